@@ -2,6 +2,180 @@ import Foundation
 import AppKit
 import CoreGraphics
 
+/// Keeps one `backend.py --serve` process alive so prompts skip interpreter
+/// startup, imports and client construction. Requests and replies are
+/// newline-delimited JSON frames matched by "id".
+final class BackendDaemon {
+    static let shared = BackendDaemon()
+
+    private let queue = DispatchQueue(label: "skibidysaurus.backend-daemon")
+    private var process: Process?
+    private var inputHandle: FileHandle?
+    private var launchedWith: String = ""
+    private var readBuffer = Data()
+    private var pending: [String: CheckedContinuation<[String: Any], Error>] = [:]
+    private var partialHandlers: [String: (String) -> Void] = [:]
+    private var partialText: [String: String] = [:]
+
+    /// Sends one request. When `onPartial` is set the backend streams "delta"
+    /// frames and `onPartial` receives the accumulated text after each one.
+    func ask(
+        _ request: [String: Any],
+        pythonExecutable: String,
+        backendScript: String,
+        projectRoot: String,
+        onPartial: ((String) -> Void)? = nil
+    ) async throws -> String {
+        let reply = try await send(
+            request,
+            pythonExecutable: pythonExecutable,
+            backendScript: backendScript,
+            projectRoot: projectRoot,
+            onPartial: onPartial
+        )
+        return (reply["response"] as? String ?? "").trimmingCharacters(in: .whitespacesAndNewlines)
+    }
+
+    /// Sends one request and returns the daemon's whole reply frame.
+    func send(
+        _ request: [String: Any],
+        pythonExecutable: String,
+        backendScript: String,
+        projectRoot: String,
+        onPartial: ((String) -> Void)? = nil
+    ) async throws -> [String: Any] {
+        try await withCheckedThrowingContinuation { continuation in
+            queue.async {
+                do {
+                    try self.ensureRunning(
+                        pythonExecutable: pythonExecutable,
+                        backendScript: backendScript,
+                        projectRoot: projectRoot
+                    )
+                    let id = UUID().uuidString
+                    var frame = request
+                    frame["id"] = id
+                    frame["stream"] = onPartial != nil
+                    var data = try JSONSerialization.data(withJSONObject: frame)
+                    data.append(0x0A)
+                    self.pending[id] = continuation
+                    if let onPartial {
+                        self.partialHandlers[id] = onPartial
+                        self.partialText[id] = ""
+                    }
+                    do {
+                        try self.inputHandle?.write(contentsOf: data)
+                    } catch {
+                        self.pending.removeValue(forKey: id)
+                        self.partialHandlers.removeValue(forKey: id)
+                        self.partialText.removeValue(forKey: id)
+                        self.stop()
+                        continuation.resume(throwing: error)
+                    }
+                } catch {
+                    continuation.resume(throwing: error)
+                }
+            }
+        }
+    }
+
+    private func ensureRunning(pythonExecutable: String, backendScript: String, projectRoot: String) throws {
+        if let process, process.isRunning, launchedWith == backendScript {
+            return
+        }
+        stop()
+
+        let task = Process()
+        let inputPipe = Pipe()
+        let outputPipe = Pipe()
+        task.executableURL = URL(fileURLWithPath: pythonExecutable)
+        task.arguments = [backendScript, "--serve"]
+        task.currentDirectoryURL = URL(fileURLWithPath: projectRoot)
+        var env = ProcessInfo.processInfo.environment
+        env["PYTHONWARNINGS"] = "ignore"
+        task.environment = env
+        task.standardInput = inputPipe
+        task.standardOutput = outputPipe
+        task.standardError = FileHandle.standardError
+
+        outputPipe.fileHandleForReading.readabilityHandler = { [weak self] handle in
+            let chunk = handle.availableData
+            self?.queue.async { self?.consume(chunk) }
+        }
+        task.terminationHandler = { [weak self] finished in
+            self?.queue.async {
+                guard let self, self.process === finished else { return }
+                self.failPending(message: "Backend daemon exited with status \(finished.terminationStatus)")
+                self.process = nil
+                self.inputHandle = nil
+            }
+        }
+
+        try task.run()
+        process = task
+        inputHandle = inputPipe.fileHandleForWriting
+        launchedWith = backendScript
+        readBuffer = Data()
+    }
+
+    private func consume(_ chunk: Data) {
+        guard !chunk.isEmpty else { return }
+        readBuffer.append(chunk)
+        while let newline = readBuffer.firstIndex(of: 0x0A) {
+            let line = readBuffer.subdata(in: readBuffer.startIndex..<newline)
+            readBuffer.removeSubrange(readBuffer.startIndex...newline)
+            guard
+                let object = try? JSONSerialization.jsonObject(with: line),
+                let reply = object as? [String: Any],
+                let id = reply["id"] as? String
+            else {
+                continue
+            }
+            if let delta = reply["delta"] as? String {
+                let text = (partialText[id] ?? "") + delta
+                partialText[id] = text
+                partialHandlers[id]?(text)
+                continue
+            }
+            partialHandlers.removeValue(forKey: id)
+            partialText.removeValue(forKey: id)
+            guard let continuation = pending.removeValue(forKey: id) else {
+                continue
+            }
+            if reply["response"] is String || reply["ok"] as? Bool == true {
+                continuation.resume(returning: reply)
+            } else {
+                let message = reply["error"] as? String ?? "Malformed backend reply"
+                continuation.resume(throwing: NSError(
+                    domain: "BackendDaemon",
+                    code: 2,
+                    userInfo: [NSLocalizedDescriptionKey: message]
+                ))
+            }
+        }
+    }
+
+    private func failPending(message: String) {
+        let error = NSError(domain: "BackendDaemon", code: 3, userInfo: [NSLocalizedDescriptionKey: message])
+        let waiting = pending
+        pending = [:]
+        partialHandlers = [:]
+        partialText = [:]
+        for continuation in waiting.values {
+            continuation.resume(throwing: error)
+        }
+    }
+
+    private func stop() {
+        if let process, process.isRunning {
+            process.terminate()
+        }
+        failPending(message: "Backend daemon restarted")
+        process = nil
+        inputHandle = nil
+    }
+}
+
 class BackendBridge {
     enum ScreenCaptureMode {
         case none
@@ -35,19 +209,22 @@ class BackendBridge {
             return nil
         }
 
-        let normalizedImage = downsampleIfNeeded(cgImage, maxDimension: 1280) ?? cgImage
+        // The backend crops and re-encodes per engine (core/imageprep.py), so hand it
+        // enough resolution for its highest tier instead of a fixed low-quality image.
+        let normalizedImage = downsampleIfNeeded(cgImage, maxDimension: 2048) ?? cgImage
         
         let bitmapRep = NSBitmapImageRep(cgImage: normalizedImage)
         guard let jpegData = bitmapRep.representation(
             using: .jpeg,
-            properties: [.compressionFactor: 0.45]
+            properties: [.compressionFactor: 0.8]
         ) else {
             return nil
         }
         
         let tempPath = NSTemporaryDirectory() + "skibidysaurus_screenshot.jpg"
         do {
-            try jpegData.write(to: URL(fileURLWithPath: tempPath))
+            // Atomic write: the backend memory-maps this file, so replace it instead of truncating it in place.
+            try jpegData.write(to: URL(fileURLWithPath: tempPath), options: .atomic)
             return tempPath
         } catch {
             return nil
@@ -139,6 +316,84 @@ class BackendBridge {
         return cwd
     }
     
+    /// Starts the daemon if needed and has it pre-open the pooled connection
+    /// for `engine`, so the first prompt skips the TCP/TLS handshake. For
+    /// Ollama it also loads `ollamaModel` into memory.
+    static func warmUp(engine: String, ollamaModel: String = "") {
+        let projectRoot = resolveProjectRoot()
+        let pythonExecutable = projectRoot + "/venv/bin/python"
+        let backendScript = projectRoot + "/backend.py"
+        guard FileManager.default.fileExists(atPath: pythonExecutable),
+              FileManager.default.fileExists(atPath: backendScript) else {
+            return
+        }
+        Task.detached(priority: .utility) {
+            _ = try? await BackendDaemon.shared.ask(
+                ["op": "warm", "engine": engine, "ollama_model": ollamaModel],
+                pythonExecutable: pythonExecutable,
+                backendScript: backendScript,
+                projectRoot: projectRoot
+            )
+        }
+    }
+
+    /// One page of the backend's prompt history (llm/history.py), newest first.
+    /// A non-empty `query` searches prompts and responses; pass the returned
+    /// `next` as `before` for the following page (nil on the last one).
+    static func history(query: String = "", before: Int? = nil, limit: Int = 50) async throws -> (items: [AppState.HistoryItem], next: Int?) {
+        var request: [String: Any] = ["op": "history", "query": query, "limit": limit]
+        if let before {
+            request["before"] = before
+        }
+        let reply = try await daemonRequest(request)
+        let entries = reply["entries"] as? [[String: Any]] ?? []
+        let items = entries.compactMap { entry -> AppState.HistoryItem? in
+            guard let id = entry["id"] as? Int, let prompt = entry["prompt"] as? String else { return nil }
+            return AppState.HistoryItem(
+                id: id,
+                prompt: prompt,
+                preview: entry["preview"] as? String ?? "",
+                engine: entry["engine"] as? String ?? "",
+                createdAt: Date(timeIntervalSince1970: entry["created_at"] as? Double ?? 0)
+            )
+        }
+        return (items, reply["next"] as? Int)
+    }
+
+    /// The full response of one history entry.
+    static func historyResponse(id: Int) async throws -> String {
+        let reply = try await daemonRequest(["op": "history_entry", "entry": id])
+        return (reply["entry"] as? [String: Any])?["response"] as? String ?? ""
+    }
+
+    static func importHistory(_ entries: [[String: Any]]) async throws {
+        _ = try await daemonRequest(["op": "history_import", "entries": entries])
+    }
+
+    static func clearHistory() async throws {
+        _ = try await daemonRequest(["op": "history_clear"])
+    }
+
+    private static func daemonRequest(_ request: [String: Any]) async throws -> [String: Any] {
+        let projectRoot = resolveProjectRoot()
+        let pythonExecutable = projectRoot + "/venv/bin/python"
+        let backendScript = projectRoot + "/backend.py"
+        guard FileManager.default.fileExists(atPath: pythonExecutable),
+              FileManager.default.fileExists(atPath: backendScript) else {
+            throw NSError(
+                domain: "BackendBridge",
+                code: 1,
+                userInfo: [NSLocalizedDescriptionKey: "Backend is not set up at \(projectRoot)"]
+            )
+        }
+        return try await BackendDaemon.shared.send(
+            request,
+            pythonExecutable: pythonExecutable,
+            backendScript: backendScript,
+            projectRoot: projectRoot
+        )
+    }
+
     /// Executes the Python backend and returns the AI response.
     static func askSkibidysaurus(
         prompt: String,
@@ -148,9 +403,11 @@ class BackendBridge {
         anthropicApiKey: String = "",
         captureMode: ScreenCaptureMode = .entireDesktop,
         engine: String = "gemini",
-        ollamaModel: String = "llava:latest",
-        openAIModel: String = "gpt-4.1-mini",
-        claudeModel: String = "claude-3-5-haiku-latest"
+        // Empty means the backend's default for the engine (llm/registry.py)
+        ollamaModel: String = "",
+        openAIModel: String = "",
+        claudeModel: String = "",
+        onPartial: ((String) -> Void)? = nil
     ) async throws -> String {
         
         // Step 1: Capture screen natively
@@ -183,8 +440,44 @@ class BackendBridge {
         print("[BackendBridge] Python exists: \(FileManager.default.fileExists(atPath: pythonExecutable))")
         print("[BackendBridge] Backend exists: \(FileManager.default.fileExists(atPath: backendScript))")
         
+        // Step 3: Prefer the warm daemon; fall back to a one-shot process if it fails.
+        // Send every key, empty ones too: the daemon outlives settings changes,
+        // and a key cleared in Settings has to be cleared there as well.
+        let daemonEnv: [String: String] = [
+            "GEMINI_API_KEY": geminiApiKey,
+            "OPENAI_API_KEY": openAIApiKey,
+            "ANTHROPIC_API_KEY": anthropicApiKey
+        ]
+        let daemonRequest: [String: Any] = [
+            "op": "ask",
+            "prompt": prompt,
+            "context": context,
+            "screenshot": screenshotPath,
+            "engine": engine,
+            "ollama_model": ollamaModel,
+            "openai_model": openAIModel,
+            "claude_model": claudeModel,
+            "env": daemonEnv
+        ]
+        do {
+            let response = try await BackendDaemon.shared.ask(
+                daemonRequest,
+                pythonExecutable: pythonExecutable,
+                backendScript: backendScript,
+                projectRoot: projectRoot,
+                onPartial: onPartial
+            )
+            if !screenshotPath.isEmpty {
+                try? FileManager.default.removeItem(atPath: screenshotPath)
+            }
+            return response
+        } catch {
+            print("[BackendBridge] Daemon unavailable, falling back to one-shot backend: \(error.localizedDescription)")
+        }
+
         return try await withCheckedThrowingContinuation { continuation in
             let task = Process()
+            let inputPipe = Pipe()
             let outputPipe = Pipe()
             let errorPipe = Pipe()
             
@@ -193,7 +486,6 @@ class BackendBridge {
             var args = [
                 backendScript,
                 "--prompt", prompt,
-                "--context", context,
                 "--engine", engine,
                 "--ollama-model", ollamaModel,
                 "--openai-model", openAIModel,
@@ -202,6 +494,10 @@ class BackendBridge {
             if !screenshotPath.isEmpty {
                 args += ["--screenshot", screenshotPath]
             }
+            // Selected text goes over stdin; a large selection would overflow argv
+            if !context.isEmpty {
+                args += ["--context-file", "-"]
+            }
             task.arguments = args
             
             // Set the working directory to the project root
@@ -222,11 +518,17 @@ class BackendBridge {
             env["PYTHONWARNINGS"] = "ignore"
             task.environment = env
             
+            task.standardInput = inputPipe
             task.standardOutput = outputPipe
             task.standardError = errorPipe
             
             do {
                 try task.run()
+                let contextData = Data(context.utf8)
+                DispatchQueue.global(qos: .userInitiated).async {
+                    inputPipe.fileHandleForWriting.write(contextData)
+                    try? inputPipe.fileHandleForWriting.close()
+                }
                 DispatchQueue.global(qos: .userInitiated).async {
                     task.waitUntilExit()
 
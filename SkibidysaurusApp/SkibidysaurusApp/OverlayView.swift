@@ -125,11 +125,14 @@ struct OverlayView: View {
                     Text("Ollama").tag("ollama")
                     Text("OpenAI").tag("openai")
                     Text("Claude").tag("claude")
+                    Text("llama.cpp").tag("llamacpp")
+                    Text("Race (fastest)").tag("race")
                 }
                 .pickerStyle(MenuPickerStyle())
                 .frame(width: 140)
-                .onChange(of: appState.selectedModel) { _ in
+                .onChange(of: appState.selectedModel) { engine in
                     appState.saveSelectedModel()
+                    BackendBridge.warmUp(engine: engine, ollamaModel: appState.ollamaModel)
                 }
 
                 Spacer()
@@ -286,12 +289,19 @@ struct OverlayView: View {
                 }
                 .buttonStyle(.bordered)
                 .controlSize(.small)
-                .disabled(appState.history.isEmpty)
+                .disabled(appState.history.isEmpty && appState.historyQuery.isEmpty)
             }
 
+            TextField("search history", text: $appState.historyQuery)
+                .textFieldStyle(.roundedBorder)
+                .font(.system(size: 12))
+                .onChange(of: appState.historyQuery) { _ in
+                    appState.loadHistory()
+                }
+
             ScrollView {
                 if appState.history.isEmpty {
-                    Text("no history yet. submit a prompt and it’ll show up here.")
+                    Text(appState.historyQuery.isEmpty ? "no history yet. submit a prompt and it’ll show up here." : "nothing matches that search.")
                         .foregroundColor(.gray.opacity(0.7))
                         .font(.system(size: 13))
                         .frame(maxWidth: .infinity, alignment: .leading)
@@ -309,13 +319,19 @@ struct OverlayView: View {
                                     Button("Reuse") {
                                         selectedTab = .chat
                                         promptText = item.prompt
-                                        appState.responseText = item.response
+                                        appState.responseText = item.preview
+                                        Task {
+                                            guard let full = try? await BackendBridge.historyResponse(id: item.id) else { return }
+                                            await MainActor.run {
+                                                appState.responseText = full
+                                            }
+                                        }
                                     }
                                     .buttonStyle(.bordered)
                                     .controlSize(.mini)
                                 }
 
-                                Text(item.response)
+                                Text(item.preview)
                                     .font(.system(size: 12))
                                     .foregroundColor(.secondary)
                                     .lineLimit(3)
@@ -329,6 +345,14 @@ struct OverlayView: View {
                             .background(Color.black.opacity(0.3))
                             .cornerRadius(8)
                         }
+
+                        if appState.historyHasMore {
+                            Button("Load more") {
+                                appState.loadHistory(more: true)
+                            }
+                            .buttonStyle(.bordered)
+                            .controlSize(.small)
+                        }
                     }
                 }
             }
@@ -336,6 +360,9 @@ struct OverlayView: View {
             .background(Color.black.opacity(0.2))
             .cornerRadius(8)
         }
+        .onAppear {
+            appState.loadHistory()
+        }
     }
 
     var markdownResponse: AttributedString {
@@ -399,11 +426,17 @@ struct OverlayView: View {
                     engine: appState.selectedModel,
                     ollamaModel: appState.ollamaModel,
                     openAIModel: appState.openAIModel,
-                    claudeModel: appState.claudeModel
+                    claudeModel: appState.claudeModel,
+                    onPartial: { partial in
+                        // Render tokens as they stream in from the backend daemon.
+                        DispatchQueue.main.async {
+                            appState.responseText = partial
+                        }
+                    }
                 )
                 await MainActor.run {
                     appState.responseText = result
-                    appState.addHistory(prompt: currentPrompt, response: result)
+                    appState.loadHistory()
                     if forcePrompt == nil {
                         promptText = ""
                     }
@@ -103,6 +103,7 @@ class AppDelegate: NSObject, NSApplicationDelegate, ObservableObject {
             panel.makeKeyAndOrderFront(nil)
             NSApp.activate(ignoringOtherApps: true)
             appState.requestPromptFocus()
+            BackendBridge.warmUp(engine: appState.selectedModel, ollamaModel: appState.ollamaModel)
         }
     }
     
@@ -196,7 +197,18 @@ class AppDelegate: NSObject, NSApplicationDelegate, ObservableObject {
 }
 
 class AppState: ObservableObject {
-    struct HistoryItem: Identifiable, Codable {
+    /// One prompt history entry as listed by the backend; `preview` is the
+    /// start of the response, BackendBridge.historyResponse has all of it.
+    struct HistoryItem: Identifiable {
+        let id: Int
+        let prompt: String
+        let preview: String
+        let engine: String
+        let createdAt: Date
+    }
+
+    /// What older versions kept in UserDefaults, imported into the backend once.
+    private struct LegacyHistoryItem: Codable {
         let id: UUID
         let prompt: String
         let response: String
@@ -215,11 +227,14 @@ class AppState: ObservableObject {
     @Published var anthropicApiKey: String = ""
     @Published var showSettings: Bool = false
     @Published var history: [HistoryItem] = []
+    @Published var historyQuery: String = ""
+    @Published var historyHasMore: Bool = false
     @Published var showOnboarding: Bool = false
     @Published var attachScreenContext: Bool = true
     @Published var shareEntireScreen: Bool = true
     @Published var voiceFocusMode: Bool = true
     @Published var promptFocusRequestID: Int = 0
+    private var historyNext: Int?
     
     init() {
         // Load saved API key from UserDefaults
@@ -234,7 +249,7 @@ class AppState: ObservableObject {
         self.attachScreenContext = UserDefaults.standard.object(forKey: "attach_screen_context") as? Bool ?? true
         self.shareEntireScreen = UserDefaults.standard.object(forKey: "share_entire_screen") as? Bool ?? true
         self.voiceFocusMode = UserDefaults.standard.object(forKey: "voice_focus_mode") as? Bool ?? true
-        loadHistory()
+        importLegacyHistory()
     }
     
     func saveApiKeys() {
@@ -275,26 +290,32 @@ class AppState: ObservableObject {
         promptFocusRequestID += 1
     }
 
-    func addHistory(prompt: String, response: String) {
-        let trimmedPrompt = prompt.trimmingCharacters(in: .whitespacesAndNewlines)
-        let trimmedResponse = response.trimmingCharacters(in: .whitespacesAndNewlines)
-        guard !trimmedPrompt.isEmpty, !trimmedResponse.isEmpty else { return }
-
-        history.insert(
-            HistoryItem(id: UUID(), prompt: trimmedPrompt, response: trimmedResponse, createdAt: Date()),
-            at: 0
-        )
-
-        if history.count > 25 {
-            history = Array(history.prefix(25))
+    /// Loads the first page of history matching `historyQuery`, or with
+    /// `more` the page after the ones already shown. The backend records
+    /// every answered prompt itself, so this is all the app has to do.
+    func loadHistory(more: Bool = false) {
+        let query = historyQuery
+        let before = more ? historyNext : nil
+        if more && before == nil { return }
+        Task {
+            guard let page = try? await BackendBridge.history(query: query, before: before) else { return }
+            await MainActor.run {
+                // A newer search replaced this one while it ran
+                guard query == self.historyQuery else { return }
+                self.history = more ? self.history + page.items : page.items
+                self.historyNext = page.next
+                self.historyHasMore = page.next != nil
+            }
         }
-
-        saveHistory()
     }
 
     func clearHistory() {
         history = []
-        UserDefaults.standard.removeObject(forKey: "prompt_history")
+        historyNext = nil
+        historyHasMore = false
+        Task {
+            try? await BackendBridge.clearHistory()
+        }
     }
 
     func completeOnboarding() {
@@ -302,18 +323,19 @@ class AppState: ObservableObject {
         UserDefaults.standard.set(true, forKey: "did_complete_onboarding")
     }
 
-    private func saveHistory() {
-        let encoder = JSONEncoder()
-        if let data = try? encoder.encode(history) {
-            UserDefaults.standard.set(data, forKey: "prompt_history")
-        }
-    }
-
-    private func loadHistory() {
+    private func importLegacyHistory() {
         guard let data = UserDefaults.standard.data(forKey: "prompt_history") else { return }
-        let decoder = JSONDecoder()
-        if let decoded = try? decoder.decode([HistoryItem].self, from: data) {
-            history = decoded
+        guard let legacy = try? JSONDecoder().decode([LegacyHistoryItem].self, from: data) else {
+            UserDefaults.standard.removeObject(forKey: "prompt_history")
+            return
+        }
+        let entries: [[String: Any]] = legacy.map {
+            ["prompt": $0.prompt, "response": $0.response, "created_at": $0.createdAt.timeIntervalSince1970]
+        }
+        Task {
+            // Kept until the backend has it, so a failed import is retried next launch
+            guard (try? await BackendBridge.importHistory(entries)) != nil else { return }
+            UserDefaults.standard.removeObject(forKey: "prompt_history")
         }
     }
 }
@@ -1,65 +1,845 @@
+import time
+
+# Process start as far as Python can tell; the "startup" span runs from here to the first request
+_STARTED = time.perf_counter()
+
 import sys
+import os
+import json
+import atexit
 import argparse
-import base64
+import asyncio
+import threading
+import socketserver
+from core import tracing
+from llm import registry
 from llm.clients import LLMManager
+from llm.race import is_error_response
+from llm.session import ConversationSession
+from llm.budget import fit_context
+from core.screenshot import ScreenshotDeduper, stands_in
+from core.imageprep import needs_image, prepare_image
+from core.imagebuf import ImagePayload
+
+# One manager per process: in --serve mode it stays warm across requests.
+_llm_manager = None
+_llm_manager_lock = threading.Lock()
+
+
+def get_llm_manager() -> LLMManager:
+    global _llm_manager
+    with _llm_manager_lock:
+        if _llm_manager is None:
+            _llm_manager = LLMManager()
+        return _llm_manager
+
+
+# Follow-up prompts usually happen on an unchanged screen; reuse that frame.
+_screenshot_deduper = ScreenshotDeduper()
+
+
+# Daemon conversations, keyed by the client's "session" id; idle ones are dropped.
+SESSION_IDLE_SECONDS = float(os.environ.get("SKIBIDYSAURUS_SESSION_IDLE", "") or 1800)
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(session_id: str):
+    """The ConversationSession for `session_id` (created on first use), or None without an id."""
+    if not session_id:
+        return None
+    now = time.monotonic()
+    with _sessions_lock:
+        expired = [key for key, (_, used) in _sessions.items() if now - used > SESSION_IDLE_SECONDS]
+        stale = [_sessions.pop(key)[0] for key in expired]
+        session = _sessions[session_id][0] if session_id in _sessions else ConversationSession(session_id=session_id)
+        _sessions[session_id] = (session, now)
+    for old in stale:
+        get_llm_manager().end_session(old)
+    return session
+
+
+def end_session(session_id: str) -> bool:
+    with _sessions_lock:
+        entry = _sessions.pop(session_id, None)
+    if entry is None:
+        return False
+    get_llm_manager().end_session(entry[0])
+    return True
+
+
+def _engine_model(engine: str, ollama_model: str, openai_model: str, claude_model: str) -> str:
+    return {"ollama": ollama_model, "openai": openai_model, "claude": claude_model}.get(engine, "")
+
+
+def _record_history(prompt: str, response: str, engine: str, model: str, started: float, ttft_ms: float = None):
+    """Adds the exchange to the prompt history (llm/history.py); a history that can't be written never costs the answer."""
+    try:
+        get_llm_manager().record_history(
+            prompt,
+            response,
+            engine,
+            model or registry.default_model(engine),
+            latency_ms=round((time.perf_counter() - started) * 1000, 1),
+            ttft_ms=ttft_ms,
+            source="backend",
+        )
+    except Exception as e:
+        print(f"Skibidysaurus history not recorded: {e}", file=sys.stderr)
+
+
+def _prepare_request(
+    prompt: str,
+    context: str,
+    screenshot_path: str,
+    engine: str = "gemini",
+    model: str = "",
+    session=None,
+    context_mode: str = "",
+    capture: bool = True,
+):
+    # Oversized selections are deduped and trimmed (or chunked for map-reduce) to the engine's budget
+    with tracing.span("context", chars=len(context)) as span:
+        fitted = fit_context(context, engine, model, context_mode)
+        span.set(tokens=fitted.tokens, strategy=fitted.strategy)
+
+    # Pre-pend context if available (from clipboard/highlight)
+    full_prompt = prompt
+    if fitted.text:
+        full_prompt = f"Edit this: '{fitted.text}' -> \n\nQuery: {prompt}"
+
+    # Text-only queries don't need the screen at all
+    if not needs_image(prompt, context):
+        return full_prompt, ImagePayload(), fitted, True
+
+    # Follow-ups in a session reuse the screenshot its first turn was asked about
+    if session is not None and session.image and session.engine == engine:
+        return full_prompt, ImagePayload(), fitted, True
+
+    # Use the screenshot path if provided by Swift (memory-mapped, not read), otherwise capture ourselves
+    if screenshot_path:
+        image = ImagePayload.from_file(screenshot_path)
+    elif not capture:
+        return full_prompt, ImagePayload(), fitted, True
+    else:
+        from core.capture import capture_screen_bytes
+        image = ImagePayload(capture_screen_bytes())
+    # Crop, downscale and re-encode for the engine's resolution tier and byte budget
+    image = prepare_image(image, engine, model)
+    frame = _screenshot_deduper.process(image, variant=f"{engine}:{model}")
+    # An earlier frame standing in for this capture is fine to send, but the
+    # cached answer about it may be about a different screen
+    return full_prompt, frame, fitted, not stands_in(frame, image)
+
+
+def session_stats() -> dict:
+    """Bytes this process avoided re-encoding and re-uploading."""
+    screenshots = _screenshot_deduper.stats()
+    uploads = get_llm_manager().image_stats()
+    with _sessions_lock:
+        conversations = [session.stats() for session, _ in _sessions.values()]
+    return {
+        "screenshots": screenshots,
+        "uploads": uploads,
+        "conversations": conversations,
+        "providers": get_llm_manager().resilience_stats(),
+        "bytes_saved": screenshots["bytes_saved"] + uploads["bytes_saved"],
+    }
+
 
 def get_ai_response(
     prompt: str,
     context: str = "",
     screenshot_path: str = "",
     engine: str = "gemini",
-    ollama_model: str = "llava:latest",
-    openai_model: str = "gpt-4.1-mini",
-    claude_model: str = "claude-3-5-haiku-latest",
+    ollama_model: str = "",
+    openai_model: str = "",
+    claude_model: str = "",
+    use_cache: bool = True,
+    session: str = "",
+    context_mode: str = "",
+    history: bool = True,
+    transforms: bool = True,
 ):
-    llm_manager = LLMManager()
-    
-    # Pre-pend context if available (from clipboard/highlight)
-    full_prompt = prompt
-    if context:
-        full_prompt = f"Edit this: '{context}' -> \n\nQuery: {prompt}"
+    llm_manager = get_llm_manager()
+    start = time.perf_counter()
+
+    with tracing.span("request", engine=engine, prompt_chars=len(prompt), context_chars=len(context)) as span:
+        try:
+            conversation = get_session(session)
+            # Mechanical edits ("uppercase this", "format this JSON") are answered locally, on the whole selection
+            response = llm_manager.local_response(prompt, context, engine, conversation) if transforms else None
+            if response is None:
+                full_prompt, image, fitted, cacheable = _prepare_request(
+                    prompt,
+                    context,
+                    screenshot_path,
+                    engine,
+                    _engine_model(engine, ollama_model, openai_model, claude_model),
+                    conversation,
+                    context_mode,
+                )
+                kwargs = dict(
+                    engine=engine,
+                    ollama_model=ollama_model,
+                    openai_model=openai_model,
+                    claude_model=claude_model,
+                    use_cache=use_cache and cacheable,
+                    session=conversation,
+                )
+
+                # Call selected engine
+                if fitted.chunks:
+                    response = "".join(llm_manager.stream_map_reduce(full_prompt, fitted.chunks, image, fitted.budget, **kwargs)).strip()
+                else:
+                    response = llm_manager.get_response(full_prompt, image, transforms=False, **kwargs)
+        except Exception as e:
+            response = f"Error: {e}"
+        span.set(response_chars=len(response))
+        if is_error_response(response):
+            span.set(error=response[:200])
+        if history:
+            _record_history(prompt, response, engine, _engine_model(engine, ollama_model, openai_model, claude_model), start)
+        return response
+
+
+async def aget_ai_response(
+    prompt: str,
+    context: str = "",
+    screenshot_path: str = "",
+    engine: str = "gemini",
+    ollama_model: str = "",
+    openai_model: str = "",
+    claude_model: str = "",
+    use_cache: bool = True,
+    session: str = "",
+    context_mode: str = "",
+    capture: bool = True,
+    history: bool = True,
+    transforms: bool = True,
+):
+    """
+    Async variant of get_ai_response for callers running many requests on
+    one event loop (--batch). With capture=False only an explicit
+    screenshot_path attaches an image.
+    """
+    llm_manager = get_llm_manager()
+    start = time.perf_counter()
+
+    with tracing.span("request", engine=engine, prompt_chars=len(prompt), context_chars=len(context)) as span:
+        try:
+            conversation = get_session(session)
+            response = await asyncio.to_thread(llm_manager.local_response, prompt, context, engine, conversation) if transforms else None
+            if response is None:
+                full_prompt, image, fitted, cacheable = await asyncio.to_thread(
+                    _prepare_request,
+                    prompt,
+                    context,
+                    screenshot_path,
+                    engine,
+                    _engine_model(engine, ollama_model, openai_model, claude_model),
+                    conversation,
+                    context_mode,
+                    capture,
+                )
+                kwargs = dict(
+                    engine=engine,
+                    ollama_model=ollama_model,
+                    openai_model=openai_model,
+                    claude_model=claude_model,
+                    use_cache=use_cache and cacheable,
+                    session=conversation,
+                )
+                if fitted.chunks:
+                    parts = [delta async for delta in llm_manager.astream_map_reduce(full_prompt, fitted.chunks, image, fitted.budget, **kwargs)]
+                    response = "".join(parts).strip()
+                else:
+                    response = await llm_manager.aget_response(full_prompt, image, transforms=False, **kwargs)
+        except Exception as e:
+            response = f"Error: {e}"
+        span.set(response_chars=len(response))
+        if is_error_response(response):
+            span.set(error=response[:200])
+        if history:
+            model = _engine_model(engine, ollama_model, openai_model, claude_model)
+            await asyncio.to_thread(_record_history, prompt, response, engine, model, start)
+        return response
+
+
+def stream_ai_response(
+    prompt: str,
+    context: str = "",
+    screenshot_path: str = "",
+    engine: str = "gemini",
+    ollama_model: str = "",
+    openai_model: str = "",
+    claude_model: str = "",
+    use_cache: bool = True,
+    session: str = "",
+    context_mode: str = "",
+    history: bool = True,
+    transforms: bool = True,
+):
+    """
+    Streaming variant of get_ai_response. Yields {"delta": ...} frames as text
+    arrives, then one {"done": True, "response": ..., "ttft_ms": ..., "total_ms": ...} frame
+    (plus "context" stats when the selection had to be cut down to fit).
+    """
+    llm_manager = get_llm_manager()
+    start = time.perf_counter()
+    first_token_at = None
+    parts = []
+    fitted = None
+    span = tracing.start("request", engine=engine, prompt_chars=len(prompt), context_chars=len(context), stream=True)
 
     try:
-        # Use the screenshot path if provided by Swift, otherwise capture ourselves
-        if screenshot_path:
-            with open(screenshot_path, "rb") as f:
-                base64_image = base64.b64encode(f.read()).decode("utf-8")
+        conversation = get_session(session)
+        # A generator can't keep its span current across yields, so it is made current around each step
+        with tracing.activate(span):
+            local = llm_manager.local_response(prompt, context, engine, conversation) if transforms else None
+        if local is not None:
+            stream = iter([local])
         else:
-            from core.capture import capture_screen_base64
-            base64_image = capture_screen_base64()
-        
-        # Call selected engine
-        response = llm_manager.get_response(
-            full_prompt,
-            base64_image,
-            engine=engine,
-            ollama_model=ollama_model,
-            openai_model=openai_model,
-            claude_model=claude_model,
-        )
-        return response
+            with tracing.activate(span):
+                full_prompt, image, fitted, cacheable = _prepare_request(
+                    prompt,
+                    context,
+                    screenshot_path,
+                    engine,
+                    _engine_model(engine, ollama_model, openai_model, claude_model),
+                    conversation,
+                    context_mode,
+                )
+            kwargs = dict(
+                engine=engine,
+                ollama_model=ollama_model,
+                openai_model=openai_model,
+                claude_model=claude_model,
+                use_cache=use_cache and cacheable,
+                session=conversation,
+            )
+            if fitted.chunks:
+                stream = llm_manager.stream_map_reduce(full_prompt, fitted.chunks, image, fitted.budget, **kwargs)
+            else:
+                stream = llm_manager.stream_response(full_prompt, image, transforms=False, **kwargs)
+        while True:
+            with tracing.activate(span):
+                delta = next(stream, None)
+            if delta is None:
+                break
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            parts.append(delta)
+            yield {"delta": delta}
+    except GeneratorExit:
+        # The consumer stopped reading; the span is still finished below
+        span.set(cancelled=True)
+        raise
     except Exception as e:
-        return f"Error: {e}"
+        error = f"Error: {e}"
+        parts.append(error)
+        yield {"delta": error}
+    finally:
+        end = time.perf_counter()
+        response = "".join(parts).strip()
+        ttft_ms = round(((first_token_at or end) - start) * 1000, 1)
+        if is_error_response(response):
+            span.set(error=response[:200])
+        span.finish(end, ttft_ms=ttft_ms, response_chars=len(response))
+
+    final = {
+        "done": True,
+        "response": response,
+        "ttft_ms": ttft_ms,
+        "total_ms": round((end - start) * 1000, 1),
+    }
+    if fitted is not None and fitted.strategy != "none":
+        final["context"] = fitted.stats()
+    if history:
+        model = _engine_model(engine, ollama_model, openai_model, claude_model)
+        _record_history(prompt, final["response"], engine, model, start, final["ttft_ms"])
+    yield final
+
+
+# API keys the Swift app forwards per request, so a long-lived daemon
+# picks up Settings changes without being restarted.
+_FORWARDED_ENV_KEYS = (
+    "GEMINI_API_KEY",
+    "OPENAI_API_KEY",
+    "ANTHROPIC_API_KEY",
+    "SKIBIDYSAURUS_RACE_ENGINES",
+    "SKIBIDYSAURUS_RACE_MODE",
+)
+
+
+def _apply_request_env(env: dict):
+    changed = False
+    for key in _FORWARDED_ENV_KEYS:
+        if key not in env:
+            continue
+        value = str(env.get(key) or "")
+        if os.environ.get(key, "") != value:
+            os.environ[key] = value
+            changed = True
+    if changed:
+        get_llm_manager().refresh_config()
+
+
+def _request_kwargs(request: dict) -> dict:
+    return {
+        "context": request.get("context") or "",
+        "screenshot_path": request.get("screenshot") or "",
+        "engine": request.get("engine") or "gemini",
+        "ollama_model": request.get("ollama_model") or "",
+        "openai_model": request.get("openai_model") or "",
+        "claude_model": request.get("claude_model") or "",
+        "use_cache": not request.get("no_cache"),
+        "session": request.get("session") or "",
+        "context_mode": request.get("context_mode") or "",
+        "history": not request.get("no_history"),
+        "transforms": not request.get("no_transforms"),
+    }
+
+
+# Largest page a history request may ask for
+HISTORY_MAX_PAGE = 500
+
+
+def history_request(store, op: str, request: dict) -> dict:
+    """
+    The daemon's history ops, answered from `store` (llm/history.py):
+    "history" pages newest first, or searches with "query" ("engine",
+    "field": "prompt"/"response", "exact" for whole words only), taking
+    "limit" and the previous reply's "next" as "before"; "history_entry"
+    returns one entry with its full response; "history_import" appends
+    "entries"; "history_stats" and "history_clear".
+    """
+    if op == "history":
+        field = request.get("field") or ""
+        if field not in ("", "prompt", "response"):
+            return {"error": f"unknown history field '{field}'"}
+        try:
+            limit = min(max(int(request.get("limit") or 50), 1), HISTORY_MAX_PAGE)
+            before = int(request["before"]) if request.get("before") is not None else None
+        except (TypeError, ValueError):
+            return {"error": "history limit and before must be integers"}
+        page = store.search(
+            request.get("query") or "",
+            limit=limit,
+            before=before,
+            engine=request.get("engine") or "",
+            field=field,
+            prefix=not request.get("exact"),
+        )
+        return {"ok": True, **page}
+    if op == "history_entry":
+        entry = store.get(request.get("entry"))
+        if entry is None:
+            return {"error": f"no history entry {request.get('entry')}"}
+        return {"ok": True, "entry": entry}
+    if op == "history_import":
+        return {"ok": True, "imported": store.import_entries(request.get("entries") or [])}
+    if op == "history_stats":
+        return {"ok": True, "stats": store.stats()}
+    if op == "history_clear":
+        store.clear()
+        return {"ok": True}
+    return {"error": f"unknown op '{op}'"}
+
+
+def handle_request(request: dict, emit=None) -> dict:
+    """
+    Handles one framed daemon request and returns the reply frame.
+    Replies echo the request "id" so callers can have several in flight.
+    With "stream": true, intermediate {"id", "delta"} frames go to `emit`
+    before the final reply.
+    """
+    request_id = request.get("id")
+    op = request.get("op", "ask")
+    if op == "ping":
+        return {"id": request_id, "ok": True}
+    if op == "warm":
+        kwargs = _request_kwargs(request)
+        get_llm_manager().warm_up(kwargs["engine"], kwargs["ollama_model"], kwargs["openai_model"], kwargs["claude_model"])
+        return {"id": request_id, "ok": True}
+    if op == "session_stats":
+        return {"id": request_id, "ok": True, "stats": session_stats()}
+    if op == "cache_stats":
+        return {"id": request_id, "ok": True, "stats": get_llm_manager().cache_stats()}
+    if op == "resilience_stats":
+        return {"id": request_id, "ok": True, "stats": get_llm_manager().resilience_stats()}
+    if op == "trace_stats":
+        # Per engine and stage p50/p95 from core/tracing.py (empty unless tracing is on)
+        return {"id": request_id, "ok": True, "stats": tracing.stats()}
+    if op == "transform_stats":
+        # Requests answered by llm/transforms.py instead of an engine, and the time that saved
+        return {"id": request_id, "ok": True, "stats": get_llm_manager().transform_stats()}
+    if op == "providers":
+        # Engines, their default models and capabilities, with per-engine request metrics
+        return {"id": request_id, "ok": True, "providers": registry.describe(), "stats": get_llm_manager().provider_stats()}
+    if op == "end_session":
+        return {"id": request_id, "ok": end_session(request.get("session") or "")}
+    if op.startswith("history"):
+        return {"id": request_id, **history_request(get_llm_manager().history(), op, request)}
+    if op != "ask":
+        return {"id": request_id, "error": f"unknown op '{op}'"}
+
+    prompt = request.get("prompt") or ""
+    if not prompt:
+        return {"id": request_id, "error": "missing prompt"}
+
+    _apply_request_env(request.get("env") or {})
+    if request.get("stream") and emit is not None:
+        for frame in stream_ai_response(prompt, **_request_kwargs(request)):
+            if frame.get("done"):
+                reply = {
+                    "id": request_id,
+                    "response": frame["response"],
+                    "ttft_ms": frame["ttft_ms"],
+                    "total_ms": frame["total_ms"],
+                }
+                if "context" in frame:
+                    reply["context"] = frame["context"]
+                return reply
+            emit({"id": request_id, "delta": frame["delta"]})
+
+    response = get_ai_response(prompt, **_request_kwargs(request))
+    return {"id": request_id, "response": response}
+
+
+def run_batch_file(args) -> dict:
+    """
+    --batch: one request per JSONL line in, one result line out. Request
+    lines take the daemon's fields ("prompt", "context", "context_file",
+    "screenshot", "engine", models, "no_cache", "context_mode"); anything
+    missing comes from the command line. Never captures the screen.
+    """
+    from llm.batch import BatchCheckpoint, parse_limits, run_batch
+
+    defaults = {
+        "engine": args.engine,
+        "ollama_model": args.ollama_model,
+        "openai_model": args.openai_model,
+        "claude_model": args.claude_model,
+        "no_cache": args.no_cache,
+        "context_mode": args.context_mode,
+        "no_transforms": args.no_transforms,
+        # Bulk runs stay out of the prompt history unless a line asks for it
+        "no_history": True,
+    }
+
+    async def ask(request: dict) -> str:
+        request = {**defaults, **{k: v for k, v in request.items() if v not in (None, "")}}
+        if request.get("context_file"):
+            with open(request["context_file"], encoding="utf-8", errors="replace") as f:
+                request["context"] = await asyncio.to_thread(f.read)
+        return await aget_ai_response(request["prompt"], capture=False, **_request_kwargs(request))
+
+    checkpoint = None
+    if args.output:
+        checkpoint_path = f"{args.output}.checkpoint"
+        if args.resume:
+            checkpoint = BatchCheckpoint.resume(checkpoint_path, args.output)
+        else:
+            checkpoint = BatchCheckpoint(checkpoint_path)
+    elif args.resume:
+        raise SystemExit("--resume needs --output")
+
+    source = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8")
+    out = open(args.output, "a" if args.resume else "w", encoding="utf-8") if args.output else sys.stdout
+    async def batch():
+        try:
+            return await run_batch(
+                source,
+                out,
+                ask,
+                default_engine=args.engine,
+                ordered=args.batch_order == "input",
+                limits=parse_limits(args.batch_limits),
+                checkpoint=checkpoint,
+                max_attempts=args.batch_attempts,
+            )
+        finally:
+            await get_llm_manager().transport.aclose()
+
+    try:
+        return asyncio.run(batch())
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+
+
+def history_command(argv: list) -> int:
+    """
+    `backend.py history list|search|show|stats|clear|import`: the prompt
+    history from the command line, one JSON reply on stdout shaped like the
+    daemon's history ops.
+    """
+    parser = argparse.ArgumentParser(prog="backend.py history", description="Page through and search the prompt history.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("list", "search"):
+        command = commands.add_parser(name, help="Newest entries first." if name == "list" else "Entries containing every word, newest first.")
+        if name == "search":
+            command.add_argument("query", nargs="+", help="Words to find; the last one also matches as a prefix.")
+            command.add_argument("--field", required=False, type=str, default="", choices=["prompt", "response"], help="Search only prompts or only responses.")
+            command.add_argument("--exact", action="store_true", help="Match the last word whole instead of as a prefix.")
+        command.add_argument("--limit", required=False, type=int, default=20, help=f"Entries per page (at most {HISTORY_MAX_PAGE}).")
+        command.add_argument("--before", required=False, type=int, default=None, help='The previous page\'s "next", for the page after it.')
+        command.add_argument("--engine", required=False, type=str, default="", help="Only entries answered by this engine.")
+    show = commands.add_parser("show", help="One entry with its full response.")
+    show.add_argument("entry", type=int)
+    importer = commands.add_parser("import", help="Append entries from a JSONL file ('-' for stdin).")
+    importer.add_argument("path")
+    commands.add_parser("stats", help="Entry count, date range and size on disk.")
+    commands.add_parser("clear", help="Delete every entry.")
+    args = parser.parse_args(argv)
+
+    from llm.history import PromptHistory
+    store = PromptHistory()
+    try:
+        if args.command in ("list", "search"):
+            reply = history_request(store, "history", {
+                "query": " ".join(getattr(args, "query", [])),
+                "limit": args.limit,
+                "before": args.before,
+                "engine": args.engine,
+                "field": getattr(args, "field", ""),
+                "exact": getattr(args, "exact", False),
+            })
+        elif args.command == "show":
+            reply = history_request(store, "history_entry", {"entry": args.entry})
+        elif args.command == "import":
+            source = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8")
+            try:
+                entries = [json.loads(line) for line in source if line.strip()]
+            finally:
+                if source is not sys.stdin:
+                    source.close()
+            reply = history_request(store, "history_import", {"entries": entries})
+        else:
+            reply = history_request(store, f"history_{args.command}", {})
+    finally:
+        store.close()
+    print(json.dumps(reply, ensure_ascii=False))
+    return 0 if reply.get("ok") else 1
+
+
+def pipeline_stats() -> dict:
+    """Everything the stats endpoint serves next to the per-stage percentiles."""
+    manager = get_llm_manager()
+    return {"providers": manager.provider_stats(), "resilience": manager.resilience_stats(), "transforms": manager.transform_stats()}
+
+
+def start_tracing(args):
+    """
+    Applies --trace, --profile and --stats-port: spans to a rotating JSONL
+    file, cProfile/tracemalloc reported to stderr when the process exits,
+    and the stats endpoint on localhost.
+    """
+    if args.trace or args.profile:
+        tracing.configure(tracing.trace_path(args.trace or "1"))
+    if tracing.enabled():
+        tracing.record("startup", _STARTED, mode="serve" if args.serve else "batch" if args.batch else "cli")
+    modes = tracing.profile_modes(args.profile)
+    if modes:
+        profiler = tracing.Profiler(modes).start()
+
+        def report():
+            profiler.stop()
+            print(f"Skibidysaurus stage stats: {json.dumps(tracing.stats())}", file=sys.stderr)
+            profiler.report(sys.stderr, dump_dir=os.path.dirname(tracing.tracer.path))
+
+        atexit.register(report)
+    if args.stats_port is not None:
+        server = tracing.serve_stats(args.stats_port, extra=pipeline_stats)
+        print(f"Skibidysaurus stats on http://127.0.0.1:{server.server_address[1]}/stats", file=sys.stderr)
+
+
+def _parse_frame(line: str):
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        return None, {"id": None, "error": f"invalid JSON: {e}"}
+    if not isinstance(request, dict):
+        return None, {"id": None, "error": "request must be a JSON object"}
+    return request, None
+
+
+def serve_stdio():
+    """
+    Serves newline-delimited JSON requests from stdin and writes one JSON
+    reply per line to stdout. Requests run concurrently on worker threads.
+    """
+    out = sys.stdout
+    # Anything else printed while serving must not corrupt the reply stream.
+    sys.stdout = sys.stderr
+    write_lock = threading.Lock()
+
+    def reply(message: dict):
+        with write_lock:
+            out.write(json.dumps(message) + "\n")
+            out.flush()
+
+    get_llm_manager()
+    reply({"event": "ready", "pid": os.getpid()})
+
+    workers = []
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        request, error = _parse_frame(line)
+        if error:
+            reply(error)
+            continue
+        worker = threading.Thread(target=lambda r=request: reply(handle_request(r, emit=reply)), daemon=True)
+        worker.start()
+        workers.append(worker)
+        workers = [w for w in workers if w.is_alive()]
+
+    for worker in workers:
+        worker.join()
+    print(f"Skibidysaurus session stats: {json.dumps(session_stats())}", file=sys.stderr)
+
+
+class _DaemonRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw_line in self.rfile:
+            line = raw_line.decode("utf-8").strip()
+            if not line:
+                continue
+            request, error = _parse_frame(line)
+            message = error or handle_request(request, emit=self._write_frame)
+            self._write_frame(message)
+
+    def _write_frame(self, message: dict):
+        self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+
+def serve_unix_socket(socket_path: str):
+    """
+    Serves the same framed protocol on a Unix domain socket, one thread per connection.
+    """
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    get_llm_manager()
+    server = socketserver.ThreadingUnixStreamServer(socket_path, _DaemonRequestHandler)
+    server.daemon_threads = True
+    os.chmod(socket_path, 0o600)
+    print(f"Skibidysaurus backend listening on {socket_path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Skibidysaurus session stats: {json.dumps(session_stats())}", file=sys.stderr)
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["history"]:
+        sys.exit(history_command(sys.argv[2:]))
+
     parser = argparse.ArgumentParser(description="Skibidysaurus AI Backend")
-    parser.add_argument("--prompt", required=True, type=str, help="The user's query.")
+    parser.add_argument("--prompt", required=False, type=str, default="", help="The user's query.")
     parser.add_argument("--context", required=False, type=str, default="", help="Highlighted text context.")
+    parser.add_argument("--context-file", required=False, type=str, default="", help="Read the highlighted text from this file ('-' for stdin) instead of --context.")
+    parser.add_argument(
+        "--context-mode",
+        required=False,
+        type=str,
+        default="",
+        choices=["", "trim", "mapreduce", "off"],
+        help="What to do with context over the engine's token budget: trim head/tail (default), map-reduce over chunks, or send it whole.",
+    )
     parser.add_argument("--screenshot", required=False, type=str, default="", help="Path to screenshot JPEG taken by Swift.")
     parser.add_argument(
         "--engine",
         required=False,
         type=str,
         default="gemini",
-        choices=["gemini", "ollama", "openai", "claude"],
-        help="Inference engine."
+        choices=registry.engines() + ["race"],
+        help="Inference engine. 'race' sends the prompt to several engines and keeps the first good answer."
     )
-    parser.add_argument("--ollama-model", required=False, type=str, default="llava:latest", help="Local Ollama model to use.")
-    parser.add_argument("--openai-model", required=False, type=str, default="gpt-4.1-mini", help="OpenAI model to use.")
-    parser.add_argument("--claude-model", required=False, type=str, default="claude-3-5-haiku-latest", help="Claude model to use.")
-    
+    parser.add_argument("--ollama-model", required=False, type=str, default=registry.default_model("ollama"), help="Local Ollama model to use.")
+    parser.add_argument("--openai-model", required=False, type=str, default=registry.default_model("openai"), help="OpenAI model to use.")
+    parser.add_argument("--claude-model", required=False, type=str, default=registry.default_model("claude"), help="Claude model to use.")
+    parser.add_argument("--race-engines", required=False, type=str, default="", help="Comma-separated engines for --engine race (default: gemini,openai,claude,ollama).")
+    parser.add_argument("--race-mode", required=False, type=str, default="", choices=["", "hedged", "parallel"], help="Start raced engines all at once, or hedge after each engine's p95 delay (default).")
+    parser.add_argument("--no-cache", action="store_true", help="Skip the on-disk response cache for this query.")
+    parser.add_argument("--cache-stats", action="store_true", help="Print response cache hit/miss counters as JSON and exit.")
+    parser.add_argument("--no-history", action="store_true", help="Keep this query out of the prompt history (see 'backend.py history --help').")
+    parser.add_argument("--no-transforms", action="store_true", help="Send the query to the engine even when a local transform (uppercase, format JSON, sort lines, ...) could answer it.")
+    parser.add_argument("--stream", action="store_true", help="Print newline-delimited JSON frames as text arrives instead of one final answer.")
+    parser.add_argument("--batch", required=False, type=str, default="", help="Run every request in this JSONL file ('-' for stdin) and write JSONL results.")
+    parser.add_argument("--output", required=False, type=str, default="", help="With --batch, write results here (default stdout); also where the checkpoint lives.")
+    parser.add_argument("--batch-order", required=False, type=str, default="input", choices=["input", "completed"], help="With --batch, write results in input order or as they complete.")
+    parser.add_argument("--batch-limits", required=False, type=str, default="", help="With --batch, per-engine concurrency, e.g. 'openai=8,claude=4,ollama=2'.")
+    parser.add_argument("--batch-attempts", required=False, type=int, default=3, help="With --batch, attempts per request on rate limits and transient errors.")
+    parser.add_argument("--resume", action="store_true", help="With --batch and --output, skip requests an interrupted run already answered.")
+    parser.add_argument("--serve", action="store_true", help="Run as a long-lived daemon serving newline-delimited JSON requests.")
+    parser.add_argument("--socket", required=False, type=str, default="", help="With --serve, listen on this Unix socket instead of stdin/stdout.")
+    parser.add_argument("--trace", required=False, type=str, nargs="?", const="1", default="", help="Write per-stage timing spans to this JSONL file (default: traces/trace.jsonl in the data directory).")
+    parser.add_argument("--profile", required=False, type=str, nargs="?", const="all", default="", help="Trace, and profile with cProfile and/or tracemalloc ('cpu', 'memory' or both); reported on stderr at exit.")
+    parser.add_argument("--stats-port", required=False, type=int, default=None, help="Serve per engine and stage p50/p95 on http://127.0.0.1:PORT/stats (0 picks a free port).")
+
     args = parser.parse_args()
-    
+
+    if args.race_engines:
+        os.environ["SKIBIDYSAURUS_RACE_ENGINES"] = args.race_engines
+    if args.race_mode:
+        os.environ["SKIBIDYSAURUS_RACE_MODE"] = args.race_mode
+    start_tracing(args)
+
+    if args.serve:
+        if args.socket:
+            serve_unix_socket(args.socket)
+        else:
+            serve_stdio()
+        sys.exit(0)
+
+    if args.batch:
+        stats = run_batch_file(args)
+        stats["providers"] = get_llm_manager().resilience_stats()
+        print(f"Skibidysaurus batch stats: {json.dumps(stats)}", file=sys.stderr)
+        sys.exit(1 if stats["failed"] else 0)
+
+    if args.cache_stats:
+        print(json.dumps(get_llm_manager().cache_stats()))
+        sys.exit(0)
+
+    if not args.prompt:
+        parser.error("--prompt is required unless --serve is given")
+
+    # Large selections don't fit in argv; the app hands them over as a file
+    if args.context_file == "-":
+        args.context = sys.stdin.read()
+    elif args.context_file:
+        with open(args.context_file, encoding="utf-8", errors="replace") as f:
+            args.context = f.read()
+
+    if args.stream:
+        for frame in stream_ai_response(
+            args.prompt,
+            args.context,
+            args.screenshot,
+            engine=args.engine,
+            ollama_model=args.ollama_model,
+            openai_model=args.openai_model,
+            claude_model=args.claude_model,
+            use_cache=not args.no_cache,
+            context_mode=args.context_mode,
+            history=not args.no_history,
+            transforms=not args.no_transforms,
+        ):
+            print(json.dumps(frame), flush=True)
+        sys.exit(0)
+
     print(get_ai_response(
         args.prompt,
         args.context,
@@ -68,4 +848,8 @@ if __name__ == "__main__":
         ollama_model=args.ollama_model,
         openai_model=args.openai_model,
         claude_model=args.claude_model,
+        use_cache=not args.no_cache,
+        context_mode=args.context_mode,
+        history=not args.no_history,
+        transforms=not args.no_transforms,
     ))
@@ -0,0 +1,82 @@
+"""
+Concurrent async requests on one event loop vs sequential blocking calls, and
+what a superseded query costs once it is cancelled, against the local mock
+providers.
+
+    python benchmarks/bench_async.py --concurrency 8
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_servers import MockProviderServer  # noqa: E402
+
+
+async def _concurrent(manager, engine: str, n: int) -> float:
+    start = time.perf_counter()
+    replies = await asyncio.gather(*(manager.aget_response(f"q{i}", "", engine=engine) for i in range(n)))
+    elapsed = time.perf_counter() - start
+    assert all("Error" not in r for r in replies), replies
+    return elapsed
+
+
+async def _cancelled(manager, engine: str, after: float) -> None:
+    async def consume():
+        async for _ in manager.astream_response("long answer", "", engine=engine):
+            pass
+
+    task = asyncio.create_task(consume())
+    await asyncio.sleep(after)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async LLMManager concurrency and cancellation")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--engine", default="openai", choices=["ollama", "openai", "claude"])
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--tokens", type=int, default=50)
+    args = parser.parse_args()
+
+    tokens = [f"tok{i} " for i in range(args.tokens)]
+    with MockProviderServer(tokens=tokens, first_token_delay=args.first_token_delay, token_delay=args.token_delay) as server:
+        os.environ.update(server.env())
+        from llm.clients import LLMManager
+        manager = LLMManager()
+
+        start = time.perf_counter()
+        for i in range(args.concurrency):
+            manager.get_response(f"q{i}", "", engine=args.engine)
+        sequential = time.perf_counter() - start
+
+        async def run():
+            concurrent = await _concurrent(manager, args.engine, args.concurrency)
+            sent_before = server.tokens_sent
+            await _cancelled(manager, args.engine, after=args.first_token_delay + 5 * args.token_delay)
+            # Give the server a few token intervals to notice the closed socket.
+            await asyncio.sleep(10 * args.token_delay + 0.05)
+            await manager.transport.aclose()
+            return concurrent, server.tokens_sent - sent_before
+
+        concurrent, cancelled_tokens = asyncio.run(run())
+
+    print(f"{args.concurrency} sequential blocking calls: {sequential * 1000:8.1f} ms")
+    print(f"{args.concurrency} concurrent async calls:    {concurrent * 1000:8.1f} ms")
+    print(
+        f"cancelled query: server sent {cancelled_tokens}/{args.tokens} tokens, "
+        f"disconnects seen={server.disconnects}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+backend.py --batch against the alternatives it replaces, in three parts:
+
+1. one `backend.py --prompt` process per snippet vs one --batch run, both
+   against the local mock server
+2. memory: run_batch over generated inputs of growing length with an
+   in-process fake provider; peak RSS should not grow with the line count
+3. rate limits: the fake provider answers a share of calls with a 429 and a
+   "try again in" hint; every request should still end up answered
+
+    python benchmarks/bench_batch.py --snippets 40 --lines 100000,1000000 --rate-limited 0.1
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import resource
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_servers import MockProviderServer  # noqa: E402
+from llm.batch import run_batch  # noqa: E402
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def per_process_vs_batch(snippets: int):
+    with MockProviderServer(first_token_delay=0.05) as server:
+        env = dict(os.environ, **server.env())
+        backend = os.path.join(ROOT, "backend.py")
+
+        start = time.perf_counter()
+        for i in range(snippets):
+            subprocess.run(
+                [sys.executable, backend, "--prompt", f"rewrite snippet {i}", "--engine", "openai"],
+                env=env, capture_output=True, check=True,
+            )
+        per_process = time.perf_counter() - start
+
+        lines = "".join(json.dumps({"prompt": f"rewrite snippet {i}", "engine": "openai"}) + "\n" for i in range(snippets))
+        start = time.perf_counter()
+        subprocess.run([sys.executable, backend, "--batch", "-"], input=lines, text=True, env=env, capture_output=True)
+        batch = time.perf_counter() - start
+    print(f"{snippets} snippets: one process each {per_process:6.2f} s   --batch {batch:6.2f} s  ({per_process / batch:4.1f}x)")
+
+
+class Lines:
+    """Generates request lines on the fly, so the input itself costs no memory."""
+
+    def __init__(self, count: int):
+        self.count = count
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield json.dumps({"id": i, "prompt": f"rewrite snippet {i}", "engine": ("openai", "claude")[i % 2]}) + "\n"
+
+
+def fake_provider(rate_limited: float, delay: float, seed: int = 5):
+    rng = random.Random(seed)
+
+    async def ask(request):
+        await asyncio.sleep(delay)
+        if rng.random() < rate_limited:
+            return "OpenAI Error: 429 Too Many Requests. Rate limit reached, please try again in 20ms."
+        return f"rewritten: {request['prompt']}"
+    return ask
+
+
+def memory(line_counts: list, ordered: bool):
+    for count in line_counts:
+        with open(os.devnull, "w") as out:
+            start = time.perf_counter()
+            stats = asyncio.run(run_batch(iter(Lines(count)), out, fake_provider(0.0, 0.0), ordered=ordered))
+        print(
+            f"{count:>9,} lines ({'input order' if ordered else 'as completed'}): {stats['per_s']:9,.0f} req/s  "
+            f"{time.perf_counter() - start:6.1f} s  peak RSS {peak_rss_mb():6.1f} MB"
+        )
+
+
+def rate_limits(requests: int, share: float):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "out.jsonl")
+        with open(path, "w") as out:
+            stats = asyncio.run(run_batch(iter(Lines(requests)), out, fake_provider(share, 0.005), max_attempts=8))
+        with open(path) as f:
+            answered = sum("response" in json.loads(line) for line in f)
+    print(
+        f"{requests} requests, {share:.0%} rate limited per attempt: answered {answered}/{requests}, "
+        f"{stats['retries']} retries, {stats['elapsed_s']:.2f} s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="backend.py --batch throughput, memory and retries")
+    parser.add_argument("--snippets", type=int, default=40)
+    parser.add_argument("--lines", default="100000,1000000")
+    parser.add_argument("--rate-limited", type=float, default=0.1)
+    args = parser.parse_args()
+
+    per_process_vs_batch(args.snippets)
+    memory([int(count) for count in args.lines.split(",")], ordered=True)
+    memory([int(count) for count in args.lines.split(",")][-1:], ordered=False)
+    rate_limits(500, args.rate_limited)
+
+
+if __name__ == "__main__":
+    main()
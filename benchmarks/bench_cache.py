@@ -0,0 +1,58 @@
+"""
+Response cache: latency of a miss (full round trip to the mock provider)
+vs a hit served from the on-disk SQLite cache, plus the persisted counters.
+
+    python benchmarks/bench_cache.py --rounds 20
+"""
+import os
+import sys
+import time
+import base64
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_servers import MockProviderServer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response cache hit vs miss latency")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--engine", default="openai", choices=["ollama", "openai", "claude"])
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--image-kb", type=int, default=200, help="Size of the fake screenshot sent with each query.")
+    args = parser.parse_args()
+
+    image = base64.b64encode(os.urandom(args.image_kb * 1024)).decode("utf-8")
+    with tempfile.TemporaryDirectory() as data_dir, MockProviderServer(first_token_delay=args.first_token_delay) as server:
+        os.environ.update(server.env())
+        os.environ["SKIBIDYSAURUS_DATA_DIR"] = data_dir
+        os.environ["SKIBIDYSAURUS_CACHE"] = "1"
+        from llm.clients import LLMManager
+        manager = LLMManager()
+
+        misses, hits = [], []
+        for i in range(args.rounds):
+            start = time.perf_counter()
+            manager.get_response(f"q{i}", image, engine=args.engine)
+            misses.append(time.perf_counter() - start)
+        requests_after_misses = len(server.requests)
+        for i in range(args.rounds):
+            start = time.perf_counter()
+            manager.get_response(f"q{i}", image, engine=args.engine)
+            hits.append(time.perf_counter() - start)
+        stats = manager.cache_stats()
+        network_on_hits = len(server.requests) - requests_after_misses
+        manager.close()
+
+    misses.sort()
+    hits.sort()
+    print(f"miss p50: {misses[len(misses) // 2] * 1000:8.2f} ms")
+    print(f"hit  p50: {hits[len(hits) // 2] * 1000:8.2f} ms  (provider requests during hits: {network_on_hits})")
+    print(f"counters: {stats}")
+
+
+if __name__ == "__main__":
+    main()
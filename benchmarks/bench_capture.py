@@ -0,0 +1,65 @@
+"""
+Per-capture cost of each screen capture backend available on this machine,
+including the legacy path (`screencapture` into a temp file plus the
+unconditional debug copy) where the tool exists. Off macOS only the fake
+backend runs.
+
+    python benchmarks/bench_capture.py --runs 10
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core import capture  # noqa: E402
+
+
+def _legacy() -> bytes:
+    data = capture.ScreencaptureCLIBackend().capture()
+    # The old code copied every capture to debug_screenshot.jpg
+    with tempfile.NamedTemporaryFile(suffix=".jpg") as f:
+        f.write(data)
+        f.flush()
+        shutil.copy(f.name, f.name + ".debug")
+        os.remove(f.name + ".debug")
+    return data
+
+
+def _measure(label: str, fn, runs: int):
+    fn()  # first capture pays one-time setup (permissions, content lookup)
+    timings = []
+    size = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        size = len(fn())
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"{label:<18} p50 {timings[len(timings) // 2] * 1000:7.1f} ms  p95 {timings[int(len(timings) * 0.95)] * 1000:7.1f} ms  {size / 1024:7.1f} KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Screen capture backends")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    if capture.ScreencaptureCLIBackend().available():
+        _measure("legacy cli+debug", _legacy, args.runs)
+    for name, backend_class in capture.BACKENDS.items():
+        backend = backend_class()
+        if not backend.available():
+            print(f"{name:<18} unavailable here")
+            continue
+        try:
+            _measure(name, backend.capture, args.runs)
+        except Exception as e:
+            print(f"{name:<18} failed: {e}")
+    _measure("fake (changing)", capture.FakeCaptureBackend(changing=True).capture, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Context budgeting on multi-megabyte selections. Builds synthetic logs (mostly
+templated lines that differ in ids and timestamps, plus some unique ones) and
+reports, per size:
+
+- token estimation throughput
+- fit_context() time and tokens before/after for the default trim mode
+- request body bytes sent with and without budgeting (local mock server)
+- map-reduce wall time with chunks run one at a time vs concurrently
+
+    python benchmarks/bench_context.py --sizes-mb 1,2,8 --engine openai --first-token-delay 0.2
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_servers import MockProviderServer  # noqa: E402
+from llm.budget import estimate_tokens, fit_context  # noqa: E402
+
+TEMPLATES = [
+    "{ts} INFO  worker-{n} processed request id={hex} in {ms} ms",
+    "{ts} DEBUG cache lookup key={hex} hit=false shard={n}",
+    "{ts} WARN  retrying upstream call attempt={n} after {ms} ms",
+    "{ts} ERROR connection reset by peer while reading response body (request {hex})",
+]
+
+
+def synthetic_log(size_bytes: int, unique: float, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    lines, total = [], 0
+    while total < size_bytes:
+        ts = f"2026-10-17T12:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}.{rng.randint(0, 999):03d}Z"
+        if rng.random() < unique:
+            words = " ".join("".join(rng.choice("etaoinshrdlu") for _ in range(rng.randint(3, 9))) for _ in range(12))
+            line = f"{ts} NOTE  {words}"
+        else:
+            line = rng.choice(TEMPLATES).format(ts=ts, n=rng.randint(0, 64), hex=f"{rng.getrandbits(48):012x}", ms=rng.randint(1, 900))
+        lines.append(line)
+        total += len(line) + 1
+    return "\n".join(lines)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Context budgeting on large selections")
+    parser.add_argument("--sizes-mb", default="1,2,8")
+    parser.add_argument("--engine", default="openai", choices=["ollama", "openai", "claude"])
+    parser.add_argument("--budget", type=int, default=0, help="Token budget override (default: the engine's).")
+    parser.add_argument("--first-token-delay", type=float, default=0.2, help="Mock model latency per request.")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--unique", type=float, default=0.3, help="Share of log lines that aren't templated repeats.")
+    args = parser.parse_args()
+
+    with MockProviderServer(first_token_delay=args.first_token_delay) as server:
+        os.environ.update(server.env())
+        from backend import get_ai_response, get_llm_manager
+        from llm.clients import LLMManager
+        from core.imagebuf import ImagePayload
+
+        manager = LLMManager()
+        for size_mb in (float(size) for size in args.sizes_mb.split(",")):
+            text = synthetic_log(int(size_mb * 1024 * 1024), args.unique)
+            tokens, estimate_s = timed(estimate_tokens, text)
+            fitted, fit_s = timed(fit_context, text, args.engine, "", "trim", args.budget or None)
+            print(
+                f"{size_mb:4.1f} MB  ~{tokens:>9,} tokens  estimate {estimate_s * 1000:6.1f} ms "
+                f"({len(text) / 1024 / 1024 / max(estimate_s, 1e-9):6.0f} MB/s)  "
+                f"trim -> {fitted.tokens:,} tokens ({fitted.strategy}) in {fit_s * 1000:6.1f} ms"
+            )
+
+            sent = {}
+            for mode in ("off", "trim"):
+                before = len(server.requests)
+                get_ai_response("summarize the errors", text, engine=args.engine, context_mode=mode)
+                sent[mode] = sum(size for _, size in server.requests[before:])
+            print(f"          request body: whole {sent['off'] / 1024:8.0f} KB  budgeted {sent['trim'] / 1024:6.0f} KB")
+
+            fitted = fit_context(text, args.engine, "", "mapreduce", args.budget or None)
+            if not fitted.chunks:
+                continue  # deduping alone brought it within budget
+            for concurrency in (1, args.concurrency):
+                os.environ["SKIBIDYSAURUS_MAP_CONCURRENCY"] = str(concurrency)
+                start = time.perf_counter()
+                "".join(manager.stream_map_reduce(
+                    "summarize the errors", fitted.chunks, ImagePayload(), fitted.budget, engine=args.engine
+                ))
+                print(
+                    f"          map-reduce {len(fitted.chunks):2d} chunks, concurrency {concurrency}: "
+                    f"{(time.perf_counter() - start) * 1000:7.0f} ms"
+                )
+        manager.close()
+        get_llm_manager().close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Compares cold one-shot `backend.py --prompt` calls with warm `backend.py --serve` calls.
+
+Uses the OpenAI engine with no API key so every request returns immediately
+from LLMManager; what is measured is process startup, imports and dispatch,
+not provider latency.
+
+    python benchmarks/bench_daemon.py --runs 10
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, "backend.py")
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env["OPENAI_API_KEY"] = ""
+    env["PYTHONWARNINGS"] = "ignore"
+    return env
+
+
+def _summary(label: str, samples: list[float]) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return (
+        f"{label:<14} n={len(samples):<4} "
+        f"median={statistics.median(samples) * 1000:8.1f} ms  "
+        f"p95={p95 * 1000:8.1f} ms  "
+        f"min={ordered[0] * 1000:8.1f} ms"
+    )
+
+
+def bench_cold(runs: int, screenshot: str) -> list[float]:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, BACKEND, "--prompt", "ping", "--engine", "openai", "--screenshot", screenshot],
+            cwd=ROOT,
+            env=_env(),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        )
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_warm(runs: int, screenshot: str) -> tuple[float, list[float]]:
+    start = time.perf_counter()
+    daemon = subprocess.Popen(
+        [sys.executable, BACKEND, "--serve"],
+        cwd=ROOT,
+        env=_env(),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        bufsize=1,
+    )
+    try:
+        ready = json.loads(daemon.stdout.readline())
+        assert ready.get("event") == "ready", ready
+        startup = time.perf_counter() - start
+
+        samples = []
+        for i in range(runs):
+            frame = {"id": str(i), "prompt": "ping", "engine": "openai", "screenshot": screenshot}
+            start = time.perf_counter()
+            daemon.stdin.write(json.dumps(frame) + "\n")
+            daemon.stdin.flush()
+            reply = json.loads(daemon.stdout.readline())
+            samples.append(time.perf_counter() - start)
+            assert reply.get("id") == str(i), reply
+        return startup, samples
+    finally:
+        daemon.stdin.close()
+        daemon.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold CLI vs warm daemon backend latency")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    fd, screenshot = tempfile.mkstemp(suffix=".jpg")
+    with os.fdopen(fd, "wb") as f:
+        f.write(b"\xff\xd8\xff\xd9")
+    try:
+        cold = bench_cold(args.runs, screenshot)
+        startup, warm = bench_warm(args.runs, screenshot)
+    finally:
+        os.remove(screenshot)
+
+    print(_summary("cold CLI", cold))
+    print(f"{'daemon start':<14} {startup * 1000:8.1f} ms (paid once)")
+    print(_summary("warm daemon", warm))
+    print(f"speedup (median): {statistics.median(cold) / statistics.median(warm):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Prompt history (llm/history.py) at 100k+ entries: append latency, then
+first and deep pages, prefix and full-text search with and without an
+engine filter, next to what the old approaches cost at that size, a
+LIKE scan over the table and re-encoding the whole list on every insert
+(what the app did with UserDefaults).
+
+    python benchmarks/bench_history.py --entries 100000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from llm.history import PromptHistory  # noqa: E402
+
+WORDS = (
+    "rewrite summarise translate explain refactor python swift regex error stack trace email draft "
+    "concise formal bullet list table function class async await cache latency overlay screenshot "
+    "french german spanish meeting notes invoice contract review bug crash memory thread queue"
+).split()
+ENGINES = ["gemini", "openai", "claude", "ollama"]
+
+
+def entries(count: int, seed: int = 3):
+    rng = random.Random(seed)
+    now = time.time() - count * 60
+    for i in range(count):
+        yield {
+            "prompt": " ".join(rng.choices(WORDS, k=rng.randint(4, 12))),
+            "response": " ".join(rng.choices(WORDS, k=rng.randint(40, 160))) + f" ref{i}",
+            "engine": rng.choice(ENGINES),
+            "latency_ms": rng.uniform(200, 3000),
+            "created_at": now + i * 60,
+        }
+
+
+def timed(fn, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt history store benchmark")
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        history = PromptHistory(os.path.join(data_dir, "history.sqlite3"))
+        start = time.perf_counter()
+        history.import_entries(entries(args.entries))
+        print(f"imported {args.entries} entries in {time.perf_counter() - start:.1f}s, {history.stats()['bytes'] / 1024 / 1024:.0f} MB on disk")
+
+        appends = []
+        for entry in entries(200, seed=9):
+            start = time.perf_counter()
+            history.add(entry["prompt"], entry["response"], engine=entry["engine"], latency_ms=entry["latency_ms"])
+            appends.append(time.perf_counter() - start)
+        print(f"  {'append one entry':<30} {statistics.median(appends) * 1000:8.2f} ms")
+
+        first = history.page()
+        deep = first
+        for _ in range(200):
+            deep = history.page(before=deep["next"])
+        found = history.search("regex")
+        for _ in range(20):
+            found = history.search("regex", before=found["next"])
+        cases = [
+            ("first page (50)", lambda: history.page()),
+            ("page 200 (before cursor)", lambda: history.page(before=deep["next"])),
+            ("page, engine filter", lambda: history.page(engine="claude")),
+            ("search 'regex' (as typed)", lambda: history.search("regex")),
+            ("search 'regex ' (whole word)", lambda: history.search("regex ")),
+            ("search 'trans' (prefix)", lambda: history.search("trans")),
+            ("search 'swift async crash'", lambda: history.search("swift async crash")),
+            ("search rare 'ref4242'", lambda: history.search("ref4242")),
+            ("search prompt only, claude", lambda: history.search("invoice", field="prompt", engine="claude")),
+            ("search page 20", lambda: history.search("regex", before=found["next"])),
+            ("get full entry", lambda: history.get(first["entries"][0]["id"])),
+        ]
+        for label, fn in cases:
+            print(f"  {label:<30} {timed(fn, args.runs):8.2f} ms")
+
+        db = history._db
+        like = timed(lambda: db.execute("SELECT id FROM entries WHERE response LIKE '%ref4242%' ORDER BY id DESC LIMIT 50").fetchall(), 3)
+        print(f"  {'LIKE scan for ref4242':<30} {like:8.2f} ms")
+        rows = [dict(zip(("prompt", "response"), row)) for row in db.execute("SELECT prompt, response FROM entries").fetchall()]
+        encode = timed(lambda: json.dumps(rows), 3)
+        print(f"  {'re-encode list per insert':<30} {encode:8.2f} ms  (UserDefaults style, {len(rows)} entries)")
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
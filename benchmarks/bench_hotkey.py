@@ -0,0 +1,106 @@
+"""
+Hotkey detection latency and idle wakeups: the old 50 ms key-state polling
+loop vs the event-driven HotkeyListener, both fed by the pure-Python
+FakeEventSource so it runs anywhere. The hop to a UI thread is modelled
+with a queue, like the Qt signal main.py uses.
+
+    python benchmarks/bench_hotkey.py --presses 40
+"""
+import os
+import sys
+import time
+import queue
+import random
+import argparse
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core.hotkey import FakeEventSource, HotkeyListener, parse_chord  # noqa: E402
+
+POLL_INTERVAL = 0.05
+
+
+def polling(presses: int, rng: random.Random):
+    """What the QTimer + CGEventSourceKeyState loop did: notice a held chord on the next tick."""
+    held = threading.Event()
+    pressed_at = [0.0]
+    latencies, wakeups = [], [0]
+    stop = threading.Event()
+
+    def poll():
+        was_pressed = False
+        while not stop.is_set():
+            time.sleep(POLL_INTERVAL)
+            wakeups[0] += 1
+            is_pressed = held.is_set()
+            if is_pressed and not was_pressed:
+                latencies.append(time.perf_counter() - pressed_at[0])
+            was_pressed = is_pressed
+
+    thread = threading.Thread(target=poll, daemon=True)
+    start = time.perf_counter()
+    thread.start()
+    for _ in range(presses):
+        time.sleep(rng.uniform(0.05, 0.15))
+        pressed_at[0] = time.perf_counter()
+        held.set()
+        time.sleep(0.12)  # a human keypress lasts ~100 ms
+        held.clear()
+    stop.set()
+    thread.join()
+    return latencies, wakeups[0] / (time.perf_counter() - start)
+
+
+def event_driven(presses: int, rng: random.Random):
+    source = FakeEventSource()
+    ui_queue = queue.Queue()
+    listener = HotkeyListener(lambda chord, timestamp: ui_queue.put(timestamp), chords=[parse_chord("cmd+alt+g")], backends=[source])
+    listener.start()
+    latencies, wakeups = [], [0]
+
+    def ui_thread():
+        while True:
+            timestamp = ui_queue.get()
+            wakeups[0] += 1
+            if timestamp is None:
+                return
+            latencies.append(listener.shown(timestamp) / 1000)
+
+    thread = threading.Thread(target=ui_thread, daemon=True)
+    start = time.perf_counter()
+    thread.start()
+    for _ in range(presses):
+        time.sleep(rng.uniform(0.05, 0.15))
+        source.press("cmd+alt+g")
+        # Auto-repeat and unrelated typing must not trigger
+        source.press("cmd+alt+g", is_repeat=True)
+        source.release("cmd+alt+g")
+        source.press("g")
+        time.sleep(0.12)
+    ui_queue.put(None)
+    thread.join()
+    listener.stop()
+    assert listener.triggers == presses, listener.stats()
+    return latencies, (wakeups[0] - 1) / (time.perf_counter() - start)
+
+
+def _report(label: str, latencies: list, wakeups_per_s: float):
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+    print(f"{label:<14} detect p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  wakeups {wakeups_per_s:5.1f}/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Polling vs event-driven hotkey")
+    parser.add_argument("--presses", type=int, default=40)
+    args = parser.parse_args()
+
+    _report("50 ms polling", *polling(args.presses, random.Random(1)))
+    _report("event-driven", *event_driven(args.presses, random.Random(1)))
+
+
+if __name__ == "__main__":
+    main()
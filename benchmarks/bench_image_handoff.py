@@ -0,0 +1,103 @@
+"""
+Per-request cost of handing a screenshot from the app's temp file to a
+provider request body: the old path (read() + b64encode + json.dumps, and
+b64decode again for Gemini) vs the memory-mapped ImagePayload with the
+base64 streamed into the body. Each mode runs in a fresh interpreter so
+peak RSS is comparable.
+
+    python benchmarks/bench_image_handoff.py --mb 8 --runs 10
+"""
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import resource
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _legacy(path: str) -> int:
+    with open(path, "rb") as f:
+        encoded = base64.b64encode(f.read()).decode("utf-8")
+    # What _call_gemini used to do before building its Part
+    base64.b64decode(encoded)
+    payload = {"model": "m", "messages": [{"role": "user", "content": [{"type": "image", "data": encoded}]}]}
+    body = json.dumps(payload).encode("utf-8")
+    return len(body)
+
+
+def _payload(path: str) -> int:
+    from core.imagebuf import ImagePayload
+    from llm.transport import IMAGE_PLACEHOLDER, JSONImageBody
+    image = ImagePayload.from_file(path)
+    payload = {"model": "m", "messages": [{"role": "user", "content": [{"type": "image", "data": IMAGE_PLACEHOLDER}]}]}
+    sent = 0
+    # Stand-in for the socket: consume the body chunk by chunk
+    for chunk in JSONImageBody(payload, image):
+        sent += len(chunk)
+    return sent
+
+
+def _child(mode: str, path: str, runs: int):
+    fn = _legacy if mode == "legacy" else _payload
+    baseline = _peak_rss_mb()
+    timings = []
+    size = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        size = fn(path)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(json.dumps({
+        "mode": mode,
+        "body_bytes": size,
+        "p50_ms": round(timings[len(timings) // 2] * 1000, 2),
+        "peak_rss_growth_mb": round(_peak_rss_mb() - baseline, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Screenshot handoff copies and peak memory")
+    parser.add_argument("--mb", type=float, default=8.0, help="Screenshot file size in MB.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--child", default="", help=argparse.SUPPRESS)
+    parser.add_argument("--path", default="", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args.path, args.runs)
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+        f.write(os.urandom(int(args.mb * 1024 * 1024)))
+        path = f.name
+    try:
+        for mode in ("legacy", "payload"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", mode, "--path", path, "--runs", str(args.runs)],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            result = json.loads(out)
+            print(
+                f"{result['mode']:<8} body={result['body_bytes'] / 1e6:6.2f} MB  "
+                f"p50={result['p50_ms']:8.2f} ms  peak RSS growth={result['peak_rss_growth_mb']:6.1f} MB"
+            )
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Encode time, payload size and estimated image tokens per resolution tier and
+format, for a synthetic Retina-sized screenshot, compared with the fixed
+1280 px / JPEG q45 image the app used to send.
+
+    python benchmarks/bench_imageprep.py --runs 5
+"""
+import io
+import os
+import sys
+import math
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image, ImageDraw  # noqa: E402
+from core import imageprep  # noqa: E402
+from core.imagebuf import ImagePayload  # noqa: E402
+
+
+def _fake_screen(width: int, height: int) -> bytes:
+    rng = random.Random(7)
+    img = Image.new("RGB", (width, height), (246, 246, 246))
+    draw = ImageDraw.Draw(img)
+    # A sidebar, a toolbar and a window full of text
+    draw.rectangle((0, 0, width // 6, height), fill=(225, 228, 235))
+    draw.rectangle((0, 0, width, 80), fill=(60, 64, 72))
+    for row in range(height // 24 - 5):
+        words = " ".join("".join(rng.choice("etaoinshrdlu") for _ in range(rng.randint(2, 9))) for _ in range(24))
+        draw.text((width // 6 + 30, 100 + row * 24), words, fill=(20, 20, 20))
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=92)
+    return out.getvalue()
+
+
+def _estimated_tokens(engine: str, width: int, height: int) -> int:
+    """Published image-token formulas, for comparison only."""
+    if engine == "gemini":
+        if width <= 384 and height <= 384:
+            return 258
+        tile = max(256, min(768, min(width, height) / 1.5))
+        return 258 * math.ceil(width / tile) * math.ceil(height / tile)
+    if engine == "claude":
+        return round(width * height / 750)
+    if engine == "openai":
+        scale = min(1.0, 2048 / max(width, height))
+        w, h = width * scale, height * scale
+        scale = min(1.0, 768 / min(w, h))
+        w, h = w * scale, h * scale
+        return 85 + 170 * math.ceil(w / 512) * math.ceil(h / 512)
+    return 0
+
+
+def _legacy(image_bytes: bytes) -> bytes:
+    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    img.thumbnail((1280, 1280), Image.LANCZOS)
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=45)
+    return out.getvalue()
+
+
+def _measure(label: str, engine: str, fn, runs: int):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        data = fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    # prepare_image hands back an ImagePayload, the legacy path plain bytes
+    data = ImagePayload.coerce(data)
+    with Image.open(data.open()) as img:
+        size = img.size
+    tokens = _estimated_tokens(engine, *size)
+    print(
+        f"{label:<28} {size[0]:>5}x{size[1]:<5} {len(data) / 1024:8.1f} KB "
+        f"{timings[len(timings) // 2] * 1000:8.1f} ms  ~{tokens:>5} tokens ({engine})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive screenshot preparation")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--width", type=int, default=2880)
+    parser.add_argument("--height", type=int, default=1800)
+    args = parser.parse_args()
+
+    os.environ["SKIBIDYSAURUS_IMAGE_CROP"] = "none"
+    screen = _fake_screen(args.width, args.height)
+    # A window covering the middle half of a 1440x900-point display
+    display_points = (args.width / 2, args.height / 2)
+    window = (display_points[0] / 4, display_points[1] / 4, display_points[0] / 2, display_points[1] / 2)
+    print(f"source: {args.width}x{args.height} JPEG, {len(screen) / 1024:.1f} KB")
+
+    _measure("legacy 1280px q45", "gemini", lambda: _legacy(screen), args.runs)
+    for engine, model in (("ollama", "llava:latest"), ("gemini", ""), ("openai", "gpt-4.1-mini"), ("claude", "")):
+        tier = imageprep.tier_for(engine, model)
+        _measure(
+            f"{engine} tier={tier.name}",
+            engine,
+            lambda: imageprep.prepare_image(screen, engine, model, region=(), display_points=()),
+            args.runs,
+        )
+        _measure(
+            f"{engine} tier={tier.name} window",
+            engine,
+            lambda: imageprep.prepare_image(screen, engine, model, region=window, display_points=display_points),
+            args.runs,
+        )
+    for tier in ("low", "medium", "high"):
+        os.environ["SKIBIDYSAURUS_IMAGE_TIER"] = tier
+        _measure(f"claude forced tier={tier}", "claude", lambda: imageprep.prepare_image(screen, "claude", region=(), display_points=()), args.runs)
+    os.environ.pop("SKIBIDYSAURUS_IMAGE_TIER", None)
+
+    start = time.perf_counter()
+    skipped = not imageprep.needs_image("make this more concise", "some highlighted paragraph")
+    print(f"text-only query skips the image: {skipped} ({(time.perf_counter() - start) * 1e6:.0f} us to decide)")
+
+
+if __name__ == "__main__":
+    main()
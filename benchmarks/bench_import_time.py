@@ -0,0 +1,98 @@
+"""
+Cold-start regression check for the CLI: runs `backend.py --engine ollama`
+against the mock server in fresh interpreters with `-X importtime`, reports
+wall time and the slowest imports, and exits non-zero when the median cold
+start goes over budget or an SDK that Ollama never needs gets imported.
+
+    python benchmarks/bench_import_time.py --runs 5 --budget-ms 600
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_servers import MockProviderServer  # noqa: E402
+
+# Heavy modules the Ollama path must not pull in
+FORBIDDEN = ("google.genai", "llm.providers.gemini", "llm.providers.openai", "llm.providers.claude")
+
+
+def parse_importtime(stderr: str):
+    """
+    Cumulative microseconds per module from `-X importtime` output, and the
+    total spent importing (the sum over top-level imports).
+    """
+    cumulative, total = {}, 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, _, rest = line.partition(":")
+        _, cum, name = rest.split("|")
+        cumulative[name.strip()] = int(cum)
+        # Nested imports are indented under the module that triggered them
+        if not name[1:].startswith(" "):
+            total += int(cum)
+    return cumulative, total
+
+
+def run_once(env: dict, screenshot: str):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [
+            sys.executable, "-X", "importtime", os.path.join(ROOT, "backend.py"),
+            "--engine", "ollama", "--prompt", "what is on screen?", "--screenshot", screenshot,
+        ],
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0 or "Error" in proc.stdout:
+        raise RuntimeError(f"backend.py failed: {proc.stdout.strip()} {proc.stderr[-500:]}")
+    return (elapsed, *parse_importtime(proc.stderr))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI cold-start import budget")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=600.0, help="Fail if the median cold start exceeds this.")
+    parser.add_argument("--top", type=int, default=10, help="How many of the slowest imports to list.")
+    args = parser.parse_args()
+
+    from PIL import Image
+    with tempfile.TemporaryDirectory() as tmp, MockProviderServer(first_token_delay=0.0) as server:
+        screenshot = os.path.join(tmp, "screenshot.jpg")
+        Image.new("RGB", (1440, 900), (240, 240, 240)).save(screenshot, format="JPEG", quality=80)
+        env = dict(os.environ, **server.env())
+        run_once(env, screenshot)  # warm the filesystem and bytecode caches
+        timings, imports, import_us = [], {}, 0
+        for _ in range(args.runs):
+            elapsed, imports, import_us = run_once(env, screenshot)
+            timings.append(elapsed)
+
+    timings.sort()
+    median_ms = timings[len(timings) // 2] * 1000
+    print(f"backend.py --engine ollama cold start: p50 {median_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"time in imports (last run): {import_us / 1000:.1f} ms; slowest:")
+    for name, us in sorted(imports.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failures = []
+    leaked = [name for name in FORBIDDEN if name in imports]
+    if leaked:
+        failures.append(f"unneeded provider modules imported: {', '.join(leaked)}")
+    if median_ms > args.budget_ms:
+        failures.append(f"cold start {median_ms:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
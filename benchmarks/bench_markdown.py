@@ -0,0 +1,137 @@
+"""
+Streaming a long, code-heavy markdown answer into the overlay's QTextEdit:
+GUI-thread time per update (parse, edit and repaint) when every delta
+re-renders the whole answer with setMarkdown, vs ui/markdown.py appending
+closed blocks and re-rendering only the open one, per delta and coalesced
+to one update per frame. A setMarkdown update only costs what the answer's
+length at that point costs, so that path is timed on every --sample'th
+delta and its total extrapolated. Also checks the incremental document
+matches a one-shot setMarkdown block for block.
+
+    python benchmarks/bench_markdown.py --size 100 --chunk 16 --rate 4000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PyQt6.QtWidgets import QApplication, QTextEdit  # noqa: E402
+from ui.markdown import MarkdownRenderer, FRAME_MS  # noqa: E402
+
+CODE = '''def handler(event, context):
+    """Process one event."""
+    items = [item for item in event["items"] if item.get("enabled")]
+
+    for item in items:
+        result = transform(item, retries=3)
+        if not result:
+            continue
+        yield {"id": item["id"], "value": result}
+'''
+
+
+def answer(size_kb: int, seed: int = 7) -> str:
+    """A synthetic LLM answer: headings, prose, lists, tables and fenced code."""
+    rng = random.Random(seed)
+    words = "the response cache keeps every request small while **streaming** tokens to `the overlay` and the list".split()
+    parts = []
+    section = 0
+    while sum(len(part) + 2 for part in parts) < size_kb * 1024:
+        section += 1
+        parts.append(f"## Step {section}: {' '.join(rng.choices(words, k=4))}")
+        parts.append(" ".join(rng.choices(words, k=rng.randint(30, 80))) + ".")
+        parts.append("\n".join(f"{i}. {' '.join(rng.choices(words, k=8))}" for i in range(1, rng.randint(3, 7))))
+        parts.append(f"```python\n{CODE * rng.randint(1, 4)}```")
+        if section % 3 == 0:
+            parts.append("| key | value |\n|-----|-------|\n" + "\n".join(f"| k{i} | {rng.choice(words)} |" for i in range(5)))
+        parts.append("- " + "\n- ".join(" ".join(rng.choices(words, k=6)) for _ in range(rng.randint(2, 5))))
+    return "\n\n".join(parts) + "\n"
+
+
+def blocks(document) -> list:
+    out = []
+    block = document.begin()
+    while block.isValid():
+        fmt = block.blockFormat()
+        listed = block.textList()
+        out.append((
+            block.text(),
+            fmt.headingLevel(),
+            fmt.nonBreakableLines(),
+            fmt.leftMargin(),
+            listed.format().style() if listed else None,
+        ))
+        block = block.next()
+    return out
+
+
+def stream(app, edit, text: str, chunk: int, update, every: int = 1) -> list:
+    """GUI-thread seconds per update, repaint included, updating on every `every`th delta and the last."""
+    timings = []
+    deltas = range(chunk, len(text) + chunk, chunk)
+    for i, end in enumerate(deltas):
+        if (i + 1) % every and end < len(text):
+            continue
+        start = time.perf_counter()
+        update(text[:end])
+        edit.viewport().repaint()
+        app.processEvents()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label: str, timings: list, updates: int = None):
+    updates = updates or len(timings)
+    print(
+        f"  {label:<30} {updates:5d} updates  median {statistics.median(timings) * 1000:7.2f} ms  "
+        f"max {max(timings) * 1000:7.2f} ms  total {statistics.mean(timings) * updates:6.2f} s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental markdown rendering benchmark")
+    parser.add_argument("--size", type=int, default=100, help="Answer size in KB.")
+    parser.add_argument("--chunk", type=int, default=16, help="Characters per streamed delta.")
+    parser.add_argument("--rate", type=int, default=4000, help="Streamed characters per second, for per-frame coalescing.")
+    parser.add_argument("--sample", type=int, default=5, help="Time setMarkdown on every Nth delta only.")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    edit = QTextEdit()
+    edit.setReadOnly(True)
+    edit.setFixedSize(480, 360)
+    edit.show()
+    text = answer(args.size)
+    per_frame = max(1, round(args.rate * FRAME_MS / 1000 / args.chunk))
+    deltas = -(-len(text) // args.chunk)
+    print(f"{len(text) / 1024:.0f} KB answer in {args.chunk}-character deltas at {args.rate} characters/s:")
+
+    report("setMarkdown every delta", stream(app, edit, text, args.chunk, edit.setMarkdown, args.sample), deltas)
+
+    renderer = MarkdownRenderer(edit.document())
+    report("incremental every delta", stream(app, edit, text, args.chunk, renderer.render))
+    incremental = blocks(edit.document())
+
+    renderer.reset()
+    report(f"incremental per frame ({per_frame}/frame)", stream(app, edit, text, args.chunk, renderer.render, per_frame))
+
+    edit.setMarkdown(text)
+    expected = blocks(edit.document())
+    mismatch = next((i for i, (a, b) in enumerate(zip(incremental, expected)) if a != b), None)
+    if mismatch is None and len(incremental) == len(expected):
+        print(f"  output matches setMarkdown ({len(expected)} blocks)")
+    else:
+        at = mismatch if mismatch is not None else min(len(incremental), len(expected))
+        print(f"  output differs from setMarkdown at block {at}: {incremental[at:at + 1]} vs {expected[at:at + 1]}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Ollama model warm-up and capability cache, against the local mock Ollama
+with a simulated model load time:
+
+1. cold vs warm: time to first token when the prompt has to load the model,
+   vs when warm_up() on hotkey preloaded it (empty generate with keep_alive)
+   while the user was typing
+2. text-only model with a screenshot: the reactive path (image request,
+   400, text retry) vs the /api/show capability cache; requests and latency
+3. persistence: a fresh manager reuses the cached capabilities, so the
+   digest is the only thing it has to check
+
+    python benchmarks/bench_ollama_warm.py --load-delay 1.5 --typing 2.0
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_servers import MockProviderServer  # noqa: E402
+from core.imagebuf import ImagePayload  # noqa: E402
+
+VISION_MODEL = "llava:latest"
+TEXT_MODEL = "llama3.2:latest"
+# Small PNG-looking payload; the mock never decodes it
+SCREENSHOT = ImagePayload(b"\x89PNG\r\n\x1a\n" + b"\0" * 4096)
+
+
+def ttft(manager, model: str, image: ImagePayload = ImagePayload()) -> float:
+    start = time.perf_counter()
+    for delta in manager.stream_response("rewrite this", image, engine="ollama", ollama_model=model, use_cache=False):
+        assert "Error" not in delta, delta
+        return time.perf_counter() - start
+    return time.perf_counter() - start
+
+
+def cold_vs_warm(server, runs: int, typing: float):
+    from llm.clients import LLMManager
+    manager = LLMManager()
+    cold, warm = [], []
+    for _ in range(runs):
+        server.unload()
+        cold.append(ttft(manager, VISION_MODEL))
+
+        server.unload()
+        manager.provider("ollama")._preloaded.clear()
+        # Hotkey press: warm up while the prompt is being typed
+        thread = manager.warm_up("ollama", ollama_model=VISION_MODEL)
+        time.sleep(typing)
+        warm.append(ttft(manager, VISION_MODEL))
+        thread.join()
+    manager.close()
+    print(f"first token, model load {server.load_delay:.1f}s, {typing:.1f}s typing ({runs} runs):")
+    print(f"  cold (load on prompt)     {statistics.median(cold) * 1000:8.1f} ms")
+    print(f"  warm (preload on hotkey)  {statistics.median(warm) * 1000:8.1f} ms")
+
+
+def generate_requests(server) -> int:
+    return sum(1 for path, _ in server.requests if path == "/api/generate")
+
+
+def text_only(server, runs: int):
+    from llm.clients import LLMManager
+    print(f"text-only model with a screenshot ({runs} prompts):")
+    for label, probe in (("reactive", "0"), ("capability cache", "1")):
+        os.environ["SKIBIDYSAURUS_OLLAMA_PROBE"] = probe
+        manager = LLMManager()
+        before = generate_requests(server)
+        timings = []
+        for i in range(runs):
+            start = time.perf_counter()
+            response = manager.get_response(f"summarise {i}", SCREENSHOT, engine="ollama", ollama_model=TEXT_MODEL, use_cache=False)
+            timings.append(time.perf_counter() - start)
+            assert "Error" not in response, response
+        print(
+            f"  {label:<18} {generate_requests(server) - before:3d} generate requests  "
+            f"median {statistics.median(timings) * 1000:7.1f} ms"
+        )
+        manager.close()
+    os.environ.pop("SKIBIDYSAURUS_OLLAMA_PROBE", None)
+
+
+def persistence(server):
+    from llm.clients import LLMManager
+    print("capability probes per manager (cache kept on disk):")
+    for label in ("first launch", "next launch"):
+        manager = LLMManager()
+        manager.get_response("summarise", SCREENSHOT, engine="ollama", ollama_model=TEXT_MODEL, use_cache=False)
+        print(f"  {label:<14} {manager.provider('ollama').models.probes} /api/show probes")
+        manager.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama preload and capability cache benchmark")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--load-delay", type=float, default=1.5, help="Simulated model load time in seconds.")
+    parser.add_argument("--typing", type=float, default=2.0, help="Seconds between hotkey and prompt.")
+    parser.add_argument("--first-token-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir, MockProviderServer(
+        first_token_delay=args.first_token_delay,
+        load_delay=args.load_delay,
+        text_only_models=[TEXT_MODEL],
+    ) as server:
+        os.environ.update(server.env())
+        os.environ["SKIBIDYSAURUS_DATA_DIR"] = data_dir
+        os.environ["SKIBIDYSAURUS_CACHE"] = "0"
+        cold_vs_warm(server, args.runs, args.typing)
+        server.load_delay = 0.0
+        text_only(server, args.runs)
+        os.remove(os.path.join(data_dir, "ollama_models.json"))
+        persistence(server)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Submit-to-first-token with and without the speculative prefetch that
+main.py starts on the hotkey: screenshot capture + preparation and a warm
+pooled connection, done while the user types. Runs QueryBridge against the
+local TLS mock server with a fake capture that sleeps like `screencapture`.
+
+    python benchmarks/bench_prefetch.py --runs 5 --capture-delay 0.2 --typing 1.0
+"""
+import os
+import sys
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PyQt6.QtCore import QCoreApplication, QEventLoop  # noqa: E402
+from benchmarks.mock_servers import MockProviderServer  # noqa: E402
+from core.capture import FakeCaptureBackend  # noqa: E402
+
+
+def fake_capture(delay: float):
+    backend = FakeCaptureBackend()
+    backend.capture()  # render the frame once, outside the timed path
+
+    def capture():
+        time.sleep(delay)
+        return backend.capture()
+    return capture
+
+
+def first_token(bridge, prompt: str, engine: str) -> float:
+    loop = QEventLoop()
+    first = []
+    bridge.chunk_ready.connect(lambda delta: first or first.append(time.perf_counter()))
+    bridge.result_ready.connect(lambda response: loop.quit())
+    start = time.perf_counter()
+    bridge.submit(prompt, engine)
+    loop.exec()
+    bridge.chunk_ready.disconnect()
+    bridge.result_ready.disconnect()
+    return (first[0] if first else time.perf_counter()) - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speculative prefetch on hotkey")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--engine", default="openai", choices=["ollama", "openai", "claude"])
+    parser.add_argument("--capture-delay", type=float, default=0.2, help="Seconds the fake screencapture takes.")
+    parser.add_argument("--connect-delay", type=float, default=0.08, help="Per-connection TCP+TLS cost on the mock.")
+    parser.add_argument("--typing", type=float, default=1.0, help="Seconds between hotkey and submit.")
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)  # noqa: F841 (queued signals need an application)
+    with MockProviderServer(tls=True, connect_delay=args.connect_delay) as server:
+        os.environ.update(server.env())
+        os.environ["SKIBIDYSAURUS_IMAGE_CROP"] = "none"
+        os.environ["SKIBIDYSAURUS_SCREEN_DEDUP"] = "0"
+        from main import QueryBridge
+        from llm.clients import LLMManager
+        from llm.transport import ProviderTransport
+        from llm.async_runner import BackgroundLoop
+
+        results = {"submit only": [], "prefetch": []}
+        cancelled = 0
+        for i in range(args.runs):
+            for mode in results:
+                manager = LLMManager(transport=ProviderTransport(verify=server.ca_file))
+                background_loop = BackgroundLoop()
+                bridge = QueryBridge(manager, background_loop, capture=fake_capture(args.capture_delay))
+                if mode == "prefetch":
+                    bridge.prefetch(args.engine)
+                time.sleep(args.typing)
+                results[mode].append(first_token(bridge, f"q{i}", args.engine))
+
+                # Dismissing with Escape instead of submitting cancels the prefetch
+                bridge.prefetch(args.engine)
+                pending = bridge.prefetched
+                bridge.cancel_prefetch()
+                cancelled += pending.cancelled()
+                time.sleep(0.05)  # let the loop unwind the cancelled task before stopping it
+                background_loop.stop()
+                manager.close()
+
+    for mode, samples in results.items():
+        samples.sort()
+        print(f"{mode:<12} submit->first token p50 {samples[len(samples) // 2] * 1000:7.1f} ms")
+    print(f"escape cancelled {cancelled}/{args.runs * len(results)} in-flight prefetches")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+The provider resilience layer (llm/resilience.py) under injected faults from
+the local mock server, against single-attempt requests as the baseline:
+
+1. bursts: every few calls the server answers a burst of 429s or 503s with a
+   Retry-After; reports answered share and latency p50/p95
+2. outage: the server answers nothing but 503; with the breaker, requests
+   after the first few fail in microseconds instead of each sitting out its
+   retries
+3. adaptive concurrency: many concurrent async calls against a server that
+   429s anything past its limit; reports the AIMD limit, throttles and
+   answered share
+
+    python benchmarks/bench_resilience.py --requests 100 --engine openai --server-limit 6
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_servers import MockProviderServer  # noqa: E402
+from core.imagebuf import ImagePayload  # noqa: E402
+from llm.race import is_error_response  # noqa: E402
+
+
+def manager(attempts: int):
+    # Policies read their settings when the provider's pool is first created
+    if attempts:
+        os.environ["SKIBIDYSAURUS_RETRY_ATTEMPTS"] = str(attempts)
+    else:
+        os.environ.pop("SKIBIDYSAURUS_RETRY_ATTEMPTS", None)
+    from llm.clients import LLMManager
+    return LLMManager()
+
+
+def percentile(values: list, share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))] if values else 0.0
+
+
+def report(label: str, results: list):
+    answered = [elapsed for ok, elapsed in results if ok]
+    latencies = [elapsed for _, elapsed in results]
+    print(
+        f"  {label:<14} answered {len(answered):4d}/{len(results):<4d} "
+        f"p50 {percentile(latencies, 0.5) * 1000:7.1f} ms  p95 {percentile(latencies, 0.95) * 1000:7.1f} ms"
+    )
+
+
+def bursts(server, engine: str, requests: int, every: int, burst: int):
+    print(f"bursts of {burst} x 429/503 every {every} calls, {requests} calls ({engine}):")
+    for label, attempts in (("single attempt", 1), ("resilient", 0)):
+        llm = manager(attempts)
+        results = []
+        for i in range(requests):
+            if i % every == 0:
+                server.inject((429, 503)[i // every % 2], burst, retry_after=0.05)
+            start = time.perf_counter()
+            response = llm.get_response(f"rewrite snippet {i}", ImagePayload(), engine=engine, use_cache=False)
+            results.append((not is_error_response(response), time.perf_counter() - start))
+        server.clear_faults()
+        report(label, results)
+        llm.close()
+
+
+def outage(server, engine: str, requests: int):
+    print(f"503 outage, {requests} calls ({engine}):")
+    server.inject(503, 100000)
+    llm = manager(0)
+    policy = llm.transport.resilience.policy(engine)
+    timings, opened = [], None
+    for i in range(requests):
+        start = time.perf_counter()
+        llm.get_response(f"rewrite snippet {i}", ImagePayload(), engine=engine, use_cache=False)
+        timings.append(time.perf_counter() - start)
+        if opened is None and policy.breaker.state == "open":
+            opened = i + 1
+    stats = policy.stats()
+    print(
+        f"  breaker {stats['breaker']} after {opened} calls, which took {statistics.mean(timings[:opened]) * 1000:7.1f} ms each; "
+        f"the {requests - opened} after it {statistics.median(timings[opened:]) * 1e6:5.0f} us each "
+        f"({stats['attempts']} attempts reached the server, {stats['rejected']} rejected locally)"
+    )
+    server.clear_faults()
+    llm.close()
+
+
+async def flood(llm, engine: str, requests: int, concurrency: int, trajectory: list) -> list:
+    gate = asyncio.Semaphore(concurrency)
+    policy = llm.transport.resilience.policy(engine)
+
+    async def one(i: int):
+        async with gate:
+            start = time.perf_counter()
+            response = await llm.aget_response(f"rewrite snippet {i}", ImagePayload(), engine=engine, use_cache=False)
+            trajectory.append(policy.limiter.limit)
+            return not is_error_response(response), time.perf_counter() - start
+
+    try:
+        return await asyncio.gather(*(one(i) for i in range(requests)))
+    finally:
+        await llm.transport.aclose()
+
+
+def adaptive(server, engine: str, requests: int, concurrency: int):
+    print(f"{concurrency} concurrent callers, server allows {server.concurrency_limit} in flight, {requests} calls ({engine}):")
+    for label, attempts in (("single attempt", 1), ("resilient", 0)):
+        llm = manager(attempts)
+        trajectory = []
+        faults_before = server.faults_sent
+        results = asyncio.run(flood(llm, engine, requests, concurrency, trajectory))
+        report(label, results)
+        samples = trajectory[:: max(1, len(trajectory) // 8)]
+        print(
+            f"  {'':<14} {server.faults_sent - faults_before} throttled by the server; "
+            f"limit over time: {' '.join(f'{limit:.1f}' for limit in samples)}"
+        )
+        llm.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retries, circuit breaker and AIMD concurrency under injected faults")
+    parser.add_argument("--engine", default="openai", choices=["ollama", "openai", "claude"])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--every", type=int, default=5, help="Start a fault burst every N calls.")
+    parser.add_argument("--burst", type=int, default=2, help="Faulted answers per burst.")
+    parser.add_argument("--first-token-delay", type=float, default=0.01)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--server-limit", type=int, default=6)
+    args = parser.parse_args()
+
+    with MockProviderServer(first_token_delay=args.first_token_delay, concurrency_limit=args.server_limit) as server:
+        os.environ.update(server.env())
+        bursts(server, args.engine, args.requests, args.every, args.burst)
+        outage(server, args.engine, 20)
+        adaptive(server, args.engine, args.requests * 4, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Bytes sent to a provider over a run of follow-up prompts on a nearly
+unchanged screen, with screenshot dedup + file uploads on and off, against
+the local mock providers.
+
+    python benchmarks/bench_screenshot_reuse.py --followups 5 --engine claude
+"""
+import io
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image, ImageDraw  # noqa: E402
+from benchmarks.mock_servers import MockProviderServer  # noqa: E402
+
+
+def _fake_screen(seed: int, caret: bool) -> bytes:
+    """A text-heavy 1440x900 'screen'; `caret` toggles a blinking cursor."""
+    rng = random.Random(seed)
+    img = Image.new("RGB", (1440, 900), (250, 250, 250))
+    draw = ImageDraw.Draw(img)
+    for row in range(40):
+        words = " ".join("".join(rng.choice("abcdefghij") for _ in range(rng.randint(2, 9))) for _ in range(14))
+        draw.text((40, 20 + row * 21), words, fill=(30, 30, 30))
+    if caret:
+        draw.rectangle((700, 440, 701, 458), fill=(0, 0, 0))
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=85)
+    return out.getvalue()
+
+
+def _run(server, engine: str, frames: list[bytes], dedup: bool) -> tuple[int, float, dict]:
+    os.environ["SKIBIDYSAURUS_SCREEN_DEDUP"] = "1" if dedup else "0"
+    os.environ["SKIBIDYSAURUS_IMAGE_UPLOADS"] = "1" if dedup else "0"
+    from llm.clients import LLMManager
+    from core.screenshot import ScreenshotDeduper
+    manager = LLMManager()
+    deduper = ScreenshotDeduper()
+
+    sent_before = sum(size for _, size in server.requests)
+    start = time.perf_counter()
+    for i, frame in enumerate(frames):
+        manager.get_response(f"follow-up {i}", deduper.process(frame), engine=engine)
+    elapsed = time.perf_counter() - start
+    sent = sum(size for _, size in server.requests) - sent_before
+    stats = {"screenshots": deduper.stats(), "uploads": manager.image_stats()}
+    manager.close()
+    return sent, elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Screenshot dedup and upload reuse")
+    parser.add_argument("--followups", type=int, default=5)
+    parser.add_argument("--engine", default="claude", choices=["openai", "claude"])
+    args = parser.parse_args()
+
+    # The caret blinks between prompts; the last frame is a different screen.
+    frames = [_fake_screen(1, caret=i % 2 == 0) for i in range(args.followups)] + [_fake_screen(2, caret=False)]
+
+    with tempfile.TemporaryDirectory() as data_dir, MockProviderServer() as server:
+        os.environ.update(server.env())
+        os.environ["SKIBIDYSAURUS_DATA_DIR"] = data_dir
+        inline_bytes, inline_time, _ = _run(server, args.engine, frames, dedup=False)
+        reuse_bytes, reuse_time, stats = _run(server, args.engine, frames, dedup=True)
+
+    print(f"{len(frames)} prompts, {len(frames[0]) // 1024} KB screenshots, engine={args.engine}")
+    print(f"inline every time: {inline_bytes / 1024:9.1f} KB sent  {inline_time * 1000:8.1f} ms")
+    print(f"dedup + uploads:   {reuse_bytes / 1024:9.1f} KB sent  {reuse_time * 1000:8.1f} ms")
+    print(f"session stats: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Selection capture: the old fixed 100 ms sleep after Cmd+C vs polling the
+pasteboard change count, against a simulated app that answers the copy
+after a random delay (some slower than 100 ms). Reports time to text, how
+often each path returned stale clipboard contents, and whether the user's
+clipboard survived. Pure Python; no macOS APIs involved.
+
+    python benchmarks/bench_selection.py --trials 30
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core.selection import acquire_selection  # noqa: E402
+
+USER_CLIPBOARD = "user's own clipboard"
+
+
+class FakePasteboard:
+    """Stands in for SystemPasteboard; send_copy() lands `selection` after `app_delay` seconds."""
+
+    def __init__(self, selection: str, app_delay: float):
+        self.selection = selection
+        self.app_delay = app_delay
+        self._count = 1
+        self._text = USER_CLIPBOARD
+
+    def available(self):
+        return True
+
+    def change_count(self):
+        return self._count
+
+    def text(self):
+        return self._text
+
+    def snapshot(self):
+        return self._text
+
+    def restore(self, snapshot):
+        self._text = snapshot
+        self._count += 1
+
+    def send_copy(self):
+        def land():
+            self._text = self.selection
+            self._count += 1
+        threading.Timer(self.app_delay, land).start()
+
+
+def legacy(pasteboard: FakePasteboard) -> str:
+    pasteboard.send_copy()
+    time.sleep(0.1)
+    return pasteboard.text()
+
+
+def _report(label: str, timings: list, stale: int, clobbered: int, trials: int):
+    timings.sort()
+    print(
+        f"{label:<16} p50 {timings[len(timings) // 2] * 1000:7.1f} ms  p95 {timings[int(len(timings) * 0.95)] * 1000:7.1f} ms  "
+        f"stale {stale}/{trials}  clipboard lost {clobbered}/{trials}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Selection capture latency")
+    parser.add_argument("--trials", type=int, default=30)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    delays = [rng.choice([rng.uniform(0.005, 0.03)] * 4 + [rng.uniform(0.1, 0.2)]) for _ in range(args.trials)]
+
+    timings, stale, clobbered = [], 0, 0
+    for i, delay in enumerate(delays):
+        pasteboard = FakePasteboard(f"selection {i}", delay)
+        start = time.perf_counter()
+        text = legacy(pasteboard)
+        timings.append(time.perf_counter() - start)
+        stale += text != f"selection {i}"
+        time.sleep(delay)
+        clobbered += pasteboard.text() != USER_CLIPBOARD
+    _report("fixed 100 ms", timings, stale, clobbered, args.trials)
+
+    timings, stale, clobbered = [], 0, 0
+    for i, delay in enumerate(delays):
+        pasteboard = FakePasteboard(f"selection {i}", delay)
+        start = time.perf_counter()
+        text = asyncio.run(acquire_selection(pasteboard, ax_reader=None))
+        timings.append(time.perf_counter() - start)
+        stale += text != f"selection {i}"
+        clobbered += pasteboard.text() != USER_CLIPBOARD
+    _report("change count", timings, stale, clobbered, args.trials)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Follow-up cost with and without a ConversationSession. "transcript" is what
+a stateless client has to do to keep context: paste the earlier turns into
+the prompt and attach the screenshot again. "session" replays the turns in
+the provider's native message format, references the screenshot once it is
+uploaded and folds old turns into a summary past the token budget. Reports
+request body bytes per turn (measured at the local mock server) and the
+estimated history tokens carried on the last turn.
+
+    python benchmarks/bench_session.py --turns 40 --engine claude --budget 1500
+"""
+import os
+import sys
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_servers import MockProviderServer  # noqa: E402
+from core.capture import FakeCaptureBackend  # noqa: E402
+from core.imageprep import prepare_image  # noqa: E402
+
+FOLLOW_UP = "and what about the second paragraph? keep the tone, but tighten it up a little. "
+
+
+def run(manager, server, image, engine: str, turns: int, session=None) -> list:
+    from llm.session import estimate_tokens
+    sizes, transcript = [], ""
+    for turn in range(turns):
+        question = f"{FOLLOW_UP * 3}(turn {turn})"
+        prompt = question
+        if session is None and transcript:
+            prompt = f"Conversation so far:{transcript}\n\nNew question: {question}"
+        before = len(server.requests)
+        response = manager.get_response(prompt, image, engine=engine, use_cache=False, session=session)
+        sizes.append(sum(size for path, size in server.requests[before:] if path != "/v1/files"))
+        transcript += f"\nUser: {question}\nAssistant: {response}"
+    history = session.stats()["history_tokens"] if session is not None else estimate_tokens(transcript)
+    return sizes, history
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversation session vs stateless follow-ups")
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--engine", default="claude", choices=["ollama", "openai", "claude"])
+    parser.add_argument("--budget", type=int, default=1500, help="Session token budget.")
+    args = parser.parse_args()
+
+    with MockProviderServer() as server:
+        os.environ.update(server.env())
+        os.environ["SKIBIDYSAURUS_IMAGE_CROP"] = "none"
+        from llm.clients import LLMManager
+        from llm.session import ConversationSession
+        from core.imagebuf import ImagePayload
+
+        image = prepare_image(ImagePayload(FakeCaptureBackend().capture()), args.engine)
+        results = {}
+        for mode in ("transcript", "session"):
+            manager = LLMManager()
+            session = ConversationSession(token_budget=args.budget) if mode == "session" else None
+            results[mode] = run(manager, server, image, args.engine, args.turns, session)
+            if session is not None:
+                compacted = session.compacted_turns
+                manager.end_session(session)
+            manager.close()
+
+    for mode, (sizes, history) in results.items():
+        print(
+            f"{mode:<11} first {sizes[0] / 1024:7.1f} KB  follow-up avg {sum(sizes[1:]) / max(1, len(sizes) - 1) / 1024:7.1f} KB  "
+            f"last {sizes[-1] / 1024:7.1f} KB  history ~{history} tokens"
+        )
+    print(f"session folded {compacted} of {args.turns} turns into its summary (budget {args.budget} tokens)")
+
+
+if __name__ == "__main__":
+    main()
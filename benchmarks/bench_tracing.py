@@ -0,0 +1,68 @@
+"""
+Per-stage tracing (core/tracing.py) against the local mock servers: the
+overhead per request with tracing off, in memory only and writing the JSONL
+trace file, then the per engine and stage p50/p95 the stats endpoint serves.
+
+    python benchmarks/bench_tracing.py --requests 200
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_servers import MockProviderServer  # noqa: E402
+from core import tracing  # noqa: E402
+
+ENGINES = ["ollama", "openai", "claude"]
+
+
+def run(requests: int) -> list:
+    import backend
+    timings = []
+    for i in range(requests):
+        start = time.perf_counter()
+        response = backend.get_ai_response(f"rewrite snippet {i}", f"some selected text {i}", engine=ENGINES[i % len(ENGINES)], use_cache=False)
+        timings.append(time.perf_counter() - start)
+        assert "Error" not in response, response
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tracing overhead and per-stage latency")
+    parser.add_argument("--requests", type=int, default=150)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir, MockProviderServer() as server:
+        os.environ.update(server.env())
+        os.environ["SKIBIDYSAURUS_DATA_DIR"] = data_dir
+        trace_file = os.path.join(data_dir, "traces", "trace.jsonl")
+        run(len(ENGINES))  # import providers and open connections first
+
+        print(f"{args.requests} text requests round-robin over {', '.join(ENGINES)}:")
+        for label, setup in (
+            ("tracing off", lambda: None),
+            ("in memory", lambda: setattr(tracing.tracer, "enabled", True)),
+            ("JSONL file", lambda: tracing.configure(trace_file)),
+        ):
+            setup()
+            timings = run(args.requests)
+            print(f"  {label:<12} median {statistics.median(timings) * 1000:6.2f} ms per request")
+
+        with open(trace_file, encoding="utf-8") as f:
+            lines = sum(1 for _ in f)
+        print(f"  {lines} spans written to the trace file ({os.path.getsize(trace_file) / 1024:.0f} KB)")
+        print("per engine and stage:")
+        for engine, stages in tracing.stats().items():
+            for name, stage in stages.items():
+                print(f"  {engine:<8} {name:<10} n={stage['count']:<5} p50 {stage['p50_ms']:7.1f} ms  p95 {stage['p95_ms']:7.1f} ms")
+        print(json.dumps(tracing.recent(1)[0]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Local transforms (llm/transforms.py): how long the intent matcher takes
+on prompts it answers and on ones it passes to the engine, its hit rate on
+mechanical prompts and false positives on ones that need a model, then
+end to end through backend.get_ai_response against the mock provider, a
+mechanical prompt answered locally vs sent to the engine (--no-transforms).
+
+    python benchmarks/bench_transforms.py --first-token-delay 0.8
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_servers import MockProviderServer  # noqa: E402
+from llm import transforms  # noqa: E402
+
+TEXT = "\n".join(f"line {i}: the quick brown fox jumps over the lazy dog" for i in range(20))
+JSON_TEXT = json.dumps({"items": [{"id": i, "name": f"item {i}", "tags": ["a", "b"]} for i in range(20)]})
+
+MECHANICAL = [
+    ("uppercase this", TEXT),
+    ("Can you make it lowercase please?", TEXT),
+    ("convert to snake_case", "getUserName\nHTTPServerError\nmax retries"),
+    ("camelCase", "user_name\nmax-retries"),
+    ("title case", TEXT),
+    ("sort these lines", TEXT),
+    ("sort lines descending", TEXT),
+    ("remove duplicate lines", TEXT + "\n" + TEXT),
+    ("remove blank lines", TEXT.replace("\n", "\n\n")),
+    ("how many words are there?", TEXT),
+    ("count the lines", TEXT),
+    ("format this JSON", JSON_TEXT),
+    ("minify this json", JSON_TEXT),
+    ("base64 encode", TEXT),
+    ("url encode this", "a b&c=d"),
+    ("Edit this: 'hello world' -> \n\nQuery: all caps", ""),
+    ("sort these lines:\nb\na\nc", ""),
+]
+NEEDS_MODEL = [
+    ("make this more concise", TEXT),
+    ("fix the grammar", TEXT),
+    ("translate to french", TEXT),
+    ("summarize", TEXT),
+    ("explain this", JSON_TEXT),
+    ("format this as a table", TEXT),
+    ("sort these by price", TEXT),
+    ("make it uppercase and translate to french", TEXT),
+    ("uppercase the first letter of each sentence", TEXT),
+    ("convert this to typescript", TEXT),
+    ("is this valid json", JSON_TEXT),
+    ("format this JSON", "{not: json,"),
+    ("trim this", TEXT),
+    ("compress this", JSON_TEXT),
+    ("what is on my screen?", ""),
+    ("Edit this: 'hello world' -> \n\nQuery: rewrite it as a haiku", ""),
+]
+
+
+def timed(fn, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label: str, timings: list):
+    timings = sorted(timings)
+    print(f"  {label:<34} p50 {statistics.median(timings):7.3f} ms  p99 {timings[int(len(timings) * 0.99)]:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local transform engine benchmark")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5, help="End-to-end requests per path.")
+    parser.add_argument("--engine", default="openai", choices=["ollama", "openai", "claude"])
+    parser.add_argument("--first-token-delay", type=float, default=0.8)
+    args = parser.parse_args()
+
+    transforms.answer("warm up the pattern cache", TEXT)
+    print("matcher (prompt split, normalize, match, run the transform):")
+    hit_timings = [t for prompt, text in MECHANICAL for t in timed(lambda: transforms.answer(prompt, text), args.runs)]
+    miss_timings = [t for prompt, text in NEEDS_MODEL for t in timed(lambda: transforms.answer(prompt, text), args.runs)]
+    report(f"answered locally ({len(MECHANICAL)} prompts)", hit_timings)
+    report(f"passed to the engine ({len(NEEDS_MODEL)} prompts)", miss_timings)
+    missed = [prompt for prompt, text in MECHANICAL if transforms.answer(prompt, text) is None]
+    wrong = [prompt for prompt, text in NEEDS_MODEL if transforms.answer(prompt, text) is not None]
+    print(f"  hit rate on mechanical prompts    {len(MECHANICAL) - len(missed)}/{len(MECHANICAL)}  {missed or ''}")
+    print(f"  false positives                   {len(wrong)}/{len(NEEDS_MODEL)}  {wrong or ''}")
+
+    with tempfile.TemporaryDirectory() as data_dir, MockProviderServer(first_token_delay=args.first_token_delay) as server:
+        os.environ.update(server.env())
+        os.environ["SKIBIDYSAURUS_DATA_DIR"] = data_dir
+        import backend
+
+        print(f"end to end, 'sort these lines' on {args.engine} ({args.first_token_delay:.1f} s to first token):")
+        for label, use_transforms in (("engine (--no-transforms)", False), ("local transform", True)):
+            timings = timed(
+                lambda: backend.get_ai_response("sort these lines", TEXT, engine=args.engine, use_cache=False, history=False, transforms=use_transforms),
+                args.rounds,
+            )
+            report(label, timings)
+        stats = backend.get_llm_manager().transform_stats()
+        print(f"  transform_stats: hit rate {stats['hit_rate']}, time saved {stats['time_saved_ms']:.0f} ms over {stats['hits_estimated']} hits")
+        print(f"  provider requests: {len(server.requests)} (all from the --no-transforms rounds)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Per-request latency of a fresh connection per prompt (the old bare
+requests.post behaviour) vs LLMManager's pooled keep-alive transport, against
+a local TLS stand-in for api.openai.com / api.anthropic.com.
+
+--connect-delay adds a fixed cost per new connection on the server side to
+model the TCP + TLS round trips to a remote API. The stand-in only speaks
+HTTP/1.1, so this measures connection reuse, not HTTP/2 multiplexing.
+
+    python benchmarks/bench_transport.py --runs 20 --connect-delay 0.08
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_servers import MockProviderServer  # noqa: E402
+
+
+def _run(label: str, samples: list[float]) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return f"{label:<22} median={statistics.median(samples) * 1000:7.1f} ms  p95={p95 * 1000:7.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fresh vs pooled provider connections over TLS")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--connect-delay", type=float, default=0.08)
+    parser.add_argument("--engine", default="openai", choices=["openai", "claude"])
+    args = parser.parse_args()
+
+    with MockProviderServer(tls=True, connect_delay=args.connect_delay) as server:
+        os.environ.update(server.env())
+        from llm.clients import LLMManager
+        from llm.transport import ProviderTransport
+
+        fresh = []
+        for _ in range(args.runs):
+            manager = LLMManager(transport=ProviderTransport(verify=server.ca_file))
+            start = time.perf_counter()
+            reply = manager.get_response("hello", "", engine=args.engine)
+            fresh.append(time.perf_counter() - start)
+            manager.close()
+            assert "Error" not in reply, reply
+        fresh_connections = server.connections
+
+        manager = LLMManager(transport=ProviderTransport(verify=server.ca_file))
+        manager.warm_up(args.engine).join()
+        pooled = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            reply = manager.get_response("hello", "", engine=args.engine)
+            pooled.append(time.perf_counter() - start)
+            assert "Error" not in reply, reply
+        manager.close()
+        pooled_connections = server.connections - fresh_connections
+
+    print(_run("fresh connection", fresh) + f"  connections={fresh_connections}")
+    print(_run("pooled + pre-warmed", pooled) + f"  connections={pooled_connections}")
+    saved = statistics.median(fresh) - statistics.median(pooled)
+    print(f"saved per request (median): {saved * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
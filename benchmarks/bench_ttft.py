@@ -0,0 +1,67 @@
+"""
+Time-to-first-token vs full-response latency for the streaming and blocking
+paths of LLMManager, against local mock Ollama/OpenAI/Claude servers.
+
+    python benchmarks/bench_ttft.py --first-token-delay 0.2 --token-delay 0.02
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_servers import MockProviderServer  # noqa: E402
+
+ENGINES = ["ollama", "openai", "claude"]
+
+
+def measure(manager, engine: str, runs: int):
+    blocking, ttft, streamed = [], [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        manager.get_response("hello", "", engine=engine)
+        blocking.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        first = None
+        text = []
+        for delta in manager.stream_response("hello", "", engine=engine):
+            if first is None:
+                first = time.perf_counter()
+            text.append(delta)
+        streamed.append(time.perf_counter() - start)
+        ttft.append((first or time.perf_counter()) - start)
+        assert "Error" not in "".join(text), "".join(text)
+    return blocking, ttft, streamed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming time-to-first-token benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--tokens", type=int, default=100)
+    args = parser.parse_args()
+
+    tokens = [f"tok{i} " for i in range(args.tokens)]
+    with MockProviderServer(tokens=tokens, first_token_delay=args.first_token_delay, token_delay=args.token_delay) as server:
+        os.environ.update(server.env())
+        from llm.clients import LLMManager
+        manager = LLMManager()
+
+        print(f"{'engine':<8} {'blocking':>12} {'stream TTFT':>12} {'stream total':>13}")
+        for engine in ENGINES:
+            blocking, ttft, streamed = measure(manager, engine, args.runs)
+            print(
+                f"{engine:<8} "
+                f"{statistics.median(blocking) * 1000:9.1f} ms "
+                f"{statistics.median(ttft) * 1000:9.1f} ms "
+                f"{statistics.median(streamed) * 1000:10.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
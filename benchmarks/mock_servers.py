@@ -0,0 +1,555 @@
+"""
+Deterministic local stand-ins for the Gemini generateContent (plus file
+uploads and cached contents), Ollama generate/chat, OpenAI Responses,
+Anthropic Messages and llama.cpp (llama-server) chat completions endpoints,
+for exercising llm/clients.py without network access.
+
+    with MockProviderServer(first_token_delay=0.2, token_delay=0.01) as server:
+        os.environ.update(server.env())
+        ...
+
+With tls=True the server uses a throwaway self-signed certificate (pass
+server.ca_file as `verify`), and connect_delay adds a fixed cost to every new
+connection to stand in for TCP + TLS round trips to a remote API.
+
+Ollama models: tags carry a digest, /api/show reports vision for everything
+not in text_only_models, and with load_delay the first request for a model
+(or the first after its keep_alive ran out) pays that much to load it; an
+empty generate only loads it, like Ollama's preload.
+
+Faults: inject(status, count, retry_after) queues error answers for the next
+model calls (a burst of 429s, a 503 outage), and concurrency_limit answers
+429 to any call beyond that many in flight, like a provider's rate limiter.
+fail_stream(after, message) cuts the next stream short with the engine's own
+error frame after that many tokens (an overload mid-answer); with
+trailing_tokens, frames sent after the terminal frame must be ignored.
+"""
+import os
+import re
+import ssl
+import json
+import time
+import hashlib
+import datetime
+import tempfile
+import ipaddress
+import threading
+from itertools import islice
+from collections import deque
+from urllib.parse import urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_TOKENS = ["Skibidysaurus ", "says ", "hello ", "from ", "a ", "mock ", "provider."]
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self) -> "MockProviderServer":
+        return self.server.mock
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        self.config.record(self.path, len(body))
+        return body
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_chunked(self, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _tokens(self):
+        # Paces tokens the way a real provider would: a queueing delay, then a steady rate.
+        time.sleep(self.config.first_token_delay)
+        for i, token in enumerate(self.config.tokens):
+            if i:
+                time.sleep(self.config.token_delay)
+            self.config.tokens_sent += 1
+            yield token
+
+    def _stream(self, frame, error_frame, done_frame: bytes):
+        """
+        Writes a streamed reply: frame(token) per token, then done_frame and any
+        trailing tokens. A pending fail_stream() writes error_frame(message) in
+        place of the rest instead.
+        """
+        failure = self.config.take_stream_failure()
+        after, message = failure if failure is not None else (None, "")
+        for token in islice(self._tokens(), after):
+            self._write_chunk(frame(token))
+        if failure is not None:
+            self._write_chunk(error_frame(message))
+        else:
+            self._write_chunk(done_frame)
+            for token in self.config.trailing_tokens:
+                self._write_chunk(frame(token))
+        self._end_chunked()
+
+    def _full_text(self) -> str:
+        return "".join(self._tokens())
+
+    def do_GET(self):
+        self.config.record(self.path, 0)
+        if self.path == "/api/version":
+            self._send_json(200, {"version": "mock"})
+            return
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+            return
+        if self.path == "/api/tags":
+            models = [{"name": name, "digest": self.config.digest(name)} for name in self.config.ollama_models]
+            self._send_json(200, {"models": models})
+            return
+        self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_DELETE(self):
+        self.config.record(self.path, 0)
+        if self.path.startswith("/v1/files/"):
+            self._send_json(200, {"id": self.path.rsplit("/", 1)[-1], "deleted": True})
+            return
+        if self.path.startswith("/v1beta/cachedContents/"):
+            self._send_json(200, {})
+            return
+        self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        body = self._read_body()
+        url = urlparse(self.path)
+        if self.path == "/v1/files":
+            # OpenAI and Anthropic file uploads share the path; the body is multipart.
+            self.config.uploads += 1
+            self._send_json(200, {"id": f"file-mock-{self.config.uploads}"})
+            return
+        if url.path == "/upload/v1beta/files":
+            self._gemini_upload(url)
+            return
+        if url.path == "/v1beta/cachedContents":
+            with self.config._lock:
+                self.config.caches += 1
+                name = f"cachedContents/mock-{self.config.caches}"
+            self._send_json(200, {"name": name, "model": json.loads(body or b"{}").get("model")})
+            return
+        payload = json.loads(body or b"{}")
+        fault = self.config.take_fault()
+        if fault:
+            status, headers = fault
+            self._send_json(status, {"error": {"type": "mock_fault", "message": f"injected {status}"}}, headers)
+            return
+        try:
+            if self.path == "/api/show":
+                self._ollama_show(payload)
+            elif self.path == "/api/generate":
+                self._ollama_generate(payload)
+            elif self.path == "/api/chat":
+                self._ollama_chat(payload)
+            elif self.path == "/v1/responses":
+                self._openai_responses(payload)
+            elif self.path == "/v1/messages":
+                self._anthropic_messages(payload)
+            elif self.path == "/v1/chat/completions":
+                self._chat_completions(payload)
+            elif url.path.startswith("/v1beta/models/"):
+                self._gemini_generate(url, payload)
+            else:
+                self._send_json(404, {"error": f"unknown path {self.path}"})
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away mid-response, e.g. a cancelled query.
+            self.config.disconnects += 1
+            self.close_connection = True
+        finally:
+            self.config.finish_call()
+
+    def _ollama_show(self, payload: dict):
+        model = _ollama_name(payload.get("model"))
+        if model not in self.config.ollama_models:
+            self._send_json(404, {"error": f"model '{model}' not found"})
+            return
+        capabilities = ["completion"] if model in self.config.text_only_models else ["completion", "vision"]
+        self._send_json(200, {"capabilities": capabilities, "model_info": {"llama.context_length": 4096}})
+
+    def _ollama_load(self, payload: dict) -> bool:
+        """Loads the model if it isn't resident; False (after answering 404) when it isn't installed."""
+        model = _ollama_name(payload.get("model"))
+        if model not in self.config.ollama_models:
+            self._send_json(404, {"error": f"model '{payload.get('model')}' not found, try pulling it first"})
+            return False
+        self.config.load(model, payload.get("keep_alive"))
+        return True
+
+    def _ollama_generate(self, payload: dict):
+        if not self._ollama_load(payload):
+            return
+        if not payload.get("prompt") and not payload.get("images"):
+            self._send_json(200, {"model": payload.get("model"), "response": "", "done": True, "done_reason": "load"})
+            return
+        if payload.get("images") and _ollama_name(payload.get("model")) in self.config.text_only_models:
+            self._send_json(400, {"error": f"model '{payload['model']}' does not support images"})
+            return
+        if not payload.get("stream", True):
+            self._send_json(200, {"model": payload.get("model"), "response": self._full_text(), "done": True})
+            return
+        self._start_chunked("application/x-ndjson")
+        self._stream(
+            lambda token: _ndjson({"response": token, "done": False}),
+            lambda message: _ndjson({"error": message}),
+            _ndjson({"response": "", "done": True}),
+        )
+
+    def _ollama_chat(self, payload: dict):
+        if not self._ollama_load(payload):
+            return
+        has_images = any(message.get("images") for message in payload.get("messages") or [])
+        if has_images and _ollama_name(payload.get("model")) in self.config.text_only_models:
+            self._send_json(400, {"error": f"model '{payload['model']}' does not support images"})
+            return
+        if not payload.get("stream", True):
+            message = {"role": "assistant", "content": self._full_text()}
+            self._send_json(200, {"model": payload.get("model"), "message": message, "done": True})
+            return
+        self._start_chunked("application/x-ndjson")
+        self._stream(
+            lambda token: _ndjson({"message": {"role": "assistant", "content": token}, "done": False}),
+            lambda message: _ndjson({"error": message}),
+            _ndjson({"message": {"role": "assistant", "content": ""}, "done": True}),
+        )
+
+    def _openai_responses(self, payload: dict):
+        if not payload.get("stream"):
+            self._send_json(200, {"output_text": self._full_text()})
+            return
+        self._start_chunked("text/event-stream")
+        self._stream(
+            lambda token: _sse({"type": "response.output_text.delta", "delta": token}),
+            lambda message: _sse({"type": "error", "code": "server_error", "message": message}),
+            _sse({"type": "response.completed"}),
+        )
+
+    def _anthropic_messages(self, payload: dict):
+        if not payload.get("stream"):
+            self._send_json(200, {"content": [{"type": "text", "text": self._full_text()}]})
+            return
+        self._start_chunked("text/event-stream")
+        self._write_chunk(_sse({"type": "message_start", "message": {"model": payload.get("model")}}))
+        self._stream(
+            lambda token: _sse({"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": token}}),
+            lambda message: _sse({"type": "error", "error": {"type": "overloaded_error", "message": message}}),
+            _sse({"type": "message_stop"}),
+        )
+
+    def _chat_completions(self, payload: dict):
+        if not payload.get("stream"):
+            message = {"role": "assistant", "content": self._full_text()}
+            self._send_json(200, {"choices": [{"index": 0, "message": message, "finish_reason": "stop"}]})
+            return
+        self._start_chunked("text/event-stream")
+        self._stream(
+            lambda token: _sse({"choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}, event=False),
+            lambda message: _sse({"error": {"code": 500, "message": message}}, event=False),
+            b"data: [DONE]\n\n",
+        )
+
+
+    def _gemini_upload(self, url):
+        # Resumable protocol: "start" hands out an upload URL, then chunks until "finalize"
+        command = self.headers.get("X-Goog-Upload-Command", "")
+        if command == "start":
+            upload_url = f"{self.config.base_url}/upload/v1beta/files?upload_id=mock"
+            self._send_json(200, {}, {"X-Goog-Upload-URL": upload_url, "X-Goog-Upload-Status": "active"})
+            return
+        if "finalize" not in command:
+            self._send_json(200, {}, {"X-Goog-Upload-Status": "active"})
+            return
+        with self.config._lock:
+            self.config.uploads += 1
+            name = f"files/mock-{self.config.uploads}"
+        file = {"name": name, "uri": f"{self.config.base_url}/v1beta/{name}", "mimeType": "image/jpeg", "state": "ACTIVE"}
+        self._send_json(200, {"file": file}, {"X-Goog-Upload-Status": "final"})
+
+    def _gemini_generate(self, url, payload: dict):
+        model, _, method = url.path[len("/v1beta/models/"):].partition(":")
+
+        def chunk(text: str, done: bool = False) -> dict:
+            candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+            if done:
+                candidate["finishReason"] = "STOP"
+            return {"candidates": [candidate], "modelVersion": model}
+
+        if method == "generateContent":
+            self._send_json(200, chunk(self._full_text(), done=True))
+            return
+        if method != "streamGenerateContent":
+            self._send_json(404, {"error": {"code": 404, "message": f"unknown method {method}"}})
+            return
+        self._start_chunked("text/event-stream")
+        self._stream(
+            lambda token: f"data: {json.dumps(chunk(token))}\r\n\r\n".encode("utf-8"),
+            lambda message: f"data: {json.dumps({'error': {'code': 503, 'message': message, 'status': 'UNAVAILABLE'}})}\r\n\r\n".encode("utf-8"),
+            f"data: {json.dumps(chunk('', done=True))}\r\n\r\n".encode("utf-8"),
+        )
+
+
+def _ndjson(payload: dict) -> bytes:
+    return json.dumps(payload).encode("utf-8") + b"\n"
+
+
+def _sse(payload: dict, event: bool = True) -> bytes:
+    """One Server-Sent Event; `event` names it after payload["type"] the way OpenAI and Anthropic do."""
+    head = f"event: {payload['type']}\n" if event else ""
+    return f"{head}data: {json.dumps(payload)}\n\n".encode("utf-8")
+
+
+def _ollama_name(model) -> str:
+    # Ollama resolves "llava" to "llava:latest"
+    model = str(model or "")
+    return model if ":" in model else f"{model}:latest"
+
+
+def _seconds(duration, default: float) -> float:
+    """An Ollama keep_alive ("30m", "90s", 120, -1 for forever) in seconds."""
+    if duration is None or duration == "":
+        return default
+    if isinstance(duration, (int, float)):
+        return float("inf") if duration < 0 else float(duration)
+    match = re.fullmatch(r"(-?\d+(?:\.\d+)?)(ms|s|m|h)?", str(duration).strip())
+    if not match:
+        return default
+    value = float(match.group(1))
+    if value < 0:
+        return float("inf")
+    return value * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[match.group(2) or "s"]
+
+
+def _write_self_signed_cert(directory: str):
+    from cryptography import x509
+    from cryptography.x509.oid import NameOID
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, "mock-cert.pem")
+    key_path = os.path.join(directory, "mock-key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ))
+    return cert_path, key_path
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def get_request(self):
+        conn, addr = super().get_request()
+        self.mock.connections += 1
+        if self.mock.connect_delay:
+            time.sleep(self.mock.connect_delay)
+        return conn, addr
+
+
+class MockProviderServer:
+    """
+    Threaded HTTP server on 127.0.0.1 that answers all mocked provider paths.
+    Use as a context manager; env() returns the base-URL overrides for llm/clients.py.
+    """
+
+    def __init__(
+        self,
+        tokens=None,
+        first_token_delay: float = 0.0,
+        token_delay: float = 0.0,
+        ollama_models=None,
+        text_only_models=None,
+        tls: bool = False,
+        connect_delay: float = 0.0,
+        concurrency_limit: int = 0,
+        load_delay: float = 0.0,
+        trailing_tokens=None,
+    ):
+        self.tokens = list(tokens or DEFAULT_TOKENS)
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.trailing_tokens = list(trailing_tokens or [])
+        self.text_only_models = {_ollama_name(name) for name in text_only_models or []}
+        self.ollama_models = [_ollama_name(name) for name in ollama_models or ["llava:latest"]]
+        self.ollama_models += sorted(self.text_only_models - set(self.ollama_models))
+        self.tls = tls
+        self.connect_delay = connect_delay
+        self.ca_file = None
+        self.connections = 0
+        self.disconnects = 0
+        self.tokens_sent = 0
+        self.requests = []
+        self.uploads = 0
+        self.caches = 0
+        self.concurrency_limit = concurrency_limit
+        self.load_delay = load_delay
+        self.loads = 0
+        # Ollama model -> monotonic time it unloads
+        self.loaded = {}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.faults_sent = 0
+        self._faults = deque()
+        self._stream_failures = deque()
+        self._tempdir = None
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def record(self, path: str, body_bytes: int):
+        with self._lock:
+            self.requests.append((path, body_bytes))
+
+    def digest(self, model: str) -> str:
+        return hashlib.sha256(model.encode("utf-8")).hexdigest()
+
+    def load(self, model: str, keep_alive=None):
+        """Pays load_delay unless `model` is resident, then keeps it for keep_alive (Ollama's default 5m)."""
+        with self._lock:
+            resident = self.loaded.get(model, 0) > time.monotonic()
+        if not resident:
+            time.sleep(self.load_delay)
+            with self._lock:
+                self.loads += 1
+        with self._lock:
+            self.loaded[model] = time.monotonic() + _seconds(keep_alive, 300)
+
+    def unload(self, model: str = None):
+        with self._lock:
+            if model is None:
+                self.loaded.clear()
+            else:
+                self.loaded.pop(model, None)
+
+    def inject(self, status: int, count: int = 1, retry_after: float = None, headers: dict = None):
+        """Answers the next `count` model calls with `status` instead of a completion."""
+        headers = dict(headers or {})
+        if retry_after is not None:
+            headers["Retry-After"] = f"{retry_after:g}"
+            headers["retry-after-ms"] = str(int(retry_after * 1000))
+        with self._lock:
+            self._faults.extend([(status, headers)] * count)
+
+    def clear_faults(self):
+        with self._lock:
+            self._faults.clear()
+            self._stream_failures.clear()
+
+    def fail_stream(self, after: int = 2, message: str = "Overloaded"):
+        """Ends the next streamed reply with an error frame after `after` tokens."""
+        with self._lock:
+            self._stream_failures.append((after, message))
+
+    def take_stream_failure(self):
+        with self._lock:
+            return self._stream_failures.popleft() if self._stream_failures else None
+
+    def take_fault(self):
+        """Counts a model call in and returns the (status, headers) it should fail with, if any."""
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            fault = self._faults.popleft() if self._faults else None
+            if fault is None and self.concurrency_limit and self.in_flight > self.concurrency_limit:
+                fault = (429, {"retry-after-ms": "50"})
+            if fault is not None:
+                self.faults_sent += 1
+                self.in_flight -= 1
+            return fault
+
+    def finish_call(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        scheme = "https" if self.tls else "http"
+        return f"{scheme}://{host}:{port}"
+
+    def env(self) -> dict:
+        return {
+            "GEMINI_BASE_URL": self.base_url,
+            "OLLAMA_HOST": self.base_url,
+            "OPENAI_BASE_URL": f"{self.base_url}/v1",
+            "ANTHROPIC_BASE_URL": self.base_url,
+            "LLAMACPP_HOST": self.base_url,
+            "OPENAI_API_KEY": "mock-key",
+            "ANTHROPIC_API_KEY": "mock-key",
+            "GEMINI_API_KEY": "mock-key",
+            # Measure the network path, not the on-disk response cache.
+            "SKIBIDYSAURUS_CACHE": "0",
+        }
+
+    def start(self):
+        self._server = _MockHTTPServer(("127.0.0.1", 0), _MockHandler)
+        self._server.mock = self
+        if self.tls:
+            self._tempdir = tempfile.TemporaryDirectory()
+            cert_path, key_path = _write_self_signed_cert(self._tempdir.name)
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(cert_path, key_path)
+            self._server.socket = context.wrap_socket(self._server.socket, server_side=True)
+            self.ca_file = cert_path
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._tempdir is not None:
+            self._tempdir.cleanup()
+            self._tempdir = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
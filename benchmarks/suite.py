@@ -0,0 +1,320 @@
+"""
+The end-to-end benchmark suite: every scenario against deterministic local
+stand-ins for all engines (benchmarks/mock_servers.py), compared with the
+checked-in baseline so a regression shows up in review.
+
+Scenarios, per engine:
+
+    cold        `backend.py --prompt` as a fresh process: wall time and peak RSS
+    warm        backend.get_ai_response in one process, plus time to first
+                token through LLMManager.stream_response
+    concurrent  LLMManager.aget_response, --concurrency calls in flight
+    large_image a 5K screenshot through backend.get_ai_response (prep, encode, send)
+    faults      warm requests while the server answers every --fault-every'th
+                call with a 429/503 burst; retries included in the latency
+
+Latency is reported as p50/p95/p99, with throughput and peak memory
+(tracemalloc over a short second pass for in-process scenarios).
+
+    python benchmarks/suite.py                       # run, compare with benchmarks/baseline.json
+    python benchmarks/suite.py --scenarios warm,faults --engines openai
+    python benchmarks/suite.py --check               # exit 1 on a regression
+    python benchmarks/suite.py --update-baseline     # after an intended change
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_servers import MockProviderServer  # noqa: E402
+
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+ENGINES = ["gemini", "ollama", "openai", "claude"]
+SCENARIOS = ["cold", "warm", "concurrent", "large_image", "faults"]
+# Metrics where a higher number is better; everything else regresses upwards
+HIGHER_IS_BETTER = ("rps", "ok")
+# Differences under these are noise, whatever the relative change
+ABSOLUTE_FLOOR = {"ms": 2.0, "mb": 1.0, "rps": 5.0, "ok": 0.0}
+SELECTION = "The quick brown fox jumps over the lazy dog. " * 20
+# Runs the CLI and reports its own peak RSS in KB. On Linux ru_maxrss keeps
+# the high-water mark of the parent the child was forked from, so the
+# per-exec VmHWM is used where /proc has it.
+COLD_START = """
+import sys, runpy, resource
+sys.argv = ["backend.py"] + sys.argv[1:]
+try:
+    runpy.run_path(sys.argv[0], run_name="__main__")
+finally:
+    try:
+        with open("/proc/self/status") as status:
+            peak = next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+    except OSError:
+        # macOS reports bytes
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+    print(f"peak_kb={peak}", file=sys.stderr)
+"""
+
+
+def percentile(values: list, share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))] if values else 0.0
+
+
+def distribution(latencies: list, elapsed: float = None) -> dict:
+    result = {
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+    total = elapsed if elapsed is not None else sum(latencies)
+    if latencies and total:
+        result["rps"] = round(len(latencies) / total, 1)
+    return result
+
+
+def traced_peak(fn) -> float:
+    """Peak Python heap in MB while `fn` runs."""
+    tracemalloc.start()
+    try:
+        fn()
+        return round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+    finally:
+        tracemalloc.stop()
+
+
+def _models(engine: str) -> dict:
+    return {"engine": engine, "use_cache": False}
+
+
+def _check(response: str):
+    from llm.race import is_error_response
+    if is_error_response(response):
+        raise RuntimeError(response)
+
+
+def cold(engine: str, args, env: dict) -> dict:
+    latencies, peak = [], 0.0
+    command = [sys.executable, "-c", COLD_START, "--prompt", "rewrite this", "--context", SELECTION, "--engine", engine, "--no-cache"]
+    for _ in range(args.cold_runs):
+        start = time.perf_counter()
+        child = subprocess.run(command, env=env, cwd=ROOT, capture_output=True, text=True)
+        latencies.append(time.perf_counter() - start)
+        _check(child.stdout)
+        peak = max(peak, int(child.stderr.rsplit("peak_kb=", 1)[-1]) / 1024)
+    result = distribution(latencies)
+    result.pop("rps", None)
+    result["peak_mb"] = round(peak, 1)
+    return result
+
+
+def warm(engine: str, args, env: dict) -> dict:
+    import backend
+
+    def run(n: int) -> list:
+        latencies = []
+        for i in range(n):
+            start = time.perf_counter()
+            _check(backend.get_ai_response(f"rewrite this, variant {i}", SELECTION, **_models(engine)))
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    run(1)
+    result = distribution(run(args.requests))
+    manager = backend.get_llm_manager()
+    ttft = []
+    for i in range(args.requests):
+        start = time.perf_counter()
+        first = None
+        for _ in manager.stream_response(f"Edit this: '{SELECTION}' -> \n\nQuery: shorten it {i}", "", **_models(engine)):
+            first = first or time.perf_counter()
+        ttft.append((first or time.perf_counter()) - start)
+    result["ttft_p50_ms"] = round(percentile(ttft, 0.5) * 1000, 2)
+    result["ttft_p95_ms"] = round(percentile(ttft, 0.95) * 1000, 2)
+    result["peak_mb"] = traced_peak(lambda: run(3))
+    return result
+
+
+def concurrent(engine: str, args, env: dict) -> dict:
+    import backend
+    manager = backend.get_llm_manager()
+
+    async def flood(n: int) -> list:
+        gate = asyncio.Semaphore(args.concurrency)
+
+        async def one(i: int):
+            async with gate:
+                start = time.perf_counter()
+                _check(await manager.aget_response(f"Query: summarise note {i}", "", **_models(engine)))
+                return time.perf_counter() - start
+
+        return await asyncio.gather(*(one(i) for i in range(n)))
+
+    # One loop for every pass: the SDK clients' async pools are bound to it
+    with asyncio.Runner() as runner:
+        runner.run(flood(args.concurrency))
+        start = time.perf_counter()
+        latencies = runner.run(flood(args.requests * 4))
+        result = distribution(latencies, time.perf_counter() - start)
+        result["peak_mb"] = traced_peak(lambda: runner.run(flood(args.concurrency)))
+        runner.run(manager.transport.aclose())
+    return result
+
+
+def large_image(engine: str, args, env: dict) -> dict:
+    import backend
+
+    def run(n: int) -> list:
+        latencies = []
+        for _ in range(n):
+            start = time.perf_counter()
+            _check(backend.get_ai_response("what is on my screen?", "", args.screenshot, **_models(engine)))
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    run(1)
+    result = distribution(run(max(3, args.requests // 5)))
+    result["peak_mb"] = traced_peak(lambda: run(1))
+    return result
+
+
+def faults(engine: str, args, env: dict) -> dict:
+    import backend
+    from llm.race import is_error_response
+    server = args.server
+    ok, latencies = 0, []
+    for i in range(args.requests):
+        if i % args.fault_every == 0:
+            server.inject((429, 503)[i // args.fault_every % 2], 2, retry_after=0.01)
+        start = time.perf_counter()
+        response = backend.get_ai_response(f"rewrite this, variant {i}", SELECTION, **_models(engine))
+        latencies.append(time.perf_counter() - start)
+        ok += not is_error_response(response)
+    server.clear_faults()
+    result = distribution(latencies)
+    result.pop("rps", None)
+    result["ok"] = round(ok / len(latencies), 3)
+    return result
+
+
+RUNNERS = {"cold": cold, "warm": warm, "concurrent": concurrent, "large_image": large_image, "faults": faults}
+
+
+def _unit(metric: str) -> str:
+    return metric.rsplit("_", 1)[-1] if "_" in metric else metric
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """(key, metric, baseline, now, relative change, regressed) for every metric in both."""
+    rows = []
+    for key, metrics in results.items():
+        before = baseline.get(key, {})
+        for metric, now in metrics.items():
+            if metric not in before:
+                continue
+            base = before[metric]
+            change = (now - base) / base if base else 0.0
+            worse = (base - now) if metric in HIGHER_IS_BETTER else (now - base)
+            regressed = worse > ABSOLUTE_FLOOR.get(_unit(metric), 0.0) and worse > abs(base) * tolerance
+            rows.append((key, metric, base, now, change, regressed))
+    return rows
+
+
+def machine() -> dict:
+    return {"python": platform.python_version(), "platform": platform.platform(terse=True), "cpus": os.cpu_count()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite against local mock providers")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    parser.add_argument("--requests", type=int, default=30, help="Requests per engine in each scenario.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--cold-runs", type=int, default=3)
+    parser.add_argument("--fault-every", type=int, default=5)
+    parser.add_argument("--first-token-ms", type=float, default=20.0)
+    parser.add_argument("--token-ms", type=float, default=2.0)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Relative slowdown that counts as a regression.")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="Write this run's results as the new baseline.")
+    parser.add_argument("--check", action="store_true", help="Exit 1 when a metric regressed against the baseline.")
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(",") if s in RUNNERS]
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    config = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "first_token_ms": args.first_token_ms,
+        "token_ms": args.token_ms,
+        "tokens": args.tokens,
+    }
+    tokens = [f"tok{i} " for i in range(args.tokens)]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as data_dir, MockProviderServer(
+        tokens=tokens,
+        first_token_delay=args.first_token_ms / 1000,
+        token_delay=args.token_ms / 1000,
+    ) as server:
+        os.environ.update(server.env())
+        os.environ["SKIBIDYSAURUS_DATA_DIR"] = data_dir
+        os.environ["SKIBIDYSAURUS_IMAGE_CROP"] = "none"
+        env = dict(os.environ)
+        args.server = server
+        if "large_image" in scenarios:
+            from core.capture import FakeCaptureBackend
+            args.screenshot = os.path.join(data_dir, "screenshot.jpg")
+            with open(args.screenshot, "wb") as f:
+                f.write(FakeCaptureBackend(5120, 2880, seed=1).capture())
+
+        for scenario in scenarios:
+            for engine in engines:
+                started = time.perf_counter()
+                results[f"{scenario}/{engine}"] = RUNNERS[scenario](engine, args, env)
+                metrics = results[f"{scenario}/{engine}"]
+                summary = "  ".join(f"{k} {v}" for k, v in metrics.items())
+                print(f"{scenario:<11} {engine:<8} {summary}  ({time.perf_counter() - started:.1f}s)", flush=True)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "machine": machine(), "results": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {os.path.relpath(args.baseline, ROOT)}")
+        return
+
+    try:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        print("no baseline to compare with; run with --update-baseline")
+        return
+    if baseline.get("config") != config:
+        print(f"note: baseline was recorded with {baseline.get('config')}; numbers are not like for like")
+    if baseline.get("machine") != machine():
+        print(f"note: baseline was recorded on {baseline.get('machine')}")
+
+    rows = compare(results, baseline.get("results", {}), args.tolerance)
+    regressions = [row for row in rows if row[5]]
+    print(f"\nvs baseline ({len(rows)} metrics, tolerance {args.tolerance:.0%}):")
+    for key, metric, base, now, change, regressed in rows:
+        if regressed or abs(change) >= args.tolerance:
+            better = (now > base) == (metric in HIGHER_IS_BETTER)
+            label = "REGRESSED" if regressed else "improved" if better else "noise"
+            print(f"  {label:<9} {key:<22} {metric:<12} {base:>9} -> {now:<9} ({change:+.0%})")
+    print(f"  {len(regressions)} regression(s)")
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
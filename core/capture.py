@@ -1,27 +1,273 @@
-import subprocess
-import base64
+import io
 import os
+import base64
 import tempfile
-import shutil
+import threading
+import subprocess
+from core import tracing
+
+# JPEG quality for in-process captures; prepare_image re-encodes to the engine's budget anyway
+CAPTURE_QUALITY = 0.9
+CAPTURE_TIMEOUT = 3.0
+
+
+class CaptureBackend:
+    """
+    Captures the main display and returns encoded image bytes. available()
+    is False when the backend can't work here (OS version, missing PyObjC
+    framework, no `screencapture`), so the next candidate is tried.
+    """
+
+    name = "base"
+
+    def available(self) -> bool:
+        return True
+
+    def capture(self) -> bytes:
+        raise NotImplementedError
+
+
+def _main_display_id():
+    from Quartz import CGMainDisplayID
+    return CGMainDisplayID()
+
+
+def encode_cgimage(image, quality: float = CAPTURE_QUALITY) -> bytes:
+    """JPEG-encodes a CGImage in memory with ImageIO; no temp file, no PIL round trip."""
+    from Foundation import NSMutableData
+    from Quartz import (
+        CGImageDestinationCreateWithData,
+        CGImageDestinationAddImage,
+        CGImageDestinationFinalize,
+        kCGImageDestinationLossyCompressionQuality,
+    )
+    data = NSMutableData.data()
+    destination = CGImageDestinationCreateWithData(data, "public.jpeg", 1, None)
+    CGImageDestinationAddImage(destination, image, {kCGImageDestinationLossyCompressionQuality: quality})
+    if not CGImageDestinationFinalize(destination):
+        raise RuntimeError("Could not encode screenshot")
+    return bytes(data)
+
+
+class ScreenCaptureKitBackend(CaptureBackend):
+    """
+    SCScreenshotManager (macOS 14+). The shareable-content lookup and content
+    filter are cached between captures and rebuilt if a capture fails (e.g.
+    displays changed). Our own windows are excluded from the image.
+    """
+
+    name = "screencapturekit"
+
+    def __init__(self):
+        self._filter = None
+        self._config = None
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        try:
+            import ScreenCaptureKit
+        except ImportError:
+            return False
+        return hasattr(ScreenCaptureKit, "SCScreenshotManager")
+
+    def _call(self, start):
+        """Runs `start(done)` and waits for it to call done(value, error)."""
+        finished = threading.Event()
+        result = {}
+
+        def done(value, error):
+            result["value"], result["error"] = value, error
+            finished.set()
+
+        start(done)
+        if not finished.wait(CAPTURE_TIMEOUT):
+            raise TimeoutError("ScreenCaptureKit did not answer")
+        if result["error"] is not None or result["value"] is None:
+            raise RuntimeError(f"ScreenCaptureKit error: {result['error']}")
+        return result["value"]
+
+    def _prepare(self):
+        import ScreenCaptureKit as SC
+        from Quartz import CGDisplayCopyDisplayMode
+
+        content = self._call(SC.SCShareableContent.getShareableContentWithCompletionHandler_)
+        main_id = _main_display_id()
+        displays = list(content.displays())
+        display = next((d for d in displays if d.displayID() == main_id), displays[0] if displays else None)
+        if display is None:
+            raise RuntimeError("No display to capture")
+        ours = [app for app in content.applications() if app.processID() in (os.getpid(), os.getppid())]
+        self._filter = SC.SCContentFilter.alloc().initWithDisplay_excludingApplications_exceptingWindows_(display, ours, [])
+        mode = CGDisplayCopyDisplayMode(display.displayID())
+        config = SC.SCStreamConfiguration.alloc().init()
+        config.setWidth_(mode.pixelWidth())
+        config.setHeight_(mode.pixelHeight())
+        config.setShowsCursor_(False)
+        self._config = config
+
+    def capture(self) -> bytes:
+        import ScreenCaptureKit as SC
+        with self._lock:
+            for attempt in range(2):
+                if self._filter is None:
+                    self._prepare()
+                try:
+                    image = self._call(lambda done: SC.SCScreenshotManager.captureImageWithFilter_configuration_completionHandler_(
+                        self._filter, self._config, done
+                    ))
+                    return encode_cgimage(image)
+                except RuntimeError:
+                    self._filter = None
+                    if attempt:
+                        raise
+
+
+class QuartzBackend(CaptureBackend):
+    """CGWindowListCreateImage of the main display (deprecated in macOS 14, gone in 15)."""
+
+    name = "quartz"
+
+    def available(self) -> bool:
+        try:
+            import Quartz
+        except ImportError:
+            return False
+        return hasattr(Quartz, "CGWindowListCreateImage")
+
+    def capture(self) -> bytes:
+        from Quartz import (
+            CGDisplayBounds,
+            CGWindowListCreateImage,
+            kCGWindowListOptionOnScreenOnly,
+            kCGNullWindowID,
+            kCGWindowImageDefault,
+        )
+        image = CGWindowListCreateImage(
+            CGDisplayBounds(_main_display_id()),
+            kCGWindowListOptionOnScreenOnly,
+            kCGNullWindowID,
+            kCGWindowImageDefault,
+        )
+        if image is None:
+            raise RuntimeError("CGWindowListCreateImage returned nothing (Screen Recording permission?)")
+        return encode_cgimage(image)
+
+
+class ScreencaptureCLIBackend(CaptureBackend):
+    """The `screencapture` tool through a temp file; the fallback when PyObjC can't capture."""
+
+    name = "cli"
+
+    def available(self) -> bool:
+        return os.path.exists("/usr/sbin/screencapture")
+
+    def capture(self) -> bytes:
+        fd, temp_path = tempfile.mkstemp(suffix=".jpg")
+        os.close(fd)
+        try:
+            # -x: disable sound, -m: only main monitor, -t: format
+            subprocess.run(["screencapture", "-x", "-m", "-t", "jpg", temp_path], check=True)
+            with open(temp_path, "rb") as image_file:
+                return image_file.read()
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+class FakeCaptureBackend(CaptureBackend):
+    """
+    Deterministic synthetic screenshots for tests and benchmarks on any OS:
+    the same seed always yields the same bytes. With `changing=True` every
+    capture draws a different frame.
+    """
+
+    name = "fake"
+
+    def __init__(self, width: int = 2880, height: int = 1800, seed: int = 0, changing: bool = False):
+        self.width = width
+        self.height = height
+        self.seed = seed
+        self.changing = changing
+        self.frames = 0
+        self._cached = None
+
+    def _render(self, frame: int) -> bytes:
+        import random
+        from PIL import Image, ImageDraw
+        rng = random.Random(self.seed * 100003 + frame)
+        img = Image.new("RGB", (self.width, self.height), (246, 246, 246))
+        draw = ImageDraw.Draw(img)
+        draw.rectangle((0, 0, self.width // 6, self.height), fill=(225, 228, 235))
+        for row in range(self.height // 24 - 2):
+            words = " ".join("".join(rng.choice("etaoinshrdlu") for _ in range(rng.randint(2, 9))) for _ in range(20))
+            draw.text((self.width // 6 + 30, 30 + row * 24), words, fill=(20, 20, 20))
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=90)
+        return out.getvalue()
+
+    def capture(self) -> bytes:
+        self.frames += 1
+        if self.changing:
+            return self._render(self.frames)
+        if self._cached is None:
+            self._cached = self._render(0)
+        return self._cached
+
+
+BACKENDS = {
+    "screencapturekit": ScreenCaptureKitBackend,
+    "quartz": QuartzBackend,
+    "cli": ScreencaptureCLIBackend,
+    "fake": FakeCaptureBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def capture_backend() -> CaptureBackend:
+    """
+    The first available backend, in-process ones first; chosen once per
+    process. SKIBIDYSAURUS_CAPTURE_BACKEND pins one by name.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            pinned = (os.environ.get("SKIBIDYSAURUS_CAPTURE_BACKEND", "") or "").strip().lower()
+            if pinned in BACKENDS:
+                _backend = BACKENDS[pinned]()
+            else:
+                candidates = [ScreenCaptureKitBackend(), QuartzBackend(), ScreencaptureCLIBackend()]
+                _backend = next((b for b in candidates if b.available()), candidates[-1])
+        return _backend
+
+
+def _debug_dump(data: bytes):
+    """Writes the capture to SKIBIDYSAURUS_DEBUG_SCREENSHOT (a path, or 1 for debug_screenshot.jpg in the repo)."""
+    target = (os.environ.get("SKIBIDYSAURUS_DEBUG_SCREENSHOT", "") or "").strip()
+    if not target or target == "0":
+        return
+    if target == "1":
+        target = os.path.join(os.path.dirname(os.path.dirname(__file__)), "debug_screenshot.jpg")
+    with open(target, "wb") as f:
+        f.write(data)
+
+
+def capture_screen_bytes() -> bytes:
+    """
+    Captures the main screen and returns the encoded jpeg bytes.
+    This runs silently without shutter sounds.
+    """
+    backend = capture_backend()
+    with tracing.span("capture", backend=backend.name) as span:
+        data = backend.capture()
+        span.set(bytes=len(data))
+    _debug_dump(data)
+    return data
 
 def capture_screen_base64() -> str:
     """
     Captures the main screen and returns it as a base64 encoded jpeg string.
     This runs silently without shutter sounds.
     """
-    fd, temp_path = tempfile.mkstemp(suffix=".jpg")
-    os.close(fd)
-    try:
-        # -x: disable sound, -m: only main monitor, -t: format
-        subprocess.run(["screencapture", "-x", "-m", "-t", "jpg", temp_path], check=True)
-        
-        # Save a copy locally for debugging visibility issues
-        debug_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "debug_screenshot.jpg")
-        shutil.copy(temp_path, debug_path)
-
-        with open(temp_path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-        return encoded_string
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+    return base64.b64encode(capture_screen_bytes()).decode('utf-8')
@@ -0,0 +1,352 @@
+import os
+import time
+import threading
+from dataclasses import dataclass
+
+DEFAULT_CHORD = "cmd+alt+g"
+
+# CGEventFlags / NSEventModifierFlags share these bits
+MODIFIER_FLAGS = {
+    "shift": 1 << 17,
+    "ctrl": 1 << 18,
+    "alt": 1 << 19,
+    "cmd": 1 << 20,
+}
+MODIFIER_ALIASES = {
+    "command": "cmd",
+    "super": "cmd",
+    "option": "alt",
+    "opt": "alt",
+    "control": "ctrl",
+}
+MODIFIER_MASK = sum(MODIFIER_FLAGS.values())
+
+# macOS virtual key codes (ANSI layout)
+KEY_CODES = {
+    "a": 0, "s": 1, "d": 2, "f": 3, "h": 4, "g": 5, "z": 6, "x": 7, "c": 8, "v": 9,
+    "b": 11, "q": 12, "w": 13, "e": 14, "r": 15, "y": 16, "t": 17, "1": 18, "2": 19,
+    "3": 20, "4": 21, "6": 22, "5": 23, "9": 25, "7": 26, "8": 28, "0": 29, "o": 31,
+    "u": 32, "i": 34, "p": 35, "l": 37, "j": 38, "k": 40, "n": 45, "m": 46,
+    "return": 36, "tab": 48, "space": 49, "escape": 53, "/": 44, ".": 47, ",": 43, ";": 41,
+    "f1": 122, "f2": 120, "f3": 99, "f4": 118, "f5": 96, "f6": 97,
+    "f7": 98, "f8": 100, "f9": 101, "f10": 109, "f11": 103, "f12": 111,
+}
+
+
+@dataclass(frozen=True)
+class Chord:
+    key_code: int
+    # OR of MODIFIER_FLAGS bits that must be held (and no others)
+    modifiers: int
+    label: str = ""
+
+    def matches(self, key_code: int, flags: int) -> bool:
+        return key_code == self.key_code and (flags & MODIFIER_MASK) == self.modifiers
+
+
+def parse_chord(text: str) -> Chord:
+    """'cmd+alt+g' -> Chord. Raises ValueError for unknown keys or a chord without a key."""
+    modifiers, key_code = 0, None
+    for part in (p.strip().lower() for p in text.split("+")):
+        part = MODIFIER_ALIASES.get(part, part)
+        if part in MODIFIER_FLAGS:
+            modifiers |= MODIFIER_FLAGS[part]
+        elif part in KEY_CODES and key_code is None:
+            key_code = KEY_CODES[part]
+        else:
+            raise ValueError(f"Unknown or repeated key {part!r} in hotkey {text!r}")
+    if key_code is None:
+        raise ValueError(f"Hotkey {text!r} has no key")
+    return Chord(key_code, modifiers, text.strip().lower())
+
+
+def configured_chords() -> list:
+    """Chords from SKIBIDYSAURUS_HOTKEY (comma-separated), falling back to Cmd+Option+G."""
+    raw = (os.environ.get("SKIBIDYSAURUS_HOTKEY", "") or "").strip() or DEFAULT_CHORD
+    chords = []
+    for text in raw.split(","):
+        if not text.strip():
+            continue
+        try:
+            chords.append(parse_chord(text))
+        except ValueError as e:
+            print(f"Ignoring hotkey: {e}")
+    return chords or [parse_chord(DEFAULT_CHORD)]
+
+
+@dataclass(frozen=True)
+class KeyEvent:
+    key_code: int
+    flags: int
+    is_repeat: bool = False
+    # time.perf_counter() when the event reached this process
+    timestamp: float = 0.0
+    # False for the key-up that releases it
+    is_down: bool = True
+
+
+class HotkeyBackend:
+    """
+    Delivers key-down and key-up events to `callback(KeyEvent)` from wherever the
+    platform produces them. start() returns False when the backend can't run
+    here (wrong OS, missing permission) so the next one can be tried.
+    """
+
+    name = "base"
+
+    def start(self, callback) -> bool:
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+
+class EventTapBackend(HotkeyBackend):
+    """
+    A listen-only CGEventTap on its own CFRunLoop thread. Needs the Input
+    Monitoring (or Accessibility) permission; without it the tap can't be
+    created and start() returns False.
+    """
+
+    name = "eventtap"
+
+    def __init__(self):
+        self._thread = None
+        self._run_loop = None
+        self._tap = None
+
+    def start(self, callback) -> bool:
+        ready = threading.Event()
+        result = {"ok": False}
+        self._thread = threading.Thread(
+            target=self._run, args=(callback, ready, result), name="hotkey-eventtap", daemon=True
+        )
+        self._thread.start()
+        ready.wait(2.0)
+        return result["ok"]
+
+    def _run(self, callback, ready, result):
+        try:
+            import Quartz
+        except ImportError:
+            ready.set()
+            return
+
+        def on_event(proxy, event_type, event, refcon):
+            if event_type in (Quartz.kCGEventTapDisabledByTimeout, Quartz.kCGEventTapDisabledByUserInput):
+                # macOS disables slow taps; ours does almost nothing, so just turn it back on
+                Quartz.CGEventTapEnable(self._tap, True)
+            elif event_type in (Quartz.kCGEventKeyDown, Quartz.kCGEventKeyUp):
+                callback(KeyEvent(
+                    key_code=Quartz.CGEventGetIntegerValueField(event, Quartz.kCGKeyboardEventKeycode),
+                    flags=Quartz.CGEventGetFlags(event),
+                    is_repeat=bool(Quartz.CGEventGetIntegerValueField(event, Quartz.kCGKeyboardEventAutorepeat)),
+                    timestamp=time.perf_counter(),
+                    is_down=event_type == Quartz.kCGEventKeyDown,
+                ))
+            return event
+
+        self._tap = Quartz.CGEventTapCreate(
+            Quartz.kCGSessionEventTap,
+            Quartz.kCGHeadInsertEventTap,
+            Quartz.kCGEventTapOptionListenOnly,
+            1 << Quartz.kCGEventKeyDown | 1 << Quartz.kCGEventKeyUp,
+            on_event,
+            None,
+        )
+        if self._tap is None:
+            ready.set()
+            return
+        source = Quartz.CFMachPortCreateRunLoopSource(None, self._tap, 0)
+        self._run_loop = Quartz.CFRunLoopGetCurrent()
+        Quartz.CFRunLoopAddSource(self._run_loop, source, Quartz.kCFRunLoopCommonModes)
+        Quartz.CGEventTapEnable(self._tap, True)
+        result["ok"] = True
+        ready.set()
+        # Sleeps in the kernel until a key event arrives; no polling
+        Quartz.CFRunLoopRun()
+
+    def stop(self):
+        if self._run_loop is None:
+            return
+        import Quartz
+        Quartz.CGEventTapEnable(self._tap, False)
+        Quartz.CFRunLoopStop(self._run_loop)
+        self._run_loop = None
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+
+class NSEventBackend(HotkeyBackend):
+    """
+    NSEvent global + local monitors. These are delivered on the main thread's
+    Cocoa run loop (which Qt runs on macOS), so start() must be called there.
+    """
+
+    name = "nsevent"
+
+    def __init__(self):
+        self._monitors = []
+
+    def start(self, callback) -> bool:
+        try:
+            from AppKit import NSEvent, NSEventMaskKeyDown, NSEventMaskKeyUp, NSEventTypeKeyDown
+        except ImportError:
+            return False
+
+        def to_key_event(event):
+            return KeyEvent(
+                key_code=event.keyCode(),
+                flags=event.modifierFlags(),
+                is_repeat=bool(event.isARepeat()),
+                timestamp=time.perf_counter(),
+                is_down=event.type() == NSEventTypeKeyDown,
+            )
+
+        def on_global(event):
+            callback(to_key_event(event))
+
+        def on_local(event):
+            callback(to_key_event(event))
+            return event
+
+        mask = NSEventMaskKeyDown | NSEventMaskKeyUp
+        monitor = NSEvent.addGlobalMonitorForEventsMatchingMask_handler_(mask, on_global)
+        if monitor is None:
+            return False
+        self._monitors = [monitor, NSEvent.addLocalMonitorForEventsMatchingMask_handler_(mask, on_local)]
+        return True
+
+    def stop(self):
+        if not self._monitors:
+            return
+        from AppKit import NSEvent
+        for monitor in self._monitors:
+            if monitor is not None:
+                NSEvent.removeMonitor_(monitor)
+        self._monitors = []
+
+
+class FakeEventSource(HotkeyBackend):
+    """
+    Pure-Python backend for tests and benchmarks on any OS: press() and
+    release() deliver a synthetic key-down / key-up to the listener
+    synchronously, on the calling thread.
+    """
+
+    name = "fake"
+
+    def __init__(self):
+        self._callback = None
+
+    def start(self, callback) -> bool:
+        self._callback = callback
+        return True
+
+    def stop(self):
+        self._callback = None
+
+    def press(self, chord, is_repeat: bool = False) -> KeyEvent:
+        return self._deliver(chord, is_repeat, is_down=True)
+
+    def release(self, chord) -> KeyEvent:
+        return self._deliver(chord, False, is_down=False)
+
+    def _deliver(self, chord, is_repeat: bool, is_down: bool) -> KeyEvent:
+        if isinstance(chord, str):
+            chord = parse_chord(chord)
+        event = KeyEvent(chord.key_code, chord.modifiers, is_repeat, time.perf_counter(), is_down)
+        if self._callback is not None:
+            self._callback(event)
+        return event
+
+
+BACKENDS = {
+    "eventtap": EventTapBackend,
+    "nsevent": NSEventBackend,
+    "fake": FakeEventSource,
+}
+
+
+def backend_candidates() -> list:
+    """Backends to try in order; SKIBIDYSAURUS_HOTKEY_BACKEND pins one."""
+    pinned = (os.environ.get("SKIBIDYSAURUS_HOTKEY_BACKEND", "") or "").strip().lower()
+    if pinned in BACKENDS:
+        return [BACKENDS[pinned]()]
+    return [EventTapBackend(), NSEventBackend()]
+
+
+class HotkeyListener:
+    """
+    Event-driven global hotkeys: the backend wakes us only when a key goes
+    down or up, and matching chords call `on_trigger(chord, timestamp)` on
+    the backend's thread, once per press: a triggered chord stays held until
+    its key comes back up. Callers that touch UI should hop to their own thread
+    (e.g. via a Qt signal) and call shown(timestamp) once the overlay is up
+    so trigger-to-overlay latency can be reported.
+    """
+
+    def __init__(self, on_trigger, chords: list = None, backends: list = None):
+        self.on_trigger = on_trigger
+        self.chords = list(chords) if chords is not None else configured_chords()
+        self._candidates = list(backends) if backends is not None else backend_candidates()
+        self.backend = None
+        self._lock = threading.Lock()
+        self._latencies = []
+        # Key codes of chords that triggered and haven't been released yet
+        self._held = set()
+        self.triggers = 0
+
+    def start(self) -> bool:
+        for backend in self._candidates:
+            try:
+                if backend.start(self._on_key):
+                    self.backend = backend
+                    return True
+            except Exception as e:
+                print(f"Hotkey backend {backend.name} failed: {e}")
+        return False
+
+    def stop(self):
+        if self.backend is not None:
+            self.backend.stop()
+            self.backend = None
+        with self._lock:
+            self._held.clear()
+
+    def _on_key(self, event: KeyEvent):
+        if not event.is_down:
+            # Modifiers may already be up by now, so release by key alone
+            with self._lock:
+                self._held.discard(event.key_code)
+            return
+        # Holding the chord auto-repeats the key; only the first press counts.
+        # A missed key-up costs one press: the next one's key-up releases it.
+        if event.is_repeat:
+            return
+        for chord in self.chords:
+            if chord.matches(event.key_code, event.flags):
+                with self._lock:
+                    if event.key_code in self._held:
+                        return
+                    self._held.add(event.key_code)
+                    self.triggers += 1
+                self.on_trigger(chord, event.timestamp)
+                return
+
+    def shown(self, timestamp: float) -> float:
+        """Records trigger-to-overlay latency for a trigger at `timestamp`; returns it in ms."""
+        latency_ms = (time.perf_counter() - timestamp) * 1000
+        with self._lock:
+            self._latencies.append(latency_ms)
+            del self._latencies[:-200]
+        return latency_ms
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+        result = {"backend": self.backend.name if self.backend else None, "triggers": self.triggers}
+        if latencies:
+            result["latency_p50_ms"] = round(latencies[len(latencies) // 2], 1)
+            result["latency_p95_ms"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1)
+        return result
@@ -0,0 +1,143 @@
+import io
+import mmap
+import base64
+import hashlib
+import threading
+from core import tracing
+
+# Multiple of 3 so chunks base64-encode without padding in the middle
+BASE64_CHUNK = 3 * 64 * 1024
+
+
+class _MemoryReader(io.RawIOBase):
+    """Read-only, seekable file view over a buffer, without copying it."""
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), len(self._view) - self._pos)
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, min(offset, len(self._view)))
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+class ImagePayload:
+    """
+    One screenshot, kept as raw bytes (or a read-only memory map of the file
+    the app wrote) from capture to the provider request. Base64 is produced
+    at most once, and only for providers whose JSON wire format needs it;
+    request bodies can stream it in chunks instead of building the string.
+    """
+
+    def __init__(self, data=b"", encoded: str = None):
+        self._data = data
+        self._base64 = encoded
+        self._digest = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str) -> "ImagePayload":
+        with open(path, "rb") as f:
+            try:
+                # The mapping stays valid after the file is closed, and after
+                # it is atomically replaced by the next capture.
+                return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            except ValueError:
+                # Empty files can't be mapped
+                return cls(b"")
+
+    @classmethod
+    def from_base64(cls, encoded: str) -> "ImagePayload":
+        """Wraps an already-encoded image; it is decoded only if raw bytes are needed."""
+        return cls(None, encoded or "")
+
+    @classmethod
+    def coerce(cls, image) -> "ImagePayload":
+        if isinstance(image, ImagePayload):
+            return image
+        if isinstance(image, str):
+            return cls.from_base64(image)
+        return cls(image or b"")
+
+    @property
+    def raw(self):
+        """The image bytes as a bytes-like object (bytes or mmap); never copied."""
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    self._data = base64.b64decode(self._base64)
+        return self._data
+
+    def tobytes(self) -> bytes:
+        """A real bytes object, for APIs that insist on one. Copies mmap-backed data."""
+        raw = self.raw
+        return raw if isinstance(raw, bytes) else bytes(raw)
+
+    def open(self) -> io.RawIOBase:
+        """A fresh seekable reader over the bytes, for Pillow and multipart uploads."""
+        return _MemoryReader(memoryview(self.raw))
+
+    def head(self, n: int = 16) -> bytes:
+        if self._data is None:
+            return base64.b64decode(self._base64[:((n + 2) // 3) * 4])[:n]
+        return bytes(self._data[:n])
+
+    def __len__(self):
+        if self._data is None:
+            return len(self._base64) * 3 // 4 - self._base64[-2:].count("=")
+        return len(self._data)
+
+    def __bool__(self):
+        return bool(self._base64) if self._data is None else len(self._data) > 0
+
+    @property
+    def base64_length(self) -> int:
+        if self._base64 is not None:
+            return len(self._base64)
+        return (len(self) + 2) // 3 * 4
+
+    def base64(self) -> str:
+        """The base64 form, encoded once and cached."""
+        if self._base64 is None:
+            with self._lock:
+                if self._base64 is None:
+                    with tracing.span("base64", bytes=len(self._data)):
+                        self._base64 = base64.b64encode(self._data).decode("ascii")
+        return self._base64
+
+    def iter_base64(self, chunk_size: int = BASE64_CHUNK):
+        """Yields the base64 form as ascii byte chunks without materialising it whole."""
+        if self._base64 is not None:
+            step = chunk_size // 3 * 4
+            for start in range(0, len(self._base64), step):
+                yield self._base64[start:start + step].encode("ascii")
+            return
+        view = memoryview(self._data)
+        for start in range(0, len(view), chunk_size):
+            yield base64.b64encode(view[start:start + chunk_size])
+
+    @property
+    def fingerprint(self) -> str:
+        """sha256 of the raw bytes, computed once."""
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.raw).hexdigest() if self else ""
+        return self._digest
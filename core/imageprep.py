@@ -0,0 +1,234 @@
+import io
+import os
+import re
+import time
+from dataclasses import dataclass
+from PIL import Image
+from core import tracing
+from core.imagebuf import ImagePayload
+from llm import registry
+
+
+@dataclass(frozen=True)
+class ImageTier:
+    name: str
+    # Longest edge in pixels after downscaling
+    max_edge: int
+    # Encoder quality is lowered until the image fits in this many bytes
+    target_bytes: int
+
+
+TIERS = {
+    # llava-style local models resize to 336-672 px internally; more is wasted work
+    "low": ImageTier("low", 768, 60 * 1024),
+    # One or two 768 px Gemini tiles / Claude's ~1.15 MP sweet spot
+    "medium": ImageTier("medium", 1280, 160 * 1024),
+    "high": ImageTier("high", 2048, 400 * 1024),
+}
+
+# Local vision models whose encoders work at low resolution whatever the engine
+LOW_RES_MODEL_HINTS = ("llava", "bakllava", "moondream")
+
+# Region around the cursor for SKIBIDYSAURUS_IMAGE_CROP=cursor, in points
+CURSOR_REGION = (1200, 800)
+
+MIN_QUALITY = 35
+MAX_QUALITY = 85
+
+# Words that mean the user is asking about what's on screen
+_VISUAL_WORDS = re.compile(
+    r"\b(screen|screenshot|see|look|looking|image|picture|photo|window|page|tab|shown|showing|display|"
+    r"visible|chart|graph|diagram|ui|button|layout|error|dialog|here|above|below)\b",
+    re.IGNORECASE,
+)
+
+
+def image_mime_type(data: bytes) -> str:
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    return "image/jpeg"
+
+
+def tier_for(engine: str, model: str = "") -> ImageTier:
+    override = (os.environ.get("SKIBIDYSAURUS_IMAGE_TIER", "") or "").strip().lower()
+    if override in TIERS:
+        return TIERS[override]
+    if any(hint in (model or "").lower() for hint in LOW_RES_MODEL_HINTS):
+        return TIERS["low"]
+    capabilities = registry.capabilities(engine)
+    return TIERS[capabilities.image_tier if capabilities is not None else "medium"]
+
+
+def needs_image(prompt: str, context: str) -> bool:
+    """
+    Text-only queries skip the screenshot: with highlighted text to work on
+    and no reference to anything visual, the image only costs tokens.
+    """
+    if os.environ.get("SKIBIDYSAURUS_TEXT_ONLY_SKIP", "1") == "0":
+        return True
+    if not (context or "").strip():
+        return True
+    return bool(_VISUAL_WORDS.search(prompt or ""))
+
+
+def _main_display_points():
+    try:
+        from Quartz import CGDisplayBounds, CGMainDisplayID
+        bounds = CGDisplayBounds(CGMainDisplayID())
+        return bounds.size.width, bounds.size.height
+    except Exception:
+        return None
+
+
+def _focused_window_bounds():
+    """Bounds (x, y, w, h) in points of the frontmost normal window that isn't ours."""
+    try:
+        from Quartz import (
+            CGWindowListCopyWindowInfo,
+            kCGWindowListOptionOnScreenOnly,
+            kCGWindowListExcludeDesktopElements,
+            kCGNullWindowID,
+        )
+        windows = CGWindowListCopyWindowInfo(
+            kCGWindowListOptionOnScreenOnly | kCGWindowListExcludeDesktopElements,
+            kCGNullWindowID,
+        )
+    except Exception:
+        return None
+    ours = {os.getpid(), os.getppid()}
+    for info in windows or []:
+        # Windows come front to back; layer 0 is ordinary app windows
+        if info.get("kCGWindowLayer", 0) != 0 or info.get("kCGWindowOwnerPID") in ours:
+            continue
+        if info.get("kCGWindowOwnerName") in ("Skibidysaurus", "Python"):
+            continue
+        b = info.get("kCGWindowBounds") or {}
+        if b.get("Width", 0) < 200 or b.get("Height", 0) < 150:
+            continue
+        return b["X"], b["Y"], b["Width"], b["Height"]
+    return None
+
+
+def _cursor_region_bounds():
+    try:
+        from Quartz import CGEventCreate, CGEventGetLocation
+        location = CGEventGetLocation(CGEventCreate(None))
+    except Exception:
+        return None
+    w, h = CURSOR_REGION
+    return location.x - w / 2, location.y - h / 2, w, h
+
+
+def crop_region():
+    """Region of the main display to keep, in points, per SKIBIDYSAURUS_IMAGE_CROP."""
+    mode = (os.environ.get("SKIBIDYSAURUS_IMAGE_CROP", "") or "window").strip().lower()
+    if mode == "window":
+        return _focused_window_bounds()
+    if mode == "cursor":
+        return _cursor_region_bounds()
+    return None
+
+
+def _crop(img: Image.Image, region, display_points):
+    """
+    Crops `img` to `region` when the image is a capture of the whole main
+    display (the point-to-pixel scale agrees on both axes); otherwise the
+    coordinates can't be trusted and the image is left alone.
+    """
+    if not region or not display_points:
+        return img
+    scale_x = img.width / display_points[0]
+    scale_y = img.height / display_points[1]
+    if abs(scale_x - scale_y) > 0.02 * scale_x:
+        return img
+    x, y, w, h = region
+    box = (
+        max(0, int(x * scale_x)),
+        max(0, int(y * scale_y)),
+        min(img.width, int((x + w) * scale_x)),
+        min(img.height, int((y + h) * scale_y)),
+    )
+    if box[2] - box[0] < 64 or box[3] - box[1] < 64:
+        return img
+    return img.crop(box)
+
+
+def _encode(img: Image.Image, fmt: str, quality: int) -> bytes:
+    out = io.BytesIO()
+    if fmt == "WEBP":
+        # method=0 is the fastest WebP effort level: ~5x faster than the default
+        # and still well under JPEG's size for screen content
+        img.save(out, format="WEBP", quality=quality, method=0)
+    else:
+        img.save(out, format="JPEG", quality=quality, optimize=True)
+    return out.getvalue()
+
+
+def encode_to_target(img: Image.Image, target_bytes: int, fmt: str = "JPEG") -> bytes:
+    """Highest quality in [MIN_QUALITY, MAX_QUALITY] that fits in target_bytes (binary search)."""
+    # Screen content usually fits at full quality; one encode is the common case
+    best = _encode(img, fmt, MAX_QUALITY)
+    if len(best) <= target_bytes:
+        return best
+    low, high = MIN_QUALITY, MAX_QUALITY - 5
+    best = None
+    while low <= high:
+        quality = (low + high) // 2
+        data = _encode(img, fmt, quality)
+        if len(data) <= target_bytes:
+            best = data
+            low = quality + 5
+        else:
+            high = quality - 5
+    # Nothing fits: send the smallest we are willing to make
+    return best if best is not None else _encode(img, fmt, MIN_QUALITY)
+
+
+def prepare_image(
+    image: ImagePayload,
+    engine: str,
+    model: str = "",
+    region=None,
+    display_points=None,
+    stats: dict = None,
+) -> ImagePayload:
+    """
+    Crops, downscales and re-encodes a screenshot for `engine`/`model`.
+    Images already inside the tier's size and byte budget pass through untouched.
+    """
+    image = ImagePayload.coerce(image)
+    if not image or os.environ.get("SKIBIDYSAURUS_IMAGE_PREP", "1") == "0":
+        return image
+    start = time.perf_counter()
+    tier = tier_for(engine, model)
+    with Image.open(image.open()) as src:
+        if region is None and display_points is None:
+            region, display_points = crop_region(), _main_display_points()
+        cropped = _crop(src, region, display_points)
+        longest = max(cropped.size)
+        if cropped is src and longest <= tier.max_edge and len(image) <= tier.target_bytes:
+            result = image
+        else:
+            # Decode JPEGs at a reduced scale when that still covers the tier
+            if cropped is src and src.format == "JPEG":
+                ratio = min(1.0, tier.max_edge / longest)
+                src.draft("RGB", (int(src.width * ratio), int(src.height * ratio)))
+                cropped = src
+            img = cropped.convert("RGB")
+            if max(img.size) > tier.max_edge:
+                img.thumbnail((tier.max_edge, tier.max_edge), Image.LANCZOS)
+            # "race" sends one image to every engine, so only WebP when the engine is known to decode it
+            capabilities = registry.capabilities(engine)
+            fmt = "WEBP" if capabilities is not None and capabilities.webp else "JPEG"
+            result = ImagePayload(encode_to_target(img, tier.target_bytes, fmt))
+    tracing.record("imageprep", start, tier=tier.name, input_bytes=len(image), output_bytes=len(result))
+    if stats is not None:
+        stats.update({
+            "tier": tier.name,
+            "input_bytes": len(image),
+            "output_bytes": len(result),
+            "prep_ms": round((time.perf_counter() - start) * 1000, 1),
+        })
+    return result
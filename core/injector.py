@@ -1,23 +1,28 @@
 import subprocess
-import time
+from core.pasteboard import SystemPasteboard, wait_for_focus_elsewhere
 
 def inject_text(text: str):
     """
-    Injects text into the currently focused application by placing it 
+    Injects text into the currently focused application by placing it
     in the macOS clipboard and simulating Cmd+V.
+    Blocks for at most ~0.3 s, so call it off the GUI thread.
     """
-    # Give the OS a tiny fraction of a second to ensure focus is fully restored 
-    # to the underlying app after our PyQt window closes
-    time.sleep(0.3)
-    
-    # Put text into clipboard safely via pbcopy
-    process = subprocess.Popen(['pbcopy'], stdin=subprocess.PIPE)
-    process.communicate(input=text.encode('utf-8'))
-    
-    # Simulate Cmd+V using AppleScript
-    apple_script = '''
-    tell application "System Events"
-        keystroke "v" using {command down}
-    end tell
-    '''
-    subprocess.run(["osascript", "-e", apple_script])
+    # Wait (up to 0.3 s) for focus to return to the underlying app after our
+    # window closes, instead of always sleeping the worst case
+    wait_for_focus_elsewhere()
+
+    pasteboard = SystemPasteboard()
+    if not pasteboard.available():
+        # No PyObjC: fall back to pbcopy + AppleScript
+        process = subprocess.Popen(['pbcopy'], stdin=subprocess.PIPE)
+        process.communicate(input=text.encode('utf-8'))
+        apple_script = '''
+        tell application "System Events"
+            keystroke "v" using {command down}
+        end tell
+        '''
+        subprocess.run(["osascript", "-e", apple_script])
+        return
+
+    pasteboard.set_text(text)
+    pasteboard.send_paste()
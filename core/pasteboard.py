@@ -0,0 +1,108 @@
+import os
+import time
+import subprocess
+
+# macOS virtual key codes
+KEY_C = 8
+KEY_V = 9
+# kCGEventFlagMaskCommand
+COMMAND_FLAG = 1 << 20
+
+
+class SystemPasteboard:
+    """
+    The general NSPasteboard plus synthesized Cmd+C / Cmd+V, without
+    pbcopy/osascript subprocesses. Every method is safe to call off the Qt
+    thread; without AppKit (e.g. on Linux) they degrade to no-ops.
+    """
+
+    def __init__(self):
+        try:
+            from AppKit import NSPasteboard
+            self._pb = NSPasteboard.generalPasteboard()
+        except ImportError:
+            self._pb = None
+
+    def available(self) -> bool:
+        return self._pb is not None
+
+    def change_count(self) -> int:
+        return self._pb.changeCount() if self._pb is not None else 0
+
+    def text(self) -> str:
+        if self._pb is None:
+            return ""
+        from AppKit import NSPasteboardTypeString
+        return self._pb.stringForType_(NSPasteboardTypeString) or ""
+
+    def set_text(self, text: str):
+        if self._pb is None:
+            subprocess.run(["pbcopy"], input=text.encode("utf-8"), check=False)
+            return
+        from AppKit import NSPasteboardTypeString
+        self._pb.clearContents()
+        self._pb.setString_forType_(text, NSPasteboardTypeString)
+
+    def snapshot(self) -> list:
+        """Every item on the pasteboard with all its representations, for restore()."""
+        if self._pb is None:
+            return []
+        items = []
+        for item in self._pb.pasteboardItems() or []:
+            items.append([(kind, item.dataForType_(kind)) for kind in item.types()])
+        return items
+
+    def restore(self, snapshot: list):
+        if self._pb is None:
+            return
+        from AppKit import NSPasteboardItem
+        self._pb.clearContents()
+        if not snapshot:
+            return
+        restored = []
+        for representations in snapshot:
+            item = NSPasteboardItem.alloc().init()
+            for kind, data in representations:
+                if data is not None:
+                    item.setData_forType_(data, kind)
+            restored.append(item)
+        self._pb.writeObjects_(restored)
+
+    def _post_command(self, key_code: int):
+        from Quartz import CGEventCreateKeyboardEvent, CGEventSetFlags, CGEventPost, kCGHIDEventTap
+        # Flags are set explicitly so modifiers still held from the hotkey
+        # (e.g. Option) don't turn Cmd+C into a different shortcut
+        for down in (True, False):
+            event = CGEventCreateKeyboardEvent(None, key_code, down)
+            CGEventSetFlags(event, COMMAND_FLAG)
+            CGEventPost(kCGHIDEventTap, event)
+
+    def send_copy(self):
+        self._post_command(KEY_C)
+
+    def send_paste(self):
+        self._post_command(KEY_V)
+
+
+def frontmost_pid() -> int:
+    try:
+        from AppKit import NSWorkspace
+        app = NSWorkspace.sharedWorkspace().frontmostApplication()
+        return app.processIdentifier() if app is not None else 0
+    except ImportError:
+        return 0
+
+
+def wait_for_focus_elsewhere(timeout: float = 0.3, interval: float = 0.01) -> float:
+    """
+    Waits until another app is frontmost (our window has closed), or the
+    deadline passes. Returns the seconds waited.
+    """
+    start = time.perf_counter()
+    ours = os.getpid()
+    while time.perf_counter() - start < timeout:
+        # 0 means we can't tell (no AppKit); don't wait for nothing
+        if frontmost_pid() != ours:
+            break
+        time.sleep(interval)
+    return time.perf_counter() - start
@@ -0,0 +1,14 @@
+import os
+
+
+def app_support_dir() -> str:
+    """
+    Per-user data directory for state that should survive restarts.
+    Defaults to ~/Library/Application Support/Skibidysaurus (the installer's
+    backend home); SKIBIDYSAURUS_DATA_DIR overrides it.
+    """
+    path = (os.environ.get("SKIBIDYSAURUS_DATA_DIR", "") or "").strip()
+    if not path:
+        path = os.path.join(os.path.expanduser("~"), "Library", "Application Support", "Skibidysaurus")
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,143 @@
+import os
+import threading
+from PIL import Image, ImageChops
+from core.imagebuf import ImagePayload
+
+# dHash over a 16x16 grid: 256 bits. Only a cheap first check: two frames
+# further apart than this differ for sure, closer ones are compared pixel
+# by pixel, since a changed error message can hash identically.
+HASH_SIZE = 16
+DEFAULT_MAX_DISTANCE = 3
+# Grey levels two pixels may differ by and still count as the same (encoder noise)
+PIXEL_NOISE = 24
+# A change at most this many pixels wide, and taller than that, is a blinking
+# text caret; any other changed pixel means the screen's content changed
+CARET_WIDTH = 3
+
+
+def perceptual_hash(image: ImagePayload) -> int:
+    """
+    Difference hash of an encoded image. JPEGs are decoded at reduced scale
+    (draft mode), so hashing a full-resolution screenshot takes a few ms.
+    """
+    with Image.open(image.open()) as img:
+        img.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+        small = img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+        pixels = list(small.getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hash_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _pixels(image: ImagePayload):
+    with Image.open(image.open()) as img:
+        return img.convert("L")
+
+
+def changed_region(before, after):
+    """
+    Bounding box (left, top, right, bottom) of the pixels that differ between
+    two decoded greyscale frames beyond PIXEL_NOISE, or None if none do.
+    """
+    if before.size != after.size:
+        return (0, 0) + after.size
+    diff = ImageChops.difference(before, after).point(lambda level: 255 if level > PIXEL_NOISE else 0)
+    return diff.getbbox()
+
+
+def is_caret(region) -> bool:
+    left, top, right, bottom = region
+    return right - left <= CARET_WIDTH and bottom - top > CARET_WIDTH
+
+
+def stands_in(frame: ImagePayload, capture: ImagePayload) -> bool:
+    """Whether ScreenshotDeduper.process() returned an earlier frame with other bytes than `capture`."""
+    capture = ImagePayload.coerce(capture)
+    return frame is not capture and frame.fingerprint != capture.fingerprint
+
+
+class ScreenshotDeduper:
+    """
+    Reuses the previous screenshot when the screen has not changed (the
+    same bytes, or the same pixels but for a blinking caret), so follow-up
+    prompts send the very same ImagePayload. That skips re-encoding, keeps
+    response-cache keys stable and lets providers that support it reference
+    an earlier upload instead of resending it. A frame whose content
+    changed, however slightly, is never replaced.
+    """
+
+    def __init__(self, max_distance: int = None):
+        if max_distance is None:
+            max_distance = int(os.environ.get("SKIBIDYSAURUS_SCREEN_DEDUP_DISTANCE", "") or DEFAULT_MAX_DISTANCE)
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._last_hash = None
+        self._last_image = None
+        self._last_variant = None
+        # The last frame decoded, kept once a comparison needed it
+        self._last_pixels = None
+        self.frames = 0
+        self.reused = 0
+        self.bytes_saved = 0
+
+    def process(self, image, variant: str = "") -> ImagePayload:
+        """
+        Returns `image` (an ImagePayload or raw bytes) as an ImagePayload, or
+        the previous frame if they show the same screen. Frames prepared differently (`variant`, e.g. the target
+        engine's tier and format) are never substituted for each other.
+        """
+        image = ImagePayload.coerce(image)
+        if not image:
+            return image
+        enabled = os.environ.get("SKIBIDYSAURUS_SCREEN_DEDUP", "1") != "0"
+        try:
+            phash = perceptual_hash(image) if enabled else None
+        except Exception:
+            phash = None
+
+        with self._lock:
+            self.frames += 1
+            if (
+                phash is not None
+                and self._last_hash is not None
+                and self._last_variant == variant
+                and hash_distance(phash, self._last_hash) <= self.max_distance
+                and self._same_screen(image)
+            ):
+                self.reused += 1
+                self.bytes_saved += self._last_image.base64_length
+                return self._last_image
+            self._last_hash = phash
+            self._last_image = image
+            self._last_variant = variant
+            self._last_pixels = None
+        return image
+
+    def _same_screen(self, image: ImagePayload) -> bool:
+        if image.fingerprint == self._last_image.fingerprint:
+            return True
+        try:
+            if self._last_pixels is None:
+                self._last_pixels = _pixels(self._last_image)
+            region = changed_region(self._last_pixels, _pixels(image))
+        except Exception:
+            return False
+        return region is None or is_caret(region)
+
+    def reset(self):
+        with self._lock:
+            self._last_hash = None
+            self._last_image = None
+            self._last_variant = None
+            self._last_pixels = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"frames": self.frames, "reused": self.reused, "bytes_saved": self.bytes_saved}
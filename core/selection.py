@@ -0,0 +1,103 @@
+import time
+import asyncio
+from core.pasteboard import SystemPasteboard
+
+# How long the target app gets to answer Cmd+C before we decide nothing is selected
+COPY_DEADLINE = 0.25
+POLL_INTERVAL = 0.005
+# Per-call cap on Accessibility IPC, so a hung app can't stall the hotkey
+AX_TIMEOUT = 0.1
+
+
+def ax_selected_text():
+    """
+    The focused element's AXSelectedText, or None when Accessibility isn't
+    trusted, the app doesn't expose it, or we're not on macOS. An empty
+    string means the app answered and nothing is selected.
+    """
+    try:
+        from ApplicationServices import (
+            AXIsProcessTrusted,
+            AXUIElementCreateSystemWide,
+            AXUIElementCopyAttributeValue,
+            AXUIElementSetMessagingTimeout,
+            kAXFocusedUIElementAttribute,
+            kAXSelectedTextAttribute,
+            kAXErrorSuccess,
+        )
+    except ImportError:
+        return None
+    if not AXIsProcessTrusted():
+        return None
+    system = AXUIElementCreateSystemWide()
+    AXUIElementSetMessagingTimeout(system, AX_TIMEOUT)
+    err, focused = AXUIElementCopyAttributeValue(system, kAXFocusedUIElementAttribute, None)
+    if err != kAXErrorSuccess or focused is None:
+        return None
+    AXUIElementSetMessagingTimeout(focused, AX_TIMEOUT)
+    err, text = AXUIElementCopyAttributeValue(focused, kAXSelectedTextAttribute, None)
+    if err != kAXErrorSuccess or text is None:
+        return None
+    return str(text)
+
+
+async def copy_selection(pasteboard, deadline: float = COPY_DEADLINE, timings: dict = None) -> str:
+    """
+    Synthesizes Cmd+C and polls the pasteboard change count until the target
+    app has written to it or `deadline` passes, then puts the user's previous
+    clipboard back. Returns "" when nothing was copied (no selection).
+    """
+    timings = timings if timings is not None else {}
+    start = time.perf_counter()
+    before = pasteboard.change_count()
+    saved = await asyncio.to_thread(pasteboard.snapshot)
+    await asyncio.to_thread(pasteboard.send_copy)
+    text = ""
+    changed = False
+    while time.perf_counter() - start < deadline:
+        if pasteboard.change_count() != before:
+            changed = True
+            break
+        await asyncio.sleep(POLL_INTERVAL)
+    timings["copy_wait_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    if changed:
+        ours = pasteboard.change_count()
+        text = pasteboard.text()
+        restore_start = time.perf_counter()
+        # Only if nobody else wrote to the pasteboard after our copy
+        if pasteboard.change_count() == ours:
+            await asyncio.to_thread(pasteboard.restore, saved)
+        timings["restore_ms"] = round((time.perf_counter() - restore_start) * 1000, 1)
+    return text
+
+
+async def acquire_selection(pasteboard=None, ax_reader=ax_selected_text, deadline: float = COPY_DEADLINE, timings: dict = None) -> str:
+    """
+    The user's current selection without blocking the caller's event loop:
+    Accessibility first (no clipboard side effects), falling back to a
+    synthesized copy. `timings` receives source / ax_ms / copy_wait_ms /
+    restore_ms / text_ms.
+    """
+    timings = timings if timings is not None else {}
+    start = time.perf_counter()
+    text = None
+    if ax_reader is not None:
+        try:
+            text = await asyncio.to_thread(ax_reader)
+        except Exception:
+            text = None
+        timings["ax_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    if text is not None:
+        # An app that answers AXSelectedText with "" has no selection; waiting
+        # out the copy deadline would only confirm that
+        timings["source"] = "ax" if text else "none"
+    else:
+        pasteboard = pasteboard or SystemPasteboard()
+        if pasteboard.available():
+            text = await copy_selection(pasteboard, deadline, timings)
+            timings["source"] = "clipboard" if text else "none"
+        else:
+            text = ""
+            timings["source"] = "none"
+    timings["text_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return text or ""
@@ -0,0 +1,4 @@
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile of `samples` (0 <= pct <= 1); `samples` must not be empty."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct * (len(ordered) - 1)))))]
@@ -0,0 +1,355 @@
+import os
+import sys
+import json
+import time
+import logging
+import itertools
+import threading
+import contextvars
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from core.stats import percentile
+
+# Trace file size before it is rotated, and rotated files kept beside it
+TRACE_MAX_BYTES = 5 * 1024 * 1024
+TRACE_BACKUPS = 3
+# Durations kept per (engine, stage) for the percentiles in stats()
+STAGE_SAMPLES = 512
+# Finished spans kept in memory for the stats endpoint's /spans
+RECENT_SPANS = 256
+# Spans without an engine (startup, overlay rendering) are reported under this key
+NO_ENGINE = "app"
+
+_current = contextvars.ContextVar("skibidysaurus_span", default=None)
+_ids = itertools.count(1)
+
+
+class Span:
+    """
+    One timed stage of a request. Used as a context manager it becomes the
+    parent of spans started inside it (threads started with
+    asyncio.to_thread and tasks inherit it); start() spans are finished
+    explicitly instead. The engine is inherited from the parent.
+    """
+
+    __slots__ = ("tracer", "name", "attrs", "trace_id", "span_id", "parent_id", "engine", "wall", "start", "_token")
+
+    def __init__(self, tracer, name: str, parent, attrs: dict, start: float = None):
+        self.tracer = tracer
+        self.name = name
+        self.engine = attrs.pop("engine", None) or (parent.engine if parent is not None else None)
+        self.attrs = attrs
+        self.span_id = next(_ids)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(8).hex()
+        self.start = time.perf_counter() if start is None else start
+        self.wall = time.time() - (time.perf_counter() - self.start)
+        self._token = None
+
+    def set(self, **attrs) -> "Span":
+        self.attrs.update(attrs)
+        return self
+
+    def finish(self, end: float = None, **attrs):
+        self.attrs.update(attrs)
+        self.tracer.finish(self, time.perf_counter() if end is None else end)
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # A generator holding the span was finished from another context
+            pass
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            self.attrs.setdefault("error", exc_type.__name__)
+        self.finish()
+
+
+class _NoSpan:
+    """What span()/start() hand out while tracing is off: accepts everything, records nothing."""
+
+    engine = None
+
+    def set(self, **attrs):
+        return self
+
+    def finish(self, end: float = None, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    """
+    Collects finished spans: per (engine, stage) duration samples for
+    stats(), the most recent spans, and, with a trace file configured, one
+    JSON line per span in a size-rotated file.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._recent = deque(maxlen=RECENT_SPANS)
+        self._log = None
+        self.enabled = False
+        self.path = ""
+
+    def configure(self, path: str = ""):
+        """Turns tracing on; with `path`, spans are also appended to that JSONL file."""
+        self.enabled = True
+        if not path or path == self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUPS, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        log = logging.getLogger(f"skibidysaurus.trace.{id(self)}")
+        log.propagate = False
+        log.setLevel(logging.INFO)
+        for old in list(log.handlers):
+            log.removeHandler(old)
+            old.close()
+        log.addHandler(handler)
+        self._log = log
+        self.path = path
+
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            return NO_SPAN
+        return Span(self, name, _current.get(), attrs)
+
+    def start(self, name: str, parent=None, start: float = None, **attrs):
+        if not self.enabled:
+            return NO_SPAN
+        return Span(self, name, parent if isinstance(parent, Span) else _current.get(), attrs, start)
+
+    def finish(self, span: Span, end: float):
+        elapsed = end - span.start
+        record = {
+            "trace": span.trace_id,
+            "span": span.span_id,
+            "parent": span.parent_id,
+            "name": span.name,
+            "engine": span.engine,
+            "ts": round(span.wall, 6),
+            "ms": round(elapsed * 1000, 3),
+            **span.attrs,
+        }
+        key = (span.engine or NO_ENGINE, span.name)
+        with self._lock:
+            stage = self._stages.setdefault(key, {"count": 0, "errors": 0, "samples": deque(maxlen=STAGE_SAMPLES)})
+            stage["count"] += 1
+            if span.attrs.get("error"):
+                stage["errors"] += 1
+            stage["samples"].append(elapsed)
+            self._recent.append(record)
+        if self._log is not None:
+            self._log.info(json.dumps(record, default=str))
+
+    def stats(self) -> dict:
+        """{engine: {stage: {"count", "errors", "p50_ms", "p95_ms"}}}."""
+        with self._lock:
+            stages = {key: (stage["count"], stage["errors"], list(stage["samples"])) for key, stage in self._stages.items()}
+        out = {}
+        for (engine, name), (count, errors, samples) in sorted(stages.items()):
+            out.setdefault(engine, {})[name] = {
+                "count": count,
+                "errors": errors,
+                "p50_ms": round(percentile(samples, 0.5) * 1000, 1),
+                "p95_ms": round(percentile(samples, 0.95) * 1000, 1),
+            }
+        return out
+
+    def recent(self, limit: int = RECENT_SPANS) -> list:
+        with self._lock:
+            return list(self._recent)[-limit:]
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._recent.clear()
+
+
+def trace_path(setting: str = None) -> str:
+    """
+    Where spans are written: SKIBIDYSAURUS_TRACE=1 means traces/trace.jsonl
+    in the data directory, any other value is taken as the path; "" or 0 is
+    no file.
+    """
+    from core.paths import app_support_dir
+    setting = (os.environ.get("SKIBIDYSAURUS_TRACE", "") if setting is None else setting).strip()
+    if not setting or setting == "0":
+        return ""
+    if setting == "1":
+        return os.path.join(app_support_dir(), "traces", "trace.jsonl")
+    return setting
+
+
+tracer = Tracer()
+if trace_path():
+    tracer.configure(trace_path())
+
+
+def enabled() -> bool:
+    return tracer.enabled
+
+
+def configure(path: str = ""):
+    tracer.configure(path)
+
+
+def span(name: str, **attrs):
+    """A span for `name` that becomes the current parent inside a `with` block."""
+    return tracer.span(name, **attrs)
+
+
+def start(name: str, parent=None, start: float = None, **attrs):
+    """A span finished explicitly with .finish(); it does not become the current parent."""
+    return tracer.start(name, parent, start, **attrs)
+
+
+def record(name: str, start: float, end: float = None, **attrs):
+    """A span for work that already happened between perf_counter() `start` and `end` (default now)."""
+    tracer.start(name, None, start, **attrs).finish(end)
+
+
+def current():
+    return _current.get() or NO_SPAN
+
+
+class activate:
+    """Makes an existing span (from start()) the current parent inside a `with` block, without finishing it."""
+
+    def __init__(self, span):
+        self.span = span
+        self._token = None
+
+    def __enter__(self):
+        if isinstance(self.span, Span):
+            self._token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._token is not None:
+            _current.reset(self._token)
+
+
+def stats() -> dict:
+    return tracer.stats()
+
+
+def recent(limit: int = RECENT_SPANS) -> list:
+    return tracer.recent(limit)
+
+
+def profile_modes(value: str) -> set:
+    """"cpu", "memory" or both from --profile / SKIBIDYSAURUS_PROFILE ("1" or "all" for both)."""
+    value = (value or "").strip().lower()
+    if not value or value == "0":
+        return set()
+    if value in ("1", "all", "true"):
+        return {"cpu", "memory"}
+    return {mode.strip() for mode in value.split(",") if mode.strip() in ("cpu", "memory")}
+
+
+class Profiler:
+    """
+    Opt-in cProfile (the calling thread) and tracemalloc (every thread)
+    around a run. report() prints the hottest functions by cumulative time
+    and the largest allocation sites, and saves the raw cProfile stats for
+    snakeviz/pstats next to the trace file.
+    """
+
+    def __init__(self, modes: set):
+        self.modes = set(modes)
+        self.cpu = None
+        self.snapshot = None
+        self.peak = 0
+
+    def start(self) -> "Profiler":
+        if "memory" in self.modes:
+            import tracemalloc
+            tracemalloc.start(16)
+        if "cpu" in self.modes:
+            import cProfile
+            self.cpu = cProfile.Profile()
+            self.cpu.enable()
+        return self
+
+    def stop(self):
+        if self.cpu is not None:
+            self.cpu.disable()
+        if "memory" in self.modes:
+            import tracemalloc
+            if tracemalloc.is_tracing():
+                self.snapshot = tracemalloc.take_snapshot()
+                self.peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+    def report(self, out=None, limit: int = 25, dump_dir: str = ""):
+        out = out or sys.stderr
+        if self.cpu is not None:
+            import pstats
+            if dump_dir:
+                os.makedirs(dump_dir, exist_ok=True)
+                dump = os.path.join(dump_dir, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.pstats")
+                self.cpu.dump_stats(dump)
+                print(f"cProfile stats saved to {dump}", file=out)
+            pstats.Stats(self.cpu, stream=out).sort_stats("cumulative").print_stats(limit)
+        if self.snapshot is not None:
+            print(f"tracemalloc: peak {self.peak / 1024:.0f} KB; largest allocation sites:", file=out)
+            for stat in self.snapshot.statistics("lineno")[:limit // 2]:
+                print(f"  {stat}", file=out)
+
+
+def serve_stats(port: int, extra=None, host: str = "127.0.0.1"):
+    """
+    Serves GET /stats (per engine and stage p50/p95, plus whatever `extra()`
+    returns) and GET /spans?limit=N (recent spans) on localhost from a
+    daemon thread. Turns in-memory tracing on. Returns the server; its
+    server_address has the port when 0 was asked for.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import urlparse, parse_qs
+
+    class StatsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/stats":
+                body = {"stages": stats()}
+                if extra is not None:
+                    body.update(extra())
+            elif url.path == "/spans":
+                try:
+                    limit = int(parse_qs(url.query).get("limit", [RECENT_SPANS])[0])
+                except ValueError:
+                    limit = RECENT_SPANS
+                body = {"spans": recent(limit)}
+            else:
+                self.send_error(404)
+                return
+            data = json.dumps(body, default=str).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    tracer.enabled = True
+    server = ThreadingHTTPServer((host, port), StatsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="skibidysaurus-stats", daemon=True).start()
+    return server
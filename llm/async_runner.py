@@ -0,0 +1,34 @@
+import asyncio
+import threading
+
+
+class BackgroundLoop:
+    """
+    One asyncio event loop on one daemon thread, shared by every in-flight
+    request in the process. submit() schedules a coroutine from any thread
+    and returns a concurrent.futures.Future; cancelling that future cancels
+    the underlying task.
+    """
+
+    def __init__(self, name: str = "skibidysaurus-asyncio"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self):
+        if self.loop.is_running():
+            # Finalize async generators left mid-iteration (a stream that ended on its
+            # done event) while the loop can still run their cleanup
+            try:
+                self.submit(self.loop.shutdown_asyncgens()).result(timeout=2)
+            except Exception:
+                pass
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=2)
@@ -0,0 +1,311 @@
+import os
+import re
+import json
+import time
+import asyncio
+import itertools
+from collections import deque
+import httpx
+from tenacity import (
+    AsyncRetrying,
+    stop_after_attempt,
+    wait_random_exponential,
+    retry_if_exception,
+    retry_if_result,
+)
+from llm.race import is_error_response
+from llm.resilience import RETRY_STATUSES, CircuitOpenError
+
+# Requests in flight per engine; local models share one GPU
+DEFAULT_LIMITS = {"ollama": 2, "llamacpp": 2, "gemini": 8, "openai": 8, "claude": 4}
+# On top of the transport's own retries (llm/resilience.py), so kept low
+MAX_ATTEMPTS = 3
+# Results written before the checkpoint file is rewritten, at most
+CHECKPOINT_EVERY = 200
+CHECKPOINT_SECONDS = 1.0
+# Input lines read per hop to the reader thread
+READ_AHEAD = 256
+
+# Provider errors worth another attempt: rate limits, overload, gateway trouble, timeouts
+_RETRYABLE = re.compile(
+    r"\b(408|425|429|500|502|503|504|529)\b|rate.?limit|too many requests|overloaded|timed? ?out|temporarily|try again",
+    re.IGNORECASE,
+)
+# "Please try again in 20s", "retry after 1.5 seconds", "try again in 350ms"
+_RETRY_HINT = re.compile(r"(?:retry|try again)\s+(?:after|in)\s+(\d+(?:\.\d+)?)\s*(ms|s|sec|secs|seconds)?", re.IGNORECASE)
+
+
+def is_retryable(response) -> bool:
+    return isinstance(response, str) and is_error_response(response) and bool(_RETRYABLE.search(response))
+
+
+def is_transient(error: BaseException) -> bool:
+    """Exceptions worth another attempt: network trouble and retryable statuses, not bugs or bad input."""
+    if isinstance(error, CircuitOpenError):
+        # The engine is down; another attempt would fail the same way
+        return False
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRY_STATUSES
+    return isinstance(error, httpx.TransportError)
+
+
+def retry_hint(response) -> float:
+    """Seconds the provider asked us to wait, from its error text; 0 if it didn't say."""
+    match = _RETRY_HINT.search(response or "") if isinstance(response, str) else None
+    if not match:
+        return 0.0
+    seconds = float(match.group(1))
+    return seconds / 1000 if (match.group(2) or "").lower() == "ms" else seconds
+
+
+def parse_limits(spec: str) -> dict:
+    """'openai=4,claude=2' on top of DEFAULT_LIMITS."""
+    limits = dict(DEFAULT_LIMITS)
+    for item in (spec or "").split(","):
+        engine, _, value = item.partition("=")
+        if engine.strip() and value.strip().isdigit():
+            limits[engine.strip()] = max(1, int(value))
+    return limits
+
+
+class ProviderGate:
+    """
+    Per-engine concurrency limit plus a shared cooldown: when one request is
+    rate limited, the others for that engine hold off too instead of each
+    discovering the limit on its own.
+    """
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.cooldown_until = 0.0
+
+    def back_off(self, seconds: float):
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + seconds)
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        delay = self.cooldown_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+
+class BatchCheckpoint:
+    """
+    What a batch run has written, in O(in-flight window) memory: every input
+    index below `watermark` is done, plus the indices in `done` above it.
+    Saved next to the output file and rewritten atomically, always after the
+    output it describes has been flushed.
+    """
+
+    def __init__(self, path: str = ""):
+        self.path = path
+        self.watermark = 0
+        self.done = set()
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+
+    @classmethod
+    def resume(cls, path: str, output_path: str) -> "BatchCheckpoint":
+        """Loads the checkpoint and counts results written after it was last saved."""
+        checkpoint = cls(path)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+            checkpoint.watermark = int(saved.get("watermark", 0))
+            checkpoint.done = set(saved.get("done", []))
+        if os.path.exists(output_path):
+            _truncate_partial_line(output_path)
+            with open(output_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        index = json.loads(line).get("index")
+                    except (ValueError, AttributeError):
+                        continue
+                    if isinstance(index, int) and index >= checkpoint.watermark:
+                        checkpoint.done.add(index)
+            checkpoint._advance()
+        return checkpoint
+
+    def is_done(self, index: int) -> bool:
+        return index < self.watermark or index in self.done
+
+    def mark(self, index: int):
+        self.done.add(index)
+        self._advance()
+        self._unsaved += 1
+
+    def _advance(self):
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.watermark += 1
+
+    def due(self) -> bool:
+        return self._unsaved >= CHECKPOINT_EVERY or (self._unsaved and time.monotonic() - self._saved_at >= CHECKPOINT_SECONDS)
+
+    def save(self):
+        if not self.path:
+            return
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"watermark": self.watermark, "done": sorted(self.done)}, f)
+        os.replace(temp_path, self.path)
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+
+
+def _truncate_partial_line(path: str):
+    """Drops a result line cut off by an interrupted write, so appends start clean."""
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if not size:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        position = size
+        while position > 0:
+            step = min(65536, position)
+            f.seek(position - step)
+            block = f.read(step)
+            newline = block.rfind(b"\n")
+            if newline >= 0:
+                f.truncate(position - step + newline + 1)
+                return
+            position -= step
+        f.truncate(0)
+
+
+async def _read_lines(source):
+    """Yields (index, line) from a file object without blocking the loop on I/O."""
+    index = 0
+    while True:
+        lines = await asyncio.to_thread(lambda: list(itertools.islice(source, READ_AHEAD)))
+        if not lines:
+            return
+        for line in lines:
+            yield index, line
+            index += 1
+
+
+async def run_batch(
+    source,
+    out,
+    ask,
+    default_engine: str = "gemini",
+    ordered: bool = True,
+    limits: dict = None,
+    checkpoint: BatchCheckpoint = None,
+    max_attempts: int = MAX_ATTEMPTS,
+    window: int = None,
+) -> dict:
+    """
+    Runs every JSONL request in `source` through `ask(request) -> response`
+    and writes one JSON result line per request to `out`, in input order or
+    as each completes. Requests run concurrently up to each engine's limit;
+    rate-limited and transient failures are retried with jittered exponential
+    backoff, honouring the provider's "try again in" hint. Memory stays
+    bounded by `window` however long the input is. Returns run counters.
+    """
+    limits = limits or dict(DEFAULT_LIMITS)
+    gates = {}
+    window = window or max(16, 4 * sum(limits.values()))
+    checkpoint = checkpoint or BatchCheckpoint()
+    stats = {"written": 0, "failed": 0, "skipped": 0, "retries": 0}
+    started = time.perf_counter()
+
+    def gate_for(engine: str) -> ProviderGate:
+        if engine not in gates:
+            gates[engine] = ProviderGate(limits.get(engine, min(limits.values())))
+        return gates[engine]
+
+    async def process(index: int, line: str) -> dict:
+        start = time.perf_counter()
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict) or not request.get("prompt"):
+                raise ValueError("expected an object with a \"prompt\"")
+        except ValueError as e:
+            return {"index": index, "error": f"invalid request: {e}"}
+        engine = request.get("engine") or default_engine
+        gate = gate_for(engine)
+
+        async def call():
+            async with gate:
+                return await ask(request)
+
+        def wait(retry_state):
+            stats["retries"] += 1
+            outcome = retry_state.outcome
+            response = None if outcome.failed else outcome.result()
+            delay = max(wait_random_exponential(multiplier=0.5, max=30)(retry_state), retry_hint(response))
+            gate.back_off(delay)
+            return delay
+
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(max_attempts),
+            wait=wait,
+            retry=retry_if_exception(is_transient) | retry_if_result(is_retryable),
+            retry_error_callback=lambda retry_state: (
+                f"Error: {retry_state.outcome.exception()}" if retry_state.outcome.failed else retry_state.outcome.result()
+            ),
+        )
+        try:
+            response = await retrying(call)
+        except Exception as e:
+            # Not worth retrying; the line fails on its own without stopping the batch
+            response = f"Error: {e}"
+        result = {"index": index}
+        if "id" in request:
+            result["id"] = request["id"]
+        result["error" if is_error_response(response) else "response"] = response
+        result["attempts"] = retrying.statistics.get("attempt_number", 1)
+        result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    def emit(result: dict):
+        out.write(json.dumps(result) + "\n")
+        stats["written"] += 1
+        stats["failed"] += "error" in result
+        checkpoint.mark(result["index"])
+        if checkpoint.due():
+            out.flush()
+            checkpoint.save()
+
+    tasks, order, ready = set(), deque(), {}
+
+    async def settle():
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            tasks.discard(task)
+            result = task.result()
+            if ordered:
+                ready[result["index"]] = result
+            else:
+                emit(result)
+        while order and order[0] in ready:
+            emit(ready.pop(order.popleft()))
+
+    async for index, line in _read_lines(source):
+        if checkpoint.is_done(index):
+            stats["skipped"] += 1
+            continue
+        if not line.strip():
+            checkpoint.mark(index)
+            continue
+        while len(order if ordered else tasks) >= window:
+            await settle()
+        if ordered:
+            order.append(index)
+        tasks.add(asyncio.ensure_future(process(index, line)))
+    while tasks:
+        await settle()
+
+    out.flush()
+    checkpoint.save()
+    stats["elapsed_s"] = round(time.perf_counter() - started, 2)
+    stats["per_s"] = round(stats["written"] / max(stats["elapsed_s"], 1e-9), 1)
+    return stats
@@ -0,0 +1,244 @@
+import os
+import re
+import asyncio
+from dataclasses import dataclass, field
+from llm import registry
+from llm.race import is_error_response
+
+# Context window in tokens for "race" and engines the registry doesn't know;
+# registered engines declare theirs in their capabilities
+DEFAULT_WINDOW = 128_000
+# Model-name hints that override the engine's window (first match wins)
+MODEL_WINDOWS = (
+    ("gpt-4.1", 1_000_000),
+    ("gpt-4o", 128_000),
+    ("llava", 4096),
+    ("llama3", 8192),
+    ("qwen", 32_768),
+    ("mistral", 32_768),
+)
+# Selected text may take this share of the window; the rest is the system
+# prompt, screenshot, conversation history and the answer
+CONTEXT_SHARE = 0.5
+# Even on huge windows, more than this mostly adds cost and latency
+DEFAULT_CONTEXT_TOKENS = 24_000
+# Map-reduce never fans out wider than this; longer inputs are trimmed first,
+# which also bounds dedupe time on multi-megabyte input
+MAP_REDUCE_MAX_CHUNKS = 32
+MAP_CONCURRENCY = 4
+# Times map-reduce condenses its notes again before trimming them instead
+MAP_REDUCE_MAX_ROUNDS = 3
+# Lines shorter than this (braces, blank lines, short words) are never deduped
+DEDUPE_MIN_LINE = 20
+
+CONTEXT_MODES = ("trim", "mapreduce", "off")
+
+# Numbers, hex ids and the like; lines that differ only in these count as repeats
+_VOLATILE = re.compile(r"0x[0-9a-fA-F]+|[0-9a-fA-F]{8,}|\d+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    ~4 ASCII characters per token, one per non-ASCII character (CJK, emoji
+    and accented text tokenize much denser). Linear and allocation-light, so
+    it's fine on multi-megabyte input; good enough to enforce a budget.
+    """
+    if not text:
+        return 0
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def context_window(engine: str, model: str = "") -> int:
+    model = (model or "").lower()
+    for hint, window in MODEL_WINDOWS:
+        if hint in model:
+            return window
+    if engine == "ollama" and os.environ.get("OLLAMA_CONTEXT_LENGTH", "").isdigit():
+        return int(os.environ["OLLAMA_CONTEXT_LENGTH"])
+    capabilities = registry.capabilities(engine)
+    return capabilities.context_window if capabilities is not None else DEFAULT_WINDOW
+
+
+def context_budget(engine: str, model: str = "") -> int:
+    """Tokens of selected text one request may carry for this engine/model."""
+    configured = int(os.environ.get("SKIBIDYSAURUS_CONTEXT_TOKENS", "") or DEFAULT_CONTEXT_TOKENS)
+    return max(256, min(configured, int(context_window(engine, model) * CONTEXT_SHARE)))
+
+
+def context_mode(mode: str = "") -> str:
+    mode = (mode or os.environ.get("SKIBIDYSAURUS_CONTEXT_MODE", "") or "trim").strip().lower()
+    return mode if mode in CONTEXT_MODES else "trim"
+
+
+def _chars_for(text: str, tokens: int) -> int:
+    """Characters of `text` that hold roughly `tokens` tokens."""
+    total = estimate_tokens(text)
+    if total <= tokens:
+        return len(text)
+    return int(len(text) * tokens / total)
+
+
+def dedupe_lines(text: str) -> str:
+    """
+    Drops repeats of long lines that differ only in numbers or ids (log
+    spam, stack traces printed in a loop). The first occurrence stays in
+    place, annotated with how many similar lines were dropped.
+    """
+    lines = text.split("\n")
+    first, counts = {}, {}
+    for index, line in enumerate(lines):
+        if len(line.strip()) < DEDUPE_MIN_LINE:
+            continue
+        key = _VOLATILE.sub("#", line.strip())
+        if key in first:
+            counts[first[key]] = counts.get(first[key], 0) + 1
+        else:
+            first[key] = index
+    if not counts:
+        return text
+    keep = set(first.values())
+    out = []
+    for index, line in enumerate(lines):
+        if len(line.strip()) < DEDUPE_MIN_LINE:
+            out.append(line)
+        elif index in keep:
+            repeats = counts.get(index)
+            out.append(f"{line}  [+{repeats} similar lines]" if repeats else line)
+    return "\n".join(out)
+
+
+def trim_middle(text: str, max_tokens: int) -> str:
+    """
+    Keeps the head (two thirds of the budget) and the tail of `text`, cut at
+    line boundaries, with a marker saying how much was left out. The start
+    and the end of a selection are usually what the question is about.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    head_chars = _chars_for(text, max_tokens * 2 // 3)
+    tail_chars = _chars_for(text, max_tokens - max_tokens * 2 // 3)
+    head_end = text.rfind("\n", 0, head_chars)
+    head_end = head_end if head_end > head_chars // 2 else head_chars
+    tail_start = text.find("\n", len(text) - tail_chars)
+    tail_start = tail_start + 1 if 0 <= tail_start < len(text) - tail_chars // 2 else len(text) - tail_chars
+    omitted = text[head_end:tail_start]
+    marker = f"\n[... {omitted.count(chr(10))} lines (~{estimate_tokens(omitted)} tokens) omitted ...]\n"
+    return text[:head_end] + marker + text[tail_start:]
+
+
+def chunk_text(text: str, max_tokens: int) -> list:
+    """Splits `text` into pieces of at most ~max_tokens, preferring line breaks."""
+    max_chars = max(1, _chars_for(text, max_tokens))
+    chunks, start = [], 0
+    while start < len(text):
+        end = min(len(text), start + max_chars)
+        if end < len(text):
+            newline = text.rfind("\n", start, end)
+            if newline > start + max_chars // 2:
+                end = newline + 1
+        chunks.append(text[start:end])
+        start = end
+    return chunks
+
+
+@dataclass
+class FittedContext:
+    text: str
+    # Set instead of `text` in map-reduce mode: pieces that each fit the budget
+    chunks: list = field(default_factory=list)
+    original_tokens: int = 0
+    tokens: int = 0
+    strategy: str = "none"
+    budget: int = 0
+
+    def stats(self) -> dict:
+        return {
+            "strategy": self.strategy,
+            "original_tokens": self.original_tokens,
+            "tokens": self.tokens,
+            "chunks": len(self.chunks),
+        }
+
+
+def fit_context(context: str, engine: str, model: str = "", mode: str = "", budget: int = None) -> FittedContext:
+    """
+    Brings selected text within the engine's context budget: as-is when it
+    fits, then with repeated lines collapsed, then either trimmed to head
+    and tail ("trim") or split into budget-sized chunks for map_reduce()
+    ("mapreduce"). Mode "off" sends it untouched.
+    """
+    context = context or ""
+    tokens = estimate_tokens(context)
+    mode = context_mode(mode)
+    budget = budget or context_budget(engine, model)
+    if tokens <= budget or mode == "off":
+        return FittedContext(context, [], tokens, tokens, "none", budget)
+
+    # Bound the work on huge input: nothing past what map-reduce could use is ever looked at
+    text = trim_middle(context, budget * MAP_REDUCE_MAX_CHUNKS)
+    text = dedupe_lines(text)
+    deduped = estimate_tokens(text)
+    if deduped <= budget:
+        return FittedContext(text, [], tokens, deduped, "dedupe", budget)
+
+    if mode == "mapreduce":
+        chunks = chunk_text(text, budget)
+        return FittedContext("", chunks, tokens, estimate_tokens(text), "mapreduce", budget)
+
+    text = trim_middle(text, budget)
+    return FittedContext(text, [], tokens, estimate_tokens(text), "trim", budget)
+
+
+def map_prompt(question: str, chunk: str, part: int, parts: int) -> str:
+    return (
+        f"This is part {part} of {parts} of a longer text:\n'''\n{chunk}\n'''\n\n"
+        f"Extract everything in this part that helps with: {question}\n"
+        "Reply with concise notes only, or 'nothing relevant' if there is nothing."
+    )
+
+
+def reduce_prompt(question: str, notes: str, parts: int) -> str:
+    return (
+        f"Notes taken from {parts} parts of a long text the user selected:\n{notes}\n\n"
+        f"Using these notes, answer: {question}"
+    )
+
+
+async def map_reduce(ask, question: str, chunks: list, budget: int, concurrency: int = None) -> str:
+    """
+    Map step of map-reduce over oversized context. `ask(prompt)` is an async
+    callable returning the model's answer; chunks are processed concurrently
+    (at most `concurrency` at a time) and their notes kept in order. Notes
+    that together exceed the budget are condensed again the same way, up to
+    MAP_REDUCE_MAX_ROUNDS times, then trimmed if a round stops shrinking
+    them or they still don't fit. Returns the reduce prompt for the final,
+    streamed call.
+    """
+    concurrency = concurrency or int(os.environ.get("SKIBIDYSAURUS_MAP_CONCURRENCY", "") or MAP_CONCURRENCY)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(prompts: list) -> list:
+        async def one(prompt):
+            async with semaphore:
+                return await ask(prompt)
+        answers = await asyncio.gather(*(one(prompt) for prompt in prompts))
+        good = [answer for answer in answers if answer and not is_error_response(answer)]
+        if not good:
+            raise RuntimeError(next((answer for answer in answers if answer), "no answer for any part"))
+        return good
+
+    notes = await run([map_prompt(question, chunk, i + 1, len(chunks)) for i, chunk in enumerate(chunks)])
+    combined = "\n\n".join(f"[part {i + 1}] {note}" for i, note in enumerate(notes))
+    for _ in range(MAP_REDUCE_MAX_ROUNDS):
+        tokens = estimate_tokens(combined)
+        if tokens <= budget or len(notes) < 2:
+            break
+        pieces = chunk_text(combined, budget)
+        notes = await run([map_prompt(question, piece, i + 1, len(pieces)) for i, piece in enumerate(pieces)])
+        condensed = "\n\n".join(notes)
+        if estimate_tokens(condensed) >= tokens:
+            # The model isn't condensing (e.g. it echoes the text); more rounds won't help
+            break
+        combined = condensed
+    return reduce_prompt(question, trim_middle(combined, budget), len(chunks))
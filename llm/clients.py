@@ -1,263 +1,450 @@
 import os
-import requests
-from google import genai
-from google.genai import types
+import queue
+import asyncio
+import importlib
+import threading
 from dotenv import load_dotenv
+from llm.transport import ProviderTransport
+from llm.race import LatencyHistory, astream_race, race_config, is_error_response
+from llm.uploads import ImageUploads
+from llm.budget import map_reduce
+from llm.registry import PROVIDERS, default_model
+from llm.middleware import ProviderCall, TraceStage, MetricsStage, TransformStage, SessionStage, EncodingStage, CacheStage
+from core.imagebuf import ImagePayload
 
 # Load API Key from .env
 load_dotenv()
 
+SYSTEM_PROMPT = (
+    "You are Skibidysaurus, a sophisticated AI assistant seamlessly integrated into the user's environment. "
+    "You are provided with a screenshot of the user's current screen and their query. "
+    "Always provide a beautifully written, highly professional, and perfectly phrased answer. "
+    "Keep your output extremely clean, well-structured, and concise. "
+    "Format your responses using Markdown (bullet points, bold text, code blocks) to make them highly readable. "
+    "If they ask for a rewrite or code, provide the exact snippet directly."
+)
+
+
+
 class LLMManager:
-    def __init__(self):
-        self.gemini_client = None
-        self._init_gemini_client_if_available()
+    def __init__(self, transport: ProviderTransport = None):
+        self.transport = transport or ProviderTransport()
+        self.providers = {}
+        self._providers_lock = threading.Lock()
+        self.race_engines, self.race_mode = race_config()
+        self.latency_history = None
+        self.response_cache = None
+        self.prompt_history = None
+        self.image_uploads = ImageUploads()
+        self.background_loop = None
+        self.metrics = MetricsStage()
+        self.transforms = TransformStage(self.metrics)
+        # Every engine's requests pass through these, in order (see llm/middleware.py)
+        self.middleware = [TraceStage(), self.metrics, self.transforms, SessionStage(), EncodingStage(), CacheStage(self, SYSTEM_PROMPT)]
+
+    def provider(self, engine: str):
+        """The Provider for `engine`, importing its module on first use."""
+        provider = self.providers.get(engine)
+        if provider is not None:
+            return provider
+        # Import outside the lock: loading one SDK must not stall another engine.
+        module_name, _, class_name = PROVIDERS[engine].target.partition(":")
+        provider_class = getattr(importlib.import_module(module_name), class_name)
+        with self._providers_lock:
+            if engine not in self.providers:
+                self.providers[engine] = provider_class(self)
+            return self.providers[engine]
 
     def refresh_config(self):
-        """Re-initializes the Gemini client if the API key environment variable changed"""
-        self._init_gemini_client_if_available()
+        """Re-reads API keys and race settings after the environment changed"""
+        for provider in list(self.providers.values()):
+            provider.refresh()
+        self.race_engines, self.race_mode = race_config()
+        # File references belong to the account that uploaded them.
+        self.image_uploads.forget()
 
-    def _init_gemini_client_if_available(self):
-        api_key = (os.environ.get("GEMINI_API_KEY", "") or "").strip()
-        if not api_key:
-            self.gemini_client = None
+    def warm_up(self, engine: str, ollama_model: str = "", openai_model: str = "", claude_model: str = ""):
+        """
+        Pre-opens the pooled connection for `engine` in the background, so the
+        first prompt after the engine is selected skips the TCP/TLS handshake,
+        then lets the provider warm up the model itself (Ollama loads it).
+        """
+        if engine == "race":
+            return [self.warm_up(e, ollama_model, openai_model, claude_model) for e in self.race_engines]
+        if engine not in PROVIDERS:
+            return None
+        model = self._model_for(engine, ollama_model, openai_model, claude_model)
+
+        def _warm():
+            # Importing the provider (and its SDK) here keeps it off the first prompt too.
+            provider = self.provider(engine)
+            self.transport.warm(engine, provider.warm_url(), background=False)
+            provider.warm(model)
+
+        thread = threading.Thread(target=_warm, name=f"warm-{engine}", daemon=True)
+        thread.start()
+        return thread
+
+    async def awarm_up(self, engine: str, ollama_model: str = "", openai_model: str = "", claude_model: str = ""):
+        """warm_up() on the running loop: imports the provider off-loop and opens an async pooled connection."""
+        if engine == "race":
+            await asyncio.gather(*(self.awarm_up(e, ollama_model, openai_model, claude_model) for e in self.race_engines))
             return
-        self.gemini_client = genai.Client(api_key=api_key)
+        if engine not in PROVIDERS:
+            return
+        provider = self.providers.get(engine) or await asyncio.to_thread(self.provider, engine)
+        await self.transport.awarm(engine, provider.warm_url())
+        await provider.awarm(self._model_for(engine, ollama_model, openai_model, claude_model))
+
+    def close(self):
+        for provider in list(self.providers.values()):
+            provider.close()
+        self.transport.close()
+        if self.response_cache is not None:
+            self.response_cache.close()
+            self.response_cache = None
+        if self.prompt_history is not None:
+            self.prompt_history.close()
+            self.prompt_history = None
+        if self.background_loop is not None:
+            self.background_loop.stop()
+            self.background_loop = None
+
+    def _iterate_async(self, agen):
+        """
+        Drives an async generator on the manager's background loop and yields
+        its items here, so sync callers share the loop's connection pools.
+        """
+        if self.background_loop is None:
+            from llm.async_runner import BackgroundLoop
+            self.background_loop = BackgroundLoop(name="skibidysaurus-llm")
+        items = queue.Queue()
+        done = object()
+
+        async def _pump():
+            try:
+                async for item in agen:
+                    items.put(item)
+            except Exception as e:
+                items.put(e)
+            finally:
+                items.put(done)
+
+        future = self.background_loop.submit(_pump())
+        try:
+            while True:
+                item = items.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    def _astream_race(self, system_prompt: str, prompt: str, image: ImagePayload, ollama_model: str, openai_model: str, claude_model: str, session=None):
+        if self.latency_history is None:
+            self.latency_history = LatencyHistory()
+
+        async def _stream_engine(engine: str):
+            provider = self.providers.get(engine) or await asyncio.to_thread(self.provider, engine)
+            model = self._model_for(engine, ollama_model, openai_model, claude_model)
+            async for delta in provider.astream(system_prompt, prompt, image, model, session=session):
+                yield delta
+
+        return astream_race(_stream_engine, self.race_engines, self.race_mode, self.latency_history)
+
+    def _begin(self, prompt: str, image: ImagePayload, engine: str, ollama_model: str, openai_model: str, claude_model: str, use_cache: bool, session, transforms: bool = True):
+        """
+        Runs the middleware stages' before() for a request. Returns the call
+        and, when a stage answered it (a local transform, a cache hit), that response.
+        """
+        call = ProviderCall(
+            engine,
+            self._model_for(engine, ollama_model, openai_model, claude_model),
+            prompt,
+            ImagePayload.coerce(image),
+            SYSTEM_PROMPT,
+            session,
+            use_cache,
+            transforms=transforms,
+        )
+        for stage in self.middleware:
+            call.stages.append(stage)
+            response = stage.before(call)
+            if response is not None:
+                return call, response
+        return call, None
+
+    def _finish(self, call: ProviderCall, response: str) -> str:
+        for stage in reversed(call.stages):
+            stage.after(call, response)
+        return response
+
+    def local_response(self, prompt: str, context: str = "", engine: str = "gemini", session=None):
+        """
+        The local transform's answer to `prompt` about the selected text
+        `context`, checked before the context is fitted to the engine or a
+        screenshot taken, or None. Counted like a transform hit in the pipeline.
+        """
+        call = ProviderCall(engine, "", prompt, ImagePayload(), SYSTEM_PROMPT, session, use_cache=False)
+        response = self.transforms.answer(call, context)
+        if response is None:
+            return None
+        self.transforms.after(call, response)
+        self.metrics.after(call, response)
+        return response
+
+    def end_session(self, session):
+        """Drops provider-side state (cached prefixes) held for a finished conversation."""
+        for provider in list(self.providers.values()):
+            provider.end_session(session)
 
     def get_response(
         self,
         prompt: str,
-        base64_image: str,
+        image: ImagePayload,
         engine: str = "gemini",
-        ollama_model: str = "llava:latest",
-        openai_model: str = "gpt-4.1-mini",
-        claude_model: str = "claude-3-5-haiku-latest",
+        ollama_model: str = "",
+        openai_model: str = "",
+        claude_model: str = "",
+        use_cache: bool = True,
+        session=None,
+        transforms: bool = True,
     ) -> str:
         """
         Sends the user prompt and screen context to the selected AI engine.
-        Returns the typed-out response.
+        Returns the typed-out response. `image` is an ImagePayload, or a base64
+        string for callers that already have one. With a ConversationSession
+        the earlier turns are sent too and this exchange is appended to it.
         """
-        system_prompt = (
-            "You are Skibidysaurus, a sophisticated AI assistant seamlessly integrated into the user's environment. "
-            "You are provided with a screenshot of the user's current screen and their query. "
-            "Always provide a beautifully written, highly professional, and perfectly phrased answer. "
-            "Keep your output extremely clean, well-structured, and concise. "
-            "Format your responses using Markdown (bullet points, bold text, code blocks) to make them highly readable. "
-            "If they ask for a rewrite or code, provide the exact snippet directly."
-        )
+        if engine not in PROVIDERS and engine != "race":
+            return "Error: Unknown AI engine selected."
+        call, cached = self._begin(prompt, image, engine, ollama_model, openai_model, claude_model, use_cache, session, transforms)
+        if cached is not None:
+            return self._finish(call, cached)
 
-        if engine == "gemini":
-            return self._call_gemini(system_prompt, prompt, base64_image)
-        elif engine == "ollama":
-            return self._call_ollama(system_prompt, prompt, base64_image, ollama_model)
-        elif engine == "openai":
-            return self._call_openai(system_prompt, prompt, base64_image, openai_model)
-        elif engine == "claude":
-            return self._call_claude(system_prompt, prompt, base64_image, claude_model)
+        if engine == "race":
+            response = "".join(self._iterate_async(
+                self._astream_race(call.system_prompt, prompt, call.image, ollama_model, openai_model, claude_model, session)
+            )).strip()
         else:
-            return "Error: Unknown AI engine selected."
+            response = self.provider(engine).call(call.system_prompt, prompt, call.image, call.model, session=session)
+        return self._finish(call, response)
 
-    def _call_gemini(self, system_prompt: str, user_prompt: str, base64_image: str) -> str:
-        try:
-            if self.gemini_client is None:
-                self._init_gemini_client_if_available()
-            if self.gemini_client is None:
-                return "Gemini Error: missing API key. Add it in Settings."
-
-            import base64
-            # Google GenAI SDK expects raw bytes for image Part
-            image_bytes = base64.b64decode(base64_image)
-            response = self.gemini_client.models.generate_content(
-                model='gemini-2.5-flash',
-                contents=[
-                    types.Part.from_bytes(data=image_bytes, mime_type='image/jpeg'),
-                    user_prompt
-                ],
-                config=types.GenerateContentConfig(
-                    system_instruction=system_prompt,
-                    temperature=0.4, # keep it somewhat strict to prompt
-                )
-            )
-            response_text = response.text.strip()
-            # print(f"[DEBUG] Gemini responded with {len(response_text)} chars: {response_text[:50]}")
-            return response_text
-        except Exception as e:
-            # print(f"[ERROR] Gemini API failed: {e}")
-            return f"Gemini Error: {str(e)}"
-
-    def _call_ollama(self, system_prompt: str, user_prompt: str, base64_image: str, ollama_model: str) -> str:
-        generate_url = "http://localhost:11434/api/generate"
-        tags_url = "http://localhost:11434/api/tags"
-        model_name = (ollama_model or "").strip() or "llava:latest"
-        base_payload = {
-            "model": model_name,
-            "system": system_prompt,
-            "prompt": user_prompt,
-            "stream": False
-        }
-
-        with_image_payload = dict(base_payload)
-        if base64_image:
-            with_image_payload["images"] = [base64_image]
-
-        text_only_payload = dict(base_payload)
-
-        def _installed_models() -> list[str]:
-            try:
-                tags_res = requests.get(tags_url, timeout=8)
-                tags_res.raise_for_status()
-                data = tags_res.json()
-                models = data.get("models", [])
-                return [m.get("name", "") for m in models if m.get("name")]
-            except Exception:
-                return []
-
-        def _post_generate(payload: dict) -> str:
-            res = requests.post(generate_url, json=payload, timeout=120)
-            res.raise_for_status()
-            data = res.json()
-            response = data.get("response", "").strip()
-            if not response:
-                return f"Ollama Error: model '{model_name}' returned an empty response."
-            return response
-
-        def _is_image_not_supported_error(err: requests.exceptions.HTTPError) -> bool:
-            body = ""
-            if err.response is not None:
-                try:
-                    parsed = err.response.json()
-                    body = str(parsed.get("error", ""))
-                except Exception:
-                    body = err.response.text or ""
-            body = body.lower()
-            return (
-                "does not support images" in body
-                or "image input is not supported" in body
-                or "vision" in body and "not support" in body
+    def stream_response(
+        self,
+        prompt: str,
+        image: ImagePayload,
+        engine: str = "gemini",
+        ollama_model: str = "",
+        openai_model: str = "",
+        claude_model: str = "",
+        use_cache: bool = True,
+        session=None,
+        transforms: bool = True,
+    ):
+        """
+        Same as get_response, but yields text deltas as the engine produces them.
+        Errors are yielded as a single "X Error: ..." chunk, like get_response returns them.
+        """
+        if engine not in PROVIDERS and engine != "race":
+            yield "Error: Unknown AI engine selected."
+            return
+        call, cached = self._begin(prompt, image, engine, ollama_model, openai_model, claude_model, use_cache, session, transforms)
+        if cached is not None:
+            yield self._finish(call, cached)
+            return
+
+        if engine == "race":
+            stream = self._iterate_async(
+                self._astream_race(call.system_prompt, prompt, call.image, ollama_model, openai_model, claude_model, session)
             )
+        else:
+            stream = self.provider(engine).stream(call.system_prompt, prompt, call.image, call.model, session=session)
 
-        try:
-            if "images" in with_image_payload:
-                try:
-                    return _post_generate(with_image_payload)
-                except requests.exceptions.HTTPError as e:
-                    # Common failure path: text-only local models cannot handle image fields.
-                    if _is_image_not_supported_error(e):
-                        fallback = _post_generate(text_only_payload)
-                        return (
-                            fallback
-                            + "\n\n_note: your selected ollama model is text-only, so screen image context was skipped._"
-                        )
-                    raise
-            return _post_generate(text_only_payload)
-        except requests.exceptions.ConnectionError:
-            return "Ollama Error: Could not connect to local Ollama instance at http://localhost:11434. Start Ollama first."
-        except requests.exceptions.HTTPError as e:
-            installed = _installed_models()
-            installed_hint = f" Installed models: {', '.join(installed)}." if installed else ""
-            return (
-                f"Ollama Error: {e}. Make sure model '{model_name}' exists "
-                f"(try: ollama pull {model_name}).{installed_hint}"
+        parts = []
+        for delta in stream:
+            call.first_token()
+            parts.append(delta)
+            yield delta
+        self._finish(call, "".join(parts).strip())
+
+    async def astream_response(
+        self,
+        prompt: str,
+        image: ImagePayload,
+        engine: str = "gemini",
+        ollama_model: str = "",
+        openai_model: str = "",
+        claude_model: str = "",
+        use_cache: bool = True,
+        session=None,
+        transforms: bool = True,
+    ):
+        """
+        Async variant of stream_response on pooled httpx.AsyncClient connections.
+        Cancelling the consuming task closes the provider connection mid-stream,
+        so a superseded query stops generating tokens.
+        """
+        if engine not in PROVIDERS and engine != "race":
+            yield "Error: Unknown AI engine selected."
+            return
+        call, cached = self._begin(prompt, image, engine, ollama_model, openai_model, claude_model, use_cache, session, transforms)
+        if cached is not None:
+            yield self._finish(call, cached)
+            return
+
+        if engine == "race":
+            stream = self._astream_race(call.system_prompt, prompt, call.image, ollama_model, openai_model, claude_model, session)
+        else:
+            # Importing a provider the first time blocks; keep that off the loop.
+            provider = self.providers.get(engine) or await asyncio.to_thread(self.provider, engine)
+            stream = provider.astream(call.system_prompt, prompt, call.image, call.model, session=session)
+
+        parts = []
+        async for delta in stream:
+            call.first_token()
+            parts.append(delta)
+            yield delta
+        self._finish(call, "".join(parts).strip())
+
+    async def aget_response(
+        self,
+        prompt: str,
+        image: ImagePayload,
+        engine: str = "gemini",
+        ollama_model: str = "",
+        openai_model: str = "",
+        claude_model: str = "",
+        use_cache: bool = True,
+        session=None,
+        transforms: bool = True,
+    ) -> str:
+        """
+        Async variant of get_response. Many calls can share one event loop.
+        """
+        parts = []
+        async for delta in self.astream_response(
+            prompt,
+            image,
+            engine=engine,
+            ollama_model=ollama_model,
+            openai_model=openai_model,
+            claude_model=claude_model,
+            use_cache=use_cache,
+            session=session,
+            transforms=transforms,
+        ):
+            parts.append(delta)
+        return "".join(parts).strip()
+
+    async def astream_map_reduce(
+        self,
+        prompt: str,
+        chunks: list,
+        image: ImagePayload,
+        budget: int,
+        engine: str = "gemini",
+        ollama_model: str = "",
+        openai_model: str = "",
+        claude_model: str = "",
+        use_cache: bool = True,
+        session=None,
+    ):
+        """
+        Answers `prompt` about context too large for one request: each chunk
+        is summarized against the prompt concurrently (text only), then the
+        merged notes and the screenshot go to a final, streamed request.
+        """
+        async def ask(text):
+            return await self.aget_response(
+                text,
+                ImagePayload(),
+                engine=engine,
+                ollama_model=ollama_model,
+                openai_model=openai_model,
+                claude_model=claude_model,
+                use_cache=use_cache,
+                transforms=False,
             )
-        except Exception as e:
-            return f"Ollama Error: {str(e)}"
-
-    def _call_openai(self, system_prompt: str, user_prompt: str, base64_image: str, openai_model: str) -> str:
-        api_key = (os.environ.get("OPENAI_API_KEY", "") or "").strip()
-        if not api_key:
-            return "OpenAI Error: missing API key. Add it in Settings."
-
-        model_name = (openai_model or "").strip() or "gpt-4.1-mini"
-        url = "https://api.openai.com/v1/responses"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        }
-
-        content = [{"type": "input_text", "text": user_prompt}]
-        if base64_image:
-            content.append({
-                "type": "input_image",
-                "image_url": f"data:image/jpeg;base64,{base64_image}"
-            })
-
-        payload = {
-            "model": model_name,
-            "input": [{
-                "role": "user",
-                "content": content
-            }],
-            "instructions": system_prompt,
-            "temperature": 0.4,
-        }
 
-        try:
-            res = requests.post(url, headers=headers, json=payload, timeout=120)
-            res.raise_for_status()
-            data = res.json()
-            response = (data.get("output_text") or "").strip()
-            if not response:
-                return f"OpenAI Error: model '{model_name}' returned an empty response."
-            return response
-        except requests.exceptions.HTTPError as e:
-            detail = ""
-            if e.response is not None:
-                try:
-                    detail = str(e.response.json())
-                except Exception:
-                    detail = e.response.text or ""
-            return f"OpenAI Error: {e}. {detail}".strip()
-        except Exception as e:
-            return f"OpenAI Error: {str(e)}"
-
-    def _call_claude(self, system_prompt: str, user_prompt: str, base64_image: str, claude_model: str) -> str:
-        api_key = (os.environ.get("ANTHROPIC_API_KEY", "") or "").strip()
-        if not api_key:
-            return "Claude Error: missing API key. Add it in Settings."
-
-        model_name = (claude_model or "").strip() or "claude-3-5-haiku-latest"
-        url = "https://api.anthropic.com/v1/messages"
-        headers = {
-            "x-api-key": api_key,
-            "anthropic-version": "2023-06-01",
-            "content-type": "application/json",
-        }
-
-        content = [{"type": "text", "text": user_prompt}]
-        if base64_image:
-            content.insert(0, {
-                "type": "image",
-                "source": {
-                    "type": "base64",
-                    "media_type": "image/jpeg",
-                    "data": base64_image,
-                },
-            })
-
-        payload = {
-            "model": model_name,
-            "max_tokens": 1200,
-            "temperature": 0.4,
-            "system": system_prompt,
-            "messages": [{"role": "user", "content": content}],
-        }
+        final_prompt = await map_reduce(ask, prompt, chunks, budget)
+        async for delta in self.astream_response(
+            final_prompt,
+            image,
+            engine=engine,
+            ollama_model=ollama_model,
+            openai_model=openai_model,
+            claude_model=claude_model,
+            use_cache=use_cache,
+            session=session,
+            # The notes stand in for a selection too large to transform whole
+            transforms=False,
+        ):
+            yield delta
 
-        try:
-            res = requests.post(url, headers=headers, json=payload, timeout=120)
-            res.raise_for_status()
-            data = res.json()
-            blocks = data.get("content", [])
-            texts = [b.get("text", "") for b in blocks if b.get("type") == "text" and b.get("text")]
-            response = "\n".join(texts).strip()
-            if not response:
-                return f"Claude Error: model '{model_name}' returned an empty response."
-            return response
-        except requests.exceptions.HTTPError as e:
-            detail = ""
-            if e.response is not None:
-                try:
-                    detail = str(e.response.json())
-                except Exception:
-                    detail = e.response.text or ""
-            return f"Claude Error: {e}. {detail}".strip()
-        except Exception as e:
-            return f"Claude Error: {str(e)}"
+    def stream_map_reduce(self, prompt: str, chunks: list, image: ImagePayload, budget: int, **kwargs):
+        """Sync variant of astream_map_reduce, driven on the manager's background loop."""
+        return self._iterate_async(self.astream_map_reduce(prompt, chunks, image, budget, **kwargs))
+
+    # -- Models, cache and stats ---------------------------------------------
+
+    def _model_for(self, engine: str, ollama_model: str, openai_model: str, claude_model: str) -> str:
+        if engine == "race":
+            models = [self._model_for(e, ollama_model, openai_model, claude_model) for e in self.race_engines]
+            return ",".join(models)
+        if engine == "gemini":
+            # The Gemini provider always uses its default model
+            return default_model(engine)
+        chosen = {"ollama": ollama_model, "openai": openai_model, "claude": claude_model}.get(engine)
+        return (chosen or "").strip() or default_model(engine)
+
+    def cache(self):
+        """The on-disk response cache, opened on first use."""
+        if self.response_cache is None:
+            from llm.cache import ResponseCache
+            self.response_cache = ResponseCache()
+        return self.response_cache
+
+    def history(self):
+        """The searchable prompt history, opened on first use."""
+        if self.prompt_history is None:
+            from llm.history import PromptHistory
+            self.prompt_history = PromptHistory()
+        return self.prompt_history
+
+    def record_history(
+        self,
+        prompt: str,
+        response: str,
+        engine: str,
+        model: str = "",
+        latency_ms: float = None,
+        ttft_ms: float = None,
+        source: str = "",
+    ):
+        """Appends a finished exchange to the history; errors are left out, as is everything with SKIBIDYSAURUS_HISTORY=0."""
+        if os.environ.get("SKIBIDYSAURUS_HISTORY", "1") == "0" or not prompt or not response or is_error_response(response):
+            return None
+        return self.history().add(prompt, response, engine=engine, model=model, latency_ms=latency_ms, ttft_ms=ttft_ms, source=source)
+
+    def resilience_stats(self) -> dict:
+        """Retry, circuit breaker and concurrency-limit counters per provider."""
+        return self.transport.resilience.stats()
+
+    def transform_stats(self) -> dict:
+        """Requests checked and answered by the local transforms, with the engine time they saved."""
+        return self.transforms.stats()
+
+    def provider_stats(self) -> dict:
+        """Requests, errors, cache hits and latency percentiles per engine, from the metrics stage."""
+        return self.metrics.stats()
+
+    def cache_stats(self) -> dict:
+        if os.environ.get("SKIBIDYSAURUS_CACHE", "1") == "0":
+            return {"enabled": False}
+        return {"enabled": True, **self.cache().stats()}
+
+    def image_stats(self) -> dict:
+        return self.image_uploads.stats()
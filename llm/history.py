@@ -0,0 +1,193 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+from core.paths import app_support_dir
+
+# Entries per page when the caller doesn't say
+DEFAULT_PAGE_SIZE = 50
+# Characters of the response returned with each listed entry; get() has the whole text
+PREVIEW_CHARS = 300
+
+_COLUMNS = "e.id, e.created_at, e.engine, e.model, e.prompt, substr(e.response, 1, ?), e.latency_ms, e.ttft_ms, e.source"
+_FIELDS = ("id", "created_at", "engine", "model", "prompt", "preview", "latency_ms", "ttft_ms", "source")
+# `before` for the first page: above any rowid
+_NEWEST = 2 ** 63 - 1
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def match_query(text: str, prefix: bool = True, field: str = "") -> str:
+    """
+    An FTS5 query for what the user typed: every word must appear, the last
+    one as a prefix while it may still be half typed. Quoting each word
+    keeps FTS5 operators and punctuation in the input from being parsed.
+    """
+    terms = [f'"{term}"' for term in _TERM.findall(text)]
+    if not terms:
+        return ""
+    if prefix and not text[-1:].isspace():
+        terms[-1] += "*"
+    query = " ".join(terms)
+    return f"{field} : ({query})" if field else query
+
+
+class PromptHistory:
+    """
+    Every prompt and response, append-only in SQLite with an FTS5 index
+    over both. Listing and search page backwards by id (newest first) with
+    a `before` cursor, so a page costs the same at entry 100 000 as at the
+    first, and only previews of the responses are returned.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(app_support_dir(), "history.sqlite3")
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " id INTEGER PRIMARY KEY, created_at REAL NOT NULL, engine TEXT, model TEXT,"
+            " prompt TEXT NOT NULL, response TEXT NOT NULL, latency_ms REAL, ttft_ms REAL, source TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_engine ON entries(engine, id)")
+        # External-content index: the text is stored once, in entries
+        self._db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5("
+            " prompt, response, content='entries', content_rowid='id', prefix='2 3')"
+        )
+        self._db.execute(
+            "CREATE TRIGGER IF NOT EXISTS entries_indexed AFTER INSERT ON entries BEGIN"
+            " INSERT INTO entries_fts(rowid, prompt, response) VALUES (new.id, new.prompt, new.response);"
+            " END"
+        )
+
+    def add(
+        self,
+        prompt: str,
+        response: str,
+        engine: str = "",
+        model: str = "",
+        latency_ms: float = None,
+        ttft_ms: float = None,
+        source: str = "",
+        created_at: float = None,
+    ) -> int:
+        """Appends one exchange and returns its id."""
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO entries(created_at, engine, model, prompt, response, latency_ms, ttft_ms, source) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (created_at or time.time(), engine, model, prompt, response, latency_ms, ttft_ms, source),
+            )
+            return cursor.lastrowid
+
+    def import_entries(self, entries) -> int:
+        """
+        Appends many entries ({"prompt", "response", ...} with add()'s
+        keyword names) in one transaction, oldest first. Returns how many.
+        """
+        rows = [
+            (
+                entry.get("created_at") or time.time(),
+                entry.get("engine") or "",
+                entry.get("model") or "",
+                entry["prompt"],
+                entry["response"],
+                entry.get("latency_ms"),
+                entry.get("ttft_ms"),
+                entry.get("source") or "import",
+            )
+            for entry in entries
+            if entry.get("prompt") and entry.get("response")
+        ]
+        rows.sort(key=lambda row: row[0])
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT INTO entries(created_at, engine, model, prompt, response, latency_ms, ttft_ms, source) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+        return len(rows)
+
+    def _page(self, sql: str, params: list, limit: int) -> dict:
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        entries = [dict(zip(_FIELDS + ("snippet",), row)) for row in rows]
+        return {"entries": entries, "next": entries[-1]["id"] if len(entries) == limit else None}
+
+    def page(self, limit: int = DEFAULT_PAGE_SIZE, before: int = None, engine: str = "") -> dict:
+        """
+        Newest entries first: {"entries": [...], "next": id}. Pass "next" back
+        as `before` for the following page; it is None on the last one.
+        """
+        sql = f"SELECT {_COLUMNS} FROM entries e WHERE e.id < ?"
+        params = [PREVIEW_CHARS, _NEWEST if before is None else before]
+        if engine:
+            sql += " AND e.engine = ?"
+            params.append(engine)
+        sql += " ORDER BY e.id DESC LIMIT ?"
+        return self._page(sql, params + [limit], limit)
+
+    def search(
+        self,
+        text: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        before: int = None,
+        engine: str = "",
+        field: str = "",
+        prefix: bool = True,
+    ) -> dict:
+        """
+        Entries whose prompt or response (or just `field`) has every word of
+        `text`, newest first and paged like page(), each with a highlighted
+        "snippet" of the match.
+        """
+        query = match_query(text, prefix, field)
+        if not query:
+            return self.page(limit, before, engine)
+        sql = (
+            f"SELECT {_COLUMNS}, snippet(entries_fts, -1, '[', ']', '…', 12) "
+            "FROM entries_fts JOIN entries e ON e.id = entries_fts.rowid "
+            "WHERE entries_fts MATCH ? AND entries_fts.rowid < ?"
+        )
+        params = [PREVIEW_CHARS, query, _NEWEST if before is None else before]
+        if engine:
+            sql += " AND e.engine = ?"
+            params.append(engine)
+        sql += " ORDER BY entries_fts.rowid DESC LIMIT ?"
+        return self._page(sql, params + [limit], limit)
+
+    def get(self, entry_id: int):
+        """One entry with its full response, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, created_at, engine, model, prompt, response, latency_ms, ttft_ms, source FROM entries WHERE id = ?",
+                (entry_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("id", "created_at", "engine", "model", "prompt", "response", "latency_ms", "ttft_ms", "source"), row))
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, oldest, newest = self._db.execute("SELECT COUNT(*), MIN(created_at), MAX(created_at) FROM entries").fetchone()
+            pages = self._db.execute("PRAGMA page_count").fetchone()[0]
+            page_size = self._db.execute("PRAGMA page_size").fetchone()[0]
+        return {"entries": entries, "oldest": oldest, "newest": newest, "bytes": pages * page_size}
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("INSERT INTO entries_fts(entries_fts) VALUES ('delete-all')")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
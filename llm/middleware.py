@@ -0,0 +1,277 @@
+import os
+import time
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from core import tracing
+from core.stats import percentile
+from core.imagebuf import ImagePayload
+from llm import registry
+from llm.race import is_error_response
+
+# Latency samples kept per engine for the percentiles in MetricsStage.stats()
+METRICS_SAMPLES = 512
+
+
+@dataclass
+class ProviderCall:
+    """One request on its way through the middleware stages to a provider."""
+
+    engine: str
+    model: str
+    prompt: str
+    image: ImagePayload
+    system_prompt: str
+    session: object = None
+    use_cache: bool = True
+    cache_key: str = None
+    cached: bool = False
+    # Whether llm/transforms.py may answer it, and the transform that did
+    transforms: bool = True
+    transform: str = None
+    started: float = field(default_factory=time.perf_counter)
+    first_token_at: float = None
+    # The "llm" span while tracing (core/tracing.py)
+    span: object = None
+    # Stages whose before() ran, so their after() runs too
+    stages: list = field(default_factory=list)
+
+    def first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+
+class Middleware:
+    """
+    A stage every engine's requests pass through, whichever provider serves
+    them. before() runs in order and may adjust the call or answer it
+    outright by returning a response; after() runs in reverse order with the
+    final response. Retries live one layer down, in each provider's
+    transport (llm/resilience.py), so they apply to every pooled request.
+    """
+
+    def before(self, call: ProviderCall):
+        return None
+
+    def after(self, call: ProviderCall, response: str):
+        pass
+
+
+class SessionStage(Middleware):
+    """Applies a ConversationSession: its screenshot, summary and turns in, this exchange recorded after."""
+
+    def before(self, call: ProviderCall):
+        session = call.session
+        if session is None:
+            return None
+        call.image = session.attach(call.image, call.engine)
+        call.system_prompt = session.system_prompt(call.system_prompt)
+        # Follow-ups depend on the conversation so far; only opening turns hit the response cache
+        call.use_cache = call.use_cache and not session.has_history()
+        return None
+
+    def after(self, call: ProviderCall, response: str):
+        if call.session is not None and response and not is_error_response(response):
+            call.session.record(call.prompt, response)
+
+
+class TransformStage(Middleware):
+    """
+    Answers mechanical requests ("uppercase this", "format this JSON", "sort
+    these lines") in-process with a deterministic transform from
+    llm/transforms.py, so they never reach an engine. Anything the matcher
+    isn't sure about falls through unchanged. Counts checks and hits, and
+    estimates the time saved from the engine's median latency in `metrics`.
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._checked = 0
+        self._local_ms = deque(maxlen=METRICS_SAMPLES)
+        self._hits = {}
+        self._saved_ms = 0.0
+        self._estimated = 0
+
+    def before(self, call: ProviderCall):
+        if not call.transforms:
+            return None
+        return self.answer(call)
+
+    def answer(self, call: ProviderCall, context: str = ""):
+        """The transform's response to `call` (about `context`, if given), or None to go on to the engine."""
+        if os.environ.get("SKIBIDYSAURUS_TRANSFORMS", "1") == "0":
+            return None
+        from llm import transforms
+        start = time.perf_counter()
+        found = transforms.answer(call.prompt, context)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._checked += 1
+            self._local_ms.append(elapsed_ms)
+        if found is None:
+            return None
+        call.transform, response = found
+        engine_ms = self.metrics.stats().get(call.engine, {}).get("p50_ms")
+        with self._lock:
+            self._hits[call.transform] = self._hits.get(call.transform, 0) + 1
+            if engine_ms is not None:
+                self._saved_ms += max(engine_ms - elapsed_ms, 0.0)
+                self._estimated += 1
+        tracing.record("transform", start, transform=call.transform, engine=call.engine)
+        return response
+
+    def after(self, call: ProviderCall, response: str):
+        # The session stage never saw this exchange; keep the conversation whole
+        if call.transform is not None and call.session is not None:
+            call.session.record(call.prompt, response)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = sum(self._hits.values())
+            samples = list(self._local_ms)
+            return {
+                "enabled": os.environ.get("SKIBIDYSAURUS_TRANSFORMS", "1") != "0",
+                "checked": self._checked,
+                "hits": hits,
+                "hit_rate": round(hits / self._checked, 3) if self._checked else None,
+                "by_transform": dict(self._hits),
+                "local_p50_ms": round(percentile(samples, 0.5), 3) if samples else None,
+                "local_p99_ms": round(percentile(samples, 0.99), 3) if samples else None,
+                # Engine median latency minus local time, for hits on engines with latency samples
+                "time_saved_ms": round(self._saved_ms, 1),
+                "hits_estimated": self._estimated,
+            }
+
+
+class EncodingStage(Middleware):
+    """
+    Fits the screenshot to the engine's capabilities: dropped for engines
+    without vision (no point encoding and sending it), re-encoded when it is
+    over the engine's inline size limit.
+    """
+
+    def before(self, call: ProviderCall):
+        capabilities = registry.capabilities(call.engine)
+        if capabilities is None or not call.image:
+            return None
+        if not capabilities.vision:
+            call.image = ImagePayload()
+        elif len(call.image) > capabilities.max_image_bytes:
+            from core.imageprep import prepare_image
+            call.image = prepare_image(call.image, call.engine, call.model)
+        return None
+
+
+class CacheStage(Middleware):
+    """Answers repeated (prompt, screenshot, engine, model) requests from the on-disk response cache."""
+
+    def __init__(self, manager, system_prompt: str):
+        self.manager = manager
+        self.system_prompt = system_prompt
+
+    def before(self, call: ProviderCall):
+        if not call.use_cache or os.environ.get("SKIBIDYSAURUS_CACHE", "1") == "0":
+            return None
+        from llm.cache import cache_key
+        call.cache_key = cache_key(self.system_prompt, call.prompt, call.image.fingerprint, call.engine, call.model)
+        cached = self.manager.cache().get(call.cache_key)
+        call.cached = cached is not None
+        return cached
+
+    def after(self, call: ProviderCall, response: str):
+        # Errors are never cached, so a transient failure is retried next time.
+        if call.cache_key is None or call.cached or not response or is_error_response(response):
+            return
+        self.manager.cache().put(call.cache_key, response, engine=call.engine, model=call.model)
+
+
+class TraceStage(Middleware):
+    """
+    While tracing is on, one "llm" span per request from the first stage to
+    the last token, with estimated prompt and response tokens.
+    """
+
+    def before(self, call: ProviderCall):
+        if not tracing.enabled():
+            return None
+        from llm.budget import estimate_tokens
+        call.span = tracing.start(
+            "llm",
+            start=call.started,
+            engine=call.engine,
+            model=call.model,
+            prompt_tokens=estimate_tokens(call.system_prompt) + estimate_tokens(call.prompt),
+            image_bytes=len(call.image),
+        )
+        return None
+
+    def after(self, call: ProviderCall, response: str):
+        if call.span is None:
+            return
+        from llm.budget import estimate_tokens
+        call.span.set(
+            cached=call.cached,
+            transform=call.transform,
+            # The image as finally sent, after the encoding stage
+            image_bytes=len(call.image),
+            response_tokens=estimate_tokens(response or ""),
+        )
+        if call.first_token_at is not None:
+            call.span.set(ttft_ms=round((call.first_token_at - call.started) * 1000, 1))
+        if not response or is_error_response(response):
+            call.span.set(error=(response or "empty response")[:200])
+        call.span.finish()
+
+
+class MetricsStage(Middleware):
+    """Requests, errors, cache and transform hits, latency and time to first token, per engine."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engines = {}
+
+    def after(self, call: ProviderCall, response: str):
+        now = time.perf_counter()
+        with self._lock:
+            engine = self._engines.setdefault(call.engine, {
+                "requests": 0,
+                "errors": 0,
+                "cache_hits": 0,
+                "transform_hits": 0,
+                "latency": deque(maxlen=METRICS_SAMPLES),
+                "ttft": deque(maxlen=METRICS_SAMPLES),
+            })
+            engine["requests"] += 1
+            if call.transform is not None:
+                engine["transform_hits"] += 1
+                return
+            if call.cached:
+                engine["cache_hits"] += 1
+                return
+            if not response or is_error_response(response):
+                engine["errors"] += 1
+                return
+            engine["latency"].append(now - call.started)
+            if call.first_token_at is not None:
+                engine["ttft"].append(call.first_token_at - call.started)
+
+    def stats(self) -> dict:
+        def ms(samples, pct):
+            return round(percentile(samples, pct) * 1000, 1) if samples else None
+
+        with self._lock:
+            engines = {name: dict(engine, latency=list(engine["latency"]), ttft=list(engine["ttft"])) for name, engine in self._engines.items()}
+        return {
+            name: {
+                "requests": engine["requests"],
+                "errors": engine["errors"],
+                "cache_hits": engine["cache_hits"],
+                "transform_hits": engine["transform_hits"],
+                "p50_ms": ms(engine["latency"], 0.5),
+                "p95_ms": ms(engine["latency"], 0.95),
+                "ttft_p50_ms": ms(engine["ttft"], 0.5),
+                "ttft_p95_ms": ms(engine["ttft"], 0.95),
+            }
+            for name, engine in engines.items()
+        }
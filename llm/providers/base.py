@@ -0,0 +1,304 @@
+import os
+import json
+import asyncio
+import httpx
+from core.imagebuf import ImagePayload
+from llm import registry
+from llm.transport import json_request_kwargs
+
+
+class _SSEDecoder:
+    """
+    Incremental Server-Sent Events parser. feed() takes one line at a time and
+    returns an (event, data) pair when a blank line completes an event.
+    `data` is the decoded JSON payload, or the raw string if it is not JSON.
+    """
+
+    def __init__(self):
+        self.event = ""
+        self.data_lines = []
+
+    def feed(self, raw):
+        line = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+        if not line:
+            return self.flush()
+        if line.startswith(":"):
+            return None
+        field, _, value = line.partition(":")
+        value = value[1:] if value.startswith(" ") else value
+        if field == "event":
+            self.event = value
+        elif field == "data":
+            self.data_lines.append(value)
+        return None
+
+    def flush(self):
+        if not self.data_lines:
+            self.event = ""
+            return None
+        data = "\n".join(self.data_lines)
+        try:
+            data = json.loads(data)
+        except ValueError:
+            pass
+        event = self.event
+        self.event = ""
+        self.data_lines = []
+        return event, data
+
+
+def iter_sse_events(lines):
+    decoder = _SSEDecoder()
+    for raw in lines:
+        parsed = decoder.feed(raw)
+        if parsed is not None:
+            yield parsed
+    parsed = decoder.flush()
+    if parsed is not None:
+        yield parsed
+
+
+async def aiter_sse_events(lines):
+    decoder = _SSEDecoder()
+    async for raw in lines:
+        parsed = decoder.feed(raw)
+        if parsed is not None:
+            yield parsed
+    parsed = decoder.flush()
+    if parsed is not None:
+        yield parsed
+
+
+def status_line(err: httpx.HTTPStatusError) -> str:
+    # httpx appends a docs link on a second line; keep user-facing errors to one line.
+    return str(err).splitlines()[0]
+
+
+def http_error_detail(err: httpx.HTTPStatusError) -> str:
+    if err.response is None:
+        return ""
+    try:
+        return str(err.response.json())
+    except Exception:
+        return err.response.text or ""
+
+
+def is_image_not_supported_error(err: httpx.HTTPStatusError) -> bool:
+    body = ""
+    if err.response is not None:
+        try:
+            parsed = err.response.json()
+            body = str(parsed.get("error", ""))
+        except Exception:
+            body = err.response.text or ""
+    body = body.lower()
+    return (
+        "does not support images" in body
+        or "image input is not supported" in body
+        or "vision" in body and "not support" in body
+    )
+
+
+def raise_for_status(res: httpx.Response):
+    # Streamed error bodies must be read before raising so callers can inspect them.
+    if res.is_error and not res.is_stream_consumed:
+        res.read()
+    res.raise_for_status()
+
+
+class Provider:
+    """
+    One engine's wire protocol. Subclasses live in their own modules and are
+    imported by LLMManager only when the engine is first used, so an SDK is
+    never loaded for an engine the user hasn't picked.
+
+    call/stream/astream never raise: failures come back as a single
+    "<Engine> Error: ..." string, the way the app shows them. With a
+    ConversationSession they replay its turns in the engine's native
+    multi-turn format, screenshot on the first user message.
+    """
+
+    name = ""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.transport = manager.transport
+        self.spec = registry.spec(self.name)
+
+    @property
+    def default_model(self) -> str:
+        return self.spec.default_model
+
+    @property
+    def capabilities(self) -> registry.Capabilities:
+        return self.spec.capabilities
+
+    def model_name(self, model: str) -> str:
+        return (model or "").strip() or self.default_model
+
+    def warm_url(self) -> str:
+        raise NotImplementedError
+
+    def refresh(self):
+        """Called when API keys or other settings in the environment changed."""
+
+    def warm(self, model: str = ""):
+        """Engine-side warm-up beyond the connection (e.g. loading a local model); blocking."""
+
+    async def awarm(self, model: str = ""):
+        await asyncio.to_thread(self.warm, model)
+
+    def close(self):
+        """Releases provider-side state at shutdown."""
+
+    def exchange(self, session, user_prompt: str) -> list:
+        """(role, text) pairs to send: the session's earlier turns, then this prompt."""
+        pairs = []
+        if session is not None:
+            for turn in session.turns():
+                pairs += [("user", turn.prompt), ("assistant", turn.response)]
+        pairs.append(("user", user_prompt))
+        return pairs
+
+    def end_session(self, session):
+        """Releases provider-side state (e.g. cached content) held for `session`."""
+
+    def image_reference(self, image: ImagePayload):
+        """File reference for a screenshot this provider has already seen, or None to send it inline."""
+        if not self.capabilities.file_uploads:
+            return None
+        return self.manager.image_uploads.reference(self.name, image, self.upload_image)
+
+    def upload_image(self, image: ImagePayload) -> str:
+        raise NotImplementedError
+
+    def call(self, system_prompt: str, user_prompt: str, image: ImagePayload, model: str = "", session=None) -> str:
+        raise NotImplementedError
+
+    def stream(self, system_prompt: str, user_prompt: str, image: ImagePayload, model: str = "", session=None):
+        # Engines registered without streaming answer in one chunk
+        if self.capabilities.streaming:
+            raise NotImplementedError
+        yield self.call(system_prompt, user_prompt, image, model, session=session)
+
+    async def astream(self, system_prompt: str, user_prompt: str, image: ImagePayload, model: str = "", session=None):
+        if self.capabilities.streaming:
+            raise NotImplementedError
+        yield await asyncio.to_thread(self.call, system_prompt, user_prompt, image, model, session)
+
+
+class HTTPProvider(Provider):
+    """
+    An engine spoken to as JSON over HTTP, streaming Server-Sent Events.
+    Subclasses describe the wire format: request() builds the URL, headers
+    and payload, response_text() reads a blocking answer and stream_event()
+    one streamed event. Sending, streaming, the missing-key and empty-answer
+    checks and error strings are shared, so a new engine is mostly payload.
+    """
+
+    # Environment variable holding the API key; empty for local servers that need none
+    api_key_env = ""
+
+    def api_key(self) -> str:
+        return (os.environ.get(self.api_key_env, "") or "").strip() if self.api_key_env else ""
+
+    def error(self, err: Exception) -> str:
+        if isinstance(err, httpx.HTTPStatusError):
+            return f"{self.spec.label} Error: {status_line(err)}. {http_error_detail(err)}".strip()
+        return f"{self.spec.label} Error: {str(err)}"
+
+    def request(self, system_prompt: str, user_prompt: str, image: ImagePayload, model_name: str, api_key: str, stream: bool, image_ref: str = None, session=None):
+        """(url, headers, payload) for one request; the image goes in as IMAGE_PLACEHOLDER."""
+        raise NotImplementedError
+
+    def response_text(self, data: dict) -> str:
+        raise NotImplementedError
+
+    def stream_event(self, event: str, data):
+        """(text delta, error string, done) for one SSE event."""
+        raise NotImplementedError
+
+    def _missing_key(self) -> str:
+        if self.api_key_env and not self.api_key():
+            return f"{self.spec.label} Error: missing API key. Add it in Settings."
+        return ""
+
+    def _empty(self, model_name: str) -> str:
+        return f"{self.spec.label} Error: model '{model_name}' returned an empty response."
+
+    def call(self, system_prompt: str, user_prompt: str, image: ImagePayload, model: str = "", session=None) -> str:
+        missing = self._missing_key()
+        if missing:
+            return missing
+
+        model_name = self.model_name(model)
+        image_ref = self.image_reference(image)
+        url, headers, payload = self.request(system_prompt, user_prompt, image, model_name, self.api_key(), stream=False, image_ref=image_ref, session=session)
+
+        try:
+            res = self.transport.client(self.name).post(url, **json_request_kwargs(headers, payload, image))
+            res.raise_for_status()
+            return self.response_text(res.json()).strip() or self._empty(model_name)
+        except Exception as e:
+            return self.error(e)
+
+    def stream(self, system_prompt: str, user_prompt: str, image: ImagePayload, model: str = "", session=None):
+        missing = self._missing_key()
+        if missing:
+            yield missing
+            return
+
+        model_name = self.model_name(model)
+        image_ref = self.image_reference(image)
+        url, headers, payload = self.request(system_prompt, user_prompt, image, model_name, self.api_key(), stream=True, image_ref=image_ref, session=session)
+
+        try:
+            with self.transport.client(self.name).stream("POST", url, **json_request_kwargs(headers, payload, image)) as res:
+                raise_for_status(res)
+                produced = False
+                for event, data in iter_sse_events(res.iter_lines()):
+                    delta, error, done = self.stream_event(event, data)
+                    if error:
+                        yield error
+                        return
+                    if delta:
+                        produced = True
+                        yield delta
+                    if done:
+                        break
+            if not produced:
+                yield self._empty(model_name)
+        except Exception as e:
+            yield self.error(e)
+
+    async def astream(self, system_prompt: str, user_prompt: str, image: ImagePayload, model: str = "", session=None):
+        missing = self._missing_key()
+        if missing:
+            yield missing
+            return
+
+        model_name = self.model_name(model)
+        image_ref = await asyncio.to_thread(self.image_reference, image)
+        url, headers, payload = self.request(system_prompt, user_prompt, image, model_name, self.api_key(), stream=True, image_ref=image_ref, session=session)
+
+        try:
+            request_kwargs = json_request_kwargs(headers, payload, image, is_async=True)
+            async with self.transport.async_client(self.name).stream("POST", url, **request_kwargs) as res:
+                if res.is_error:
+                    await res.aread()
+                res.raise_for_status()
+                produced = False
+                async for event, data in aiter_sse_events(res.aiter_lines()):
+                    delta, error, done = self.stream_event(event, data)
+                    if error:
+                        yield error
+                        return
+                    if delta:
+                        produced = True
+                        yield delta
+                    if done:
+                        break
+            if not produced:
+                yield self._empty(model_name)
+        except Exception as e:
+            yield self.error(e)
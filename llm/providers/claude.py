@@ -0,0 +1,128 @@
+import os
+from core.imageprep import image_mime_type
+from core.imagebuf import ImagePayload
+from llm.transport import IMAGE_PLACEHOLDER
+from llm.providers.base import HTTPProvider
+
+CLAUDE_FILES_BETA = "files-api-2025-04-14"
+
+
+def anthropic_base_url() -> str:
+    return ((os.environ.get("ANTHROPIC_BASE_URL", "") or "").strip() or "https://api.anthropic.com").rstrip("/")
+
+
+def claude_event(event: str, data):
+    if not isinstance(data, dict):
+        return "", "", False
+    kind = data.get("type") or event
+    if kind == "content_block_delta":
+        delta = data.get("delta") or {}
+        if delta.get("type") == "text_delta":
+            return delta.get("text", ""), "", False
+        return "", "", False
+    if kind == "error":
+        return "", f"Claude Error: {data.get('error') or data}", True
+    return "", "", kind == "message_stop"
+
+
+class ClaudeProvider(HTTPProvider):
+    name = "claude"
+    api_key_env = "ANTHROPIC_API_KEY"
+
+    def __init__(self, manager):
+        super().__init__(manager)
+        self.file_ids = []
+
+    def warm_url(self) -> str:
+        return f"{anthropic_base_url()}/v1/models"
+
+    def request(self, system_prompt: str, user_prompt: str, image: ImagePayload, model_name: str, api_key: str, stream: bool, image_ref: str = None, session=None):
+        url = f"{anthropic_base_url()}/v1/messages"
+        headers = {
+            "x-api-key": api_key,
+            "anthropic-version": "2023-06-01",
+            "content-type": "application/json",
+        }
+
+        messages = [
+            {"role": role, "content": [{"type": "text", "text": text}]}
+            for role, text in self.exchange(session, user_prompt)
+        ]
+        image_block = None
+        if image_ref:
+            headers["anthropic-beta"] = CLAUDE_FILES_BETA
+            image_block = {"type": "image", "source": {"type": "file", "file_id": image_ref}}
+        elif image:
+            image_block = {
+                "type": "image",
+                "source": {
+                    "type": "base64",
+                    "media_type": image_mime_type(image.head()),
+                    "data": IMAGE_PLACEHOLDER,
+                },
+            }
+        if image_block is not None:
+            messages[0]["content"].insert(0, image_block)
+
+        system = system_prompt
+        if session is not None:
+            # Cache breakpoints on the stable prefix: system prompt, screenshot,
+            # and the end of the replayed history. Follow-ups then pay cache-read
+            # rates for everything but the new question.
+            ephemeral = {"type": "ephemeral"}
+            system = [{"type": "text", "text": system_prompt, "cache_control": ephemeral}]
+            if image_block is not None:
+                image_block["cache_control"] = ephemeral
+            if len(messages) > 1:
+                messages[-2]["content"][-1]["cache_control"] = ephemeral
+
+        payload = {
+            "model": model_name,
+            "max_tokens": 1200,
+            "temperature": 0.4,
+            "system": system,
+            "messages": messages,
+        }
+        if stream:
+            payload["stream"] = True
+        return url, headers, payload
+
+    def response_text(self, data: dict) -> str:
+        blocks = data.get("content", [])
+        return "\n".join(b.get("text", "") for b in blocks if b.get("type") == "text" and b.get("text"))
+
+    def stream_event(self, event: str, data):
+        return claude_event(event, data)
+
+    def upload_image(self, image: ImagePayload) -> str:
+        res = self.transport.client("claude").post(
+            f"{anthropic_base_url()}/v1/files",
+            headers={
+                "x-api-key": self.api_key(),
+                "anthropic-version": "2023-06-01",
+                "anthropic-beta": CLAUDE_FILES_BETA,
+            },
+            files={"file": ("screenshot", image.open(), image_mime_type(image.head()))},
+        )
+        res.raise_for_status()
+        file_id = res.json()["id"]
+        self.file_ids.append(file_id)
+        return file_id
+
+    def close(self):
+        # Anthropic keeps uploaded files until deleted; clean up this session's screenshots.
+        api_key = self.api_key()
+        while self.file_ids:
+            file_id = self.file_ids.pop()
+            try:
+                self.transport.client("claude").delete(
+                    f"{anthropic_base_url()}/v1/files/{file_id}",
+                    headers={
+                        "x-api-key": api_key,
+                        "anthropic-version": "2023-06-01",
+                        "anthropic-beta": CLAUDE_FILES_BETA,
+                    },
+                    timeout=2.0,
+                )
+            except Exception:
+                pass
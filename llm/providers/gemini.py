@@ -0,0 +1,213 @@
+import os
+import asyncio
+from google import genai
+from google.genai import types
+from core.imageprep import image_mime_type
+from core.imagebuf import ImagePayload
+from llm.providers.base import Provider
+
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com"
+# Cached session prefixes outlive an overlay session by a little, then expire on their own
+GEMINI_CACHE_TTL = "900s"
+
+
+def gemini_base_url() -> str:
+    # GEMINI_BASE_URL points the SDK at a proxy or the benchmarks' mock server
+    return ((os.environ.get("GEMINI_BASE_URL", "") or "").strip() or GEMINI_BASE_URL).rstrip("/")
+
+
+def gemini_chunk(chunk):
+    """(text delta, error string, done) for one streamed GenerateContentResponse."""
+    if not chunk.candidates:
+        feedback = chunk.prompt_feedback
+        if feedback is not None and feedback.block_reason:
+            return "", f"Gemini Error: prompt blocked ({feedback.block_reason})", True
+        if chunk.usage_metadata is None:
+            # google-genai parses an error frame sent mid-stream into an empty chunk
+            return "", "Gemini Error: the response stream ended with an error.", True
+        return "", "", False
+    return chunk.text or "", "", chunk.candidates[0].finish_reason is not None
+
+
+class GeminiProvider(Provider):
+    name = "gemini"
+
+    def __init__(self, manager):
+        super().__init__(manager)
+        self.client = None
+        self.refresh()
+
+    def refresh(self):
+        """Re-initializes the Gemini client if the API key environment variable changed"""
+        api_key = (os.environ.get("GEMINI_API_KEY", "") or "").strip()
+        if not api_key:
+            self.client = None
+            return
+        self.client = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(
+                base_url=gemini_base_url(),
+                httpx_client=self.transport.client("gemini"),
+                async_client_args={"transport": self.transport.async_transport("gemini")},
+            ),
+        )
+
+    def warm_url(self) -> str:
+        return gemini_base_url()
+
+    def image_part(self, image: ImagePayload):
+        image_uri = self.image_reference(image)
+        if image_uri:
+            return types.Part.from_uri(file_uri=image_uri, mime_type=image_mime_type(image.head()))
+        # Google GenAI SDK expects raw bytes for image Part
+        return types.Part.from_bytes(data=image.tobytes(), mime_type=image_mime_type(image.head()))
+
+    def request(self, system_prompt: str, user_prompt: str, image: ImagePayload, session=None) -> dict:
+        if session is None:
+            contents = [user_prompt]
+            if image:
+                contents.insert(0, self.image_part(image))
+            return {
+                "model": self.default_model,
+                "contents": contents,
+                "config": types.GenerateContentConfig(
+                    system_instruction=system_prompt,
+                    temperature=0.4, # keep it somewhat strict to prompt
+                ),
+            }
+
+        contents = [
+            types.Content(role="user" if role == "user" else "model", parts=[types.Part.from_text(text=text)])
+            for role, text in self.exchange(session, user_prompt)
+        ]
+        if image:
+            contents[0].parts.insert(0, self.image_part(image))
+        cache_name = self.cached_prefix(session, system_prompt, contents) if len(contents) > 1 else None
+        if cache_name:
+            # The system prompt and first user turn (with the screenshot) live in the cache
+            return {
+                "model": self.default_model,
+                "contents": contents[1:],
+                "config": types.GenerateContentConfig(cached_content=cache_name, temperature=0.4),
+            }
+        return {
+            "model": self.default_model,
+            "contents": contents,
+            "config": types.GenerateContentConfig(system_instruction=system_prompt, temperature=0.4),
+        }
+
+    def cached_prefix(self, session, system_prompt: str, contents: list):
+        """
+        Name of a Gemini cached content holding the session's system prompt and
+        first turn, created on the first follow-up. Returns None if caching
+        isn't possible (e.g. the prefix is under the model's minimum size); that
+        is remembered until the prefix changes, so it isn't retried every turn.
+        """
+        state = session.provider_state.setdefault(self.name, {})
+        if state.get("generation") == session.generation:
+            return state.get("cache")
+        self.delete_cache(state.get("cache"))
+        state["generation"] = session.generation
+        state["cache"] = None
+        try:
+            cache = self.client.caches.create(
+                model=self.default_model,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=system_prompt,
+                    contents=[contents[0]],
+                    ttl=GEMINI_CACHE_TTL,
+                ),
+            )
+            state["cache"] = cache.name
+        except Exception:
+            pass
+        return state["cache"]
+
+    def delete_cache(self, name: str):
+        if not name or self.client is None:
+            return
+        try:
+            self.client.caches.delete(name=name)
+        except Exception:
+            pass
+
+    def end_session(self, session):
+        state = session.provider_state.pop(self.name, None) or {}
+        self.delete_cache(state.get("cache"))
+
+    def call(self, system_prompt: str, user_prompt: str, image: ImagePayload, model: str = "", session=None) -> str:
+        try:
+            if self.client is None:
+                self.refresh()
+            if self.client is None:
+                return "Gemini Error: missing API key. Add it in Settings."
+
+            response = self.client.models.generate_content(
+                **self.request(system_prompt, user_prompt, image, session)
+            )
+            response_text = response.text.strip()
+            # print(f"[DEBUG] Gemini responded with {len(response_text)} chars: {response_text[:50]}")
+            return response_text
+        except Exception as e:
+            # print(f"[ERROR] Gemini API failed: {e}")
+            return f"Gemini Error: {str(e)}"
+
+    def stream(self, system_prompt: str, user_prompt: str, image: ImagePayload, model: str = "", session=None):
+        try:
+            if self.client is None:
+                self.refresh()
+            if self.client is None:
+                yield "Gemini Error: missing API key. Add it in Settings."
+                return
+
+            request = self.request(system_prompt, user_prompt, image, session)
+            produced = False
+            for chunk in self.client.models.generate_content_stream(**request):
+                delta, error, done = gemini_chunk(chunk)
+                if error:
+                    yield error
+                    return
+                if delta:
+                    produced = True
+                    yield delta
+                if done:
+                    break
+            if not produced:
+                yield f"Gemini Error: model '{request['model']}' returned an empty response."
+        except Exception as e:
+            yield f"Gemini Error: {str(e)}"
+
+    async def astream(self, system_prompt: str, user_prompt: str, image: ImagePayload, model: str = "", session=None):
+        try:
+            if self.client is None:
+                self.refresh()
+            if self.client is None:
+                yield "Gemini Error: missing API key. Add it in Settings."
+                return
+
+            # Building the request may upload the screenshot; keep that off the loop.
+            request = await asyncio.to_thread(self.request, system_prompt, user_prompt, image, session)
+            stream = await self.client.aio.models.generate_content_stream(**request)
+            produced = False
+            async for chunk in stream:
+                delta, error, done = gemini_chunk(chunk)
+                if error:
+                    yield error
+                    return
+                if delta:
+                    produced = True
+                    yield delta
+                if done:
+                    break
+            if not produced:
+                yield f"Gemini Error: model '{request['model']}' returned an empty response."
+        except Exception as e:
+            yield f"Gemini Error: {str(e)}"
+
+    def upload_image(self, image: ImagePayload) -> str:
+        # Gemini deletes uploaded files by itself after 48 hours.
+        uploaded = self.client.files.upload(
+            file=image.open(),
+            config=types.UploadFileConfig(mime_type=image_mime_type(image.head())),
+        )
+        return uploaded.uri
@@ -0,0 +1,68 @@
+import os
+from core.imageprep import image_mime_type
+from core.imagebuf import ImagePayload
+from llm.transport import IMAGE_PLACEHOLDER
+from llm.providers.base import HTTPProvider
+
+
+def llamacpp_base_url() -> str:
+    host = (os.environ.get("LLAMACPP_HOST", "") or "").strip() or "http://127.0.0.1:8080"
+    if "://" not in host:
+        host = f"http://{host}"
+    return host.rstrip("/")
+
+
+def llamacpp_event(event: str, data):
+    if data == "[DONE]":
+        return "", "", True
+    if not isinstance(data, dict):
+        return "", "", False
+    if data.get("error"):
+        return "", f"llama.cpp Error: {data['error']}", True
+    choice = (data.get("choices") or [{}])[0]
+    return (choice.get("delta") or {}).get("content") or "", "", bool(choice.get("finish_reason"))
+
+
+class LlamaCppProvider(HTTPProvider):
+    """llama.cpp's llama-server through its OpenAI-compatible chat endpoint."""
+
+    name = "llamacpp"
+
+    def api_key(self) -> str:
+        # Only needed when llama-server was started with --api-key
+        return (os.environ.get("LLAMACPP_API_KEY", "") or "").strip()
+
+    def warm_url(self) -> str:
+        return f"{llamacpp_base_url()}/health"
+
+    def request(self, system_prompt: str, user_prompt: str, image: ImagePayload, model_name: str, api_key: str, stream: bool, image_ref: str = None, session=None):
+        url = f"{llamacpp_base_url()}/v1/chat/completions"
+        headers = {"Content-Type": "application/json"}
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+
+        messages = [{"role": "system", "content": system_prompt}]
+        messages += [{"role": role, "content": text} for role, text in self.exchange(session, user_prompt)]
+        if image and self.capabilities.vision:
+            messages[1]["content"] = [
+                {"type": "text", "text": messages[1]["content"]},
+                {"type": "image_url", "image_url": {"url": f"data:{image_mime_type(image.head())};base64,{IMAGE_PLACEHOLDER}"}},
+            ]
+
+        payload = {
+            "model": model_name,
+            "messages": messages,
+            "temperature": 0.4,
+            # Reuse the KV cache for the prefix shared with the previous request
+            "cache_prompt": True,
+        }
+        if stream:
+            payload["stream"] = True
+        return url, headers, payload
+
+    def response_text(self, data: dict) -> str:
+        choice = (data.get("choices") or [{}])[0]
+        return (choice.get("message") or {}).get("content") or ""
+
+    def stream_event(self, event: str, data):
+        return llamacpp_event(event, data)
@@ -0,0 +1,418 @@
+import os
+import json
+import time
+import asyncio
+import threading
+import httpx
+from core.paths import app_support_dir
+from core.imagebuf import ImagePayload
+from llm.transport import IMAGE_PLACEHOLDER, json_request_kwargs
+from llm.providers.base import (
+    Provider,
+    status_line,
+    is_image_not_supported_error,
+    raise_for_status,
+)
+
+TEXT_ONLY_NOTE = "\n\n_note: your selected ollama model is text-only, so screen image context was skipped._"
+# How long Ollama keeps a model in memory after a request; its own default is 5m
+DEFAULT_KEEP_ALIVE = "30m"
+# A hotkey press re-sends the preload at most this often per model
+PRELOAD_INTERVAL = 60.0
+
+
+def ollama_base_url() -> str:
+    host = (os.environ.get("OLLAMA_HOST", "") or "").strip() or "http://localhost:11434"
+    if "://" not in host:
+        host = f"http://{host}"
+    return host.rstrip("/")
+
+
+def ollama_chunk(line: str):
+    data = json.loads(line)
+    if data.get("error"):
+        return "", f"Ollama Error: {data['error']}", True
+    # /api/generate puts text in "response", /api/chat in "message"
+    text = data.get("response") or (data.get("message") or {}).get("content", "")
+    return text, "", bool(data.get("done"))
+
+
+def ollama_text(data: dict) -> str:
+    return (data.get("response") or (data.get("message") or {}).get("content", "")).strip()
+
+
+def keep_alive() -> str:
+    return (os.environ.get("SKIBIDYSAURUS_OLLAMA_KEEP_ALIVE", "") or "").strip() or DEFAULT_KEEP_ALIVE
+
+
+def full_model_name(model: str) -> str:
+    # /api/tags lists "llava:latest" for a model pulled as "llava"
+    return model if ":" in model else f"{model}:latest"
+
+
+class OllamaModels:
+    """
+    What each installed model can do, probed with /api/show once per model
+    digest and kept on disk, so a text-only model gets a text request
+    straight away instead of a failed image request first, and a model that
+    isn't installed is reported without sending the prompt at all. Digests
+    come from /api/tags, listed once per process and again on warm-up.
+    """
+
+    def __init__(self, transport, path: str = None):
+        self.transport = transport
+        self.path = path or os.path.join(app_support_dir(), "ollama_models.json")
+        self._lock = threading.Lock()
+        self.models = self._load()
+        self.installed = None
+        self.probes = 0
+
+    @staticmethod
+    def enabled() -> bool:
+        return os.environ.get("SKIBIDYSAURUS_OLLAMA_PROBE", "1") != "0"
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return {k: v for k, v in data.items() if isinstance(v, dict) and "digest" in v}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        with self._lock:
+            snapshot = json.dumps(self.models)
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(snapshot)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def refresh(self) -> dict:
+        """Installed model name -> digest, from /api/tags."""
+        res = self.transport.client("ollama").get(f"{ollama_base_url()}/api/tags", timeout=8)
+        res.raise_for_status()
+        self.installed = {m["name"]: m.get("digest", "") for m in res.json().get("models", []) if m.get("name")}
+        return self.installed
+
+    def known(self, model: str):
+        """
+        info() if it needs no request: the model's entry, or None when that
+        takes a request. A model missing from the last /api/tags listing is
+        None too, not False: it may have been pulled since, and only info()
+        lists again before reporting it missing.
+        """
+        if self.installed is None:
+            return None
+        name = full_model_name(model)
+        if name not in self.installed:
+            return None
+        entry = self.models.get(name)
+        return entry if entry is not None and entry["digest"] == self.installed[name] else None
+
+    def info(self, model: str):
+        """
+        {"digest", "vision", "context_length"} for `model`, False when it
+        isn't installed, or None when Ollama couldn't say (probing off, or an
+        older server without /api/show capabilities).
+        """
+        if not self.enabled():
+            return None
+        entry = self.known(model)
+        if entry is not None:
+            return entry
+        name = full_model_name(model)
+        try:
+            if self.installed is None or name not in self.installed:
+                self.refresh()
+            if name not in self.installed:
+                return False
+            entry = self.known(model)
+            if entry is not None:
+                return entry
+            res = self.transport.client("ollama").post(f"{ollama_base_url()}/api/show", json={"model": name}, timeout=8)
+            res.raise_for_status()
+            data = res.json()
+        except Exception:
+            return None
+        self.probes += 1
+        if "capabilities" in data:
+            vision = "vision" in data["capabilities"]
+        else:
+            vision = bool(data.get("projector_info"))
+        context_length = next(
+            (v for k, v in (data.get("model_info") or {}).items() if k.endswith(".context_length")), None
+        )
+        entry = {"digest": self.installed[name], "vision": vision, "context_length": context_length}
+        with self._lock:
+            self.models[name] = entry
+        self._save()
+        return entry
+
+    def mark_text_only(self, model: str):
+        """Remembers a model that rejected an image, for servers /api/show couldn't tell us about."""
+        name = full_model_name(model)
+        digest = (self.installed or {}).get(name)
+        if digest is None:
+            return
+        with self._lock:
+            self.models[name] = dict(self.models.get(name) or {"context_length": None}, digest=digest, vision=False)
+        self._save()
+
+
+class OllamaProvider(Provider):
+    name = "ollama"
+
+    def __init__(self, manager):
+        super().__init__(manager)
+        self.models = OllamaModels(self.transport)
+        self._preloaded = {}
+
+    def warm_url(self) -> str:
+        return f"{ollama_base_url()}/api/version"
+
+    def url(self, session=None) -> str:
+        # Sessions use the chat endpoint: native multi-turn messages, and a
+        # stable prefix the llama.cpp prompt cache can reuse between turns
+        return f"{ollama_base_url()}/api/chat" if session is not None else f"{ollama_base_url()}/api/generate"
+
+    def payload(self, system_prompt: str, user_prompt: str, image: ImagePayload, model_name: str, stream: bool, session=None) -> dict:
+        if session is not None:
+            messages = [{"role": "system", "content": system_prompt}]
+            messages += [{"role": role, "content": text} for role, text in self.exchange(session, user_prompt)]
+            if image:
+                # Streamed into the body by json_request_kwargs
+                messages[1]["images"] = [IMAGE_PLACEHOLDER]
+            return {"model": model_name, "messages": messages, "stream": stream, "keep_alive": keep_alive()}
+
+        payload = {
+            "model": model_name,
+            "system": system_prompt,
+            "prompt": user_prompt,
+            "stream": stream,
+            "keep_alive": keep_alive(),
+        }
+        if image:
+            # Streamed into the body by json_request_kwargs
+            payload["images"] = [IMAGE_PLACEHOLDER]
+        return payload
+
+    @staticmethod
+    def has_image(payload: dict) -> bool:
+        return "images" in payload or any("images" in m for m in payload.get("messages", []))
+
+    def installed_models(self) -> list[str]:
+        try:
+            return list(self.models.installed if self.models.installed is not None else self.models.refresh())
+        except Exception:
+            return []
+
+    def warm(self, model: str = ""):
+        """
+        Called on hotkey: re-lists installed models, probes this one if its
+        digest is new, and loads it into memory with an empty generate, so
+        the prompt that follows skips the model load.
+        """
+        model_name = self.model_name(model)
+        try:
+            self.models.refresh()
+        except Exception:
+            return
+        self.models.info(model_name)
+        if time.monotonic() - self._preloaded.get(model_name, float("-inf")) < PRELOAD_INTERVAL:
+            return
+        try:
+            # No prompt: Ollama just loads the model and (re)starts its keep_alive timer
+            res = self.transport.client("ollama").post(
+                f"{ollama_base_url()}/api/generate",
+                json={"model": model_name, "keep_alive": keep_alive()},
+            )
+            res.raise_for_status()
+            self._preloaded[model_name] = time.monotonic()
+        except Exception:
+            pass
+
+    def missing(self, model_name: str) -> str:
+        installed = self.installed_models()
+        installed_hint = f" Installed models: {', '.join(installed)}." if installed else ""
+        return (
+            f"Ollama Error: model '{model_name}' is not installed "
+            f"(try: ollama pull {model_name}).{installed_hint}"
+        )
+
+    def plan(self, image: ImagePayload, model_name: str):
+        """
+        (image to send, note to append, error) from what is known about the
+        model: text-only models get no image, missing ones an error up front.
+        Unknown models get the image and the reactive fallback.
+        """
+        info = self.models.info(model_name) if image else self.models.known(model_name)
+        if info is False:
+            return image, "", self.missing(model_name)
+        if image and info and not info["vision"]:
+            return ImagePayload(), TEXT_ONLY_NOTE, ""
+        return image, "", ""
+
+    def error(self, err: Exception, model_name: str) -> str:
+        if isinstance(err, httpx.ConnectError):
+            return (
+                f"Ollama Error: Could not connect to local Ollama instance at {ollama_base_url()}. "
+                "Start Ollama first."
+            )
+        if isinstance(err, httpx.HTTPStatusError):
+            installed = self.installed_models()
+            installed_hint = f" Installed models: {', '.join(installed)}." if installed else ""
+            return (
+                f"Ollama Error: {status_line(err)}. Make sure model '{model_name}' exists "
+                f"(try: ollama pull {model_name}).{installed_hint}"
+            )
+        return f"Ollama Error: {str(err)}"
+
+    def call(self, system_prompt: str, user_prompt: str, image: ImagePayload, model: str = "", session=None) -> str:
+        generate_url = self.url(session)
+        model_name = self.model_name(model)
+        image, note, error = self.plan(image, model_name)
+        if error:
+            return error
+
+        with_image_payload = self.payload(system_prompt, user_prompt, image, model_name, stream=False, session=session)
+        text_only_payload = self.payload(system_prompt, user_prompt, "", model_name, stream=False, session=session)
+
+        def _post_generate(payload: dict) -> str:
+            res = self.transport.client("ollama").post(generate_url, **json_request_kwargs({}, payload, image))
+            res.raise_for_status()
+            response = ollama_text(res.json())
+            if not response:
+                return f"Ollama Error: model '{model_name}' returned an empty response."
+            return response
+
+        try:
+            if self.has_image(with_image_payload):
+                try:
+                    return _post_generate(with_image_payload)
+                except httpx.HTTPStatusError as e:
+                    # Common failure path: text-only local models cannot handle image fields.
+                    if is_image_not_supported_error(e):
+                        self.models.mark_text_only(model_name)
+                        return _post_generate(text_only_payload) + TEXT_ONLY_NOTE
+                    raise
+            return _post_generate(text_only_payload) + note
+        except Exception as e:
+            return self.error(e, model_name)
+
+    def stream(self, system_prompt: str, user_prompt: str, image: ImagePayload, model: str = "", session=None):
+        generate_url = self.url(session)
+        model_name = self.model_name(model)
+        image, note, error = self.plan(image, model_name)
+        if error:
+            yield error
+            return
+
+        client = self.transport.client("ollama")
+
+        def _open_stream(payload: dict):
+            res = client.send(client.build_request("POST", generate_url, **json_request_kwargs({}, payload, image)), stream=True)
+            try:
+                raise_for_status(res)
+            except httpx.HTTPStatusError:
+                res.close()
+                raise
+            return res
+
+        try:
+            payload = self.payload(system_prompt, user_prompt, image, model_name, stream=True, session=session)
+            try:
+                res = _open_stream(payload)
+            except httpx.HTTPStatusError as e:
+                # Text-only models reject the image up front, before any tokens stream.
+                if not self.has_image(payload) or not is_image_not_supported_error(e):
+                    raise
+                self.models.mark_text_only(model_name)
+                note = TEXT_ONLY_NOTE
+                res = _open_stream(self.payload(system_prompt, user_prompt, "", model_name, stream=True, session=session))
+
+            produced = False
+            try:
+                # Ollama streams newline-delimited JSON objects.
+                for line in res.iter_lines():
+                    if not line:
+                        continue
+                    delta, error, done = ollama_chunk(line)
+                    if error:
+                        yield error
+                        return
+                    if delta:
+                        produced = True
+                        yield delta
+                    if done:
+                        break
+            finally:
+                res.close()
+            if not produced:
+                yield f"Ollama Error: model '{model_name}' returned an empty response."
+            elif note:
+                yield note
+        except Exception as e:
+            yield self.error(e, model_name)
+
+    async def astream(self, system_prompt: str, user_prompt: str, image: ImagePayload, model: str = "", session=None):
+        generate_url = self.url(session)
+        model_name = self.model_name(model)
+        if image and self.models.enabled() and self.models.known(model_name) is None:
+            # Probing the model is blocking; keep it off the loop
+            image, note, error = await asyncio.to_thread(self.plan, image, model_name)
+        else:
+            image, note, error = self.plan(image, model_name)
+        if error:
+            yield error
+            return
+
+        client = self.transport.async_client("ollama")
+
+        async def _open_stream(payload: dict):
+            res = await client.send(
+                client.build_request("POST", generate_url, **json_request_kwargs({}, payload, image, is_async=True)),
+                stream=True,
+            )
+            if res.is_error:
+                await res.aread()
+                await res.aclose()
+                res.raise_for_status()
+            return res
+
+        try:
+            payload = self.payload(system_prompt, user_prompt, image, model_name, stream=True, session=session)
+            try:
+                res = await _open_stream(payload)
+            except httpx.HTTPStatusError as e:
+                if not self.has_image(payload) or not is_image_not_supported_error(e):
+                    raise
+                await asyncio.to_thread(self.models.mark_text_only, model_name)
+                note = TEXT_ONLY_NOTE
+                res = await _open_stream(self.payload(system_prompt, user_prompt, "", model_name, stream=True, session=session))
+
+            produced = False
+            try:
+                async for line in res.aiter_lines():
+                    if not line:
+                        continue
+                    delta, error, done = ollama_chunk(line)
+                    if error:
+                        yield error
+                        return
+                    if delta:
+                        produced = True
+                        yield delta
+                    if done:
+                        break
+            finally:
+                await res.aclose()
+            if not produced:
+                yield f"Ollama Error: model '{model_name}' returned an empty response."
+            elif note:
+                yield note
+        except Exception as e:
+            # The error hint may query /api/tags, which is blocking; keep it off the loop.
+            yield await asyncio.to_thread(self.error, e, model_name)
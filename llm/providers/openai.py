@@ -0,0 +1,82 @@
+import os
+from core.imageprep import image_mime_type
+from core.imagebuf import ImagePayload
+from llm.transport import IMAGE_PLACEHOLDER
+from llm.providers.base import HTTPProvider
+
+
+def openai_base_url() -> str:
+    return ((os.environ.get("OPENAI_BASE_URL", "") or "").strip() or "https://api.openai.com/v1").rstrip("/")
+
+
+def openai_event(event: str, data):
+    if not isinstance(data, dict):
+        return "", "", False
+    kind = data.get("type") or event
+    if kind == "response.output_text.delta":
+        return data.get("delta", ""), "", False
+    if kind in ("error", "response.failed"):
+        error = data.get("error") or (data.get("response") or {}).get("error") or data
+        return "", f"OpenAI Error: {error}", True
+    return "", "", kind == "response.completed"
+
+
+class OpenAIProvider(HTTPProvider):
+    name = "openai"
+    api_key_env = "OPENAI_API_KEY"
+
+    def warm_url(self) -> str:
+        return f"{openai_base_url()}/models"
+
+    def request(self, system_prompt: str, user_prompt: str, image: ImagePayload, model_name: str, api_key: str, stream: bool, image_ref: str = None, session=None):
+        url = f"{openai_base_url()}/responses"
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        }
+
+        messages = [
+            {"role": role, "content": [{"type": "input_text" if role == "user" else "output_text", "text": text}]}
+            for role, text in self.exchange(session, user_prompt)
+        ]
+        if image_ref:
+            messages[0]["content"].append({"type": "input_image", "file_id": image_ref})
+        elif image:
+            messages[0]["content"].append({
+                "type": "input_image",
+                "image_url": f"data:{image_mime_type(image.head())};base64,{IMAGE_PLACEHOLDER}"
+            })
+
+        payload = {
+            "model": model_name,
+            "input": messages,
+            "instructions": system_prompt,
+            "temperature": 0.4,
+        }
+        if session is not None:
+            # OpenAI caches shared prompt prefixes automatically; the key routes
+            # a session's follow-ups to the same cache
+            payload["prompt_cache_key"] = session.id
+        if stream:
+            payload["stream"] = True
+        return url, headers, payload
+
+    def response_text(self, data: dict) -> str:
+        return data.get("output_text") or ""
+
+    def stream_event(self, event: str, data):
+        return openai_event(event, data)
+
+    def upload_image(self, image: ImagePayload) -> str:
+        res = self.transport.client("openai").post(
+            f"{openai_base_url()}/files",
+            headers={"Authorization": f"Bearer {self.api_key()}"},
+            data={
+                "purpose": "vision",
+                "expires_after[anchor]": "created_at",
+                "expires_after[seconds]": "86400",
+            },
+            files={"file": ("screenshot", image.open(), image_mime_type(image.head()))},
+        )
+        res.raise_for_status()
+        return res.json()["id"]
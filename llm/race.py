@@ -0,0 +1,193 @@
+import os
+import json
+import asyncio
+import threading
+from core.paths import app_support_dir
+from core.stats import percentile
+from llm.registry import PROVIDERS, error_prefixes
+
+DEFAULT_RACE_ENGINES = ["gemini", "openai", "claude", "ollama"]
+# Hedge delay used until an engine has enough history for a real p95
+DEFAULT_HEDGE_DELAY = 2.0
+MIN_SAMPLES_FOR_P95 = 5
+MAX_SAMPLES = 100
+
+
+def is_error_response(text: str) -> bool:
+    return text.lstrip().startswith(error_prefixes())
+
+
+class LatencyHistory:
+    """
+    Rolling per-engine time-to-first-token samples, persisted as JSON so
+    hedge delays stay tuned across runs.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(app_support_dir(), "latency_history.json")
+        self._lock = threading.Lock()
+        # Serializes writers so an older snapshot never replaces a newer one
+        self._save_lock = threading.Lock()
+        self.samples = self._load()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return {k: [float(x) for x in v][-MAX_SAMPLES:] for k, v in data.items() if isinstance(v, list)}
+        except (OSError, ValueError):
+            return {}
+
+    def add(self, engine: str, seconds: float):
+        """Counts a sample in memory; save() persists it."""
+        with self._lock:
+            values = self.samples.setdefault(engine, [])
+            values.append(round(seconds, 4))
+            del values[:-MAX_SAMPLES]
+
+    def record(self, engine: str, seconds: float):
+        self.add(engine, seconds)
+        self.save()
+
+    def record_soon(self, engine: str, seconds: float):
+        """record() from the event loop: the sample counts at once, the file is written on a worker thread."""
+        self.add(engine, seconds)
+        asyncio.get_running_loop().run_in_executor(None, self.save)
+
+    def save(self):
+        with self._save_lock:
+            with self._lock:
+                snapshot = json.dumps(self.samples)
+            try:
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(snapshot)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                pass
+
+    def p50(self, engine: str) -> float:
+        with self._lock:
+            values = list(self.samples.get(engine, []))
+        return percentile(values, 0.5) if values else float("inf")
+
+    def p95(self, engine: str) -> float:
+        with self._lock:
+            values = list(self.samples.get(engine, []))
+        if len(values) < MIN_SAMPLES_FOR_P95:
+            return DEFAULT_HEDGE_DELAY
+        return percentile(values, 0.95)
+
+    def rank(self, engines: list[str]) -> list[str]:
+        """Fastest median first; engines with no history keep their configured order."""
+        return sorted(engines, key=lambda e: (self.p50(e), engines.index(e)))
+
+
+def race_config() -> tuple[list[str], str]:
+    raw = (os.environ.get("SKIBIDYSAURUS_RACE_ENGINES", "") or "").strip()
+    engines = [e.strip() for e in raw.split(",") if e.strip()] if raw else list(DEFAULT_RACE_ENGINES)
+    engines = [e for e in dict.fromkeys(engines) if e in PROVIDERS]
+    mode = (os.environ.get("SKIBIDYSAURUS_RACE_MODE", "") or "hedged").strip().lower()
+    if mode not in ("hedged", "parallel"):
+        mode = "hedged"
+    return engines, mode
+
+
+async def astream_race(
+    stream_engine,
+    engines: list[str],
+    mode: str,
+    history: LatencyHistory,
+):
+    """
+    Races `engines` and yields the winner's text deltas.
+
+    `stream_engine(engine)` must return an async iterator of deltas for one
+    engine. In "parallel" mode every engine starts at once; in "hedged" mode
+    the next engine starts only after the previous one's p95 delay, or as
+    soon as it fails. The first engine whose first chunk is not an error
+    string wins and every other contender is cancelled.
+    """
+    if not engines:
+        yield "Error: no engines configured for race (set SKIBIDYSAURUS_RACE_ENGINES)."
+        return
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    tasks = {}
+    errors = []
+    waiting = list(history.rank(engines)) if mode == "hedged" else list(engines)
+
+    async def contend(engine: str):
+        started = loop.time()
+        first = True
+        try:
+            async for delta in stream_engine(engine):
+                if first:
+                    first = False
+                    if is_error_response(delta):
+                        await queue.put((engine, "error", delta))
+                        return
+                    # The winner's first delta shouldn't wait on the disk
+                    history.record_soon(engine, loop.time() - started)
+                await queue.put((engine, "delta", delta))
+            if first:
+                await queue.put((engine, "error", f"Error: {engine} returned an empty response."))
+            else:
+                await queue.put((engine, "end", None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put((engine, "error", f"Error: {engine} failed: {e}"))
+
+    def launch_next():
+        engine = waiting.pop(0)
+        tasks[engine] = asyncio.create_task(contend(engine))
+        return loop.time() + history.p95(engine)
+
+    winner = None
+    next_launch_at = None
+    try:
+        if mode == "parallel":
+            while waiting:
+                launch_next()
+        elif waiting:
+            next_launch_at = launch_next()
+
+        while True:
+            timeout = None
+            if winner is None and waiting and next_launch_at is not None:
+                timeout = max(0.0, next_launch_at - loop.time())
+            try:
+                engine, kind, value = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                # Hedge: the leader is slower than its usual p95, start the next engine too.
+                next_launch_at = launch_next()
+                continue
+
+            if winner is None:
+                if kind == "error":
+                    errors.append(value)
+                    tasks.pop(engine, None)
+                    if waiting:
+                        next_launch_at = launch_next()
+                    elif not tasks:
+                        yield "Error: every raced engine failed.\n" + "\n".join(errors)
+                        return
+                    continue
+                winner = engine
+                for other, task in tasks.items():
+                    if other != winner:
+                        task.cancel()
+
+            if engine != winner:
+                continue
+            if kind == "end":
+                return
+            yield value
+            if kind == "error":
+                return
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
@@ -0,0 +1,124 @@
+import os
+import threading
+from dataclasses import dataclass, field
+
+
+@dataclass(frozen=True)
+class Capabilities:
+    # Accepts a screenshot; the encoding stage drops it for engines that don't
+    vision: bool = True
+    # Streams deltas; otherwise stream() falls back to one call() chunk
+    streaming: bool = True
+    # Screenshots seen twice are uploaded once and referenced by file id
+    file_uploads: bool = False
+    # Decodes WebP; llama.cpp-based servers only take JPEG/PNG
+    webp: bool = True
+    # core.imageprep tier screenshots are downscaled to
+    image_tier: str = "medium"
+    # Largest image the API accepts inline; bigger ones are re-encoded first
+    max_image_bytes: int = 20 * 1024 * 1024
+    # Tokens per request for the default model; llm.budget takes a share for selected text
+    context_window: int = 128_000
+
+
+@dataclass(frozen=True)
+class ProviderSpec:
+    """
+    One engine: where its Provider class lives ("module:Class", imported on
+    first use so an SDK is never loaded for an engine the user hasn't
+    picked), its default model, how its errors are labelled, and what it can do.
+    """
+
+    name: str
+    target: str
+    default_model: str
+    label: str
+    capabilities: Capabilities = field(default_factory=Capabilities)
+
+
+_lock = threading.Lock()
+PROVIDERS = {}
+
+
+def register(spec: ProviderSpec) -> ProviderSpec:
+    """Adds or replaces an engine. Plugins outside llm/providers call this at import time."""
+    with _lock:
+        PROVIDERS[spec.name] = spec
+    return spec
+
+
+def spec(engine: str) -> ProviderSpec:
+    """The spec for `engine`, or None for "race" and unknown engines."""
+    return PROVIDERS.get(engine)
+
+
+def capabilities(engine: str) -> Capabilities:
+    found = PROVIDERS.get(engine)
+    return found.capabilities if found is not None else None
+
+
+def default_model(engine: str) -> str:
+    found = PROVIDERS.get(engine)
+    return found.default_model if found is not None else ""
+
+
+def engines() -> list:
+    return list(PROVIDERS)
+
+
+def error_prefixes() -> tuple:
+    """The "<Label> Error:" prefixes responses from every registered engine can fail with."""
+    return ("Error:",) + tuple(f"{found.label} Error:" for found in list(PROVIDERS.values()))
+
+
+def describe() -> dict:
+    """Engines with their default model and capabilities, for the daemon's `providers` op."""
+    return {
+        name: {"default_model": found.default_model, **found.capabilities.__dict__}
+        for name, found in list(PROVIDERS.items())
+    }
+
+
+register(ProviderSpec(
+    "gemini",
+    "llm.providers.gemini:GeminiProvider",
+    "gemini-2.5-flash",
+    "Gemini",
+    Capabilities(file_uploads=True, context_window=1_000_000),
+))
+register(ProviderSpec(
+    "ollama",
+    "llm.providers.ollama:OllamaProvider",
+    "llava:latest",
+    "Ollama",
+    # Ollama's default num_ctx; raise it with OLLAMA_CONTEXT_LENGTH on the server
+    Capabilities(webp=False, image_tier="low", context_window=4096),
+))
+register(ProviderSpec(
+    "openai",
+    "llm.providers.openai:OpenAIProvider",
+    "gpt-4.1-mini",
+    "OpenAI",
+    Capabilities(file_uploads=True, context_window=128_000),
+))
+register(ProviderSpec(
+    "claude",
+    "llm.providers.claude:ClaudeProvider",
+    "claude-3-5-haiku-latest",
+    "Claude",
+    Capabilities(file_uploads=True, max_image_bytes=5 * 1024 * 1024, context_window=200_000),
+))
+register(ProviderSpec(
+    "llamacpp",
+    "llm.providers.llamacpp:LlamaCppProvider",
+    # llama-server answers with whatever model it was started with
+    "default",
+    "llama.cpp",
+    # Vision needs the server started with --mmproj
+    Capabilities(
+        vision=os.environ.get("LLAMACPP_VISION", "0") == "1",
+        webp=False,
+        image_tier="low",
+        context_window=int(os.environ.get("LLAMACPP_CONTEXT_LENGTH", "") or 4096),
+    ),
+))
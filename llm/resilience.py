@@ -0,0 +1,582 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+import httpx
+from core import tracing
+
+# Statuses worth another attempt; 529 is Anthropic's "overloaded"
+RETRY_STATUSES = (408, 425, 429, 500, 502, 503, 504, 529)
+# Statuses that mean "send less": they shrink the concurrency limit
+THROTTLE_STATUSES = (429, 503, 529)
+# Statuses that count against the circuit breaker
+FAILURE_STATUSES = (500, 502, 503, 504, 529)
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+
+DEFAULT_ATTEMPTS = 3
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 20.0
+# A Retry-After longer than this fails the request instead of leaving the user waiting
+MAX_RETRY_WAIT = 30.0
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+# AIMD: start here, add one slot per limit's worth of successes, halve on throttling
+INITIAL_CONCURRENCY = 16
+MAX_CONCURRENCY = 64
+DECREASE_FACTOR = 0.5
+# httpcore trace events timed into each "http" span, by the event's last name part
+HTTP_PHASES = {
+    "connect_tcp": "connect_ms",
+    "start_tls": "tls_ms",
+    "send_request_body": "send_ms",
+    "receive_response_headers": "headers_ms",
+}
+
+
+_UNITS = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+
+
+def _duration(value: str) -> float:
+    """'1.5', '20ms', '6m0s', '1h2m3.5s' (OpenAI's reset format) in seconds; None if unparseable."""
+    value = (value or "").strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total, number = 0.0, ""
+    i = 0
+    while i < len(value):
+        c = value[i]
+        if c.isdigit() or c == ".":
+            number += c
+        elif number:
+            unit = "ms" if value[i:i + 2] == "ms" else c
+            if unit not in _UNITS:
+                return None
+            total += float(number) * _UNITS[unit]
+            i += len(unit) - 1
+            number = ""
+        else:
+            return None
+        i += 1
+    return total if not number and value else None
+
+
+def retry_after(headers) -> float:
+    """
+    Seconds the server asked us to wait, from Retry-After (seconds or an HTTP
+    date), retry-after-ms, or the providers' rate-limit reset headers. None
+    when it didn't say.
+    """
+    if headers is None:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        seconds = _duration(value)
+        if seconds is not None:
+            return max(0.0, seconds)
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    resets = [_duration(headers.get(name, "")) for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")]
+    resets = [r for r in resets if r]
+    return max(resets) if resets else None
+
+
+def exhausted_for(headers) -> float:
+    """On a successful response, how long until the rate-limit window reopens if it's used up; else 0."""
+    for kind in ("requests", "tokens"):
+        if headers.get(f"x-ratelimit-remaining-{kind}") == "0":
+            return _duration(headers.get(f"x-ratelimit-reset-{kind}", "")) or 0.0
+    return 0.0
+
+
+def backoff(attempt: int, hint: float = None) -> float:
+    """
+    The server's hint plus a little jitter when it gave one, so callers told
+    the same time don't all come back at once; full-jitter exponential
+    backoff when it didn't.
+    """
+    if hint:
+        return hint + random.uniform(0, hint * 0.1)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+class CircuitOpenError(httpx.TransportError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Closed until `threshold` consecutive failures, then open (requests fail
+    fast) for `cooldown` seconds, then half-open: one trial request decides
+    whether it closes again or reopens. Every way a request can end has to
+    reach success(), failure() or abandon(), or the trial never settles.
+    """
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.open_for = cooldown
+        self.opens = 0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.open_for:
+                self.state = "half_open"
+                self._trial = False
+            if self.state == "half_open":
+                if self._trial:
+                    return False
+                self._trial = True
+                return True
+            return self.state == "closed"
+
+    def retry_in(self) -> float:
+        return max(0.0, self.opened_at + self.open_for - time.monotonic())
+
+    def success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial = False
+
+    def failure(self, hint: float = None):
+        with self._lock:
+            self._fail(hint)
+
+    def abandon(self, hint: float = None):
+        """
+        A request that ended without saying whether the server is healthy
+        (throttled, timed out, cancelled): a half-open trial counts as failed,
+        otherwise nothing changes.
+        """
+        with self._lock:
+            if self.state == "half_open":
+                self._fail(hint)
+
+    def _fail(self, hint: float = None):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.threshold:
+            if self.state != "open":
+                self.opens += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self.open_for = max(self.cooldown, hint or 0.0)
+            self._trial = False
+
+
+class AIMDLimiter:
+    """
+    Concurrency limit that grows by one slot per limit's worth of successes
+    while it is the bottleneck, and halves when the provider throttles.
+    Throttles of requests sent before the last halving are the same
+    congestion event and don't halve it again. Usable from threads (acquire)
+    and from any event loop (aacquire) at once; a released slot goes
+    straight to the longest waiter.
+    """
+
+    def __init__(self, initial: int = INITIAL_CONCURRENCY, minimum: int = 1, maximum: int = MAX_CONCURRENCY):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.decreases = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def _try(self) -> bool:
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def acquire(self):
+        with self._lock:
+            if self._try():
+                return
+            event = threading.Event()
+            self._waiters.append((None, event))
+        event.wait()
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try():
+                return
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Still queued: just leave. Already handed a slot: _hand_over sees the
+            # cancelled future and gives the slot back.
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif future.done() and not future.cancelled():
+                    # Handed a slot and then cancelled before resuming
+                    self.in_flight -= 1
+                    self._wake()
+            raise
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            loop, waiter = self._waiters.popleft()
+            self.in_flight += 1
+            if loop is None:
+                waiter.set()
+            else:
+                loop.call_soon_threadsafe(self._hand_over, waiter)
+
+    def _hand_over(self, future):
+        if future.done():
+            self.release()
+        else:
+            future.set_result(True)
+
+    def increase(self):
+        with self._lock:
+            # Only a limit that is actually holding requests back has earned a raise
+            if self.in_flight < int(self.limit) and not self._waiters:
+                return
+            self.limit = min(self.maximum, self.limit + 1.0 / max(1.0, self.limit))
+            self._wake()
+
+    def decrease(self, epoch: int):
+        """`epoch` is `decreases` as it was when the throttled request was sent."""
+        with self._lock:
+            if epoch != self.decreases:
+                return
+            self.limit = max(self.minimum, self.limit * DECREASE_FACTOR)
+            self.decreases += 1
+
+
+class ProviderResilience:
+    """Retry policy, circuit breaker, adaptive concurrency and counters for one provider."""
+
+    def __init__(self, name: str, attempts: int = None):
+        self.name = name
+        self.attempts = max(1, attempts or int(os.environ.get("SKIBIDYSAURUS_RETRY_ATTEMPTS", "") or DEFAULT_ATTEMPTS))
+        self.max_wait = float(os.environ.get("SKIBIDYSAURUS_RETRY_MAX_WAIT", "") or MAX_RETRY_WAIT)
+        self.breaker = CircuitBreaker()
+        self.limiter = AIMDLimiter(int(os.environ.get("SKIBIDYSAURUS_CONCURRENCY", "") or INITIAL_CONCURRENCY))
+        # Set from rate-limit headers when the window is used up; requests wait it out
+        self.paused_until = 0.0
+        self.counters = {
+            "requests": 0,
+            "attempts": 0,
+            "retries": 0,
+            "throttled": 0,
+            "server_errors": 0,
+            "connection_errors": 0,
+            "rejected": 0,
+            "gave_up": 0,
+        }
+        self.last_retry_after = None
+
+    def check(self):
+        """Raises CircuitOpenError while the breaker is open."""
+        if not self.breaker.allow():
+            self.counters["rejected"] += 1
+            raise CircuitOpenError(
+                f"{self.name} is failing; not sending requests for {self.breaker.retry_in():.0f}s"
+            )
+
+    def pause(self) -> float:
+        return max(0.0, self.paused_until - time.monotonic())
+
+    def outcome(self, status: int, headers, epoch: int) -> float:
+        """
+        Records one response and returns how long to wait before retrying it,
+        or None when it shouldn't be retried (success, client error, or a
+        server-requested wait longer than we are willing to hold the user).
+        """
+        if status < 400:
+            self.breaker.success()
+            self.limiter.increase()
+            reset = exhausted_for(headers)
+            if reset:
+                self.paused_until = max(self.paused_until, time.monotonic() + reset)
+            return None
+        hint = retry_after(headers)
+        self.last_retry_after = hint
+        if status in THROTTLE_STATUSES:
+            self.limiter.decrease(epoch)
+        if status == 429:
+            self.counters["throttled"] += 1
+            if hint:
+                self.paused_until = max(self.paused_until, time.monotonic() + hint)
+        if status in FAILURE_STATUSES:
+            self.counters["server_errors"] += 1
+            self.breaker.failure(hint)
+        elif status in RETRY_STATUSES:
+            # Throttled or timed out (429, 408): no verdict on the server's health
+            self.breaker.abandon(hint)
+        else:
+            # The server answered; a client error (401, 404, ...) isn't an outage
+            self.breaker.success()
+        if status not in RETRY_STATUSES or (hint or 0) > self.max_wait:
+            return None
+        return hint or 0.0
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "breaker": self.breaker.state,
+            "breaker_opens": self.breaker.opens,
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "in_flight": self.limiter.in_flight,
+            "limit_decreases": self.limiter.decreases,
+            "last_retry_after": self.last_retry_after,
+        }
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class _ReleasingSyncStream(httpx.SyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+
+def _once(fn):
+    done = []
+
+    def wrapper():
+        if not done:
+            done.append(True)
+            fn()
+    return wrapper
+
+
+def _http_span(policy: ProviderResilience, request: httpx.Request, attempt: int, queued: float):
+    """
+    An "http" span for one attempt, up to the response headers. While tracing,
+    httpcore's trace extension times connect, TLS, sending the body and
+    waiting for the headers into it; queue_ms is the wait for a local slot.
+    """
+    span = tracing.start(
+        "http",
+        provider=policy.name,
+        attempt=attempt + 1,
+        request_bytes=int(request.headers.get("content-length") or 0),
+        queue_ms=round((time.perf_counter() - queued) * 1000, 1),
+    )
+    if span is tracing.NO_SPAN:
+        return span, None
+    started = {}
+
+    def on_event(name: str, info: dict):
+        phase, _, state = name.rpartition(".")
+        phase = phase.rpartition(".")[2]
+        if phase not in HTTP_PHASES:
+            return
+        if state == "started":
+            started[phase] = time.perf_counter()
+        elif phase in started:
+            span.set(**{HTTP_PHASES[phase]: round((time.perf_counter() - started.pop(phase)) * 1000, 1)})
+
+    return span, on_event
+
+
+class ResilientAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps the pooled transport for one provider: waits for a concurrency slot
+    (held until the response is closed, so streamed answers count), fails
+    fast while the breaker is open, and retries throttled, overloaded and
+    dropped requests with backoff before any byte reaches the caller.
+    """
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, policy: ProviderResilience):
+        self.inner = inner
+        self.policy = policy
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        policy = self.policy
+        policy.counters["requests"] += 1
+        for attempt in range(policy.attempts):
+            policy.check()
+            queued = time.perf_counter()
+            try:
+                if policy.pause():
+                    await asyncio.sleep(policy.pause())
+                await policy.limiter.aacquire()
+            except BaseException:
+                # Cancelled while waiting; a half-open trial must not stay claimed
+                policy.breaker.abandon()
+                raise
+            release = _once(policy.limiter.release)
+            policy.counters["attempts"] += 1
+            epoch = policy.limiter.decreases
+            span, on_event = _http_span(policy, request, attempt, queued)
+            if on_event is not None:
+                async def trace(name, info, on_event=on_event):
+                    on_event(name, info)
+                request.extensions["trace"] = trace
+            try:
+                response = await self.inner.handle_async_request(request)
+            except RETRY_EXCEPTIONS as e:
+                span.finish(error=type(e).__name__)
+                release()
+                policy.counters["connection_errors"] += 1
+                policy.breaker.failure()
+                if attempt + 1 >= policy.attempts:
+                    policy.counters["gave_up"] += 1
+                    raise
+                policy.counters["retries"] += 1
+                await asyncio.sleep(backoff(attempt))
+                continue
+            except BaseException as e:
+                span.finish(error=type(e).__name__)
+                release()
+                # Timed out or cancelled: no verdict, but a half-open trial is over
+                policy.breaker.abandon()
+                raise
+            span.finish(status=response.status_code)
+            wait = policy.outcome(response.status_code, response.headers, epoch)
+            if wait is None or attempt + 1 >= policy.attempts:
+                if wait is not None:
+                    policy.counters["gave_up"] += 1
+                return httpx.Response(
+                    response.status_code,
+                    headers=response.headers,
+                    stream=_ReleasingStream(response.stream, release),
+                    extensions=response.extensions,
+                )
+            await response.aread()
+            await response.aclose()
+            release()
+            policy.counters["retries"] += 1
+            await asyncio.sleep(backoff(attempt, wait))
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+class ResilientTransport(httpx.BaseTransport):
+    """ResilientAsyncTransport for the blocking clients (CLI calls, uploads)."""
+
+    def __init__(self, inner: httpx.BaseTransport, policy: ProviderResilience):
+        self.inner = inner
+        self.policy = policy
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        policy = self.policy
+        policy.counters["requests"] += 1
+        for attempt in range(policy.attempts):
+            policy.check()
+            queued = time.perf_counter()
+            try:
+                if policy.pause():
+                    time.sleep(policy.pause())
+                policy.limiter.acquire()
+            except BaseException:
+                policy.breaker.abandon()
+                raise
+            release = _once(policy.limiter.release)
+            policy.counters["attempts"] += 1
+            epoch = policy.limiter.decreases
+            span, on_event = _http_span(policy, request, attempt, queued)
+            if on_event is not None:
+                request.extensions["trace"] = on_event
+            try:
+                response = self.inner.handle_request(request)
+            except RETRY_EXCEPTIONS as e:
+                span.finish(error=type(e).__name__)
+                release()
+                policy.counters["connection_errors"] += 1
+                policy.breaker.failure()
+                if attempt + 1 >= policy.attempts:
+                    policy.counters["gave_up"] += 1
+                    raise
+                policy.counters["retries"] += 1
+                time.sleep(backoff(attempt))
+                continue
+            except BaseException as e:
+                span.finish(error=type(e).__name__)
+                release()
+                # Timed out or cancelled: no verdict, but a half-open trial is over
+                policy.breaker.abandon()
+                raise
+            span.finish(status=response.status_code)
+            wait = policy.outcome(response.status_code, response.headers, epoch)
+            if wait is None or attempt + 1 >= policy.attempts:
+                if wait is not None:
+                    policy.counters["gave_up"] += 1
+                return httpx.Response(
+                    response.status_code,
+                    headers=response.headers,
+                    stream=_ReleasingSyncStream(response.stream, release),
+                    extensions=response.extensions,
+                )
+            response.read()
+            response.close()
+            release()
+            policy.counters["retries"] += 1
+            time.sleep(backoff(attempt, wait))
+
+    def close(self):
+        self.inner.close()
+
+
+class Resilience:
+    """One ProviderResilience per provider, shared by its sync and async pools."""
+
+    def __init__(self):
+        self._policies = {}
+        self._lock = threading.Lock()
+
+    def policy(self, provider: str) -> ProviderResilience:
+        with self._lock:
+            if provider not in self._policies:
+                self._policies[provider] = ProviderResilience(provider)
+            return self._policies[provider]
+
+    def stats(self) -> dict:
+        with self._lock:
+            policies = dict(self._policies)
+        return {name: policy.stats() for name, policy in policies.items()}
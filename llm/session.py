@@ -0,0 +1,134 @@
+import os
+import uuid
+import threading
+from dataclasses import dataclass
+from core.imagebuf import ImagePayload
+from llm.budget import estimate_tokens
+
+# Rough budget for replayed history (turns + summary), in tokens
+DEFAULT_TOKEN_BUDGET = 6000
+# Turns that are always replayed verbatim, however long
+KEEP_RECENT_TURNS = 2
+# What a screenshot costs on the cloud engines at the medium tier, roughly
+IMAGE_TOKENS = 1000
+# Per-turn excerpt lengths when older turns are folded into the summary
+SUMMARY_PROMPT_CHARS = 200
+SUMMARY_RESPONSE_CHARS = 400
+
+
+@dataclass
+class Turn:
+    prompt: str
+    response: str
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.prompt) + estimate_tokens(self.response)
+
+
+class ConversationSession:
+    """
+    Multi-turn state for one overlay session (or one daemon session id).
+    Providers replay turns() in their native message format with the
+    session's screenshot on the first user message, so every request shares
+    a stable prefix (system prompt, image, earlier turns) that provider-side
+    prompt caching can reuse. When the replayed history would exceed the
+    token budget, the oldest turns are folded into a short extractive
+    summary that rides along with the system prompt.
+    """
+
+    def __init__(self, token_budget: int = None, session_id: str = None):
+        if token_budget is None:
+            token_budget = int(os.environ.get("SKIBIDYSAURUS_SESSION_TOKEN_BUDGET", "") or DEFAULT_TOKEN_BUDGET)
+        self.token_budget = token_budget
+        self.id = session_id or uuid.uuid4().hex
+        self.image = ImagePayload()
+        self.engine = ""
+        self.summary = ""
+        self._turns = []
+        # Bumped whenever the replayed prefix changes shape (compaction, new
+        # image), so provider caches built on the old prefix are dropped
+        self.generation = 0
+        # Per-engine provider state (e.g. Gemini cached-content names), keyed by engine
+        self.provider_state = {}
+        self.compacted_turns = 0
+        self._lock = threading.Lock()
+
+    def attach(self, image: ImagePayload, engine: str) -> ImagePayload:
+        """
+        The screenshot for this request: the session keeps the first one it
+        sees and reuses it for follow-ups. Switching engines swaps in the new
+        engine's image (it was prepared for a different tier and format).
+        """
+        image = ImagePayload.coerce(image)
+        with self._lock:
+            if engine != self.engine or (image and not self.image):
+                self.image = image
+                self.engine = engine
+                self.generation += 1
+            return self.image
+
+    def turns(self) -> list:
+        with self._lock:
+            return list(self._turns)
+
+    def system_prompt(self, base: str) -> str:
+        with self._lock:
+            summary = self.summary
+        if not summary:
+            return base
+        return f"{base}\n\nEarlier in this conversation (summarized):\n{summary}"
+
+    def has_history(self) -> bool:
+        with self._lock:
+            return bool(self._turns) or bool(self.summary)
+
+    def record(self, prompt: str, response: str):
+        with self._lock:
+            self._turns.append(Turn(prompt, response))
+            self._compact()
+
+    def _compact(self):
+        """Folds the oldest turns into the summary until the replay fits the budget."""
+        def used():
+            image_tokens = IMAGE_TOKENS if self.image else 0
+            return image_tokens + estimate_tokens(self.summary) + sum(t.tokens for t in self._turns)
+
+        folded = False
+        while used() > self.token_budget and len(self._turns) > KEEP_RECENT_TURNS:
+            turn = self._turns.pop(0)
+            excerpt = (
+                f"- User: {_clip(turn.prompt, SUMMARY_PROMPT_CHARS)}\n"
+                f"  Assistant: {_clip(turn.response, SUMMARY_RESPONSE_CHARS)}"
+            )
+            self.summary = f"{self.summary}\n{excerpt}".strip()
+            self.compacted_turns += 1
+            folded = True
+        # A summary that alone blows the budget keeps only its newest lines
+        while estimate_tokens(self.summary) > self.token_budget // 2 and "\n- " in self.summary:
+            self.summary = self.summary[self.summary.index("\n- ") + 1:]
+        if folded:
+            self.generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._turns = []
+            self.summary = ""
+            self.image = ImagePayload()
+            self.engine = ""
+            self.generation += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "id": self.id,
+                "turns": len(self._turns),
+                "compacted_turns": self.compacted_turns,
+                "history_tokens": estimate_tokens(self.summary) + sum(t.tokens for t in self._turns),
+                "token_budget": self.token_budget,
+            }
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
@@ -0,0 +1,298 @@
+import re
+import json
+import base64
+import binascii
+import threading
+from dataclasses import dataclass
+from urllib.parse import quote, unquote
+
+# Instructions longer than this are never mechanical enough to answer locally
+MAX_INSTRUCTION_CHARS = 80
+
+# The two ways selected text reaches a prompt: backend.py's and the Qt overlay's inline edit
+_BACKEND_EDIT = re.compile(r"Edit this: '(.*)' -> \n\nQuery: (.*)", re.DOTALL)
+_OVERLAY_EDIT = re.compile(r"Edit this: '(.*)' -> ?(.*)", re.DOTALL)
+# Politeness and words naming the text rather than what to do with it
+_POLITE = re.compile(r"^(?:(?:please|pls|can you|could you|would you|can u|kindly|just)\s+)+|\s+(?:please|pls|thanks|thank you)$")
+_FILLER = re.compile(r"\b(?:this|these|that|it|the|my|all|selected|selection|highlighted|text|string|following|of|for me)\b")
+# Convert/change/make ... (to/into) <target>
+_VERB = r"(?:(?:convert|change|make|turn|transform|put|rewrite|format)\s+)?(?:(?:to|into|in|as)\s+)?"
+# Identifier words: runs of letters and digits, split again at camelCase boundaries
+_WORD_RUN = re.compile(r"[^\W_]+")
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])")
+
+
+@dataclass(frozen=True)
+class Transform:
+    """
+    A deterministic text operation the LLM would otherwise be asked to do:
+    `pattern` has to match the whole normalized instruction (see
+    normalize()), and `apply` returns the result, or None when the text
+    isn't something it can handle (invalid JSON), so the request goes to
+    the engine after all.
+    """
+
+    name: str
+    pattern: str
+    apply: object
+
+    def matches(self, instruction: str) -> bool:
+        return _compiled(self.pattern).fullmatch(instruction) is not None
+
+
+_lock = threading.Lock()
+TRANSFORMS = {}
+_patterns = {}
+
+
+def _compiled(pattern: str):
+    compiled = _patterns.get(pattern)
+    if compiled is None:
+        compiled = _patterns[pattern] = re.compile(pattern)
+    return compiled
+
+
+def register(transform: Transform) -> Transform:
+    """Adds or replaces a transform; the first registered that matches wins."""
+    with _lock:
+        TRANSFORMS[transform.name] = transform
+    return transform
+
+
+def normalize(instruction: str) -> str:
+    """Lowercased, without politeness, filler words or trailing punctuation."""
+    text = " ".join(instruction.lower().split()).strip(" .!?:")
+    text = _POLITE.sub("", text)
+    return " ".join(_FILLER.sub(" ", text).split())
+
+
+def split_request(prompt: str, context: str = ""):
+    """
+    (instruction, text) for a prompt: the text is `context`, the selection
+    an "Edit this: '...' ->" prompt carries, or what follows the first line
+    or colon of "sort these lines:\\n...". Text is "" when there is none.
+    """
+    if context:
+        return prompt, context
+    found = _BACKEND_EDIT.fullmatch(prompt) or _OVERLAY_EDIT.fullmatch(prompt)
+    if found:
+        return found.group(2), found.group(1)
+    head, newline, rest = prompt.partition("\n")
+    if newline and rest.strip():
+        return head, rest
+    head, colon, rest = prompt.partition(":")
+    if colon and rest.strip():
+        return head, rest.strip()
+    return prompt, ""
+
+
+def find(instruction: str):
+    """The transform whose pattern matches `instruction`, or None."""
+    if len(instruction) > MAX_INSTRUCTION_CHARS:
+        return None
+    normalized = normalize(instruction)
+    if not normalized:
+        return None
+    for transform in list(TRANSFORMS.values()):
+        if transform.matches(normalized):
+            return transform
+    return None
+
+
+def answer(prompt: str, context: str = ""):
+    """
+    (transform name, result) when a registered transform answers the
+    prompt outright, otherwise None and the request goes to the engine.
+    """
+    instruction, text = split_request(prompt, context)
+    if not text.strip():
+        return None
+    transform = find(instruction)
+    if transform is None:
+        return None
+    try:
+        result = transform.apply(text)
+    except Exception:
+        return None
+    if result is None:
+        return None
+    return transform.name, result
+
+
+# -- Built-in transforms -------------------------------------------------------
+
+
+def _per_line(convert):
+    """Applies `convert` to every non-blank line, keeping its indentation."""
+    def apply(text: str) -> str:
+        lines = []
+        for line in text.splitlines():
+            stripped = line.lstrip()
+            lines.append(line[: len(line) - len(stripped)] + convert(stripped) if stripped.strip() else line)
+        return "\n".join(lines)
+    return apply
+
+
+def _words(line: str) -> list:
+    return [word for run in _WORD_RUN.findall(line) for word in _CAMEL_BOUNDARY.sub(" ", run).split()]
+
+
+def _title_word(match) -> str:
+    word = match.group(0)
+    for i, char in enumerate(word):
+        if char.isalpha():
+            return word[:i] + char.upper() + word[i + 1:].lower()
+    return word
+
+
+def _lines(text: str) -> list:
+    return text.splitlines()
+
+
+def _line_order(reorder):
+    """A transform over the list of lines; on a single line it would change nothing, so the engine gets it."""
+    def apply(text: str):
+        lines = _lines(text)
+        if len(lines) < 2:
+            return None
+        return "\n".join(reorder(lines))
+    return apply
+
+
+def _format_json(text: str, indent=2):
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return None
+    if indent is None:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(value, ensure_ascii=False, indent=indent)
+
+
+def _base64_decode(text: str):
+    compact = "".join(text.split())
+    try:
+        decoded = base64.b64decode(compact + "=" * (-len(compact) % 4), validate=True)
+        return decoded.decode("utf-8")
+    except (binascii.Error, ValueError):
+        return None
+
+
+def _count(label: str, count: int) -> str:
+    return f"{count:,} {label}{'' if count == 1 else 's'}"
+
+
+_CASE = r"[\s_-]?case"
+for _transform in (
+    Transform("uppercase", _VERB + rf"(?:upper{_CASE}|caps|capitals|capital letters)", lambda text: text.upper()),
+    Transform("lowercase", _VERB + rf"lower{_CASE}", lambda text: text.lower()),
+    Transform(
+        "title_case",
+        _VERB + rf"(?:title{_CASE}|capitali[sz]e (?:each|every) word|capitali[sz]e words)",
+        lambda text: re.sub(r"\S+", _title_word, text),
+    ),
+    Transform("snake_case", _VERB + rf"snake{_CASE}", _per_line(lambda line: "_".join(w.lower() for w in _words(line)))),
+    Transform(
+        "constant_case",
+        _VERB + rf"(?:constant{_CASE}|screaming snake{_CASE}|upper snake{_CASE})",
+        _per_line(lambda line: "_".join(w.upper() for w in _words(line))),
+    ),
+    Transform("kebab_case", _VERB + rf"(?:kebab|dash){_CASE}", _per_line(lambda line: "-".join(w.lower() for w in _words(line)))),
+    Transform(
+        "camel_case",
+        _VERB + rf"camel{_CASE}",
+        _per_line(lambda line: "".join(w.lower() if i == 0 else w[:1].upper() + w[1:].lower() for i, w in enumerate(_words(line)))),
+    ),
+    Transform(
+        "pascal_case",
+        _VERB + rf"pascal{_CASE}",
+        _per_line(lambda line: "".join(w[:1].upper() + w[1:].lower() for w in _words(line))),
+    ),
+    Transform(
+        "sort_lines_descending",
+        r"(?:sort|order)(?: lines)?(?: alphabetically)? (?:descending|in descending order|reverse|in reverse(?: order)?|z-a|z to a)|reverse sort(?: lines)?",
+        _line_order(lambda lines: sorted(lines, key=str.casefold, reverse=True)),
+    ),
+    Transform(
+        "sort_lines",
+        r"(?:sort|order)(?: lines)?(?: alphabetically)?(?: ascending| in ascending order| a-z| a to z)?|alphabeti[sz]e(?: lines)?",
+        _line_order(lambda lines: sorted(lines, key=str.casefold)),
+    ),
+    Transform(
+        "reverse_lines",
+        r"reverse(?: order)? lines|reverse line order|reverse order lines|flip lines",
+        _line_order(reversed),
+    ),
+    Transform(
+        "dedupe_lines",
+        r"(?:remove|delete|drop) (?:duplicates|duplicate lines|duplicated lines|repeated lines)|(?:dedupe|deduplicate)(?: lines)?|unique lines",
+        _line_order(dict.fromkeys),
+    ),
+    Transform(
+        "remove_blank_lines",
+        r"(?:remove|delete|drop|strip) (?:empty|blank) lines",
+        lambda text: "\n".join(line for line in _lines(text) if line.strip()),
+    ),
+    Transform(
+        "trim_whitespace",
+        # "trim this" alone usually means shorten it, which only the engine can do
+        r"(?:trim|strip)(?: trailing| leading)? (?:whitespace|spaces)|(?:remove|delete) (?:trailing|leading|extra) whitespace",
+        lambda text: "\n".join(line.rstrip() for line in text.strip().splitlines()),
+    ),
+    Transform(
+        "collapse_spaces",
+        r"(?:remove|collapse) (?:extra|double|multiple|duplicate) spaces",
+        lambda text: "\n".join(re.sub(r"[ \t]{2,}", " ", line).strip() for line in _lines(text)),
+    ),
+    Transform(
+        "number_lines",
+        r"number lines|add line numbers",
+        lambda text: "\n".join(f"{i}. {line}" for i, line in enumerate(_lines(text), 1)),
+    ),
+    Transform(
+        "count_words",
+        r"(?:count|count number|number|how many) words(?: are there| are in| in| does have)?|word count|count words",
+        lambda text: _count("word", len(text.split())),
+    ),
+    Transform(
+        "count_characters",
+        r"(?:count|count number|number|how many) (?:characters|chars)(?: are there| are in| in| does have)?|(?:character|char) count",
+        lambda text: _count("character", len(text)),
+    ),
+    Transform(
+        "count_lines",
+        r"(?:count|count number|number|how many) lines(?: are there| are in| in| does have)?|line count",
+        lambda text: _count("line", len(_lines(text))),
+    ),
+    Transform(
+        "format_json",
+        r"(?:format|reformat|pretty[\s-]?print|prettify|beautify|indent|tidy|clean up)(?: as)? json|json (?:format|pretty[\s-]?print|prettify|beautify)|pretty[\s-]?print|prettify|beautify",
+        _format_json,
+    ),
+    Transform(
+        "minify_json",
+        r"(?:minify|compact|compress)(?: as)? json|json (?:minify|compact)",
+        lambda text: _format_json(text, indent=None),
+    ),
+    Transform(
+        "base64_encode",
+        r"(?:base ?64|b64)(?: encode)?|(?:encode|convert)(?: (?:to|into|as|with|in))? (?:base ?64|b64)",
+        lambda text: base64.b64encode(text.encode("utf-8")).decode("ascii"),
+    ),
+    Transform(
+        "base64_decode",
+        r"(?:base ?64|b64) decode|decode(?: from)? (?:base ?64|b64)|from (?:base ?64|b64)",
+        _base64_decode,
+    ),
+    Transform(
+        "url_encode",
+        r"(?:url|percent)[\s-]?encode|(?:encode|escape)(?: (?:as|for|to))? (?:url|uri)",
+        lambda text: quote(text, safe=""),
+    ),
+    Transform(
+        "url_decode",
+        r"(?:url|percent)[\s-]?decode|(?:decode|unescape)(?: (?:as|from))? (?:url|uri)",
+        lambda text: unquote(text),
+    ),
+):
+    register(_transform)
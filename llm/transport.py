@@ -0,0 +1,210 @@
+import os
+import json
+import asyncio
+import threading
+import httpx
+from llm.resilience import Resilience, ResilientTransport, ResilientAsyncTransport
+
+try:
+    import h2  # noqa: F401  (httpx only negotiates HTTP/2 when h2 is installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, "") or default)
+    except ValueError:
+        return default
+
+
+# Stands in for the image's base64 in a JSON payload until the body is streamed
+IMAGE_PLACEHOLDER = "@@skibidysaurus-image-base64@@"
+
+
+class JSONImageBody:
+    """
+    A JSON request body whose screenshot is base64-encoded chunk by chunk as
+    it is written to the socket, instead of being built as one large string
+    and then serialised again. The exact Content-Length is known up front,
+    so nothing is sent chunked.
+    """
+
+    def __init__(self, payload: dict, image):
+        text = json.dumps(payload).encode("utf-8")
+        self.before, _, self.after = text.partition(IMAGE_PLACEHOLDER.encode("ascii"))
+        self.image = image
+        self.length = len(self.before) + image.base64_length + len(self.after)
+
+    def headers(self, headers: dict) -> dict:
+        return {**headers, "Content-Type": "application/json", "Content-Length": str(self.length)}
+
+    def __iter__(self):
+        yield self.before
+        yield from self.image.iter_base64()
+        yield self.after
+
+    def aiter(self):
+        return _AsyncJSONImageBody(self)
+
+
+class _AsyncJSONImageBody:
+    """
+    Async view of a JSONImageBody for httpx.AsyncClient. Unlike a generator
+    it can be iterated again, so a retried request resends the same body.
+    """
+
+    def __init__(self, body: JSONImageBody):
+        self.body = body
+
+    async def __aiter__(self):
+        yield self.body.before
+        for chunk in self.body.image.iter_base64():
+            yield chunk
+        yield self.body.after
+
+
+def json_request_kwargs(headers: dict, payload: dict, image, is_async: bool = False) -> dict:
+    """
+    httpx keyword arguments for a JSON POST. When the payload holds
+    IMAGE_PLACEHOLDER, the image is streamed into the body in its place.
+    """
+    if not image or not _contains_placeholder(payload):
+        return {"headers": headers, "json": payload}
+    body = JSONImageBody(payload, image)
+    return {"headers": body.headers(headers), "content": body.aiter() if is_async else body}
+
+
+def _contains_placeholder(value) -> bool:
+    if isinstance(value, str):
+        return IMAGE_PLACEHOLDER in value
+    if isinstance(value, dict):
+        return any(_contains_placeholder(v) for v in value.values())
+    if isinstance(value, list):
+        return any(_contains_placeholder(v) for v in value)
+    return False
+
+
+class ProviderTransport:
+    """
+    Owns one pooled, keep-alive httpx.Client per provider so repeated prompts
+    in a long-lived process reuse TCP/TLS connections instead of handshaking
+    every time. Limits and timeouts come from the constructor or
+    SKIBIDYSAURUS_HTTP_* environment variables. Every pool sends through its
+    provider's resilience policy (retries, circuit breaker, adaptive
+    concurrency), shared between the sync and async pools.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = None,
+        max_keepalive_connections: int = None,
+        keepalive_expiry: float = None,
+        connect_timeout: float = None,
+        read_timeout: float = None,
+        http2: bool = None,
+        verify=True,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections or _env_int("SKIBIDYSAURUS_HTTP_MAX_CONNECTIONS", 10),
+            max_keepalive_connections=max_keepalive_connections or _env_int("SKIBIDYSAURUS_HTTP_MAX_KEEPALIVE", 5),
+            keepalive_expiry=keepalive_expiry or _env_float("SKIBIDYSAURUS_HTTP_KEEPALIVE_EXPIRY", 90.0),
+        )
+        read = read_timeout or _env_float("SKIBIDYSAURUS_HTTP_READ_TIMEOUT", 120.0)
+        self.timeout = httpx.Timeout(
+            read,
+            connect=connect_timeout or _env_float("SKIBIDYSAURUS_HTTP_CONNECT_TIMEOUT", 5.0),
+        )
+        if http2 is None:
+            http2 = os.environ.get("SKIBIDYSAURUS_HTTP2", "1") != "0"
+        self.http2 = bool(http2) and HTTP2_AVAILABLE
+        self.verify = verify
+        self.resilience = Resilience()
+        self._clients = {}
+        self._async_clients = {}
+        self._lock = threading.Lock()
+
+    def client(self, provider: str) -> httpx.Client:
+        with self._lock:
+            client = self._clients.get(provider)
+            if client is None or client.is_closed:
+                client = httpx.Client(
+                    timeout=self.timeout,
+                    transport=ResilientTransport(
+                        httpx.HTTPTransport(limits=self.limits, http2=self.http2, verify=self.verify),
+                        self.resilience.policy(provider),
+                    ),
+                )
+                self._clients[provider] = client
+            return client
+
+    def async_client(self, provider: str) -> httpx.AsyncClient:
+        """
+        Pooled httpx.AsyncClient for `provider` on the running event loop.
+        Async connections belong to one loop, so each loop gets its own pool.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            for key in [k for k in self._async_clients if k[1].is_closed()]:
+                self._async_clients.pop(key)
+            client = self._async_clients.get((provider, loop))
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(timeout=self.timeout, transport=self.async_transport(provider))
+                self._async_clients[(provider, loop)] = client
+            return client
+
+    def async_transport(self, provider: str) -> httpx.AsyncBaseTransport:
+        """A new async connection pool behind `provider`'s resilience policy, for SDKs that build their own client."""
+        return ResilientAsyncTransport(
+            httpx.AsyncHTTPTransport(limits=self.limits, http2=self.http2, verify=self.verify),
+            self.resilience.policy(provider),
+        )
+
+    def warm(self, provider: str, url: str, background: bool = True):
+        """
+        Opens a connection to `url` ahead of the first real request so the
+        TCP and TLS handshakes are already paid. The response itself is ignored.
+        """
+        def _warm():
+            try:
+                self.client(provider).get(url, timeout=self.timeout.connect or 5.0)
+            except httpx.HTTPError:
+                pass
+
+        if not background:
+            _warm()
+            return None
+        thread = threading.Thread(target=_warm, daemon=True)
+        thread.start()
+        return thread
+
+    async def awarm(self, provider: str, url: str):
+        """warm() for the running loop's async pool, which the overlay's queries use."""
+        try:
+            await self.async_client(provider).get(url, timeout=self.timeout.connect or 5.0)
+        except httpx.HTTPError:
+            pass
+
+    def close(self):
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients = {}
+        for client in clients:
+            client.close()
+
+    async def aclose(self):
+        """Closes the async pools that belong to the running loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            keys = [k for k in self._async_clients if k[1] is loop]
+            clients = [self._async_clients.pop(k) for k in keys]
+        for client in clients:
+            await client.aclose()
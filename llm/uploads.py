@@ -0,0 +1,82 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# Provider file handles outlive a session on some APIs; only reuse them this long.
+REFERENCE_TTL_SECONDS = 12 * 3600
+MAX_REFERENCES = 32
+
+
+class ImageUploads:
+    """
+    Remembers provider-side file references for screenshots, so an image
+    sent more than once is uploaded once and referenced afterwards.
+
+    The first time a (provider, image) pair is seen the image goes inline as
+    usual; on the second sighting it is uploaded through `upload(image)`
+    and every later request sends the returned reference instead of the
+    bytes. A provider whose upload fails is not retried for the session.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refs = OrderedDict()
+        self._seen = OrderedDict()
+        self._failed = set()
+        self.uploads = 0
+        self.references = 0
+        self.bytes_saved = 0
+
+    @staticmethod
+    def enabled() -> bool:
+        return os.environ.get("SKIBIDYSAURUS_IMAGE_UPLOADS", "1") != "0"
+
+    def reference(self, provider: str, image, upload):
+        """Returns a provider reference for the ImagePayload, or None to send it inline."""
+        if not image or not self.enabled():
+            return None
+        key = (provider, image.fingerprint)
+        now = time.time()
+        with self._lock:
+            if provider in self._failed:
+                return None
+            entry = self._refs.get(key)
+            if entry is not None and now - entry[1] < REFERENCE_TTL_SECONDS:
+                self._refs.move_to_end(key)
+                self.references += 1
+                self.bytes_saved += image.base64_length
+                return entry[0]
+            if key not in self._seen:
+                self._seen[key] = now
+                while len(self._seen) > MAX_REFERENCES:
+                    self._seen.popitem(last=False)
+                return None
+
+        try:
+            ref = upload(image)
+        except Exception:
+            with self._lock:
+                self._failed.add(provider)
+            return None
+
+        with self._lock:
+            self._refs[key] = (ref, now)
+            while len(self._refs) > MAX_REFERENCES:
+                self._refs.popitem(last=False)
+            self.uploads += 1
+        return ref
+
+    def forget(self, provider: str = None):
+        """Drops references, e.g. after an API key change made them unusable."""
+        with self._lock:
+            for key in [k for k in self._refs if provider is None or k[0] == provider]:
+                del self._refs[key]
+            if provider is None:
+                self._failed.clear()
+            else:
+                self._failed.discard(provider)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"uploads": self.uploads, "references": self.references, "bytes_saved": self.bytes_saved}
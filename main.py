@@ -1,33 +1,168 @@
+import time
+
+# The "startup" span runs from here until the app is ready for the hotkey
+_STARTED = time.perf_counter()
+
+import os
 import sys
-import threading
+import asyncio
 from PyQt6.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QWidget, QVBoxLayout, QPushButton
 from PyQt6.QtGui import QIcon, QAction
-from PyQt6.QtCore import QObject, pyqtSignal, QThread, QTimer
+from PyQt6.QtCore import Qt, QObject, pyqtSignal
 
 from ui.overlay import HoverOverlay
-from core.capture import capture_screen_base64
-from core.injector import inject_text
+from core.capture import capture_screen_bytes
+from core.screenshot import ScreenshotDeduper, stands_in
+from core.imageprep import prepare_image
+from core.imagebuf import ImagePayload
+from core.hotkey import HotkeyListener
+from core.selection import acquire_selection
+from core import tracing
 from llm.clients import LLMManager
+from llm.registry import default_model
+from llm.session import ConversationSession
+from llm.budget import fit_context, context_mode
+from llm.async_runner import BackgroundLoop
 
-class WorkerThread(QThread):
+class QueryBridge(QObject):
+    """
+    Runs queries on the shared asyncio loop instead of spawning a QThread per
+    prompt. Submitting a new query cancels the one still in flight, which
+    closes its provider connection. prefetch() captures and prepares the
+    screenshot and warms the engine's connection while the user is still
+    typing; the next submit() consumes it. Each trigger opens a conversation
+    session: follow-ups in the same overlay reuse its screenshot and replay
+    the earlier turns, until dismiss() ends it.
+    """
+    chunk_ready = pyqtSignal(str)
     result_ready = pyqtSignal(str)
+    # Internal signals carry the query id so late output from a superseded query is dropped
+    _chunk = pyqtSignal(int, str)
+    _result = pyqtSignal(int, str)
 
-    def __init__(self, prompt, model, llm_manager):
+    def __init__(self, llm_manager, background_loop, capture=capture_screen_bytes):
         super().__init__()
-        self.prompt = prompt
-        self.model = model
         self.llm_manager = llm_manager
+        self.background_loop = background_loop
+        self.capture = capture
+        self.query_id = 0
+        self.future = None
+        self.prefetched = None
+        self.session = ConversationSession()
+        self.screenshot_deduper = ScreenshotDeduper()
+        self._chunk.connect(self._on_chunk)
+        self._result.connect(self._on_result)
 
-    def run(self):
-        # 1. Capture screen silently
+    def prefetch(self, model):
+        self.cancel_prefetch()
+        self.new_session()
+        self.prefetched = self.background_loop.submit(self._prefetch(model))
+
+    def cancel_prefetch(self):
+        if self.prefetched is not None and not self.prefetched.done():
+            self.prefetched.cancel()
+        self.prefetched = None
+
+    def new_session(self):
+        """Ends the current conversation and starts a fresh one for the next trigger."""
+        session, self.session = self.session, ConversationSession()
+        if session.has_history():
+            self.background_loop.submit(asyncio.to_thread(self.llm_manager.end_session, session))
+
+    def dismiss(self):
+        self.cancel_prefetch()
+        self.new_session()
+
+    def submit(self, prompt, model):
+        self.cancel()
+        self.query_id += 1
+        # The query takes ownership of the prefetch, so dismissing won't cancel it
+        prefetched, self.prefetched = self.prefetched, None
+        self.future = self.background_loop.submit(self._run(self.query_id, prompt, model, prefetched))
+
+    def cancel(self):
+        if self.future is not None and not self.future.done():
+            self.future.cancel()
+        self.future = None
+
+    async def _prefetch(self, model):
+        warm = asyncio.ensure_future(self.llm_manager.awarm_up(model))
+        try:
+            with tracing.span("prefetch", engine=model):
+                raw = ImagePayload(await asyncio.to_thread(self.capture))
+                return raw, model, await asyncio.to_thread(prepare_image, raw, model)
+        except asyncio.CancelledError:
+            warm.cancel()
+            raise
+
+    async def _screenshot(self, model, prefetched):
+        """The prefetched screenshot when there is one, re-prepared if the engine changed since."""
+        if prefetched is not None and not prefetched.cancelled():
+            try:
+                raw, prefetch_model, prepared = await asyncio.wrap_future(prefetched)
+            except Exception:
+                raw = None
+            if raw is not None:
+                if prefetch_model == model:
+                    return prepared
+                return await asyncio.to_thread(prepare_image, raw, model)
+        # 1. Capture screen silently (blocking subprocess, so off the loop)
+        image = ImagePayload(await asyncio.to_thread(self.capture))
+        return await asyncio.to_thread(prepare_image, image, model)
+
+    async def _run(self, query_id, prompt, model, prefetched=None):
+        started = time.perf_counter()
+        with tracing.span("query", engine=model, prompt_chars=len(prompt), prefetched=prefetched is not None) as span:
+            response = await self._answer(query_id, prompt, model, prefetched)
+            span.set(response_chars=len(response))
+        # 3. Emit result
+        self._result.emit(query_id, response)
+        # 4. Searchable history (llm/history.py), written after the answer is on screen
+        latency_ms = round((time.perf_counter() - started) * 1000, 1)
+        try:
+            await asyncio.to_thread(self.llm_manager.record_history, prompt, response, model, default_model(model), latency_ms, source="app")
+        except Exception as e:
+            print(f"History not recorded: {e}")
+
+    async def _answer(self, query_id, prompt, model, prefetched):
+        session = self.session
         try:
-            base64_image = capture_screen_base64()
-            # 2. Get LLM Response
-            response = self.llm_manager.get_response(self.prompt, base64_image, self.model)
+            # Mechanical edits of the selection ("uppercase this") are answered without the screenshot or the engine
+            local = await asyncio.to_thread(self.llm_manager.local_response, prompt, "", model, session)
+            if local is not None:
+                if prefetched is not None:
+                    prefetched.cancel()
+                self._chunk.emit(query_id, local)
+                return local
+            use_cache = True
+            if prefetched is None and session.image and session.engine == model:
+                # A follow-up: the session already carries this conversation's screenshot
+                image = ImagePayload()
+            else:
+                capture = await self._screenshot(model, prefetched)
+                # Reuse the previous frame when the screen hasn't changed
+                image = await asyncio.to_thread(self.screenshot_deduper.process, capture, model)
+                # Cached answers are keyed by the frame sent, which isn't quite this capture
+                use_cache = not stands_in(image, capture)
+            # 2. Stream the LLM response so the overlay can render as tokens arrive
+            parts = []
+            async for delta in self.llm_manager.astream_response(prompt, image, model, use_cache=use_cache, session=session, transforms=False):
+                parts.append(delta)
+                self._chunk.emit(query_id, delta)
+            response = "".join(parts).strip()
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             response = f"Error capturing or generating: {e}"
-        # 3. Emit result
-        self.result_ready.emit(response)
+        return response
+
+    def _on_chunk(self, query_id, delta):
+        if query_id == self.query_id:
+            self.chunk_ready.emit(delta)
+
+    def _on_result(self, query_id, response):
+        if query_id == self.query_id:
+            self.result_ready.emit(response)
 
 
 class FloatingLauncher(QWidget):
@@ -82,6 +217,10 @@ class FloatingLauncher(QWidget):
 class AppController(QObject):
     # Signal to safely show UI from a background pynput thread, optionally with selected text
     trigger_ui = pyqtSignal(str)
+    # Emitted from the hotkey backend's thread with the trigger's perf_counter timestamp
+    hotkey_triggered = pyqtSignal(float)
+    # Selected text, trigger timestamp and timing breakdown, from the selection coroutine
+    selection_ready = pyqtSignal(str, float, object)
 
     def __init__(self):
         super().__init__()
@@ -114,78 +253,84 @@ class AppController(QObject):
 
         self.overlay = HoverOverlay()
         self.llm_manager = LLMManager()
+        self.background_loop = BackgroundLoop()
+        self.query_bridge = QueryBridge(self.llm_manager, self.background_loop)
+        self.query_bridge.chunk_ready.connect(self.overlay.append_partial)
+        self.query_bridge.result_ready.connect(self.on_result)
         self.launcher = FloatingLauncher(self.on_activate)
 
         # Connect signals
         self.trigger_ui.connect(self.overlay.show_ready)
         self.overlay.submit_query.connect(self.handle_query)
+        self.overlay.dismissed.connect(self.query_bridge.dismiss)
         self.overlay.settings_saved.connect(self.llm_manager.refresh_config)
+        # Pre-open the pooled connection whenever an engine is picked
+        self.overlay.model_selector.currentTextChanged.connect(self.llm_manager.warm_up)
+        self.llm_manager.warm_up(self.overlay.model_selector.currentText())
 
-        # Setup global hotkey polling (Cmd + Option + G) via PyObjC
-        self.hotkey_timer = QTimer(self)
-        self.hotkey_timer.timeout.connect(self.check_hotkey)
-        self.hotkey_timer.start(50)  # Check every 50ms
-        self.hotkey_pressed_state = False
-        
-        print("Skibidysaurus running quietly in the background! Press Cmd+Option+G anywhere to trigger.")
-
-    def check_hotkey(self):
-        from Quartz import CGEventSourceKeyState, kCGEventSourceStateHIDSystemState
-        # KeyCodes: 5 is 'G', 55 is Command, 58 is Option
-        g_pressed = CGEventSourceKeyState(kCGEventSourceStateHIDSystemState, 5)
-        cmd_pressed = CGEventSourceKeyState(kCGEventSourceStateHIDSystemState, 55)
-        opt_pressed = CGEventSourceKeyState(kCGEventSourceStateHIDSystemState, 58)
-        
-        is_pressed = g_pressed and cmd_pressed and opt_pressed
-        
-        if is_pressed and not self.hotkey_pressed_state:
-            # Just pressed
-            self.hotkey_pressed_state = True
-            self.on_activate()
-        elif not is_pressed and self.hotkey_pressed_state:
-            # Released
-            self.hotkey_pressed_state = False
+        # Global hotkey (Cmd + Option + G unless SKIBIDYSAURUS_HOTKEY says otherwise).
+        # The backend wakes us only on key events; the signal hops to the Qt thread.
+        self.hotkey_triggered.connect(self.on_hotkey)
+        self.selection_ready.connect(self.on_selection)
+        self.hotkey = HotkeyListener(lambda chord, timestamp: self.hotkey_triggered.emit(timestamp))
+        chords = ", ".join(chord.label for chord in self.hotkey.chords)
+        if self.hotkey.start():
+            print(f"Skibidysaurus running quietly in the background! Press {chords} anywhere to trigger.")
+        else:
+            print("Global hotkey unavailable (grant Input Monitoring in System Settings); use the tray icon or launcher.")
+
+        # Opt-in diagnostics: SKIBIDYSAURUS_TRACE (spans to JSONL), SKIBIDYSAURUS_PROFILE, SKIBIDYSAURUS_STATS_PORT
+        self.profiler = None
+        modes = tracing.profile_modes(os.environ.get("SKIBIDYSAURUS_PROFILE", ""))
+        if modes:
+            tracing.configure(tracing.tracer.path or tracing.trace_path("1"))
+            self.profiler = tracing.Profiler(modes).start()
+        stats_port = os.environ.get("SKIBIDYSAURUS_STATS_PORT", "")
+        if stats_port.isdigit():
+            server = tracing.serve_stats(int(stats_port), extra=lambda: {"providers": self.llm_manager.provider_stats(), "transforms": self.llm_manager.transform_stats()})
+            print(f"Pipeline stats on http://127.0.0.1:{server.server_address[1]}/stats")
+        tracing.record("startup", _STARTED, mode="app")
+
+    def on_hotkey(self, timestamp):
+        self._activate(timestamp, "hotkey")
 
     def on_activate(self):
-        # Hotkey pressed! Safely tell PyQt to show the window.
-        import time
-        from Quartz import CGEventCreateKeyboardEvent, CGEventPost, kCGHIDEventTap
-        
-        # 1. Simulate Cmd+C to copy selected text
-        # Keycode 8 is 'C', 55 is Command
+        self._activate(time.perf_counter(), "menu")
+
+    def _activate(self, timestamp, trigger):
+        model = self.overlay.model_selector.currentText()
+        # Selection capture waits on other apps; keep it off the Qt thread
+        self.background_loop.submit(self._acquire_selection(timestamp, trigger, model))
+        # Screenshot and connection warm-up start now, before the overlay covers the screen
+        self.query_bridge.prefetch(model)
+
+    async def _acquire_selection(self, timestamp, trigger, model):
+        timings = {"trigger": trigger, "dispatch_ms": round((time.perf_counter() - timestamp) * 1000, 1)}
         try:
-            # Cmd Down
-            cmd_down = CGEventCreateKeyboardEvent(None, 55, True)
-            CGEventPost(kCGHIDEventTap, cmd_down)
-            
-            # C Down
-            c_down = CGEventCreateKeyboardEvent(None, 8, True)
-            CGEventPost(kCGHIDEventTap, c_down)
-            
-            # C Up
-            c_up = CGEventCreateKeyboardEvent(None, 8, False)
-            CGEventPost(kCGHIDEventTap, c_up)
-            
-            # Cmd Up
-            cmd_up = CGEventCreateKeyboardEvent(None, 55, False)
-            CGEventPost(kCGHIDEventTap, cmd_up)
+            selected_text = await acquire_selection(timings=timings)
+            # An accidental multi-megabyte copy is cut to the engine's budget before it reaches
+            # the prompt. The overlay edits the text inline, so it has no map-reduce path.
+            mode = "off" if context_mode() == "off" else "trim"
+            fitted = await asyncio.to_thread(fit_context, selected_text, model, "", mode)
+            if fitted.strategy != "none":
+                timings["context"] = f"{fitted.strategy}:{fitted.original_tokens}->{fitted.tokens}"
+            selected_text = fitted.text
         except Exception as e:
-            print(f"Error sending Cmd+C: {e}")
-            
-        # 2. Give the OS a tiny fraction of a second to update the clipboard
-        time.sleep(0.1)
-        
-        # 3. Read clipboard text
-        clipboard = QApplication.clipboard()
-        selected_text = clipboard.text()
-        
-        # 4. Show UI with the copied text
+            print(f"Error reading selection: {e}")
+            selected_text = ""
+        self.selection_ready.emit(selected_text, timestamp, timings)
+
+    def on_selection(self, selected_text, timestamp, timings):
+        # Show UI with the selected text (slot runs on the Qt thread)
         self.trigger_ui.emit(selected_text)
+        timings["overlay_ms"] = round((time.perf_counter() - timestamp) * 1000, 1)
+        if timings["trigger"] == "hotkey":
+            self.hotkey.shown(timestamp)
+        breakdown = " ".join(f"{k}={v}" for k, v in timings.items() if k != "trigger")
+        print(f"{timings['trigger']} -> text -> overlay: {breakdown}")
 
     def handle_query(self, prompt, model):
-        self.worker = WorkerThread(prompt, model, self.llm_manager)
-        self.worker.result_ready.connect(self.on_result)
-        self.worker.start()
+        self.query_bridge.submit(prompt, model)
 
     def on_result(self, response):
         # Display the output directly inside the overlay
@@ -195,6 +340,14 @@ class AppController(QObject):
         QApplication.clipboard().setText(response)
 
     def quit_app(self):
+        print(f"Hotkey stats: {self.hotkey.stats()}")
+        if self.profiler is not None:
+            self.profiler.stop()
+            self.profiler.report(dump_dir=os.path.dirname(tracing.tracer.path))
+        self.hotkey.stop()
+        self.query_bridge.cancel()
+        self.query_bridge.dismiss()
+        self.background_loop.stop()
         self.overlay.close()
         self.app.quit()
         sys.exit()
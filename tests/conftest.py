@@ -0,0 +1,9 @@
+import pytest
+from benchmarks.mock_servers import MockProviderServer
+
+
+@pytest.fixture
+def mock_server():
+    """The local provider stand-in from benchmarks/mock_servers.py, with no artificial delays."""
+    with MockProviderServer() as server:
+        yield server
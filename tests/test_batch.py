@@ -0,0 +1,81 @@
+import io
+import json
+import asyncio
+import httpx
+import pytest
+from llm import batch
+from llm.batch import is_retryable, is_transient, retry_hint, run_batch
+from llm.resilience import CircuitOpenError
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(batch, "wait_random_exponential", lambda **kwargs: lambda retry_state: 0.0)
+
+
+def run(ask, lines=('{"prompt": "hi"}',), **kwargs) -> list:
+    out = io.StringIO()
+    asyncio.run(run_batch(iter(lines), out, ask, **kwargs))
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def failing(error, calls: list):
+    async def ask(request):
+        calls.append(request)
+        raise error
+    return ask
+
+
+def status_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://mock/v1/responses")
+    return httpx.HTTPStatusError(f"{status}", request=request, response=httpx.Response(status, request=request))
+
+
+def test_is_transient():
+    assert is_transient(httpx.ReadTimeout("slow"))
+    assert is_transient(httpx.ConnectError("refused"))
+    assert is_transient(status_error(429))
+    assert is_transient(status_error(503))
+    assert not is_transient(status_error(400))
+    assert not is_transient(status_error(401))
+    assert not is_transient(CircuitOpenError("open"))
+    assert not is_transient(ValueError("bad request"))
+    assert not is_transient(KeyError("bug"))
+
+
+def test_retryable_responses():
+    assert is_retryable("OpenAI Error: Client error '429 Too Many Requests'")
+    assert is_retryable("Claude Error: {'type': 'overloaded_error', 'message': 'Overloaded'}")
+    assert not is_retryable("OpenAI Error: missing API key. Add it in Settings.")
+    assert not is_retryable("429 reasons to love regex")
+    assert retry_hint("Rate limit reached. Please try again in 350ms.") == 0.35
+    assert retry_hint("retry after 2 seconds") == 2.0
+
+
+@pytest.mark.parametrize("error", [ValueError("bad request"), KeyError("bug"), CircuitOpenError("open"), status_error(400)])
+def test_permanent_errors_are_not_retried(error):
+    calls = []
+    [result] = run(failing(error, calls))
+    assert len(calls) == 1
+    assert result["attempts"] == 1
+    assert result["error"].startswith("Error:")
+
+
+@pytest.mark.parametrize("error", [httpx.ReadTimeout("slow"), status_error(503)])
+def test_transient_errors_stop_at_the_attempt_cap(error):
+    calls = []
+    [result] = run(failing(error, calls), max_attempts=3)
+    assert len(calls) == 3
+    assert result["attempts"] == 3
+    assert "error" in result
+
+
+def test_rate_limited_response_is_retried_until_it_succeeds():
+    answers = iter(["OpenAI Error: 429 Too Many Requests", "hello"])
+
+    async def ask(request):
+        return next(answers)
+
+    [result] = run(ask)
+    assert result["response"] == "hello"
+    assert result["attempts"] == 2
@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from llm import budget
+from llm.budget import MAP_REDUCE_MAX_ROUNDS, chunk_text, estimate_tokens, map_reduce
+
+BUDGET = 200
+CHUNKS = [f"line {i} of part {part}: " + "lorem ipsum dolor sit amet " * 4 for part in range(8) for i in range(6)]
+
+
+@pytest.fixture
+def rounds(monkeypatch):
+    """How many times map-reduce condensed its notes again."""
+    calls = []
+
+    def counting(text, max_tokens):
+        calls.append(text)
+        return chunk_text(text, max_tokens)
+
+    monkeypatch.setattr(budget, "chunk_text", counting)
+    return calls
+
+
+def reduce(ask) -> str:
+    chunks = chunk_text("\n".join(CHUNKS), BUDGET)
+    return asyncio.run(map_reduce(ask, "what is this?", chunks, BUDGET))
+
+
+def notes_in(prompt: str) -> str:
+    return prompt.split(":\n", 1)[1].rsplit("\n\nUsing these notes", 1)[0]
+
+
+def test_condensing_notes_fit_without_trimming(rounds):
+    async def ask(prompt):
+        return "short note"
+
+    prompt = reduce(ask)
+    assert "omitted" not in prompt
+    assert rounds == []
+
+
+def test_rounds_are_capped(rounds):
+    async def ask(prompt):
+        # Shrinks every round, never enough to fit
+        chunk = prompt.split("'''")[1]
+        return chunk[: int(len(chunk) * 0.9)]
+
+    prompt = reduce(ask)
+    assert len(rounds) == MAP_REDUCE_MAX_ROUNDS
+    assert estimate_tokens(notes_in(prompt)) <= BUDGET + 20
+    assert "omitted" in prompt
+
+
+def test_round_that_does_not_shrink_falls_back_to_trimming(rounds):
+    async def ask(prompt):
+        # Echoes its input, like a model ignoring the instructions
+        return prompt
+
+    prompt = reduce(ask)
+    assert len(rounds) == 1
+    assert estimate_tokens(notes_in(prompt)) <= BUDGET + 20
+    assert "omitted" in prompt
+
+
+def test_single_oversized_note_is_trimmed(rounds):
+    async def ask(prompt):
+        return "word " * 2000
+
+    prompt = asyncio.run(map_reduce(ask, "what is this?", ["one chunk"], BUDGET))
+    assert rounds == []
+    assert estimate_tokens(notes_in(prompt)) <= BUDGET + 20
+
+
+def test_all_parts_failing_raises():
+    async def ask(prompt):
+        return "OpenAI Error: 500 Internal Server Error"
+
+    with pytest.raises(RuntimeError, match="OpenAI Error"):
+        reduce(ask)
@@ -0,0 +1,38 @@
+import os
+import pytest
+import backend
+
+
+@pytest.fixture
+def refreshes(monkeypatch):
+    calls = []
+
+    class Manager:
+        def refresh_config(self):
+            calls.append(True)
+
+    monkeypatch.setattr(backend, "get_llm_manager", lambda: Manager())
+    return calls
+
+
+def test_empty_key_clears_it(monkeypatch, refreshes):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-old")
+    backend._apply_request_env({"GEMINI_API_KEY": "", "OPENAI_API_KEY": "", "ANTHROPIC_API_KEY": ""})
+    assert os.environ["OPENAI_API_KEY"] == ""
+    assert refreshes == [True]
+
+
+def test_unchanged_keys_do_not_refresh(monkeypatch, refreshes):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-same")
+    monkeypatch.setenv("GEMINI_API_KEY", "")
+    backend._apply_request_env({"OPENAI_API_KEY": "sk-same", "GEMINI_API_KEY": ""})
+    # Keys the request doesn't carry are left alone
+    backend._apply_request_env({})
+    assert refreshes == []
+
+
+def test_only_forwarded_keys_are_applied(monkeypatch, refreshes):
+    monkeypatch.delenv("PATH_NOT_FORWARDED", raising=False)
+    backend._apply_request_env({"PATH_NOT_FORWARDED": "x"})
+    assert "PATH_NOT_FORWARDED" not in os.environ
+    assert refreshes == []
@@ -0,0 +1,158 @@
+import pytest
+from core.hotkey import (
+    DEFAULT_CHORD,
+    KEY_CODES,
+    MODIFIER_FLAGS,
+    Chord,
+    FakeEventSource,
+    HotkeyBackend,
+    HotkeyListener,
+    KeyEvent,
+    configured_chords,
+    parse_chord,
+)
+
+CAPS_LOCK = 1 << 16
+# Device-dependent bits (e.g. left vs right Command) ride along in real event flags
+DEVICE_BITS = 0x8
+
+
+@pytest.fixture
+def source():
+    return FakeEventSource()
+
+
+def listen(source, chords=DEFAULT_CHORD):
+    triggered = []
+    listener = HotkeyListener(
+        lambda chord, timestamp: triggered.append(chord.label),
+        chords=[parse_chord(text) for text in chords.split(",")],
+        backends=[source],
+    )
+    assert listener.start()
+    return listener, triggered
+
+
+def test_parse_chord():
+    chord = parse_chord("cmd+alt+g")
+    assert chord == Chord(KEY_CODES["g"], MODIFIER_FLAGS["cmd"] | MODIFIER_FLAGS["alt"], "cmd+alt+g")
+    # Aliases, order, case and spacing don't matter
+    assert parse_chord(" Option + Command + G ").modifiers == chord.modifiers
+    assert parse_chord("G+CMD+OPT").key_code == chord.key_code
+    assert parse_chord("ctrl+shift+f12") == Chord(KEY_CODES["f12"], MODIFIER_FLAGS["ctrl"] | MODIFIER_FLAGS["shift"], "ctrl+shift+f12")
+    assert parse_chord("space").modifiers == 0
+
+
+@pytest.mark.parametrize("text", ["cmd+alt", "", "cmd+hyper+g", "cmd+g+h", "cmd+alt+ä"])
+def test_parse_chord_rejects(text):
+    with pytest.raises(ValueError):
+        parse_chord(text)
+
+
+def test_configured_chords(monkeypatch, capsys):
+    monkeypatch.setenv("SKIBIDYSAURUS_HOTKEY", "cmd+shift+space, nonsense+g ,")
+    assert [chord.label for chord in configured_chords()] == ["cmd+shift+space"]
+    assert "Ignoring hotkey" in capsys.readouterr().out
+    monkeypatch.setenv("SKIBIDYSAURUS_HOTKEY", "cmd+alt")
+    assert [chord.label for chord in configured_chords()] == [DEFAULT_CHORD]
+
+
+def test_modifier_mask():
+    chord = parse_chord("cmd+alt+g")
+    flags = chord.modifiers
+    assert chord.matches(KEY_CODES["g"], flags)
+    # Caps Lock and device bits are outside the mask
+    assert chord.matches(KEY_CODES["g"], flags | CAPS_LOCK | DEVICE_BITS)
+    # Every chord modifier has to be held, and no other
+    assert not chord.matches(KEY_CODES["g"], MODIFIER_FLAGS["cmd"])
+    assert not chord.matches(KEY_CODES["g"], flags | MODIFIER_FLAGS["shift"])
+    assert not chord.matches(KEY_CODES["h"], flags)
+
+
+def test_press_triggers(source):
+    listener, triggered = listen(source, "cmd+alt+g,ctrl+space")
+    source.press("cmd+alt+g")
+    source.release("cmd+alt+g")
+    source.press("ctrl+space")
+    assert triggered == ["cmd+alt+g", "ctrl+space"]
+    assert listener.stats()["backend"] == "fake"
+    assert listener.triggers == 2
+
+
+def test_other_keys_do_not_trigger(source):
+    listener, triggered = listen(source)
+    source.press("g")
+    source.press("cmd+g")
+    source.press("cmd+alt+shift+g")
+    source.press("cmd+alt+h")
+    source._callback(KeyEvent(KEY_CODES["g"], MODIFIER_FLAGS["cmd"] | MODIFIER_FLAGS["alt"] | CAPS_LOCK))
+    assert triggered == ["cmd+alt+g"]
+
+
+def test_auto_repeat_is_suppressed(source):
+    listener, triggered = listen(source)
+    source.press("cmd+alt+g")
+    for _ in range(5):
+        source.press("cmd+alt+g", is_repeat=True)
+    assert triggered == ["cmd+alt+g"]
+
+
+def test_held_chord_triggers_once_until_key_up(source):
+    listener, triggered = listen(source)
+    # A source that doesn't flag auto-repeat: the chord stays held until its key-up
+    source.press("cmd+alt+g")
+    source.press("cmd+alt+g")
+    assert triggered == ["cmd+alt+g"]
+    source.release("cmd+alt+g")
+    source.press("cmd+alt+g")
+    assert triggered == ["cmd+alt+g", "cmd+alt+g"]
+
+
+def test_key_up_releases_without_modifiers(source):
+    listener, triggered = listen(source)
+    source.press("cmd+alt+g")
+    # Modifiers let go first; the key-up of G alone still releases the chord
+    source.release("g")
+    source.press("cmd+alt+g")
+    assert listener.triggers == 2
+    # Key-ups never trigger
+    source.release("cmd+alt+g")
+    assert listener.triggers == 2
+
+
+def test_stop_releases_held_chords(source):
+    listener, triggered = listen(source)
+    source.press("cmd+alt+g")
+    listener.stop()
+    source.press("cmd+alt+g")
+    assert listener.start()
+    source.press("cmd+alt+g")
+    assert triggered == ["cmd+alt+g", "cmd+alt+g"]
+
+
+def test_next_backend_when_one_cannot_start(source):
+    class Unavailable(HotkeyBackend):
+        name = "unavailable"
+
+        def start(self, callback):
+            return False
+
+    class Broken(HotkeyBackend):
+        name = "broken"
+
+        def start(self, callback):
+            raise OSError("no permission")
+
+    listener = HotkeyListener(lambda chord, timestamp: None, chords=[parse_chord(DEFAULT_CHORD)], backends=[Unavailable(), Broken(), source])
+    assert listener.start()
+    assert listener.backend is source
+    assert not HotkeyListener(lambda chord, timestamp: None, backends=[Unavailable()]).start()
+
+
+def test_shown_records_latency(source):
+    listener, triggered = listen(source)
+    event = source.press("cmd+alt+g")
+    assert listener.shown(event.timestamp) >= 0
+    stats = listener.stats()
+    assert stats["triggers"] == 1
+    assert stats["latency_p50_ms"] <= stats["latency_p95_ms"]
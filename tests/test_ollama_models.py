@@ -0,0 +1,35 @@
+import pytest
+from llm.providers.ollama import OllamaModels
+from llm.transport import ProviderTransport
+
+
+@pytest.fixture
+def models(mock_server, monkeypatch, tmp_path):
+    monkeypatch.setenv("OLLAMA_HOST", mock_server.base_url)
+    mock_server.ollama_models = ["llava:latest", "llama3:latest"]
+    mock_server.text_only_models = {"llama3:latest"}
+    return OllamaModels(ProviderTransport(), str(tmp_path / "ollama_models.json"))
+
+
+def test_known_needs_no_request(mock_server, models):
+    assert models.known("llava") is None
+    assert mock_server.requests == []
+    entry = models.info("llava")
+    assert entry["vision"] is True
+    assert models.known("llava") == entry
+    assert models.known("llava:latest") == entry
+
+
+def test_missing_model(mock_server, models):
+    assert models.info("mistral") is False
+    # The listing may predate a pull, so known() leaves the verdict to info()
+    assert models.known("mistral") is None
+    mock_server.ollama_models.append("mistral:latest")
+    assert models.info("mistral")["vision"] is True
+
+
+def test_text_only_model(models):
+    assert models.info("llama3")["vision"] is False
+    assert models.probes == 1
+    assert models.info("llama3")["vision"] is False
+    assert models.probes == 1
@@ -0,0 +1,51 @@
+import json
+import time
+import asyncio
+from llm.race import LatencyHistory, astream_race
+
+
+def test_record_persists(tmp_path):
+    history = LatencyHistory(str(tmp_path / "latency.json"))
+    history.record("openai", 0.25)
+    assert LatencyHistory(history.path).samples == {"openai": [0.25]}
+
+
+def test_record_soon_writes_off_the_loop(tmp_path, monkeypatch):
+    history = LatencyHistory(str(tmp_path / "latency.json"))
+    save = history.save
+
+    def slow_save():
+        time.sleep(0.2)
+        save()
+
+    monkeypatch.setattr(history, "save", slow_save)
+
+    async def main():
+        start = time.perf_counter()
+        history.record_soon("claude", 0.5)
+        elapsed = time.perf_counter() - start
+        # Counted right away, for the next race's ranking
+        assert history.p50("claude") == 0.5
+        return elapsed
+
+    assert asyncio.run(main()) < 0.1
+    # asyncio.run waits for the default executor, so the write has landed
+    with open(history.path, encoding="utf-8") as f:
+        assert json.load(f) == {"claude": [0.5]}
+
+
+def test_race_records_the_winner(tmp_path):
+    history = LatencyHistory(str(tmp_path / "latency.json"))
+
+    async def stream_engine(engine):
+        if engine == "gemini":
+            yield "Gemini Error: missing API key. Add it in Settings."
+            return
+        yield "hello"
+        yield " world"
+
+    async def main():
+        return [delta async for delta in astream_race(stream_engine, ["gemini", "openai"], "parallel", history)]
+
+    assert "".join(asyncio.run(main())) == "hello world"
+    assert list(LatencyHistory(history.path).samples) == ["openai"]
@@ -0,0 +1,216 @@
+import time
+import asyncio
+import email.utils
+import httpx
+import pytest
+from llm import resilience
+from llm.resilience import (
+    AIMDLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    ProviderResilience,
+    ResilientAsyncTransport,
+    ResilientTransport,
+    retry_after,
+)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    # Retries still happen, without the jittered sleeps between them
+    monkeypatch.setattr(resilience, "backoff", lambda attempt, hint=None: 0.0)
+
+
+def client(server, policy):
+    return httpx.Client(base_url=server.base_url, transport=ResilientTransport(httpx.HTTPTransport(), policy))
+
+
+def complete(http):
+    return http.post("/v1/chat/completions", json={"model": "mock", "messages": []})
+
+
+def test_retry_after_seconds():
+    assert retry_after(httpx.Headers({"Retry-After": "7"})) == 7.0
+    assert retry_after(httpx.Headers({"Retry-After": "1.5"})) == 1.5
+    assert retry_after(httpx.Headers({"retry-after-ms": "250"})) == 0.25
+    # OpenAI's reset headers, when there is no Retry-After
+    assert retry_after(httpx.Headers({"x-ratelimit-reset-requests": "6m0s", "x-ratelimit-reset-tokens": "20ms"})) == 360.0
+    assert retry_after(httpx.Headers({})) is None
+
+
+def test_retry_after_http_date():
+    date = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert retry_after(httpx.Headers({"Retry-After": date})) == pytest.approx(30, abs=2)
+    # A date in the past means retry now, never a negative wait
+    past = email.utils.formatdate(time.time() - 60, usegmt=True)
+    assert retry_after(httpx.Headers({"Retry-After": past})) == 0.0
+    assert retry_after(httpx.Headers({"Retry-After": "soon"})) is None
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(threshold=3, cooldown=0.05)
+    for _ in range(2):
+        breaker.failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    # Only one trial request while half-open
+    assert not breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed" and breaker.failures == 0 and breaker.allow()
+    assert breaker.opens == 1
+
+
+def test_breaker_reopens_when_the_trial_fails():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+    breaker.failure()
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == "half_open"
+    breaker.failure(hint=0.2)
+    assert breaker.state == "open" and not breaker.allow()
+    # The server's Retry-After stretches the cooldown
+    assert breaker.retry_in() > 0.1
+    assert breaker.opens == 2
+
+
+def test_breaker_fails_fast_during_an_outage(mock_server):
+    policy = ProviderResilience("openai", attempts=1)
+    policy.breaker = CircuitBreaker(threshold=3, cooldown=30)
+    mock_server.inject(503, 100)
+    with client(mock_server, policy) as http:
+        for _ in range(3):
+            assert complete(http).status_code == 503
+        with pytest.raises(CircuitOpenError):
+            complete(http)
+    assert mock_server.faults_sent == 3
+    assert policy.stats()["breaker"] == "open"
+    assert policy.counters["rejected"] == 1
+
+
+def test_429_halves_the_concurrency_limit_and_retries(mock_server):
+    policy = ProviderResilience("openai", attempts=3)
+    policy.limiter = AIMDLimiter(initial=16)
+    mock_server.inject(429, 1, retry_after=0.01)
+    with client(mock_server, policy) as http:
+        assert complete(http).status_code == 200
+    assert policy.limiter.limit == 8
+    assert policy.limiter.decreases == 1
+    assert policy.counters["throttled"] == 1
+    assert policy.counters["retries"] == 1
+    assert policy.limiter.in_flight == 0
+
+
+def test_aimd_counts_one_congestion_event_once():
+    limiter = AIMDLimiter(initial=16, minimum=2)
+    epoch = limiter.decreases
+    limiter.decrease(epoch)
+    # Throttles of requests sent before the first halving don't halve it again
+    limiter.decrease(epoch)
+    assert limiter.limit == 8
+    for _ in range(10):
+        limiter.decrease(limiter.decreases)
+    assert limiter.limit == 2
+
+
+def test_retries_stop_at_the_attempt_cap(mock_server):
+    policy = ProviderResilience("openai", attempts=3)
+    mock_server.inject(503, 10, retry_after=0.01)
+    with client(mock_server, policy) as http:
+        response = complete(http)
+    assert response.status_code == 503
+    assert mock_server.faults_sent == 3
+    assert policy.counters["attempts"] == 3
+    assert policy.counters["retries"] == 2
+    assert policy.counters["gave_up"] == 1
+
+
+def test_a_wait_longer_than_max_wait_is_not_retried(mock_server):
+    policy = ProviderResilience("openai", attempts=3)
+    policy.max_wait = 5
+    mock_server.inject(429, 1, retry_after=60)
+    with client(mock_server, policy) as http:
+        assert complete(http).status_code == 429
+    assert mock_server.faults_sent == 1
+    assert policy.counters["retries"] == 0
+
+
+def test_connection_errors_are_retried_up_to_the_cap():
+    policy = ProviderResilience("openai", attempts=2)
+    # Nothing listens on port 9 (discard) here
+    with httpx.Client(base_url="http://127.0.0.1:9", transport=ResilientTransport(httpx.HTTPTransport(), policy)) as http:
+        with pytest.raises(httpx.ConnectError):
+            complete(http)
+    assert policy.counters["connection_errors"] == 2
+    assert policy.counters["gave_up"] == 1
+
+
+def half_open_policy() -> ProviderResilience:
+    """A policy whose breaker is half-open, with the next check() claiming the trial."""
+    policy = ProviderResilience("openai", attempts=1)
+    policy.breaker = CircuitBreaker(threshold=5, cooldown=0.05)
+    for _ in range(5):
+        policy.outcome(503, httpx.Headers(), 0)
+    assert policy.breaker.state == "open"
+    time.sleep(0.06)
+    return policy
+
+
+def assert_not_stuck(policy):
+    # Whatever the trial's verdict, the breaker lets a request through again once the cooldown ends
+    time.sleep(0.06)
+    policy.check()
+
+
+def test_trial_ending_in_a_client_error_closes_the_breaker():
+    policy = half_open_policy()
+    policy.check()
+    policy.outcome(401, httpx.Headers(), 0)
+    assert policy.breaker.state == "closed"
+    policy.check()
+    policy.check()
+
+
+def test_trial_ending_in_429_reopens_the_breaker():
+    policy = half_open_policy()
+    policy.check()
+    policy.outcome(429, httpx.Headers({"retry-after-ms": "10"}), 0)
+    assert policy.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        policy.check()
+    assert_not_stuck(policy)
+
+
+def test_trial_that_times_out_reopens_the_breaker():
+    def timeout(request):
+        raise httpx.ReadTimeout("no answer", request=request)
+
+    policy = half_open_policy()
+    with httpx.Client(base_url="http://mock", transport=ResilientTransport(httpx.MockTransport(timeout), policy)) as http:
+        with pytest.raises(httpx.ReadTimeout):
+            complete(http)
+    assert policy.breaker.state == "open"
+    assert_not_stuck(policy)
+
+
+def test_cancelled_trial_reopens_the_breaker():
+    async def hang(request):
+        await asyncio.sleep(10)
+
+    async def cancelled_trial(policy):
+        transport = ResilientAsyncTransport(httpx.MockTransport(hang), policy)
+        async with httpx.AsyncClient(base_url="http://mock", transport=transport) as http:
+            task = asyncio.create_task(http.post("/v1/chat/completions", json={}))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    policy = half_open_policy()
+    asyncio.run(cancelled_trial(policy))
+    assert policy.breaker.state == "open"
+    assert policy.limiter.in_flight == 0
+    assert_not_stuck(policy)
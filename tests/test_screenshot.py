@@ -0,0 +1,59 @@
+import io
+import pytest
+from PIL import Image, ImageDraw
+from core.screenshot import ScreenshotDeduper, hash_distance, perceptual_hash
+from core.imagebuf import ImagePayload
+
+
+def screen(error: str = "KeyError: 'name'", caret: bool = False) -> bytes:
+    """A terminal-ish 1440x900 screen with a traceback ending in `error`."""
+    img = Image.new("RGB", (1440, 900), (250, 250, 250))
+    draw = ImageDraw.Draw(img)
+    draw.text((40, 40), "Traceback (most recent call last):", fill=(30, 30, 30))
+    draw.text((40, 60), '  File "app.py", line 12, in <module>', fill=(30, 30, 30))
+    draw.text((40, 80), error, fill=(200, 30, 30))
+    if caret:
+        draw.rectangle((700, 440, 701, 458), fill=(0, 0, 0))
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=85)
+    return out.getvalue()
+
+
+@pytest.fixture
+def deduper(monkeypatch):
+    monkeypatch.delenv("SKIBIDYSAURUS_SCREEN_DEDUP", raising=False)
+    return ScreenshotDeduper(max_distance=3)
+
+
+def test_identical_frame_is_reused(deduper):
+    first = deduper.process(screen())
+    assert deduper.process(screen()) is first
+    assert deduper.stats()["reused"] == 1
+
+
+def test_blinking_caret_is_reused(deduper):
+    first = deduper.process(screen())
+    assert deduper.process(screen(caret=True)) is first
+
+
+@pytest.mark.parametrize("error", ["ValueError: 'age'", "KeyError: 'nam'", "KeyError: 'nane'"])
+def test_changed_text_is_not_reused(deduper, error):
+    before, after = screen(), screen(error)
+    # The coarse hash can't tell these apart ...
+    assert hash_distance(perceptual_hash(ImagePayload(before)), perceptual_hash(ImagePayload(after))) <= 3
+    deduper.process(before)
+    # ... but the model has to see the new screen
+    assert deduper.process(after).tobytes() == after
+    assert deduper.stats()["reused"] == 0
+
+
+def test_other_variant_is_not_reused(deduper):
+    deduper.process(screen(), variant="openai:gpt-4o")
+    assert deduper.process(screen(), variant="claude:").tobytes() == screen()
+
+
+def test_disabled(deduper, monkeypatch):
+    monkeypatch.setenv("SKIBIDYSAURUS_SCREEN_DEDUP", "0")
+    deduper.process(screen())
+    assert deduper.process(screen()).tobytes() == screen()
+    assert deduper.stats()["reused"] == 0
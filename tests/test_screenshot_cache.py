@@ -0,0 +1,50 @@
+import pytest
+import backend
+from core.screenshot import ScreenshotDeduper
+from llm.clients import LLMManager
+from tests.test_screenshot import screen
+
+PROMPT = "what does this error mean?"
+
+
+@pytest.fixture
+def ask(mock_server, monkeypatch, tmp_path):
+    """get_ai_response on a fresh manager and deduper, with the response cache on."""
+    for name, value in mock_server.env().items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setenv("SKIBIDYSAURUS_CACHE", "1")
+    monkeypatch.setenv("SKIBIDYSAURUS_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("SKIBIDYSAURUS_IMAGE_UPLOADS", "0")
+    monkeypatch.setattr(backend, "_llm_manager", LLMManager())
+    monkeypatch.setattr(backend, "_screenshot_deduper", ScreenshotDeduper())
+
+    def ask(png: bytes) -> str:
+        path = tmp_path / "screen.jpg"
+        path.write_bytes(png)
+        return backend.get_ai_response(PROMPT, screenshot_path=str(path), engine="openai", history=False)
+    return ask
+
+
+def provider_requests(server) -> int:
+    return sum(path == "/v1/responses" for path, _ in server.requests)
+
+
+def test_same_screen_is_answered_from_the_cache(mock_server, ask):
+    ask(screen())
+    ask(screen())
+    assert provider_requests(mock_server) == 1
+
+
+def test_different_screens_both_reach_the_provider(mock_server, ask):
+    ask(screen("KeyError: 'name'"))
+    ask(screen("ValueError: 'age'"))
+    assert provider_requests(mock_server) == 2
+    assert backend.session_stats()["screenshots"]["reused"] == 0
+
+
+def test_reused_frame_is_not_answered_from_the_cache(mock_server, ask):
+    ask(screen())
+    # The deduper sends the first frame again, but the capture was different
+    ask(screen(caret=True))
+    assert backend.session_stats()["screenshots"]["reused"] == 1
+    assert provider_requests(mock_server) == 2
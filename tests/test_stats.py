@@ -0,0 +1,12 @@
+from core.stats import percentile
+
+
+def test_percentile():
+    samples = [5.0, 1.0, 4.0, 2.0, 3.0]
+    assert percentile(samples, 0.0) == 1.0
+    assert percentile(samples, 0.5) == 3.0
+    assert percentile(samples, 0.95) == 5.0
+    assert percentile(samples, 1.0) == 5.0
+    assert percentile([7.0], 0.99) == 7.0
+    # Sorted on the way, not in place
+    assert samples == [5.0, 1.0, 4.0, 2.0, 3.0]
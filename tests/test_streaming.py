@@ -0,0 +1,129 @@
+import asyncio
+import pytest
+from google.genai import types
+from benchmarks.mock_servers import DEFAULT_TOKENS
+from core.imagebuf import ImagePayload
+from llm.clients import LLMManager
+from llm.providers.base import iter_sse_events
+from llm.providers.claude import claude_event
+from llm.providers.gemini import gemini_chunk
+from llm.providers.llamacpp import llamacpp_event
+from llm.providers.ollama import ollama_chunk
+from llm.providers.openai import openai_event
+
+ENGINES = ["gemini", "openai", "claude", "ollama", "llamacpp"]
+LABELS = {"gemini": "Gemini", "openai": "OpenAI", "claude": "Claude", "ollama": "Ollama", "llamacpp": "llama.cpp"}
+ANSWER = "".join(DEFAULT_TOKENS)
+
+
+@pytest.fixture
+def manager(mock_server, monkeypatch, tmp_path):
+    for name, value in mock_server.env().items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setenv("SKIBIDYSAURUS_DATA_DIR", str(tmp_path))
+    return LLMManager()
+
+
+def stream(manager, engine: str) -> list:
+    return list(manager.provider(engine).stream("system", "say hello", ImagePayload()))
+
+
+def astream(manager, engine: str) -> list:
+    async def collect():
+        return [chunk async for chunk in manager.provider(engine).astream("system", "say hello", ImagePayload())]
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("read", [stream, astream])
+def test_chunks_join_into_the_answer(manager, engine, read):
+    chunks = read(manager, engine)
+    assert "".join(chunks) == ANSWER
+    assert len(chunks) == len(DEFAULT_TOKENS)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_nothing_after_the_terminal_frame(mock_server, manager, engine):
+    # done / response.completed / message_stop / [DONE] / finishReason ends the answer
+    mock_server.trailing_tokens = [" trailing"]
+    assert "".join(stream(manager, engine)) == ANSWER
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("read", [stream, astream])
+def test_mid_stream_error_is_surfaced(mock_server, manager, engine, read):
+    mock_server.fail_stream(after=2, message="Overloaded")
+    chunks = read(manager, engine)
+    # The tokens before the failure, then the error as the last chunk, nothing after it
+    assert chunks[:2] == DEFAULT_TOKENS[:2]
+    assert len(chunks) == 3
+    assert chunks[-1].startswith(f"{LABELS[engine]} Error:")
+    if engine != "gemini":
+        # google-genai keeps only the fact that the stream failed, not the message
+        assert "Overloaded" in chunks[-1]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_error_before_any_token(mock_server, manager, engine):
+    mock_server.fail_stream(after=0, message="Overloaded")
+    chunks = stream(manager, engine)
+    assert len(chunks) == 1
+    assert chunks[0].startswith(f"{LABELS[engine]} Error:")
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_empty_answer_is_an_error(mock_server, manager, engine):
+    mock_server.tokens = []
+    assert stream(manager, engine) == [f"{LABELS[engine]} Error: model '{manager.provider(engine).default_model}' returned an empty response."]
+
+
+def test_sse_events_split_across_lines():
+    lines = [
+        ": keep-alive",
+        "event: response.output_text.delta",
+        'data: {"type": "response.output_text.delta",',
+        'data:  "delta": "Hi"}',
+        "",
+        "",
+        "data: [DONE]",
+    ]
+    # Data lines join with newlines into one JSON payload; a last event without a blank line still counts
+    assert list(iter_sse_events(lines)) == [
+        ("response.output_text.delta", {"type": "response.output_text.delta", "delta": "Hi"}),
+        ("", "[DONE]"),
+    ]
+
+
+def test_terminal_frames():
+    assert openai_event("response.completed", {"type": "response.completed"}) == ("", "", True)
+    assert claude_event("message_stop", {"type": "message_stop"}) == ("", "", True)
+    assert llamacpp_event("", "[DONE]") == ("", "", True)
+    assert llamacpp_event("", {"choices": [{"delta": {"content": "."}, "finish_reason": "stop"}]}) == (".", "", True)
+    assert ollama_chunk('{"response": "", "done": true}') == ("", "", True)
+    # Events the engines send along the way are neither text nor the end
+    assert openai_event("response.created", {"type": "response.created"}) == ("", "", False)
+    assert claude_event("ping", {"type": "ping"}) == ("", "", False)
+    assert claude_event("content_block_delta", {"type": "content_block_delta", "delta": {"type": "input_json_delta"}}) == ("", "", False)
+
+
+def test_gemini_chunks():
+    def chunk(payload: dict):
+        return types.GenerateContentResponse._from_response(response=payload, kwargs={})
+
+    text = {"candidates": [{"content": {"parts": [{"text": "Hi"}], "role": "model"}}]}
+    stop = {"candidates": [{"content": {"parts": [{"text": ""}], "role": "model"}, "finishReason": "STOP"}]}
+    assert gemini_chunk(chunk(text)) == ("Hi", "", False)
+    assert gemini_chunk(chunk(stop)) == ("", "", True)
+    assert gemini_chunk(chunk({"usageMetadata": {"totalTokenCount": 3}})) == ("", "", False)
+    assert gemini_chunk(chunk({"promptFeedback": {"blockReason": "SAFETY"}}))[1].startswith("Gemini Error: prompt blocked")
+    assert gemini_chunk(chunk({}))[1:] == ("Gemini Error: the response stream ended with an error.", True)
+
+
+def test_error_frames():
+    assert openai_event("response.failed", {"type": "response.failed", "response": {"error": {"message": "boom"}}})[1:] == (
+        "OpenAI Error: {'message': 'boom'}",
+        True,
+    )
+    assert claude_event("error", {"type": "error", "error": {"message": "boom"}})[1:] == ("Claude Error: {'message': 'boom'}", True)
+    assert llamacpp_event("", {"error": "boom"}) == ("", "llama.cpp Error: boom", True)
+    assert ollama_chunk('{"error": "boom"}') == ("", "Ollama Error: boom", True)
@@ -0,0 +1,48 @@
+import pytest
+import backend
+from core import tracing
+from llm.clients import LLMManager
+from tests.test_screenshot import screen
+
+
+@pytest.fixture
+def tracer(mock_server, monkeypatch, tmp_path):
+    for name, value in mock_server.env().items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setenv("SKIBIDYSAURUS_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("SKIBIDYSAURUS_IMAGE_UPLOADS", "0")
+    monkeypatch.setattr(backend, "_llm_manager", LLMManager())
+    monkeypatch.setattr(tracing, "tracer", tracing.Tracer())
+    tracing.configure()
+    return tracing.tracer
+
+
+@pytest.fixture
+def ask(tmp_path):
+    path = tmp_path / "screen.jpg"
+    path.write_bytes(screen())
+    return lambda: backend.stream_ai_response("say hello", screenshot_path=str(path), engine="openai", history=False)
+
+
+def requests(tracer) -> list:
+    return [record for record in tracer.recent() if record["name"] == "request"]
+
+
+def test_streamed_request_is_traced(tracer, ask):
+    frames = list(ask())
+    assert not frames[-1]["response"].startswith("Error")
+    assert frames[-1]["done"]
+    [record] = requests(tracer)
+    assert record["response_chars"] == len(frames[-1]["response"])
+    assert "cancelled" not in record
+
+
+def test_request_span_finishes_when_the_consumer_stops_early(tracer, ask):
+    stream = ask()
+    first = next(stream)
+    stream.close()
+    [record] = requests(tracer)
+    assert record["cancelled"]
+    assert record["response_chars"] == len(first["delta"].strip())
+    assert "error" not in record
+    assert tracer.stats()["openai"]["request"]["count"] == 1
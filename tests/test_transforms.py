@@ -0,0 +1,58 @@
+import json
+import pytest
+from llm import transforms
+
+PARAGRAPH = "The quarterly report ran long.\nIt covers revenue, hiring and the roadmap in detail."
+
+
+@pytest.mark.parametrize("prompt, text, name, expected", [
+    ("uppercase this", "hello world", "uppercase", "HELLO WORLD"),
+    ("Can you convert this to snake_case please?", "helloWorld\nHTTPServer error", "snake_case", "hello_world\nhttp_server_error"),
+    ("make it camelCase", "hello world-foo", "camel_case", "helloWorldFoo"),
+    ("sort these lines", "b\nA\nc", "sort_lines", "A\nb\nc"),
+    ("remove duplicate lines", "a\nb\na", "dedupe_lines", "a\nb"),
+    ("how many words are there?", "a b c d", "count_words", "4 words"),
+    ("format this json", '{"a":1}', "format_json", '{\n  "a": 1\n}'),
+    ("minify this json", '{"a": [1, 2]}', "minify_json", '{"a":[1,2]}'),
+    ("trim whitespace", "  a  \n b  \n", "trim_whitespace", "a\n b"),
+    ("strip trailing spaces", "a  \nb ", "trim_whitespace", "a\nb"),
+    ("base64 encode", "héllo", "base64_encode", "aMOpbGxv"),
+])
+def test_answers_mechanical_prompts(prompt, text, name, expected):
+    assert transforms.answer(prompt, text) == (name, expected)
+
+
+def test_reads_text_from_the_prompt():
+    assert transforms.answer("Edit this: 'x y' -> \n\nQuery: title case") == ("title_case", "X Y")
+    assert transforms.answer("Edit this: 'x y' -> all caps") == ("uppercase", "X Y")
+    assert transforms.answer("sort these lines:\nz\ny") == ("sort_lines", "y\nz")
+    assert transforms.answer("uppercase: hello") == ("uppercase", "HELLO")
+
+
+@pytest.mark.parametrize("prompt, text", [
+    # Shortening text is the engine's job; a bare verb must not mean whitespace
+    ("trim this", PARAGRAPH),
+    ("strip this", PARAGRAPH),
+    ("trim it down to one sentence", PARAGRAPH),
+    ("compress this", json.dumps({"a": [1, 2]})),
+    ("compact this", json.dumps({"a": [1, 2]})),
+    ("minify", json.dumps({"a": [1, 2]})),
+    ("compress this paragraph", PARAGRAPH),
+    ("make this more concise", PARAGRAPH),
+    ("format this as a table", PARAGRAPH),
+    ("sort these by price", PARAGRAPH),
+    ("make it uppercase and translate to french", PARAGRAPH),
+    ("uppercase the first letter of each sentence", PARAGRAPH),
+    ("reverse this string", PARAGRAPH),
+    ("is this valid json", '{"a": 1}'),
+])
+def test_near_misses_go_to_the_engine(prompt, text):
+    assert transforms.answer(prompt, text) is None
+
+
+def test_text_it_cannot_handle_goes_to_the_engine():
+    assert transforms.answer("format this json", "{not: json,") is None
+    # Sorting a single line changes nothing, so the user meant something else
+    assert transforms.answer("sort these", "pear, apple, fig") is None
+    assert transforms.answer("base64 decode", "not base64!") is None
+    assert transforms.answer("uppercase this", "") is None
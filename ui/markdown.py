@@ -0,0 +1,149 @@
+import re
+from PyQt6.QtGui import QTextCursor, QTextDocument, QTextDocumentFragment
+
+# Streaming repaints are coalesced to one per frame
+FRAME_MS = 16
+
+# A code fence at the start of a line; indented fences belong to a list item and stay in its block
+_FENCE = re.compile(r"(`{3,}|~{3,})")
+
+
+def _fragment(markdown: str) -> QTextDocumentFragment:
+    """
+    `markdown` parsed into a fragment that starts with a block separator,
+    so inserting it opens a new block that keeps its own format (heading,
+    code, list) instead of merging into the block before it.
+    """
+    doc = QTextDocument()
+    doc.setMarkdown(markdown)
+    first = doc.begin()
+    cursor = QTextCursor(doc)
+    cursor.insertBlock(first.blockFormat(), first.charFormat())
+    cursor.setPosition(0)
+    cursor.movePosition(QTextCursor.MoveOperation.End, QTextCursor.MoveMode.KeepAnchor)
+    return QTextDocumentFragment(cursor)
+
+
+class MarkdownRenderer:
+    """
+    Renders a growing markdown answer into a QTextDocument without
+    re-parsing what is already shown. Blocks that can no longer change
+    (followed by a blank line and an unindented line, or complete lines of
+    a fenced code block) are parsed once and appended; only the trailing
+    open block is removed and re-rendered on each update. Text that does
+    not extend the previous one starts over.
+    """
+
+    def __init__(self, document: QTextDocument):
+        self.document = document
+        self.reset()
+
+    def reset(self):
+        self.text = ""
+        # Characters of self.text appended as closed blocks
+        self._committed = 0
+        # Document position where the open block starts, and the format of the block it is in,
+        # which removing the open block can leave overwritten
+        self._tail_start = 0
+        self._tail_format = None
+        # Opening line of the fenced code block the committed text ends inside
+        self._fence = None
+        self.document.clear()
+        self._revision = self.document.revision()
+
+    def render(self, text: str):
+        # Something else edited the document (clear(), setMarkdown())
+        if self.document.revision() != self._revision or not text.startswith(self.text):
+            self.reset()
+        if text == self.text:
+            return
+        self.text = text
+        closed, tail = self._split()
+        cursor = QTextCursor(self.document)
+        cursor.beginEditBlock()
+        cursor.setPosition(self._tail_start)
+        cursor.movePosition(QTextCursor.MoveOperation.End, QTextCursor.MoveMode.KeepAnchor)
+        cursor.removeSelectedText()
+        if self._tail_format is not None:
+            cursor.setBlockFormat(self._tail_format)
+        for markdown in closed:
+            self._append(cursor, markdown)
+        self._tail_start = cursor.position()
+        self._tail_format = cursor.blockFormat()
+        self._append(cursor, tail)
+        cursor.endEditBlock()
+        self._revision = self.document.revision()
+
+    def _append(self, cursor: QTextCursor, markdown: str):
+        if not markdown.strip():
+            return
+        empty = self.document.isEmpty()
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertFragment(_fragment(markdown))
+        if empty:
+            # The fragment's leading separator would leave an empty first line
+            first = QTextCursor(self.document)
+            first.setPosition(1, QTextCursor.MoveMode.KeepAnchor)
+            first.removeSelectedText()
+            cursor.movePosition(QTextCursor.MoveOperation.End)
+
+    def _split(self):
+        """
+        Scans the text after the committed blocks: ([closed block markdown],
+        open tail markdown), and advances the committed offset past the
+        closed ones.
+        """
+        text = self.text
+        fence = self._fence
+        closed = []
+        start = pos = self._committed
+        # End of the block's content when a blank line may have closed it
+        blank_at = None
+        while True:
+            end = text.find("\n", pos)
+            if end < 0:
+                break
+            line = text[pos:end].rstrip("\r")
+            if fence is not None:
+                marker = _FENCE.match(fence).group(1)
+                stripped = line.strip()
+                if len(stripped) >= len(marker) and stripped == marker[0] * len(stripped):
+                    # An empty block still renders, as one empty line
+                    if start < pos or text[max(0, start - len(fence) - 2):start].rstrip("\r\n").endswith(fence):
+                        closed.append(f"{fence}\n{text[start:pos]}{marker}")
+                    fence = None
+                    start = end + 1
+            elif not line.strip():
+                if blank_at is None and text[start:pos].strip():
+                    blank_at = pos
+            else:
+                if blank_at is not None and not line[0].isspace():
+                    closed.append(text[start:blank_at])
+                    start = pos
+                blank_at = None
+                match = _FENCE.match(line)
+                if match and not (match.group(1)[0] == "`" and "`" in line[match.end():]):
+                    if text[start:pos].strip():
+                        closed.append(text[start:pos])
+                    fence = line
+                    start = end + 1
+            pos = end + 1
+        if fence is not None:
+            # Complete lines of an open code block are final. Qt drops blank lines at the start
+            # of a code block, so the last non-blank line and any blank lines after it stay open.
+            keep = pos
+            while keep > start:
+                line_start = max(text.rfind("\n", start, keep - 1) + 1, start)
+                blank = not text[line_start:keep].strip()
+                keep = line_start
+                if not blank:
+                    break
+            if start < keep:
+                closed.append(f"{fence}\n{text[start:keep]}{_FENCE.match(fence).group(1)}")
+                start = keep
+            tail = f"{fence}\n{text[start:]}" if text[start:] else ""
+        else:
+            tail = text[start:]
+        self._committed = start
+        self._fence = fence
+        return closed, tail
@@ -4,6 +4,9 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QLineEdit, QComboBox, QApplic
 from PyQt6.QtCore import Qt, pyqtSignal, QTimer
 import os
 from dotenv import set_key, load_dotenv
+from llm import registry
+from core import tracing
+from ui.markdown import MarkdownRenderer, FRAME_MS
 
 class SettingsDialog(QDialog):
     def __init__(self, parent=None):
@@ -51,12 +54,20 @@ class HoverOverlay(QWidget):
     submit_query = pyqtSignal(str, str)
     # Signal emitted when settings are saved to trigger LLM re-init
     settings_saved = pyqtSignal()
+    # Signal emitted when the overlay is dismissed with Escape
+    dismissed = pyqtSignal()
 
     def __init__(self):
         super().__init__()
         self.animation_timer = QTimer()
         self.animation_timer.timeout.connect(self.animate_thinking)
         self.animation_dots = 0
+        self.streaming_text = None
+        # Streamed deltas are rendered at most once per frame
+        self.render_timer = QTimer()
+        self.render_timer.setSingleShot(True)
+        self.render_timer.setInterval(FRAME_MS)
+        self.render_timer.timeout.connect(self.render_partial)
         self.init_ui()
 
     def init_ui(self):
@@ -78,7 +89,7 @@ class HoverOverlay(QWidget):
         container_layout = QVBoxLayout(self.container)
 
         self.model_selector = QComboBox()
-        self.model_selector.addItems(["gemini", "ollama"])
+        self.model_selector.addItems(registry.engines())
         container_layout.addWidget(self.model_selector)
         
         self.settings_button = QPushButton("⚙")
@@ -111,6 +122,7 @@ class HoverOverlay(QWidget):
         self.output_area.setReadOnly(True)
         self.output_area.setPlaceholderText("Gemini's response will appear here...")
         container_layout.addWidget(self.output_area)
+        self.markdown = MarkdownRenderer(self.output_area.document())
 
         layout.addWidget(self.container)
         self.setLayout(layout)
@@ -203,6 +215,7 @@ class HoverOverlay(QWidget):
             self.animation_dots = 0
             self.submit_button.setText("Thinking")
             self.animation_timer.start(400) # update every 400ms
+            self.streaming_text = None
             
             # Emit signal
             self.submit_query.emit(prompt, model)
@@ -228,6 +241,20 @@ class HoverOverlay(QWidget):
 
         self.show()
 
+    def append_partial(self, delta: str):
+        # First chunk of a new answer replaces whatever the previous answer left behind
+        if self.streaming_text is None:
+            self.streaming_text = ""
+        self.streaming_text += delta
+        if not self.render_timer.isActive():
+            self.render_timer.start()
+
+    def render_partial(self):
+        if self.streaming_text is None:
+            return
+        with tracing.span("render", chars=len(self.streaming_text), partial=True):
+            self.markdown.render(self.streaming_text)
+
     def show_result(self, result_text: str):
         # Stop Animation
         self.animation_timer.stop()
@@ -238,8 +265,12 @@ class HoverOverlay(QWidget):
         self.input_field.clear()
         self.input_field.setPlaceholderText("Ask follow up...")
         
-        # Render markdown directly for more professional, clean output
-        self.output_area.setMarkdown(result_text)
+        # Render markdown directly for more professional, clean output; a streamed
+        # answer only has its last block left to render
+        self.render_timer.stop()
+        self.streaming_text = None
+        with tracing.span("render", chars=len(result_text), partial=False):
+            self.markdown.render(result_text)
         # Ensure focus doesn't accidentally trigger another submit immediately
         self.input_field.setFocus()
 
@@ -247,6 +278,7 @@ class HoverOverlay(QWidget):
         # Escape key to cancel
         if event.key() == Qt.Key.Key_Escape:
             self.hide()
+            self.dismissed.emit()
         else:
             super().keyPressEvent(event)
 